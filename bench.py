@@ -0,0 +1,237 @@
+"""
+Benchmark entrypoint
+"""
+import argparse
+import cProfile
+import json
+import os
+import sys
+from pathlib import Path
+
+# Add src folder, so modules can be found
+sys.path.append(str(Path(__file__).resolve().parent / "src"))
+
+from ai_wayang_single.bench.benchmark import Benchmark, format_report
+from ai_wayang_single.bench.evaluation import TpchEvaluation, format_scoreboard
+from ai_wayang_single.bench.load import LoadTest, format_load
+from ai_wayang_single.bench.replay import SessionReplay
+from ai_wayang_single.bench.startup import StartupBenchmark, format_startup
+from ai_wayang_single.bench.stub_llm import StubLLM
+from ai_wayang_single.bench.stub_wayang import StubWayangServer
+from ai_wayang_single.bench.tpch_data import TpchGenerator
+
+def run(args) -> int:
+    """
+    Runs the offline benchmark and compares it with a baseline if given
+    """
+
+    # Stubs for OpenAI and Wayang
+    llm = StubLLM(StubLLM.load(args.plans) if args.plans else None, latency=args.llm_latency)
+    wayang = StubWayangServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+
+    benchmark = Benchmark(llm, wayang, iterations=args.iterations, warmup=args.warmup, concurrency=args.concurrency)
+    report = benchmark.run()
+
+    return finish(report, args)
+
+def replay(args) -> int:
+    """
+    Replays logged sessions with their recorded plans and Wayang responses
+    """
+
+    # Load one session or a whole log folder
+    if os.path.isdir(args.logs):
+        sessions = SessionReplay.load_folder(args.logs)
+    else:
+        session = SessionReplay.load_session(args.logs)
+        sessions = [session] if session else []
+
+    if not sessions:
+        print(f"[ERROR] No replayable sessions in {args.logs}")
+        return 1
+
+    print(f"[INFO] Replaying {len(sessions)} sessions")
+    session_replay = SessionReplay(sessions, repeat=args.repeat)
+
+    # Profile the replay if asked, e.g. to find hot spots in mapper, validator or prompt building
+    if args.profile:
+        profiler = cProfile.Profile()
+        report = profiler.runcall(session_replay.run)
+        profiler.dump_stats(args.profile)
+        print(f"[INFO] Profile saved to {args.profile}")
+    else:
+        report = session_replay.run()
+
+    # Sessions where the current pipeline took another path than recorded
+    for file in report["diverged"]:
+        print(f"[WARNING] Replay diverged from recording: {file}")
+
+    return finish(report, args)
+
+def tpch(args) -> int:
+    """
+    Runs the TPC-H evaluation, or exports the generated dataset
+    """
+
+    # Export dataset, e.g. to load it into the JDBC database used by Wayang
+    if args.export_sql or args.export_csv:
+        generator = TpchGenerator(args.scale, args.seed)
+
+        if args.export_sql:
+            generator.to_sql(args.export_sql)
+            print(f"[INFO] TPC-H dataset saved to {args.export_sql}")
+
+        if args.export_csv:
+            generator.to_csv(args.export_csv)
+            print(f"[INFO] TPC-H dataset saved to {args.export_csv}")
+
+        return 0
+
+    questions = TpchEvaluation.load_questions(args.questions.split(",") if args.questions else None)
+    evaluation = TpchEvaluation(
+        questions,
+        llm=args.llm,
+        wayang=args.wayang,
+        recorded_plans=StubLLM.load(args.plans) if args.plans else None,
+        scale=args.scale,
+        seed=args.seed,
+        record=bool(args.record),
+    )
+    report = evaluation.run()
+
+    # Save plans from the real LLM, so the stub can replay them later
+    if args.record:
+        with open(args.record, "w", encoding="utf-8") as f:
+            json.dump(evaluation.recordings(), f, indent=4)
+
+    return finish(report, args, format_scoreboard)
+
+def startup(args) -> int:
+    """
+    Measures cold starts of the server
+    """
+
+    report = StartupBenchmark(runs=args.runs).run()
+
+    # Heavy modules should only be imported on first use, e.g. pandas by load_schemas
+    for module in report["heavy_modules"]:
+        print(f"[WARNING] {module} imported at startup")
+
+    return finish(report, args, format_startup)
+
+def load(args) -> int:
+    """
+    Load tests several worker processes sharing state
+    """
+
+    workers = [int(n) for n in args.workers.split(",")]
+    report = LoadTest(workers, queries=args.queries, warmup=args.warmup, llm_latency=args.llm_latency, latency=args.latency).run()
+
+    # Every job must be readable from a process that didn't run it
+    for level in report["levels"]:
+        if level["shared_jobs_found"] < level["jobs"] or level["shared_pages_read"] < level["jobs"]:
+            print(f"[WARNING] {level['jobs'] - level['shared_jobs_found']} jobs not found in the shared store with {level['workers']} workers")
+
+    return finish(report, args, format_load)
+
+def finish(report, args, formatter=format_report) -> int:
+    """
+    Prints and saves a report and compares it with a baseline if given
+    """
+
+    print(formatter(report))
+
+    # Save report, e.g. as a new baseline
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+    # Fail on regressions against the baseline
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        regressions = Benchmark.compare(report, baseline, args.tolerance)
+
+        for regression in regressions:
+            print(f"[REGRESSION] {regression}")
+
+        if regressions:
+            return 1
+
+    return 0
+
+def add_report_arguments(parser) -> None:
+    """
+    Adds arguments for saving and comparing reports
+    """
+
+    parser.add_argument("--output", help="Save the report as JSON")
+    parser.add_argument("--baseline", help="Baseline report to compare with. Exits with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative change against the baseline")
+
+def main():
+    """
+    Parses arguments and runs the chosen benchmark
+    """
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the AI-Wayang pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # End-to-end benchmark with stub LLM and stub Wayang server
+    run_parser = subparsers.add_parser("run", help="Benchmark query_wayang end to end without network")
+    run_parser.add_argument("--plans", help="JSON file with recorded plans, defaults to the bundled TPC-H plans")
+    run_parser.add_argument("--iterations", type=int, default=5, help="Measured rounds over all queries")
+    run_parser.add_argument("--warmup", type=int, default=1, help="Unmeasured rounds before measuring")
+    run_parser.add_argument("--concurrency", type=int, default=1, help="Queries run in parallel")
+    run_parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    run_parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per Wayang execution")
+    run_parser.add_argument("--jitter", type=float, default=0.0, help="Random extra seconds per Wayang execution")
+    run_parser.add_argument("--error-rate", type=float, default=0.0, help="Share of Wayang executions failing, 0 to 1")
+    run_parser.add_argument("--seed", type=int, default=42, help="Seed for latency jitter and errors")
+    add_report_arguments(run_parser)
+    run_parser.set_defaults(func=run)
+
+    # Replay of logged sessions
+    replay_parser = subparsers.add_parser("replay", help="Replay logged sessions with recorded plans and Wayang responses")
+    replay_parser.add_argument("logs", help="Log file or log folder (LOG_FOLDER)")
+    replay_parser.add_argument("--repeat", type=int, default=1, help="Times to replay each session")
+    replay_parser.add_argument("--profile", help="Save cProfile stats of the replay to this file")
+    add_report_arguments(replay_parser)
+    replay_parser.set_defaults(func=replay)
+
+    # TPC-H evaluation
+    tpch_parser = subparsers.add_parser("tpch", help="Evaluate the 22 TPC-H questions against reference results")
+    tpch_parser.add_argument("--llm", choices=["stub", "openai"], default="stub", help="Stub replays recorded plans, openai uses the configured client")
+    tpch_parser.add_argument("--wayang", choices=["stub", "real"], default="stub", help="Stub answers with the reference result, real uses WAYANG_URL")
+    tpch_parser.add_argument("--plans", help="JSON file with recorded plans for the stub LLM, defaults to the bundled plans")
+    tpch_parser.add_argument("--record", help="Save the plans of the real LLM to this file for later stub runs")
+    tpch_parser.add_argument("--questions", help="Comma separated question ids, e.g. q1,q6. Default all")
+    tpch_parser.add_argument("--scale", type=float, default=0.01, help="Scale factor of the generated dataset")
+    tpch_parser.add_argument("--seed", type=int, default=42, help="Seed of the generated dataset")
+    tpch_parser.add_argument("--export-sql", help="Save the generated dataset as SQL script and exit")
+    tpch_parser.add_argument("--export-csv", help="Save the generated dataset as CSV files in this folder and exit")
+    add_report_arguments(tpch_parser)
+    tpch_parser.set_defaults(func=tpch)
+
+    # Startup time
+    startup_parser = subparsers.add_parser("startup", help="Measure import time and first use of prompts and clients in fresh interpreters")
+    startup_parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure")
+    add_report_arguments(startup_parser)
+    startup_parser.set_defaults(func=startup)
+
+    # Load test of worker processes sharing state
+    load_parser = subparsers.add_parser("load", help="Load test worker processes sharing job, template and result state")
+    load_parser.add_argument("--workers", default="1,2,4", help="Comma separated numbers of worker processes to compare")
+    load_parser.add_argument("--queries", type=int, default=20, help="Measured queries per worker")
+    load_parser.add_argument("--warmup", type=int, default=1, help="Unmeasured queries per worker before measuring")
+    load_parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    load_parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per Wayang execution")
+    add_report_arguments(load_parser)
+    load_parser.set_defaults(func=load)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,67 @@
 """
 Entrypoint
 """
+import argparse
+import multiprocessing
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 # Add src folderm, so modules can be found
 sys.path.append(str(Path(__file__).resolve().parent / "src"))
 
-from src.ai_wayang_single.server.mcp_server import mcp
+from ai_wayang_single.server.mcp_server import mcp
+from ai_wayang_single.config.settings import MCP_CONFIG, METRICS_CONFIG, SHARED_CONFIG
+from ai_wayang_single.utils.metrics import MetricsServer, metrics
 
-def main():
+def serve(worker: int = 0):
     """
-    Starts the MCP-server, default is port 9500
+    Starts the MCP-server, default is port 9500. Worker n listens on the port plus n
+    Also starts the Prometheus metrics endpoint if a metrics port is set
     """
 
+    # Start metrics endpoint
+    if METRICS_CONFIG.get("port"):
+        MetricsServer(metrics, int(METRICS_CONFIG.get("port")) + worker).start()
+
+    mcp.settings.port = MCP_CONFIG.get("port") + worker
+    print(f"Starts MCP-server on port {mcp.settings.port}")
     mcp.run(transport="sse")
-    print(f"Starts MCP-server")
+
+def main():
+    """
+    Starts one MCP-server, or several worker processes sharing job, template and result state
+    """
+
+    parser = argparse.ArgumentParser(description="AI-Wayang MCP-server")
+    parser.add_argument("--workers", type=int, default=int(MCP_CONFIG.get("workers")), help="Worker processes, each on its own port from MCP_PORT")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        serve()
+        return
+
+    # Workers share state through one store file, read from the environment when they start
+    if not SHARED_CONFIG.get("store_file"):
+        os.environ["SHARED_STORE_FILE"] = str(Path(tempfile.gettempdir()) / "ai_wayang_shared.db")
+        print(f"[INFO] SHARED_STORE_FILE not set, using {os.environ['SHARED_STORE_FILE']}")
+
+    # Spawn instead of fork, so each worker opens its own store connections
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=serve, args=(worker,), daemon=True) for worker in range(args.workers)]
+
+    for process in workers:
+        process.start()
+
+    print(f"[INFO] Started {args.workers} workers on ports {MCP_CONFIG.get('port')}-{MCP_CONFIG.get('port') + args.workers - 1}")
+
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,267 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict
+import json
+import os
+import re
+import time
+import tracemalloc
+from ai_wayang_single.bench.stub_llm import StubLLM
+from ai_wayang_single.bench.stub_wayang import StubWayangServer
+
+# Report fields where higher is worse, and where lower is worse
+HIGHER_IS_WORSE = ("latency_p50_ms", "latency_p99_ms", "peak_memory_mb")
+LOWER_IS_WORSE = ("throughput_qps",)
+
+
+class Benchmark:
+    """
+    Offline benchmark of query_wayang end to end.
+    The agents get a StubLLM replaying recorded plans and the executor is pointed at a local StubWayangServer,
+    so the benchmark needs no network and only measures the pipeline's own overhead
+
+    """
+
+    def __init__(
+        self,
+        llm: StubLLM | None = None,
+        wayang: StubWayangServer | None = None,
+        queries: List[str] | None = None,
+        iterations: int = 5,
+        warmup: int = 1,
+        concurrency: int = 1,
+    ):
+        self.llm = llm or StubLLM()
+        self.wayang = wayang or StubWayangServer()
+        self.queries = queries or self.llm.queries()
+        self.iterations = iterations
+        self.warmup = warmup
+        self.concurrency = concurrency
+
+    def run(self) -> Dict:
+        """
+        Runs warmup and measured rounds over all queries and builds the report
+
+        Returns:
+            Dict: Report with throughput, latency percentiles, per-stage time, memory and tokens
+
+        """
+
+        # The OpenAI client needs a key to be created, even though it's never used
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+        from ai_wayang_single.server import mcp_server
+        from ai_wayang_single.utils.metrics import metrics
+
+        # Use stubs instead of OpenAI and Wayang
+        url = self.wayang.start()
+        mcp_server.builder_agent.client = self.llm
+        mcp_server.debugger_agent.client = self.llm
+        mcp_server.wayang_executor.url = url
+
+        try:
+            # Warm up caches and imports, not measured
+            for _ in range(self.warmup):
+                for query in self.queries:
+                    mcp_server.query_wayang(query)
+
+            # Only measure the measured rounds
+            metrics.reset()
+            self.llm.calls = 0
+            self.wayang.requests = 0
+            tracemalloc.start()
+
+            # Measured rounds
+            jobs = [query for _ in range(self.iterations) for query in self.queries]
+            start = time.perf_counter()
+
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results = list(pool.map(lambda query: self._timed_query(mcp_server, query), jobs))
+
+            duration = time.perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        finally:
+            self.wayang.stop()
+
+        return self._report(results, duration, peak_memory, metrics.snapshot())
+
+    @staticmethod
+    def compare(report: Dict, baseline: Dict, tolerance: float = 0.1) -> List[str]:
+        """
+        Compares a report with a baseline report
+
+        Args:
+            report (Dict): New report
+            baseline (Dict): Baseline report
+            tolerance (float): Allowed relative change before a field counts as a regression, e.g. 0.1 for 10%
+
+        Returns:
+            List[str]: Regressions, empty if none
+
+        """
+
+        # List to store regressions
+        regressions = []
+
+        for field in HIGHER_IS_WORSE:
+            if baseline.get(field) and report[field] > baseline[field] * (1 + tolerance):
+                regressions.append(f"{field}: {report[field]:.3f} > baseline {baseline[field]:.3f}")
+
+        for field in LOWER_IS_WORSE:
+            if baseline.get(field) and report[field] < baseline[field] * (1 - tolerance):
+                regressions.append(f"{field}: {report[field]:.3f} < baseline {baseline[field]:.3f}")
+
+        if report["success_rate"] < baseline.get("success_rate", 0):
+            regressions.append(f"success_rate: {report['success_rate']:.3f} < baseline {baseline['success_rate']:.3f}")
+
+        return regressions
+
+    def _timed_query(self, mcp_server, query: str) -> Dict:
+        """
+        Helper function to run and time a single query
+
+        Args:
+            mcp_server: The MCP-server module
+            query (str): A query in natural language
+
+        Returns:
+            Dict: Query, latency and whether it succeeded
+
+        """
+
+        start = time.perf_counter()
+        output = mcp_server.query_wayang(query)
+        latency = time.perf_counter() - start
+
+        # Failed queries return an explanation instead of the Wayang output
+        success = not (output.startswith("Couldn't execute") or output.startswith("An error occured"))
+
+        return {"query": query, "latency": latency, "success": success}
+
+    def _report(self, results: List[Dict], duration: float, peak_memory: int, snapshot: Dict) -> Dict:
+        """
+        Helper function to build the report
+
+        Args:
+            results (List[Dict]): Timed queries
+            duration (float): Wall time of the measured rounds in seconds
+            peak_memory (int): Peak traced memory in bytes
+            snapshot (Dict): Metrics snapshot of the measured rounds
+
+        Returns:
+            Dict: The report
+
+        """
+
+        return {
+            **summarize(results, duration, peak_memory, snapshot),
+            "concurrency": self.concurrency,
+            "llm_calls": self.llm.calls,
+            "wayang_requests": self.wayang.requests,
+        }
+
+
+def summarize(results: List[Dict], duration: float, peak_memory: int, snapshot: Dict) -> Dict:
+    """
+    Summarizes timed queries and a metrics snapshot into report fields
+
+    Args:
+        results (List[Dict]): Timed queries with latency and success
+        duration (float): Wall time in seconds
+        peak_memory (int): Peak traced memory in bytes
+        snapshot (Dict): Metrics snapshot
+
+    Returns:
+        Dict: Throughput, latency percentiles, per-stage time, memory and tokens
+
+    """
+
+    latencies = sorted(r["latency"] for r in results)
+
+    # Time per stage from the stage histograms
+    stages = {}
+    for key, histogram in snapshot["histograms"].items():
+        match = re.match(r'wayang_stage_duration_seconds\{.*stage="(\w+)".*\}', key)
+
+        if not match:
+            continue
+
+        stage = stages.setdefault(match.group(1), {"count": 0, "total_ms": 0.0})
+        stage["count"] += histogram["count"]
+        stage["total_ms"] += histogram["sum"] * 1000
+
+    for stage in stages.values():
+        stage["mean_ms"] = stage["total_ms"] / stage["count"] if stage["count"] else 0.0
+
+    # Tokens from the token counters
+    tokens = {}
+    for key, value in snapshot["counters"].items():
+        match = re.match(r'wayang_llm_tokens_total\{.*type="(\w+)".*\}', key)
+
+        if match:
+            tokens[match.group(1)] = tokens.get(match.group(1), 0) + value
+
+    return {
+        "queries": len(results),
+        "success_rate": sum(r["success"] for r in results) / len(results) if results else 0.0,
+        "duration_seconds": duration,
+        "throughput_qps": len(results) / duration if duration else 0.0,
+        "latency_mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        "latency_p50_ms": 1000 * percentile(latencies, 50),
+        "latency_p99_ms": 1000 * percentile(latencies, 99),
+        "stages": stages,
+        "peak_memory_mb": peak_memory / (1024 * 1024),
+        "tokens": tokens,
+    }
+
+
+def percentile(values: List[float], percentile: float) -> float:
+    """
+    Gets a percentile with linear interpolation
+
+    Args:
+        values (List[float]): Sorted values
+        percentile (float): Percentile from 0 to 100
+
+    Returns:
+        float: The percentile, 0 if no values
+
+    """
+
+    if not values:
+        return 0.0
+
+    position = (len(values) - 1) * percentile / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def format_report(report: Dict) -> str:
+    """
+    Formats a report for the terminal
+
+    Args:
+        report (Dict): Benchmark report
+
+    Returns:
+        str: Formatted report
+
+    """
+
+    lines = [
+        f"Queries:      {report['queries']} (concurrency {report['concurrency']}, success rate {report['success_rate']:.0%})",
+        f"Throughput:   {report['throughput_qps']:.2f} queries/s",
+        f"Latency:      mean {report['latency_mean_ms']:.1f} ms, p50 {report['latency_p50_ms']:.1f} ms, p99 {report['latency_p99_ms']:.1f} ms",
+        f"Peak memory:  {report['peak_memory_mb']:.2f} MB",
+        f"LLM calls:    {report['llm_calls']}, Wayang requests: {report['wayang_requests']}",
+        f"Tokens:       {json.dumps(report['tokens'])}",
+        "Stages:",
+    ]
+
+    for stage, data in sorted(report["stages"].items()):
+        lines.append(f"  {stage:<10} {data['count']:>5} x {data['mean_ms']:8.2f} ms = {data['total_ms']:9.1f} ms")
+
+    return "\n".join(lines)
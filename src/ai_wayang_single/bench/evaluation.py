@@ -0,0 +1,470 @@
+from pathlib import Path
+from typing import List, Dict
+import json
+import math
+import os
+import re
+import sqlite3
+import time
+from ai_wayang_single.bench.benchmark import summarize
+from ai_wayang_single.bench.stub_llm import StubLLM, RecordingLLM
+from ai_wayang_single.bench.stub_wayang import StubWayangServer
+from ai_wayang_single.bench.tpch_data import TpchGenerator
+from ai_wayang_single.wayang.sql_compiler import NotTranslatable, PlanSqlCompiler
+
+# The 22 TPC-H questions in natural language with reference SQL
+QUESTIONS_FILE = Path(__file__).resolve().parent / "data" / "tpch_questions.json"
+
+# Recorded plans for the stub LLM
+TPCH_PLANS_FILE = Path(__file__).resolve().parent / "data" / "tpch_plans.json"
+
+# Outputs of query_wayang that are not Wayang results
+FAILURE_PREFIXES = ("Couldn't execute", "An error occured")
+
+# Wrappers around a result row, e.g. (1,2) or Record(1, 2)
+ROW_WRAPPER = re.compile(r"^(?:Record)?[\(\[](.*)[\)\]]$")
+
+# PostgreSQL functions that are keywords in SQLite, renamed before running compiled plans on SQLite
+SQLITE_KEYWORD_FUNCTIONS = re.compile(r"\b(LEFT|RIGHT)\(")
+
+
+class TpchEvaluation:
+    """
+    Evaluates query_wayang on the 22 TPC-H questions in natural language.
+    Reference results are computed with SQLite on a generated small-scale dataset.
+    Reports per question whether the result is correct, debug iterations, end-to-end latency and tokens.
+
+    The LLM and Wayang backends are pluggable: "stub" replays recorded plans and executes plans on the SQLite dataset,
+    "openai" and "real" use the configured OpenAI client and Wayang server. With a real Wayang server the JDBC
+    database must hold the same generated dataset, see TpchGenerator.to_sql.
+    The stub Wayang server compiles plans to SQL like the SQL pushdown, so plans outside the compiler's subset
+    aren't executed and their questions are scored as unverified
+
+    """
+
+    def __init__(
+        self,
+        questions: List[Dict] | None = None,
+        llm: str = "stub",
+        wayang: str = "stub",
+        recorded_plans: List[Dict] | None = None,
+        scale: float = 0.01,
+        seed: int = 42,
+        record: bool = False,
+    ):
+        self.questions = questions or self.load_questions()
+        self.llm = llm
+        self.wayang = wayang
+        self.recorded_plans = recorded_plans if recorded_plans is not None else StubLLM.load(TPCH_PLANS_FILE)
+        self.generator = TpchGenerator(scale, seed)
+        self.record = record
+        self.recorder = None
+        self.compiler = PlanSqlCompiler()
+        self._plan_mapper = None
+        self._connection = None
+        self._unverified = None
+
+    @staticmethod
+    def load_questions(ids: List[str] | None = None) -> List[Dict]:
+        """
+        Loads the TPC-H questions
+
+        Args:
+            ids (List[str] | None): Question ids to keep, e.g. ["q1", "q6"]. All if None
+
+        Returns:
+            List[Dict]: Questions with id, question, sql and whether the result is ordered
+
+        """
+
+        with open(QUESTIONS_FILE, "r", encoding="utf-8") as f:
+            questions = json.load(f)
+
+        if ids:
+            questions = [q for q in questions if q["id"] in ids]
+
+        return questions
+
+    def run(self) -> Dict:
+        """
+        Runs all questions and builds the scoreboard
+
+        Returns:
+            Dict: Report with a result per question and the same summary fields as the benchmark
+
+        """
+
+        # The OpenAI client needs a key to be created, even though the stub never uses it
+        if self.llm == "stub":
+            os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+        from ai_wayang_single.server import mcp_server
+        from ai_wayang_single.utils.metrics import metrics
+
+        # Reference results from the generated dataset
+        print(f"[INFO] Generating TPC-H dataset, scale {self.generator.scale}")
+        connection = self.generator.to_sqlite()
+        add_postgres_functions(connection)
+
+        # Keep the real clients and executor, so they can be restored
+        builder_client = mcp_server.builder_agent.client
+        debugger_client = mcp_server.debugger_agent.client
+        executor_pool = mcp_server.wayang_executor.pool
+
+        # Set up backends
+        stub_llm = StubLLM(self.recorded_plans) if self.llm == "stub" else None
+        stub_wayang = StubWayangServer(responder=self._execute_responder) if self.wayang == "stub" else None
+        self._plan_mapper = mcp_server.plan_mapper
+        self._connection = connection
+
+        if stub_llm:
+            mcp_server.builder_agent.client = stub_llm
+            mcp_server.debugger_agent.client = stub_llm
+        elif self.record:
+            self.recorder = RecordingLLM(builder_client)
+            mcp_server.builder_agent.client = self.recorder
+            mcp_server.debugger_agent.client = self.recorder
+
+        if stub_wayang:
+            mcp_server.wayang_executor.url = stub_wayang.start()
+
+        # List to store results
+        results = []
+        metrics.reset()
+        start = time.perf_counter()
+
+        try:
+            for question in self.questions:
+                expected = connection.execute(question["sql"]).fetchall()
+
+                # The stub LLM can only answer recorded questions
+                if stub_llm and not stub_llm.has_plan(question["question"]):
+                    results.append({"id": question["id"], "status": "skipped"})
+                    continue
+
+                results.append(self._run_question(mcp_server, metrics, question, expected))
+
+        finally:
+            duration = time.perf_counter() - start
+
+            if stub_wayang:
+                stub_wayang.stop()
+
+            mcp_server.builder_agent.client = builder_client
+            mcp_server.debugger_agent.client = debugger_client
+            mcp_server.wayang_executor.pool = executor_pool
+            connection.close()
+
+        # Summary over the questions that ran. A question succeeds if its result is correct
+        ran = [r for r in results if r["status"] != "skipped"]
+        summary = summarize([{"latency": r["latency"], "success": r["status"] == "correct"} for r in ran], duration, 0, metrics.snapshot())
+
+        return {
+            **summary,
+            "llm": self.llm,
+            "wayang": self.wayang,
+            "correct": sum(r["status"] == "correct" for r in results),
+            "wrong": sum(r["status"] == "wrong" for r in results),
+            "failed": sum(r["status"] == "failed" for r in results),
+            "unverified": sum(r["status"] == "unverified" for r in results),
+            "skipped": sum(r["status"] == "skipped" for r in results),
+            "recorded": len(ran) if stub_llm else None,
+            "total": len(results),
+            "debug_iterations": sum(r.get("debug_iterations", 0) for r in ran),
+            "results": results,
+        }
+
+    def recordings(self) -> List[Dict]:
+        """
+        Gets the plans recorded from the real LLM, so later stub runs can replay them
+
+        Returns:
+            List[Dict]: Recorded plans, empty if not recording
+
+        """
+
+        return self.recorder.to_recorded_plans() if self.recorder else []
+
+    def _run_question(self, mcp_server, metrics, question: Dict, expected: List[tuple]) -> Dict:
+        """
+        Helper function to run and score a single question
+
+        Args:
+            mcp_server: The MCP-server module
+            metrics: The shared metrics registry
+            question (Dict): The question
+            expected (List[tuple]): Reference result
+
+        Returns:
+            Dict: Result of the question
+
+        """
+
+        print(f"[INFO] TPC-H {question['id']}")
+
+        # Set by the stub Wayang server if it can't execute a plan of this question
+        self._unverified = None
+
+        if self.recorder:
+            self.recorder.query = question["question"]
+
+        before = metrics.snapshot()
+        start = time.perf_counter()
+        output = mcp_server.query_wayang(question["question"])
+        latency = time.perf_counter() - start
+        after = metrics.snapshot()
+
+        # Score the full result, not only the preview returned to the client
+        if mcp_server.last_session_job_id:
+            with open(mcp_server.result_store.get(mcp_server.last_session_job_id)["path"], "r", encoding="utf-8") as f:
+                output = f.read()
+
+        # Score the output against the reference result, the output of a plan the stub couldn't execute says nothing
+        if self._unverified:
+            status = "unverified"
+            print(f"[INFO] Stub Wayang server couldn't execute the plan of {question['id']}: {self._unverified}")
+        elif output.startswith(FAILURE_PREFIXES):
+            status = "failed"
+        else:
+            status = "correct" if compare_results(parse_output(output), expected, question["ordered"]) else "wrong"
+
+        tokens = self._delta(before, after, r'wayang_llm_tokens_total\{.*type="(\w+)".*\}')
+
+        return {
+            "id": question["id"],
+            "status": status,
+            "latency": latency,
+            "debug_iterations": int(self._delta(before, after, r"(wayang_debug_iterations)$", "histograms").get("wayang_debug_iterations", 0)),
+            "llm_calls": int(self._delta(before, after, r"(wayang_llm_requests_total)\{").get("wayang_llm_requests_total", 0)),
+            "tokens": tokens,
+            "expected_rows": len(expected),
+        }
+
+    def _execute_responder(self, plan: Dict):
+        """
+        Helper function for the stub Wayang server to execute a plan on the generated SQLite dataset.
+        The plan is compiled to SQL and its rows are formatted like Wayang's output
+
+        Args:
+            plan (Dict): Wayang JSON plan
+
+        Returns:
+            Tuple: Status code and output lines. No output if the plan can't be executed, the question is then unverified
+
+        """
+
+        try:
+            query = self.compiler.compile(self._plan_mapper.plan_from_json(plan))
+            rows = self._connection.execute(SQLITE_KEYWORD_FUNCTIONS.sub(r"PG_\1(", query.sql)).fetchall()
+        except (NotTranslatable, ValueError, sqlite3.Error) as e:
+            self._unverified = str(e).splitlines()[0] if str(e) else type(e).__name__
+            return 200, ""
+
+        return 200, "".join(query.format_row(row) + "\n" for row in rows)
+
+    def _delta(self, before: Dict, after: Dict, pattern: str, kind: str = "counters") -> Dict:
+        """
+        Helper function to get the change of metrics between two snapshots, grouped by a regex group
+
+        Args:
+            before (Dict): Snapshot before
+            after (Dict): Snapshot after
+            pattern (str): Regex with one group for the name to group by
+            kind (str): counters or histograms. Histograms use their sum
+
+        Returns:
+            Dict: Change per group
+
+        """
+
+        # Dict to store changes
+        output = {}
+
+        for key, value in after[kind].items():
+            match = re.match(pattern, key)
+
+            if not match:
+                continue
+
+            old = before[kind].get(key, 0)
+
+            if kind == "histograms":
+                value, old = value["sum"], (old or {}).get("sum", 0)
+
+            output[match.group(1)] = output.get(match.group(1), 0) + value - old
+
+        return output
+
+
+def add_postgres_functions(connection: sqlite3.Connection) -> None:
+    """
+    Adds the PostgreSQL functions and collation used by PlanSqlCompiler to a SQLite connection,
+    so compiled plans run on the generated dataset. LEFT and RIGHT are keywords in SQLite and are added as PG_LEFT and PG_RIGHT
+
+    Args:
+        connection (sqlite3.Connection): SQLite connection
+
+    """
+
+    def compare(a: str, b: str) -> int:
+        return (a > b) - (a < b)
+
+    def right(text, n):
+        if text is None or n is None:
+            return None
+        # The last n characters, or all but the first -n characters if n is negative
+        return text[-n:] if n else ""
+
+    def extreme(function):
+        # NULLs are ignored, like in PostgreSQL
+        return lambda *values: function((v for v in values if v is not None), default=None)
+
+    # Strings in the C collation are ordered by character codes, like SQLite's default
+    connection.create_collation("C", compare)
+    connection.create_function("PG_LEFT", 2, lambda text, n: None if text is None or n is None else text[:n], deterministic=True)
+    connection.create_function("PG_RIGHT", 2, right, deterministic=True)
+    connection.create_function("STRPOS", 2, lambda text, part: None if text is None or part is None else text.find(part) + 1, deterministic=True)
+    connection.create_function("TRUNC", 1, lambda value: None if value is None else math.trunc(value), deterministic=True)
+    connection.create_function("GREATEST", -1, extreme(max), deterministic=True)
+    connection.create_function("LEAST", -1, extreme(min), deterministic=True)
+
+
+def parse_output(output: str) -> List[List[str]]:
+    """
+    Parses Wayang output into rows of cells.
+    Each line is a row, optionally wrapped in parentheses, brackets or Record(...), with comma separated cells
+
+    Args:
+        output (str): Output from Wayang
+
+    Returns:
+        List[List[str]]: Rows of cells
+
+    """
+
+    # List to store rows
+    rows = []
+
+    for line in output.splitlines():
+        line = line.strip()
+
+        if not line:
+            continue
+
+        match = ROW_WRAPPER.match(line)
+        if match:
+            line = match.group(1)
+
+        rows.append([cell.strip().strip("'\"") for cell in line.split(",")])
+
+    return rows
+
+
+def compare_results(actual: List[List[str]], expected: List[tuple], ordered: bool) -> bool:
+    """
+    Compares parsed Wayang output with a reference result.
+    Numbers are compared with a small tolerance, other values as text. Row order only matters if ordered
+
+    Args:
+        actual (List[List[str]]): Parsed output
+        expected (List[tuple]): Reference result
+        ordered (bool): True if the row order must match
+
+    Returns:
+        bool: True if the results match
+
+    """
+
+    # An empty reference result may come back as no output or a single empty row
+    actual = [row for row in actual if row != [""]]
+
+    if len(actual) != len(expected):
+        return False
+
+    actual = [[_normalize_cell(cell) for cell in row] for row in actual]
+    expected = [[_normalize_cell(cell) for cell in row] for row in expected]
+
+    if not ordered:
+        actual = sorted(actual, key=_sort_key)
+        expected = sorted(expected, key=_sort_key)
+
+    for actual_row, expected_row in zip(actual, expected):
+        if len(actual_row) != len(expected_row):
+            return False
+
+        for a, e in zip(actual_row, expected_row):
+            if isinstance(a, float) and isinstance(e, float):
+                if not math.isclose(a, e, rel_tol=1e-6, abs_tol=0.01):
+                    return False
+            elif a != e:
+                return False
+
+    return True
+
+
+def _normalize_cell(cell):
+    """
+    Helper function to turn a cell into a float if numeric, otherwise stripped text
+
+    """
+
+    if cell is None:
+        return ""
+
+    try:
+        return float(cell)
+    except (TypeError, ValueError):
+        return str(cell).strip()
+
+
+def _sort_key(row: List) -> tuple:
+    """
+    Helper function to sort rows of mixed numbers and text. Numbers are rounded, so close values sort together
+
+    """
+
+    return tuple((0, round(cell, 1), "") if isinstance(cell, float) else (1, 0, cell) for cell in row)
+
+
+def format_scoreboard(report: Dict) -> str:
+    """
+    Formats an evaluation report as scoreboard for the terminal
+
+    Args:
+        report (Dict): Evaluation report
+
+    Returns:
+        str: Formatted scoreboard
+
+    """
+
+    lines = []
+
+    # Replayed plans only check the pipeline, they say nothing about how well an LLM answers the questions
+    if report.get("llm") == "stub":
+        lines.append("Stub smoke run: replays recorded plans, not comparable with scoreboards of a real LLM")
+        lines.append("")
+
+    lines.append(f"{'Query':<6} {'Status':<8} {'Iter':>4} {'Latency':>10} {'Tokens':>8}")
+
+    for result in report["results"]:
+        if result["status"] == "skipped":
+            lines.append(f"{result['id']:<6} {'skipped':<8}")
+            continue
+
+        tokens = int(result["tokens"].get("input", 0) + result["tokens"].get("output", 0))
+        lines.append(f"{result['id']:<6} {result['status']:<8} {result['debug_iterations']:>4} {result['latency'] * 1000:>7.0f} ms {tokens:>8}")
+
+    lines.append("")
+
+    # The stub LLM only answers questions with recorded plans
+    if report.get("recorded") is not None:
+        lines.append(f"Recorded plans cover {report['recorded']} of {report['total']} questions, the others are skipped")
+
+    lines.append(
+        f"Correct {report['correct']}/{report['queries']} (wrong {report['wrong']}, failed {report['failed']}, unverified {report.get('unverified', 0)}, skipped {report['skipped']}), "
+        f"debug iterations {report['debug_iterations']}, p50 {report['latency_p50_ms']:.0f} ms, p99 {report['latency_p99_ms']:.0f} ms, "
+        f"tokens {json.dumps({k: int(v) for k, v in report['tokens'].items()})}"
+    )
+
+    return "\n".join(lines)
@@ -0,0 +1,226 @@
+from pathlib import Path
+from typing import Dict, List
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from ai_wayang_single.bench.benchmark import percentile
+from ai_wayang_single.bench.stub_wayang import StubWayangServer
+
+# Source folder added to the path of the worker interpreters
+SRC_FOLDER = Path(__file__).resolve().parent.parent.parent
+
+# Runs one worker process: the pipeline with stubs, sharing state through the store file in its environment
+WORKER_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+from ai_wayang_single.bench.stub_llm import StubLLM
+from ai_wayang_single.server import mcp_server
+llm = StubLLM(latency={llm_latency!r})
+mcp_server.builder_agent.client = llm
+mcp_server.debugger_agent.client = llm
+mcp_server.wayang_executor.url = {url!r}
+queries = llm.queries()
+for query in queries[:{warmup!r}]:
+    mcp_server.query_wayang(query)
+results = []
+start = time.time()
+for i in range({queries!r}):
+    query = queries[({worker!r} + i) % len(queries)]
+    mcp_server.last_session_job_id = None
+    query_start = time.perf_counter()
+    output = mcp_server.query_wayang(query)
+    latency = time.perf_counter() - query_start
+    success = not (output.startswith("Couldn't execute") or output.startswith("An error occured"))
+    results.append({{"latency": latency, "success": success, "job_id": mcp_server.last_session_job_id}})
+print(json.dumps({{"start": start, "end": time.time(), "results": results}}))
+"""
+
+
+class LoadTest:
+    """
+    Load test of several worker processes sharing one store file and result folder.
+    Each worker runs the pipeline with the stub LLM against one stub Wayang server, like workers behind a load balancer.
+    Afterwards every job is read back from a process that didn't run it, to check that state is shared
+
+    """
+
+    def __init__(self, workers: List[int], queries: int = 20, warmup: int = 1, llm_latency: float = 0.0, latency: float = 0.0):
+        self.workers = workers
+        self.queries = queries
+        self.warmup = warmup
+        self.llm_latency = llm_latency
+        self.latency = latency
+
+    def run(self) -> Dict:
+        """
+        Runs the load test for each number of workers and builds the report
+
+        Returns:
+            Dict: Report with throughput, latency and scaling efficiency per number of workers.
+            Top-level fields are those of the most workers, so reports compare like the benchmark's
+
+        """
+
+        wayang = StubWayangServer(latency=self.latency)
+        url = wayang.start()
+
+        # List to store results per number of workers
+        levels = []
+
+        try:
+            for workers in self.workers:
+                print(f"[INFO] Load test with {workers} workers")
+                levels.append(self._run_level(workers, url))
+        finally:
+            wayang.stop()
+
+        # Throughput relative to linear scaling from the first level
+        base = levels[0]["throughput_qps"] / levels[0]["workers"] if levels and levels[0]["workers"] else 0.0
+        for level in levels:
+            level["scaling_efficiency"] = level["throughput_qps"] / (base * level["workers"]) if base else 0.0
+
+        return {**levels[-1], "cpus": os.cpu_count(), "levels": levels}
+
+    def _run_level(self, workers: int, url: str) -> Dict:
+        """
+        Helper function to run the workers of one level with a fresh store file and result folder
+
+        Args:
+            workers (int): Number of worker processes
+            url (str): URL of the stub Wayang server
+
+        Returns:
+            Dict: Throughput, latency, success rate and shared state check
+
+        """
+
+        with tempfile.TemporaryDirectory() as folder:
+            # The OpenAI client needs a key to be created, even though it's never used
+            env = {
+                **os.environ,
+                "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "stub"),
+                "SHARED_STORE_FILE": os.path.join(folder, "shared.db"),
+                "RESULT_FOLDER": os.path.join(folder, "results"),
+                "RESULT_MAX_RESULTS": str(max(workers * self.queries * 2, 100)),
+                "PROMPT_SNAPSHOT_FILE": os.path.join(folder, "prompts.json"),
+            }
+
+            processes = []
+            for worker in range(workers):
+                script = WORKER_SCRIPT.format(src=str(SRC_FOLDER), url=url, llm_latency=self.llm_latency, warmup=self.warmup, queries=self.queries, worker=worker)
+                processes.append(subprocess.Popen([sys.executable, "-c", script], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True))
+
+            # List to store worker outputs
+            runs = []
+            for process in processes:
+                stdout, stderr = process.communicate()
+
+                if process.returncode != 0:
+                    print(f"[ERROR] Load test worker failed: {stderr.strip().splitlines()[-1:]}")
+                    continue
+
+                runs.append(json.loads(stdout.strip().splitlines()[-1]))
+
+            return {"workers": workers, **self._summarize(runs, workers), **self._check_shared(runs, env)}
+
+    def _summarize(self, runs: List[Dict], workers: int) -> Dict:
+        """
+        Helper function to summarize the worker outputs of one level
+
+        Args:
+            runs (List[Dict]): Worker outputs with start, end and timed queries
+            workers (int): Number of started workers
+
+        Returns:
+            Dict: Throughput over the wall time of all workers, latency and success rate
+
+        """
+
+        results = [result for run in runs for result in run["results"]]
+        latencies = sorted(result["latency"] for result in results)
+
+        # Wall time from the first worker starting to measure until the last one finishes
+        duration = max((run["end"] for run in runs), default=0.0) - min((run["start"] for run in runs), default=0.0)
+
+        return {
+            "queries": len(results),
+            "failed_workers": workers - len(runs),
+            "success_rate": sum(result["success"] for result in results) / len(results) if results else 0.0,
+            "duration_seconds": duration,
+            "throughput_qps": len(results) / duration if duration > 0 else 0.0,
+            "latency_mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p50_ms": 1000 * percentile(latencies, 50),
+            "latency_p99_ms": 1000 * percentile(latencies, 99),
+            "peak_memory_mb": 0.0,
+        }
+
+    def _check_shared(self, runs: List[Dict], env: Dict) -> Dict:
+        """
+        Helper function to read every job back in a new process, which ran none of them
+
+        Args:
+            runs (List[Dict]): Worker outputs with job ids
+            env (Dict): Environment of the workers, with the store file and result folder
+
+        Returns:
+            Dict: Jobs found in the shared store and result pages read
+
+        """
+
+        job_ids = [result["job_id"] for run in runs for result in run["results"] if result["job_id"]]
+
+        script = (
+            "import json, sys\n"
+            f"sys.path.insert(0, {str(SRC_FOLDER)!r})\n"
+            "from ai_wayang_single.utils.shared_store import shared_store\n"
+            "from ai_wayang_single.wayang.result_store import ResultStore\n"
+            "store = ResultStore(shared_store=shared_store)\n"
+            "jobs = pages = 0\n"
+            "for job_id in json.loads(sys.stdin.read()):\n"
+            "    jobs += shared_store.get('jobs', job_id) is not None\n"
+            "    try:\n"
+            "        pages += store.fetch_page(job_id, 0, 10)['returned'] > 0\n"
+            "    except KeyError:\n"
+            "        pass\n"
+            "print(json.dumps({'jobs': jobs, 'pages': pages}))\n"
+        )
+
+        process = subprocess.run([sys.executable, "-c", script], input=json.dumps(job_ids), env=env, capture_output=True, text=True)
+
+        if process.returncode != 0:
+            print(f"[ERROR] Shared state check failed: {process.stderr.strip().splitlines()[-1:]}")
+            return {"jobs": len(job_ids), "shared_jobs_found": 0, "shared_pages_read": 0}
+
+        found = json.loads(process.stdout.strip().splitlines()[-1])
+
+        return {"jobs": len(job_ids), "shared_jobs_found": found["jobs"], "shared_pages_read": found["pages"]}
+
+
+def format_load(report: Dict) -> str:
+    """
+    Formats a load test report for the terminal
+
+    Args:
+        report (Dict): Load test report
+
+    Returns:
+        str: Formatted report
+
+    """
+
+    lines = [
+        f"CPUs: {report['cpus']}",
+        "Workers  Queries  Success  Throughput    p50 ms    p99 ms  Scaling  Shared jobs/pages",
+    ]
+
+    for level in report["levels"]:
+        lines.append(
+            f"{level['workers']:>7}  {level['queries']:>7}  {level['success_rate']:>7.0%}  {level['throughput_qps']:>8.2f}/s  "
+            f"{level['latency_p50_ms']:>8.1f}  {level['latency_p99_ms']:>8.1f}  {level['scaling_efficiency']:>7.0%}  "
+            f"{level['shared_jobs_found']}/{level['shared_pages_read']} of {level['jobs']}"
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,295 @@
+from pathlib import Path
+from typing import List, Dict
+import json
+import os
+import threading
+import time
+import tracemalloc
+from ai_wayang_single.bench.benchmark import summarize
+from ai_wayang_single.bench.stub_llm import StubLLM
+
+# Log titles the replay reads
+QUERY_TITLE = "User query: Plan description from client LLM"
+ARCHITECTURE_TITLE = "Architecture"
+BUILDER_PLAN_TITLE = "Agent: BuilderAgent Raw Plan"
+DEBUGGER_PLAN_TITLE = "Agent: DebuggerAgent's plan"
+WAYANG_TITLE = "Wayang: "
+WAYANG_ERROR_TITLE = "Err: Wayang error"
+SUCCESS_TITLE = "Final: Sucessful"
+FAILURE_TITLE = "Final: Unsucessful"
+
+
+class ReplayExecutor:
+    """
+    Stand-in for the WayangExecutor that answers with the recorded Wayang responses of a session, in order
+
+    """
+
+    def __init__(self, responses: List[List]):
+        self.responses = list(responses)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def execute_plan(self, plan: Dict, result_store=None):
+        """
+        Answers a plan with the next recorded response
+
+        Args:
+            plan (Dict): Wayang JSON plan, ignored
+            result_store (ResultStore | None): Store to spool succesful outputs to
+
+        Returns:
+            Tuple: Recorded status code and output
+
+        """
+
+        with self._lock:
+            self.requests += 1
+
+            # Stay at the last response if the pipeline executes more plans than recorded
+            if not self.responses:
+                return 500, "No recorded Wayang response"
+
+            status_code, output = self.responses[min(self.requests, len(self.responses)) - 1]
+
+        # Logs of spooled results only hold the preview
+        if isinstance(output, dict):
+            output = output.get("preview") or ""
+
+        if status_code == 200 and result_store is not None:
+            return status_code, result_store.write([output.encode("utf-8")])
+
+        return status_code, output
+
+
+class SessionReplay:
+    """
+    Replays sessions from Logger logs through query_wayang.
+    The recorded LLM plans and Wayang responses are substituted in, so only the pipeline itself runs:
+    mapping, validation, prompt building and bookkeeping. Useful to profile changes against real traces
+
+    """
+
+    @staticmethod
+    def load_session(path: str | Path) -> Dict | None:
+        """
+        Loads a session from a log file
+
+        Args:
+            path (str | Path): Path to a log file from Logger
+
+        Returns:
+            Dict | None: Query, settings, recorded plans, Wayang responses and outcome, or None if not replayable
+
+        """
+
+        with open(path, "r", encoding="utf-8") as f:
+            logs = json.load(f)
+
+        # Initialize session
+        session = {
+            "file": str(path),
+            "query": None,
+            "model": None,
+            "reasoning": None,
+            "use_debugger": "True",
+            "plans": [],
+            "wayang_responses": [],
+            "outcome": None,
+        }
+
+        for index, log in enumerate(logs):
+            title, msg = log.get("title", ""), log.get("log")
+
+            if title == QUERY_TITLE:
+                session["query"] = msg
+
+            elif title == ARCHITECTURE_TITLE and isinstance(msg, dict):
+                session["model"] = msg.get("model")
+                session["reasoning"] = msg.get("reasoning", "low")
+                session["use_debugger"] = msg.get("debugger") or "True"
+
+            elif title == BUILDER_PLAN_TITLE:
+                session["plans"].append(msg)
+
+            elif title.startswith(DEBUGGER_PLAN_TITLE) and isinstance(msg, dict):
+                session["plans"].append(msg.get("plan"))
+
+            elif title.startswith(WAYANG_TITLE):
+                session["wayang_responses"].append(SessionReplay._wayang_response(logs, index, msg))
+
+            elif title.startswith(SUCCESS_TITLE):
+                session["outcome"] = "success"
+
+            elif title.startswith(FAILURE_TITLE):
+                session["outcome"] = "failure"
+
+        # A session needs a query and at least the Builder's plan
+        if not session["query"] or not session["plans"]:
+            return None
+
+        return session
+
+    @staticmethod
+    def load_folder(folder: str | Path) -> List[Dict]:
+        """
+        Loads all replayable sessions from a log folder
+
+        Args:
+            folder (str | Path): Log folder
+
+        Returns:
+            List[Dict]: Sessions ordered by file name
+
+        """
+
+        # List to store sessions
+        sessions = []
+
+        for root, _, files in os.walk(folder):
+            for file in sorted(files):
+                if not file.endswith(".json"):
+                    continue
+
+                try:
+                    session = SessionReplay.load_session(os.path.join(root, file))
+                except (json.JSONDecodeError, OSError) as e:
+                    print(f"[WARNING] Couldn't load log {file}: {e}")
+                    continue
+
+                if session:
+                    sessions.append(session)
+
+        return sessions
+
+    def __init__(self, sessions: List[Dict], repeat: int = 1):
+        self.sessions = sessions
+        self.repeat = repeat
+
+    def run(self) -> Dict:
+        """
+        Replays all sessions and builds the report
+
+        Returns:
+            Dict: Report with the same fields as the benchmark, plus a result per session
+
+        """
+
+        # The OpenAI client needs a key to be created, even though it's never used
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+        from ai_wayang_single.server import mcp_server
+        from ai_wayang_single.utils.metrics import metrics
+
+        # Keep the real clients and executor, so they can be restored
+        builder_client = mcp_server.builder_agent.client
+        debugger_client = mcp_server.debugger_agent.client
+        wayang_executor = mcp_server.wayang_executor
+
+        # List to store replayed sessions
+        results = []
+        llm_calls = 0
+        wayang_requests = 0
+
+        metrics.reset()
+        tracemalloc.start()
+        start = time.perf_counter()
+
+        try:
+            for _ in range(self.repeat):
+                for session in self.sessions:
+                    # Substitute recorded plans and responses for this session
+                    llm = StubLLM([{"query": session["query"], "plans": session["plans"]}])
+                    executor = ReplayExecutor(session["wayang_responses"])
+                    mcp_server.builder_agent.client = llm
+                    mcp_server.debugger_agent.client = llm
+                    mcp_server.wayang_executor = executor
+
+                    query_start = time.perf_counter()
+                    output = mcp_server.query_wayang(session["query"], session["model"], session["reasoning"], session["use_debugger"])
+                    latency = time.perf_counter() - query_start
+
+                    llm_calls += llm.calls
+                    wayang_requests += executor.requests
+                    results.append(self._compare(session, output, latency, llm.calls, executor.requests))
+
+        finally:
+            duration = time.perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            mcp_server.builder_agent.client = builder_client
+            mcp_server.debugger_agent.client = debugger_client
+            mcp_server.wayang_executor = wayang_executor
+
+        return {
+            **summarize(results, duration, peak_memory, metrics.snapshot()),
+            "concurrency": 1,
+            "llm_calls": llm_calls,
+            "wayang_requests": wayang_requests,
+            "diverged": [r["file"] for r in results if r["diverged"]],
+            "sessions": results,
+        }
+
+    def _compare(self, session: Dict, output: str, latency: float, llm_calls: int, wayang_requests: int) -> Dict:
+        """
+        Helper function to compare a replayed session with its recording
+
+        Args:
+            session (Dict): The recorded session
+            output (str): Output of the replayed query
+            latency (float): Seconds the replay took
+            llm_calls (int): LLM calls made by the replay
+            wayang_requests (int): Plans executed by the replay
+
+        Returns:
+            Dict: Replay result. Diverged if the replay needed other LLM calls, executions or outcome than recorded
+
+        """
+
+        success = not (output.startswith("Couldn't execute") or output.startswith("An error occured"))
+        outcome = "success" if success else "failure"
+
+        diverged = (
+            llm_calls != len(session["plans"])
+            or wayang_requests != len(session["wayang_responses"])
+            or (session["outcome"] is not None and outcome != session["outcome"])
+        )
+
+        return {
+            "file": session["file"],
+            "latency": latency,
+            "success": success,
+            "recorded_outcome": session["outcome"],
+            "recorded_llm_calls": len(session["plans"]),
+            "llm_calls": llm_calls,
+            "recorded_wayang_requests": len(session["wayang_responses"]),
+            "wayang_requests": wayang_requests,
+            "diverged": diverged,
+        }
+
+    @staticmethod
+    def _wayang_response(logs: List[Dict], index: int, msg) -> List:
+        """
+        Helper function to get the Wayang response of an execution log
+
+        Args:
+            logs (List[Dict]): All logs of the session
+            index (int): Index of the execution log
+            msg: Message of the execution log
+
+        Returns:
+            List: Status code and output
+
+        """
+
+        if isinstance(msg, dict) and "status_code" in msg:
+            return [msg["status_code"], msg.get("output") or ""]
+
+        # Older logs only record failed executions, in the error log after the execution log
+        following = logs[index + 1] if index + 1 < len(logs) else {}
+
+        if following.get("title", "").startswith(WAYANG_ERROR_TITLE):
+            return [following["log"].get("status_code"), following["log"].get("output") or ""]
+
+        return [200, ""]
@@ -0,0 +1,125 @@
+from pathlib import Path
+from typing import Dict, List
+import json
+import os
+import subprocess
+import sys
+from ai_wayang_single.bench.benchmark import percentile
+
+# Source folder added to the path of the measured interpreter
+SRC_FOLDER = Path(__file__).resolve().parent.parent.parent
+
+# Modules that should only be imported when first needed
+HEAVY_MODULES = ("pandas", "numpy", "sqlalchemy", "openai", "pyarrow")
+
+# Measured in a fresh interpreter, so every run is a cold start
+CHILD_SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+from ai_wayang_single.server import mcp_server
+imported = time.perf_counter()
+heavy = [m for m in {heavy!r} if m in sys.modules]
+mcp_server.builder_agent.system_prompt
+mcp_server.debugger_agent.system_prompt
+prompts = time.perf_counter()
+mcp_server.builder_agent.client
+mcp_server.debugger_agent.client
+clients = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "prompts": prompts - imported,
+    "clients": clients - prompts,
+    "heavy_modules": heavy,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}))
+"""
+
+
+class StartupBenchmark:
+    """
+    Measures server startup: importing the MCP-server module, then building the system prompts and
+    creating the OpenAI clients on first use. Each run is a new interpreter, like a restart or a cold start.
+    Also reports heavy modules imported at startup, which should only be imported when first needed
+
+    """
+
+    def __init__(self, runs: int = 5):
+        self.runs = runs
+
+    def run(self) -> Dict:
+        """
+        Runs the cold starts and builds the report
+
+        Returns:
+            Dict: Report with import time percentiles, first-use time of prompts and clients, memory and heavy modules
+
+        """
+
+        # The OpenAI client needs a key to be created, even though it's never used
+        env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "stub")}
+        script = CHILD_SCRIPT.format(src=str(SRC_FOLDER), heavy=HEAVY_MODULES)
+
+        # List to store runs
+        runs = []
+
+        for run in range(1, self.runs + 1):
+            print(f"[INFO] Startup run {run}/{self.runs}")
+            process = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True)
+
+            if process.returncode != 0:
+                print(f"[ERROR] Startup run failed: {process.stderr.strip().splitlines()[-1:]}")
+                runs.append(None)
+                continue
+
+            runs.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+        return self._report(runs)
+
+    def _report(self, runs: List[Dict | None]) -> Dict:
+        """
+        Helper function to build the report. Latency fields are the import time, so reports compare like the benchmark's
+
+        Args:
+            runs (List[Dict | None]): Measurements per run, None for failed runs
+
+        Returns:
+            Dict: Startup report
+
+        """
+
+        ok = [run for run in runs if run]
+        imports = sorted(run["import"] * 1000 for run in ok)
+
+        return {
+            "queries": len(runs),
+            "success_rate": len(ok) / len(runs) if runs else 0.0,
+            "latency_mean_ms": sum(imports) / len(imports) if imports else 0.0,
+            "latency_p50_ms": percentile(imports, 50),
+            "latency_p99_ms": percentile(imports, 99),
+            "prompts_mean_ms": sum(run["prompts"] for run in ok) * 1000 / len(ok) if ok else 0.0,
+            "clients_mean_ms": sum(run["clients"] for run in ok) * 1000 / len(ok) if ok else 0.0,
+            "peak_memory_mb": max((run["max_rss_kb"] for run in ok), default=0) / 1024,
+            "heavy_modules": sorted({module for run in ok for module in run["heavy_modules"]}),
+        }
+
+
+def format_startup(report: Dict) -> str:
+    """
+    Formats a startup report for the terminal
+
+    Args:
+        report (Dict): Startup report
+
+    Returns:
+        str: Formatted report
+
+    """
+
+    return "\n".join([
+        f"Runs:          {report['queries']} (success rate {report['success_rate']:.0%})",
+        f"Import:        mean {report['latency_mean_ms']:.0f} ms, p50 {report['latency_p50_ms']:.0f} ms, p99 {report['latency_p99_ms']:.0f} ms",
+        f"First use:     prompts {report['prompts_mean_ms']:.0f} ms, clients {report['clients_mean_ms']:.0f} ms",
+        f"Peak memory:   {report['peak_memory_mb']:.1f} MB",
+        f"Heavy modules: {', '.join(report['heavy_modules']) or 'none'}",
+    ])
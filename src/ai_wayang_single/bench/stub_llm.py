@@ -0,0 +1,346 @@
+from pathlib import Path
+from typing import List, Dict
+import json
+import threading
+import time
+from ai_wayang_single.llm.models import WayangPlan
+
+# Recorded plans shipped with the benchmark
+RECORDED_PLANS_FILE = Path(__file__).resolve().parent / "data" / "recorded_plans.json"
+
+
+class StubUsage:
+    """
+    Token usage of a stub response, shaped like the usage of the OpenAI responses API
+
+    """
+
+    def __init__(self, input_tokens: int, output_tokens: int):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+    def model_dump(self) -> Dict:
+        """
+        Gets usage as dict
+
+        Returns:
+            Dict: Usage as returned by the OpenAI client
+
+        """
+
+        return {
+            "input_tokens": self.input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": self.output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": self.input_tokens + self.output_tokens,
+        }
+
+
+class StubResponse:
+    """
+    A parsed stub response, shaped like the response of responses.parse
+
+    """
+
+    def __init__(self, model: str, plan: WayangPlan, usage: StubUsage):
+        self.model = model
+        self.output_parsed = plan
+        self.usage = usage
+
+
+class StubEvent:
+    """
+    A stub stream event, shaped like the text delta events of responses.stream
+
+    """
+
+    def __init__(self, delta: str):
+        self.type = "response.output_text.delta"
+        self.delta = delta
+
+
+class StubStream:
+    """
+    A stub stream, shaped like the stream manager of responses.stream.
+    Replays the JSON of the plan in small parts, spreading the latency over them
+
+    """
+
+    def __init__(self, response: StubResponse, latency: float = 0.0, chunk_chars: int = 20):
+        text = response.output_parsed.model_dump_json()
+        self.response = response
+        self.chunks = [text[i : i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        self.delay = latency / max(len(self.chunks), 1)
+        self.closed = False
+
+    def __enter__(self) -> "StubStream":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.closed = True
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.closed:
+                return
+
+            if self.delay:
+                time.sleep(self.delay)
+
+            yield StubEvent(chunk)
+
+    def get_final_response(self) -> StubResponse:
+        """
+        Gets the response once the stream is read
+
+        """
+
+        return self.response
+
+
+class StubLLM:
+    """
+    Deterministic stand-in for the OpenAI client that replays recorded plans.
+    The Builder gets the first recorded plan of a query, and each following Debugger call gets the next one.
+    Assign it to the client of the agents, e.g. builder_agent.client = StubLLM()
+
+    """
+
+    def __init__(self, recorded_plans: List[Dict] | None = None, latency: float = 0.0):
+        self.recorded_plans = recorded_plans if recorded_plans is not None else self.load(RECORDED_PLANS_FILE)
+        self.latency = latency
+        self.plans = {self._normalize(r["query"]): [WayangPlan(**p) for p in r["plans"]] for r in self.recorded_plans}
+        self.responses = self
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._attempts = threading.local()
+
+    @staticmethod
+    def load(path: str | Path) -> List[Dict]:
+        """
+        Loads recorded plans from a JSON file
+
+        Args:
+            path (str | Path): Path to a JSON list of {"query": ..., "plans": [...]}
+
+        Returns:
+            List[Dict]: Recorded plans
+
+        """
+
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def queries(self) -> List[str]:
+        """
+        Gets the queries with recorded plans
+
+        Returns:
+            List[str]: Queries in natural language
+
+        """
+
+        return [r["query"] for r in self.recorded_plans]
+
+    def has_plan(self, query: str) -> bool:
+        """
+        Checks if a query has recorded plans
+
+        Args:
+            query (str): A query in natural language
+
+        Returns:
+            bool: True if recorded
+
+        """
+
+        return self._normalize(query) in self.plans
+
+    def parse(self, model: str, input: List[Dict], text_format=None, reasoning: Dict | None = None, **kwargs) -> StubResponse:
+        """
+        Replays the recorded plan for a request, like responses.parse
+
+        Args:
+            model (str): GPT-model, only echoed in the response
+            input (List[Dict]): Messages of the request
+            text_format: Structured output format, ignored
+            reasoning (Dict | None): Reasoning effort, ignored
+
+        Returns:
+            StubResponse: Response with the recorded plan and estimated usage
+
+        """
+
+        # Simulated model latency
+        if self.latency:
+            time.sleep(self.latency)
+
+        return self._replay(model, input)
+
+    def stream(self, model: str, input: List[Dict], text_format=None, reasoning: Dict | None = None, **kwargs) -> StubStream:
+        """
+        Replays the recorded plan for a request as a stream, like responses.stream
+
+        Args:
+            model (str): GPT-model, only echoed in the response
+            input (List[Dict]): Messages of the request
+            text_format: Structured output format, ignored
+            reasoning (Dict | None): Reasoning effort, ignored
+
+        Returns:
+            StubStream: Stream of the recorded plan, with the latency spread over its parts
+
+        """
+
+        return StubStream(self._replay(model, input), self.latency)
+
+    def _replay(self, model: str, input: List[Dict]) -> StubResponse:
+        """
+        Helper function to get the recorded plan for a request
+
+        Args:
+            model (str): GPT-model, only echoed in the response
+            input (List[Dict]): Messages of the request
+
+        Returns:
+            StubResponse: Response with the recorded plan and estimated usage
+
+        """
+
+        with self._lock:
+            self.calls += 1
+
+        prompt = input[-1]["content"]
+        query = self._normalize(prompt)
+
+        # Attempts are counted per thread, so concurrent queries don't share a position
+        if not hasattr(self._attempts, "counts"):
+            self._attempts.counts = {}
+        attempts = self._attempts.counts
+
+        if query in self.plans:
+            # Builder request. The query is the whole prompt
+            attempts[query] = 0
+        else:
+            # Debugger request. The query is embedded in the prompt
+            query = next((q for q in self.plans if q in self._normalize(prompt)), None)
+
+            if query is None:
+                raise ValueError(f"No recorded plan for prompt: {prompt[:100]}")
+
+            attempts[query] = attempts.get(query, 0) + 1
+
+        # Stay at the last plan if the recording has no more attempts
+        plans = self.plans[query]
+        plan = plans[min(attempts[query], len(plans) - 1)]
+
+        # Estimate tokens from characters, roughly 4 per token
+        input_chars = sum(len(str(message.get("content", ""))) for message in input)
+        usage = StubUsage(input_chars // 4, len(plan.model_dump_json()) // 4)
+
+        return StubResponse(model, plan, usage)
+
+    def _normalize(self, text: str) -> str:
+        """
+        Helper function to normalize whitespace and case for lookups
+
+        Args:
+            text (str): Text to normalize
+
+        Returns:
+            str: Normalized text
+
+        """
+
+        return " ".join(text.split()).lower()
+
+
+class RecordingStream:
+    """
+    Wraps a stream manager of the real OpenAI client, recording the parsed plan of its final response
+
+    """
+
+    def __init__(self, manager, record):
+        self.manager = manager
+        self.record = record
+        self._stream = None
+
+    def __enter__(self) -> "RecordingStream":
+        self._stream = self.manager.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        return self.manager.__exit__(*args)
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def get_final_response(self):
+        response = self._stream.get_final_response()
+        self.record(response)
+        return response
+
+
+class RecordingLLM:
+    """
+    Wraps a real OpenAI client and records the parsed plans per query, in the format StubLLM replays.
+    Set the query before each pipeline run, e.g. recorder.query = "Count the orders per status"
+
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.responses = self
+        self.query = None
+        self.recordings = {}
+        self._lock = threading.Lock()
+
+    def parse(self, **params):
+        """
+        Forwards a request to the wrapped client and records the parsed plan
+
+        Returns:
+            The response of the wrapped client
+
+        """
+
+        response = self.client.responses.parse(**params)
+        self._record(response)
+
+        return response
+
+    def stream(self, **params) -> RecordingStream:
+        """
+        Forwards a streamed request to the wrapped client, the plan is recorded when the stream completes.
+        Streams stopped early for a fatal error are not recorded
+
+        Returns:
+            RecordingStream: Stream manager of the wrapped client
+
+        """
+
+        return RecordingStream(self.client.responses.stream(**params), self._record)
+
+    def _record(self, response) -> None:
+        """
+        Helper function to record the parsed plan of a response for the current query
+
+        """
+
+        with self._lock:
+            if self.query is not None:
+                self.recordings.setdefault(self.query, []).append(response.output_parsed.model_dump())
+
+    def to_recorded_plans(self) -> List[Dict]:
+        """
+        Gets the recordings as recorded plans for StubLLM
+
+        Returns:
+            List[Dict]: Recorded plans, one entry per query
+
+        """
+
+        with self._lock:
+            return [{"query": query, "plans": plans} for query, plans in self.recordings.items()]
@@ -0,0 +1,129 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+
+# Error stack returned for injected failures, shaped like a Wayang server error
+INJECTED_ERROR = (
+    "org.apache.wayang.core.api.exception.WayangException: Job execution failed.\n"
+    "\tat org.apache.wayang.core.api.Job.doExecute(Job.java:337)\n"
+    "Caused by: java.lang.RuntimeException: Injected error from stub Wayang server\n"
+    "\tat org.apache.wayang.java.operators.JavaMapOperator.evaluate(JavaMapOperator.java:81)\n"
+)
+
+
+class StubWayangServer:
+    """
+    Local stand-in for the Wayang REST server with configurable latency and error injection.
+    Answers every plan with deterministic output derived from its operators, so no Wayang or database is needed.
+    A responder can be given to answer plans with other output, e.g. reference results
+
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 42, host: str = "127.0.0.1", port: int = 0, responder=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.host = host
+        self.port = port
+        self.responder = responder
+        self.server = None
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """
+        URL of the plan endpoint
+
+        """
+
+        return f"http://{self.host}:{self.port}/wayang-api-json/submit-plan/json"
+
+    def start(self) -> str:
+        """
+        Starts the server in a background thread
+
+        Returns:
+            str: URL of the plan endpoint
+
+        """
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                # Read plan
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+
+                status, output = stub._answer(body)
+
+                data = output.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                # Don't print a line per plan
+                return None
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return self.url
+
+    def stop(self) -> None:
+        """
+        Stops the server
+
+        """
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def _answer(self, body: bytes):
+        """
+        Helper function to answer a plan after the configured latency
+
+        Args:
+            body (bytes): Request body with the JSON plan
+
+        Returns:
+            Tuple: Status code and output
+
+        """
+
+        # Draw latency and error from the seeded generator, so runs are reproducible
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+
+        if delay:
+            time.sleep(delay)
+
+        try:
+            plan = json.loads(body)
+        except json.JSONDecodeError as e:
+            return 400, f"Invalid JSON plan: {e}"
+
+        if fail:
+            return 500, INJECTED_ERROR
+
+        # Custom answer, as (status code, output)
+        if self.responder:
+            return self.responder(plan)
+
+        # Deterministic output, one line per operator
+        operators = plan.get("operators", [])
+        lines = [f"{op.get('id')},{op.get('operatorName') or op.get('cat')}" for op in operators]
+
+        return 200, "\n".join(lines) + "\n"
@@ -0,0 +1,370 @@
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Dict
+import csv
+import os
+import random
+import sqlite3
+
+# Regions and nations as in the TPC-H specification
+REGIONS = ["AFRICA", "AMERICA", "ASIA", "EUROPE", "MIDDLE EAST"]
+NATIONS = [
+    ("ALGERIA", 0), ("ARGENTINA", 1), ("BRAZIL", 1), ("CANADA", 1), ("EGYPT", 4),
+    ("ETHIOPIA", 0), ("FRANCE", 3), ("GERMANY", 3), ("INDIA", 2), ("INDONESIA", 2),
+    ("IRAN", 4), ("IRAQ", 4), ("JAPAN", 2), ("JORDAN", 4), ("KENYA", 0),
+    ("MOROCCO", 0), ("MOZAMBIQUE", 0), ("PERU", 1), ("CHINA", 2), ("ROMANIA", 3),
+    ("SAUDI ARABIA", 4), ("VIETNAM", 2), ("RUSSIA", 3), ("UNITED KINGDOM", 3), ("UNITED STATES", 1),
+]
+
+# Word lists for generated text columns
+COLORS = [
+    "almond", "antique", "aquamarine", "azure", "beige", "bisque", "black", "blanched", "blue", "blush",
+    "brown", "burlywood", "burnished", "chartreuse", "chiffon", "chocolate", "coral", "cornflower", "cornsilk", "cream",
+    "cyan", "dark", "deep", "dim", "dodger", "drab", "firebrick", "floral", "forest", "frosted",
+    "gainsboro", "ghost", "goldenrod", "green", "grey", "honeydew", "hot", "indian", "ivory", "khaki",
+    "lace", "lavender", "lawn", "lemon", "light", "lime", "linen", "magenta", "maroon", "medium",
+    "metallic", "midnight", "mint", "misty", "moccasin", "navajo", "navy", "olive", "orange", "orchid",
+    "pale", "papaya", "peach", "peru", "pink", "plum", "powder", "puff", "purple", "red",
+    "rose", "rosy", "royal", "saddle", "salmon", "sandy", "seashell", "sienna", "sky", "slate",
+    "smoke", "snow", "spring", "steel", "tan", "thistle", "tomato", "turquoise", "violet", "wheat",
+    "white", "yellow",
+]
+TYPE_SYLLABLES = (
+    ["STANDARD", "SMALL", "MEDIUM", "LARGE", "ECONOMY", "PROMO"],
+    ["ANODIZED", "BURNISHED", "PLATED", "POLISHED", "BRUSHED"],
+    ["TIN", "NICKEL", "BRASS", "STEEL", "COPPER"],
+)
+CONTAINER_SYLLABLES = (
+    ["SM", "LG", "MED", "JUMBO", "WRAP"],
+    ["CASE", "BOX", "BAG", "JAR", "PKG", "PACK", "CAN", "DRUM"],
+)
+SEGMENTS = ["AUTOMOBILE", "BUILDING", "FURNITURE", "MACHINERY", "HOUSEHOLD"]
+PRIORITIES = ["1-URGENT", "2-HIGH", "3-MEDIUM", "4-NOT SPECIFIED", "5-LOW"]
+SHIP_INSTRUCTIONS = ["DELIVER IN PERSON", "COLLECT COD", "NONE", "TAKE BACK RETURN"]
+SHIP_MODES = ["REG AIR", "AIR", "RAIL", "SHIP", "TRUCK", "MAIL", "FOB"]
+COMMENT_WORDS = [
+    "furiously", "quickly", "carefully", "blithely", "slyly", "final", "regular", "express", "pending", "ironic",
+    "bold", "even", "unusual", "packages", "deposits", "accounts", "requests", "instructions", "theodolites", "foxes",
+    "pinto", "beans", "ideas", "dependencies", "platelets", "sleep", "wake", "haggle", "nag", "detect",
+]
+
+# Dates of the TPC-H population
+START_DATE = date(1992, 1, 1)
+END_DATE = date(1998, 12, 31)
+CURRENT_DATE = date(1995, 6, 17)
+
+# Columns of each table in load order. Names and order follow data/schemas/tables
+TABLES = {
+    "region": ["r_regionkey", "r_name", "r_comment"],
+    "nation": ["n_nationkey", "n_name", "n_regionkey", "n_comment"],
+    "supplier": ["s_suppkey", "s_name", "s_address", "s_nationkey", "s_phone", "s_acctbal", "s_comment"],
+    "part": ["p_partkey", "p_name", "p_mfgr", "p_brand", "p_type", "p_size", "p_container", "p_retailprice", "p_comment"],
+    "partsupp": ["ps_partkey", "ps_suppkey", "ps_availqty", "ps_supplycost", "ps_comment"],
+    "customer": ["c_custkey", "c_name", "c_address", "c_nationkey", "c_phone", "c_acctbal", "c_mktsegment", "c_comment"],
+    "orders": ["o_orderkey", "o_custkey", "o_orderstatus", "o_totalprice", "o_orderdate", "o_orderpriority", "o_clerk", "o_shippriority", "o_comment"],
+    "lineitem": [
+        "l_orderkey", "l_partkey", "l_suppkey", "l_linenumber", "l_quantity", "l_extendedprice", "l_discount", "l_tax",
+        "l_returnflag", "l_linestatus", "l_shipdate", "l_commitdate", "l_receiptdate", "l_shipinstruct", "l_shipmode", "l_comment",
+    ],
+}
+
+# Column types for CREATE TABLE, portable between SQLite and PostgreSQL
+INTEGER_COLUMNS = {
+    "r_regionkey", "n_nationkey", "n_regionkey", "s_suppkey", "s_nationkey", "p_partkey", "p_size", "ps_partkey",
+    "ps_suppkey", "ps_availqty", "c_custkey", "c_nationkey", "o_orderkey", "o_custkey", "o_shippriority",
+    "l_orderkey", "l_partkey", "l_suppkey", "l_linenumber",
+}
+DECIMAL_COLUMNS = {
+    "s_acctbal", "p_retailprice", "ps_supplycost", "c_acctbal", "o_totalprice",
+    "l_quantity", "l_extendedprice", "l_discount", "l_tax",
+}
+DATE_COLUMNS = {"o_orderdate", "l_shipdate", "l_commitdate", "l_receiptdate"}
+
+# Indexes so the correlated reference queries stay fast
+INDEXES = [
+    ("lineitem", "l_orderkey"), ("lineitem", "l_partkey"), ("lineitem", "l_suppkey"),
+    ("orders", "o_custkey"), ("partsupp", "ps_partkey"), ("partsupp", "ps_suppkey"),
+]
+
+
+class TpchGenerator:
+    """
+    Deterministic generator of a small TPC-H dataset.
+    Follows the value distributions of the TPC-H specification closely enough for the 22 queries to return results,
+    at a fraction of the size. Scale 1 has 10,000 suppliers, 200,000 parts, 150,000 customers and 1,500,000 orders
+
+    """
+
+    def __init__(self, scale: float = 0.01, seed: int = 42):
+        self.scale = scale
+        self.seed = seed
+
+    def generate(self) -> Dict[str, List[tuple]]:
+        """
+        Generates all tables
+
+        Returns:
+            Dict[str, List[tuple]]: Rows per table, columns in the order of TABLES
+
+        """
+
+        rng = random.Random(self.seed)
+
+        # Row counts for the scale
+        suppliers = max(int(10000 * self.scale), 10)
+        parts = max(int(200000 * self.scale), 200)
+        customers = max(int(150000 * self.scale), 150)
+        orders = customers * 10
+
+        tables = {name: [] for name in TABLES}
+
+        # Regions and nations are fixed
+        for key, name in enumerate(REGIONS):
+            tables["region"].append((key, name, self._comment(rng)))
+
+        for key, (name, region) in enumerate(NATIONS):
+            tables["nation"].append((key, name, region, self._comment(rng)))
+
+        # Suppliers. Some comments mention customer complaints, used by Q16
+        for key in range(1, suppliers + 1):
+            nation = rng.randrange(25)
+            comment = self._comment(rng)
+
+            if rng.random() < 0.05:
+                comment = f"{comment} Customer {rng.choice(COMMENT_WORDS)} Complaints"
+
+            tables["supplier"].append((
+                key, f"Supplier#{key:09d}", self._address(rng), nation, self._phone(rng, nation),
+                self._money(rng, -999.99, 9999.99), comment,
+            ))
+
+        # Parts
+        retail_prices = {}
+        for key in range(1, parts + 1):
+            manufacturer = rng.randint(1, 5)
+            retail_prices[key] = round((90000 + ((key // 10) % 20001) + 100 * (key % 1000)) / 100, 2)
+
+            tables["part"].append((
+                key,
+                " ".join(rng.sample(COLORS, 5)),
+                f"Manufacturer#{manufacturer}",
+                f"Brand#{manufacturer}{rng.randint(1, 5)}",
+                " ".join(rng.choice(syllables) for syllables in TYPE_SYLLABLES),
+                rng.randint(1, 50),
+                " ".join(rng.choice(syllables) for syllables in CONTAINER_SYLLABLES),
+                retail_prices[key],
+                self._comment(rng),
+            ))
+
+        # Four suppliers per part, spread as in the specification
+        part_suppliers = {}
+        for key in range(1, parts + 1):
+            part_suppliers[key] = []
+
+            for i in range(4):
+                supplier = (key + (i * ((suppliers // 4) + (key - 1) // suppliers))) % suppliers + 1
+                part_suppliers[key].append(supplier)
+
+                tables["partsupp"].append((
+                    key, supplier, rng.randint(1, 9999), self._money(rng, 1.00, 1000.00), self._comment(rng),
+                ))
+
+        # Customers
+        for key in range(1, customers + 1):
+            nation = rng.randrange(25)
+            tables["customer"].append((
+                key, f"Customer#{key:09d}", self._address(rng), nation, self._phone(rng, nation),
+                self._money(rng, -999.99, 9999.99), rng.choice(SEGMENTS), self._comment(rng),
+            ))
+
+        # Orders and lineitems. Every third customer has no orders, used by Q13 and Q22
+        last_order_date = (END_DATE - timedelta(days=151) - START_DATE).days
+        for key in range(1, orders + 1):
+            customer = rng.randint(1, customers)
+            while customer % 3 == 0:
+                customer = rng.randint(1, customers)
+
+            order_date = START_DATE + timedelta(days=rng.randint(0, last_order_date))
+            comment = self._comment(rng)
+
+            if rng.random() < 0.02:
+                comment = f"{comment} special {rng.choice(COMMENT_WORDS)} requests"
+
+            total = 0.0
+            statuses = set()
+
+            for line in range(1, rng.randint(1, 7) + 1):
+                part = rng.randint(1, parts)
+                quantity = rng.randint(1, 50)
+                price = round(quantity * retail_prices[part], 2)
+                discount = rng.randint(0, 10) / 100
+                tax = rng.randint(0, 8) / 100
+                ship_date = order_date + timedelta(days=rng.randint(1, 121))
+                commit_date = order_date + timedelta(days=rng.randint(30, 90))
+                receipt_date = ship_date + timedelta(days=rng.randint(1, 30))
+
+                return_flag = rng.choice("RA") if receipt_date <= CURRENT_DATE else "N"
+                line_status = "O" if ship_date > CURRENT_DATE else "F"
+                statuses.add(line_status)
+                total += price * (1 + tax) * (1 - discount)
+
+                tables["lineitem"].append((
+                    key, part, rng.choice(part_suppliers[part]), line, float(quantity), price, discount, tax,
+                    return_flag, line_status, ship_date.isoformat(), commit_date.isoformat(), receipt_date.isoformat(),
+                    rng.choice(SHIP_INSTRUCTIONS), rng.choice(SHIP_MODES), self._comment(rng),
+                ))
+
+            # Status is F or O if all lines agree, otherwise P
+            status = statuses.pop() if len(statuses) == 1 else "P"
+
+            tables["orders"].append((
+                key, customer, status, round(total, 2), order_date.isoformat(), rng.choice(PRIORITIES),
+                f"Clerk#{rng.randint(1, max(int(1000 * self.scale), 1)):09d}", 0, comment,
+            ))
+
+        return tables
+
+    def to_sqlite(self, path: str = ":memory:") -> sqlite3.Connection:
+        """
+        Generates the dataset into a SQLite database
+
+        Args:
+            path (str): Database file, default in memory
+
+        Returns:
+            sqlite3.Connection: Connection to the loaded database
+
+        """
+
+        connection = sqlite3.connect(path, check_same_thread=False)
+        tables = self.generate()
+
+        for table, columns in TABLES.items():
+            connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.execute(self._create_table(table, columns))
+            placeholders = ", ".join("?" for _ in columns)
+            connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", tables[table])
+
+        for table, column in INDEXES:
+            connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{column} ON {table} ({column})")
+
+        connection.commit()
+
+        return connection
+
+    def to_sql(self, path: str | Path) -> None:
+        """
+        Writes the dataset as a SQL script, e.g. to load it into the JDBC database used by Wayang
+
+        Args:
+            path (str | Path): Path of the SQL file
+
+        """
+
+        tables = self.generate()
+
+        with open(path, "w", encoding="utf-8") as f:
+            for table, columns in TABLES.items():
+                f.write(f"DROP TABLE IF EXISTS {table};\n")
+                f.write(self._create_table(table, columns) + ";\n")
+
+                for row in tables[table]:
+                    values = ", ".join(self._sql_literal(column, value) for column, value in zip(columns, row))
+                    f.write(f"INSERT INTO {table} VALUES ({values});\n")
+
+    def to_csv(self, folder: str | Path) -> None:
+        """
+        Writes the dataset as one CSV file per table with a header row
+
+        Args:
+            folder (str | Path): Output folder
+
+        """
+
+        os.makedirs(folder, exist_ok=True)
+        tables = self.generate()
+
+        for table, columns in TABLES.items():
+            with open(os.path.join(folder, f"{table}.csv"), "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(tables[table])
+
+    def _create_table(self, table: str, columns: List[str]) -> str:
+        """
+        Helper function to build a CREATE TABLE statement
+
+        Args:
+            table (str): Table name
+            columns (List[str]): Column names
+
+        Returns:
+            str: The statement
+
+        """
+
+        definitions = []
+
+        for column in columns:
+            if column in INTEGER_COLUMNS:
+                column_type = "INTEGER"
+            elif column in DECIMAL_COLUMNS:
+                column_type = "DECIMAL(15,2)"
+            elif column in DATE_COLUMNS:
+                column_type = "DATE"
+            else:
+                column_type = "VARCHAR(200)"
+
+            definitions.append(f"{column} {column_type}")
+
+        return f"CREATE TABLE {table} ({', '.join(definitions)})"
+
+    def _sql_literal(self, column: str, value) -> str:
+        """
+        Helper function to format a value as SQL literal
+
+        Args:
+            column (str): Column name
+            value: Value
+
+        Returns:
+            str: The literal
+
+        """
+
+        if column in INTEGER_COLUMNS or column in DECIMAL_COLUMNS:
+            return str(value)
+
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def _comment(self, rng: random.Random) -> str:
+        """
+        Helper function to generate a comment
+
+        """
+
+        return " ".join(rng.choice(COMMENT_WORDS) for _ in range(rng.randint(3, 8)))
+
+    def _address(self, rng: random.Random) -> str:
+        """
+        Helper function to generate an address without commas
+
+        """
+
+        return "".join(rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ") for _ in range(rng.randint(10, 30))).strip()
+
+    def _phone(self, rng: random.Random, nation: int) -> str:
+        """
+        Helper function to generate a phone number. The country code is the nation key plus 10
+
+        """
+
+        return f"{nation + 10}-{rng.randint(100, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"
+
+    def _money(self, rng: random.Random, low: float, high: float) -> float:
+        """
+        Helper function to generate an amount with two decimals
+
+        """
+
+        return rng.randint(int(low * 100), int(high * 100)) / 100
@@ -7,7 +7,8 @@ load_dotenv()
 
 # Server port for MCP server
 MCP_CONFIG = {
-    "port": int(os.getenv("MCP_PORT", 9500))
+    "port": int(os.getenv("MCP_PORT", 9500)),
+    "workers": os.getenv("MCP_WORKERS", 1)
 }
 
 # LLM client model settings
@@ -16,12 +17,77 @@ BUILDER_MODEL_CONFIG = {
     "reason_effort": os.getenv("BUILDER_REASON_EFFORT", None)
 }
 
+# Streamed plan generation settings
+STREAM_CONFIG = {
+    "stream_plans": os.getenv("STREAM_PLANS", "False"),
+    "max_retries": os.getenv("STREAM_MAX_RETRIES", 2)
+}
+
+# Prompt settings
+PROMPT_CONFIG = {
+    "snapshot_file": os.getenv("PROMPT_SNAPSHOT_FILE", None),
+    "hot_reload": os.getenv("PROMPT_HOT_RELOAD", "True"),
+    "reload_interval_seconds": os.getenv("PROMPT_RELOAD_INTERVAL_SECONDS", 5)
+}
+
+# LLM call dispatch settings, shared by all agents
+LLM_DISPATCH_CONFIG = {
+    "max_rpm": os.getenv("LLM_MAX_RPM", None),
+    "max_tpm": os.getenv("LLM_MAX_TPM", None),
+    "hedge_percentile": os.getenv("LLM_HEDGE_PERCENTILE", None),
+    "hedge_min_samples": os.getenv("LLM_HEDGE_MIN_SAMPLES", 20),
+    "max_retries": os.getenv("LLM_MAX_RETRIES", 3)
+}
+
 # Debugger LLM model settings
 DEBUGGER_MODEL_CONFIG = {
     "use_debugger": os.getenv("USE_DEBUGGER", "False"),
     "model": os.getenv("DEBUGGER_LLM", "gpt-5-nano"),
     "reason_effort": os.getenv("DEBUGGER_REASON_EFFORT", None),
-    "max_itr": os.getenv("MAX_ITERATIONS", 5)
+    "max_itr": os.getenv("MAX_ITERATIONS", 5),
+    "history_token_budget": os.getenv("DEBUGGER_HISTORY_TOKEN_BUDGET", 16000),
+    "distill_errors": os.getenv("DEBUGGER_DISTILL_ERRORS", "True")
+}
+
+# Speculative plan generation settings
+SPECULATIVE_CONFIG = {
+    "use_speculative": os.getenv("USE_SPECULATIVE", "False"),
+    "candidates": os.getenv("SPECULATIVE_CANDIDATES", "gpt-5-nano:low,gpt-5-nano:medium,gpt-5-mini:low"),
+    "max_candidates": os.getenv("SPECULATIVE_MAX_CANDIDATES", 3),
+    "max_workers": os.getenv("SPECULATIVE_MAX_WORKERS", 3),
+    "first_valid_wins": os.getenv("SPECULATIVE_FIRST_VALID_WINS", "True")
+}
+
+# Batch query settings
+BATCH_CONFIG = {
+    "max_queries": os.getenv("BATCH_MAX_QUERIES", 50),
+    "max_build_workers": os.getenv("BATCH_MAX_BUILD_WORKERS", 4),
+    "max_execute_workers": os.getenv("BATCH_MAX_EXECUTE_WORKERS", 4)
+}
+
+# Model routing and escalation ladder settings
+ROUTER_CONFIG = {
+    "use_router": os.getenv("USE_MODEL_ROUTER", "False"),
+    "ladder": os.getenv("MODEL_LADDER", "gpt-5-nano:low,gpt-5-nano:medium,gpt-5-mini:medium,gpt-5:medium"),
+    "complexity_thresholds": os.getenv("ROUTER_COMPLEXITY_THRESHOLDS", "4,8"),
+    "stats_file": os.getenv("ROUTER_STATS_FILE", None)
+}
+
+# Plan template settings
+TEMPLATE_CONFIG = {
+    "use_templates": os.getenv("USE_PLAN_TEMPLATES", "False"),
+    "template_file": os.getenv("PLAN_TEMPLATE_FILE", None),
+    "max_failures": os.getenv("PLAN_TEMPLATE_MAX_FAILURES", 2)
+}
+
+# Budget settings. Limits are off if not set
+BUDGET_CONFIG = {
+    "max_tokens_per_request": os.getenv("BUDGET_MAX_TOKENS_PER_REQUEST", None),
+    "max_seconds_per_request": os.getenv("BUDGET_MAX_SECONDS_PER_REQUEST", None),
+    "max_iterations_per_request": os.getenv("BUDGET_MAX_ITERATIONS_PER_REQUEST", None),
+    "max_tokens_per_client": os.getenv("BUDGET_MAX_TOKENS_PER_CLIENT", None),
+    "client_window_seconds": os.getenv("BUDGET_CLIENT_WINDOW_SECONDS", 3600),
+    "model_prices": os.getenv("MODEL_PRICES", "gpt-5-nano:0.05/0.005/0.40,gpt-5-mini:0.25/0.025/2.00,gpt-5:1.25/0.125/10.00")
 }
 
 # Input settings
@@ -34,7 +100,52 @@ INPUT_CONFIG = {
 
 # Output settings
 OUTPUT_CONFIG = {
-    "output_folder": os.getenv("OUTPUT_FOLDER", None)
+    "output_folder": os.getenv("OUTPUT_FOLDER", None),
+    "max_age_seconds": os.getenv("OUTPUT_MAX_AGE_SECONDS", None),
+    "max_bytes": os.getenv("OUTPUT_MAX_BYTES", None),
+    "max_files": os.getenv("OUTPUT_MAX_FILES", None),
+    "cleanup_interval_seconds": os.getenv("OUTPUT_CLEANUP_INTERVAL_SECONDS", 60)
+}
+
+# Result store settings for large Wayang outputs
+RESULT_CONFIG = {
+    "result_folder": os.getenv("RESULT_FOLDER", None),
+    "preview_lines": os.getenv("RESULT_PREVIEW_LINES", 50),
+    "preview_chars": os.getenv("RESULT_PREVIEW_CHARS", 4000),
+    "max_page_lines": os.getenv("RESULT_MAX_PAGE_LINES", 500),
+    "max_results": os.getenv("RESULT_MAX_RESULTS", 100),
+    "summary_top_k": os.getenv("RESULT_SUMMARY_TOP_K", 5),
+    "write_parquet": os.getenv("RESULT_WRITE_PARQUET", "False")
+}
+
+# Scheduler settings for plan executions in Wayang
+SCHEDULER_CONFIG = {
+    "max_concurrent": os.getenv("SCHEDULER_MAX_CONCURRENT", 8),
+    "max_batch_concurrent": os.getenv("SCHEDULER_MAX_BATCH_CONCURRENT", None),
+    "max_queue": os.getenv("SCHEDULER_MAX_QUEUE", 100)
+}
+
+# SQL pushdown settings, for plans reading only from the JDBC database
+PUSHDOWN_CONFIG = {
+    "use_pushdown": os.getenv("USE_SQL_PUSHDOWN", "False"),
+    "pool_size": os.getenv("SQL_POOL_SIZE", 5),
+    "max_overflow": os.getenv("SQL_POOL_MAX_OVERFLOW", 5),
+    "statement_timeout_seconds": os.getenv("SQL_STATEMENT_TIMEOUT_SECONDS", 300),
+    "fetch_rows": os.getenv("SQL_FETCH_ROWS", 10000)
+}
+
+# Partitioned JDBC reads, splitting scans of large tables over several connections
+PARTITION_CONFIG = {
+    "partition_reads": os.getenv("PARTITION_READS", "False"),
+    "partitions": os.getenv("PARTITION_COUNT", 4),
+    "min_rows": os.getenv("PARTITION_MIN_ROWS", 1000000),
+    "strategy": os.getenv("PARTITION_STRATEGY", "range")
+}
+
+# Shared state settings, for several worker processes or instances on one host
+SHARED_CONFIG = {
+    "store_file": os.getenv("SHARED_STORE_FILE", None),
+    "max_jobs": os.getenv("SHARED_MAX_JOBS", 1000)
 }
 
 # Log settings
@@ -42,7 +153,24 @@ LOG_CONFIG = {
     "log_folder": os.getenv("LOG_FOLDER", None)
 }
 
+# Metrics settings
+METRICS_CONFIG = {
+    "port": os.getenv("METRICS_PORT", None)
+}
+
+# Trace export settings
+TRACE_CONFIG = {
+    "trace_file": os.getenv("TRACE_FILE", None),
+    "collector_url": os.getenv("TRACE_COLLECTOR_URL", None),
+    "service_name": os.getenv("TRACE_SERVICE_NAME", "ai-wayang-single")
+}
+
 # Wayang server settings
 WAYANG_CONFIG = {
-    "server_url": os.getenv("WAYANG_URL")
+    "server_url": os.getenv("WAYANG_URL"),
+    "heavy_url": os.getenv("WAYANG_HEAVY_URL", None),
+    "heavy_plan_bytes": os.getenv("WAYANG_HEAVY_PLAN_BYTES", None),
+    "max_concurrency": os.getenv("WAYANG_MAX_CONCURRENCY", None),
+    "probe_interval_seconds": os.getenv("WAYANG_PROBE_INTERVAL_SECONDS", 10),
+    "queue_timeout_seconds": os.getenv("WAYANG_QUEUE_TIMEOUT_SECONDS", 300)
 }
\ No newline at end of file
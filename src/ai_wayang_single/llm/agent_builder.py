@@ -1,7 +1,14 @@
-from openai import OpenAI
-from ai_wayang_single.config.settings import BUILDER_MODEL_CONFIG
+from typing import Callable, Dict
+import threading
+import time
+from ai_wayang_single.config.settings import BUILDER_MODEL_CONFIG, STREAM_CONFIG
 from ai_wayang_single.llm.models import WayangPlan
-from ai_wayang_single.llm.prompt_loader import PromptLoader
+from ai_wayang_single.llm.llm_dispatcher import llm_dispatcher
+from ai_wayang_single.llm.plan_stream import PlanStreamReader, StreamAborted
+from ai_wayang_single.llm.prompt_registry import prompt_registry
+from ai_wayang_single.utils.budget import budgets
+from ai_wayang_single.utils.metrics import metrics
+from ai_wayang_single.utils.tracer import tracer
 
 
 class Builder:
@@ -15,13 +22,50 @@ class Builder:
         model: str | None = None,
         reasoning: str | None = None,
         system_prompt: str | None = None,
+        client=None,
     ):
-        self.client = OpenAI()
+        self._client = client
         self.model = model or BUILDER_MODEL_CONFIG.get("model")
         self.reasoning = reasoning or BUILDER_MODEL_CONFIG.get("reason_effort")
-        self.system_prompt = (
-            system_prompt or PromptLoader().load_builder_system_prompt()
-        )
+        self._system_prompt = system_prompt
+        self.stream = STREAM_CONFIG.get("stream_plans") == "True"
+        self.stream_retries = int(STREAM_CONFIG.get("max_retries"))
+        self._stream_lock = threading.Lock()
+        self._stream_stats = {"streamed": 0, "aborts": 0, "plans_with_errors": 0, "first_errors": 0, "first_error_seconds": 0.0, "plan_seconds": 0.0}
+
+    @property
+    def client(self):
+        """
+        OpenAI client, created on first use so the server starts without importing the OpenAI SDK.
+        Retries are left to the LLM dispatcher, which paces them for all calls
+
+        """
+
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(max_retries=0)
+
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+
+    @property
+    def system_prompt(self) -> str:
+        """
+        System prompt, the current version from the prompt registry unless given
+
+        """
+
+        if self._system_prompt is None:
+            return prompt_registry.get("builder")
+
+        return self._system_prompt
+
+    @system_prompt.setter
+    def system_prompt(self, system_prompt: str) -> None:
+        self._system_prompt = system_prompt
 
     def set_model_and_reasoning(self, model: str, reasoning: str) -> None:
         """
@@ -36,12 +80,16 @@ class Builder:
         self.model = model
         self.reasoning = reasoning
 
-    def generate_plan(self, prompt: str):
+    def generate_plan(self, prompt: str, model: str | None = None, reasoning: str | None = None, check: Callable | None = None):
         """
         Generates a logical, abstract Wayang plan from a natural language query.
+        With streaming on and a check given, operations are checked as they are generated
 
         Args:
             prompt (str): A query in natural language
+            model (str | None): GPT-model for this call only. Defaults to the object's model
+            reasoning (str | None): Reasoning level for this call only. Defaults to the object's reasoning
+            check (Callable | None): Function returning the fatal errors of a single operation, for streaming
 
         Returns:
             WayangPlan: A logical Wayang plan
@@ -50,7 +98,7 @@ class Builder:
 
         # Defines params and structured format for the model
         params = {
-            "model": self.model,
+            "model": model or self.model,
             "input": [
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": prompt},
@@ -59,13 +107,138 @@ class Builder:
         }
 
         # Set effort if reasoning model
-        effort = self.reasoning
+        effort = reasoning or self.reasoning
 
         if effort:
             params["reasoning"] = {"effort": effort}
 
-        # Generate response
-        response = self.client.responses.parse(**params)
+        # Check budget before calling the LLM, roughly 4 characters per token
+        estimated_tokens = (len(self.system_prompt) + len(prompt)) // 4
+        budgets.check("builder", estimated_tokens)
+
+        # Generate response, waiting for the provider's rate limits in the shared dispatcher
+        with tracer.span("Builder.generate_plan", {"llm.model": params["model"], "llm.reasoning": str(effort)}) as span:
+            if self.stream and check is not None:
+                response, dispatch = self._stream_plan(params, estimated_tokens, check)
+                span.set_attribute("llm.stream_aborts", dispatch["stream"]["aborts"])
+            else:
+                response, dispatch = llm_dispatcher.parse(self.client, params, estimated_tokens, "builder")
+
+            # Record latency and token usage
+            metrics.record_usage("builder", params["model"], response.usage, dispatch["latency"])
+            budgets.record("builder", params["model"], response.usage)
+            span.set_attribute("llm.input_tokens", response.usage.input_tokens)
+            span.set_attribute("llm.output_tokens", response.usage.output_tokens)
+            span.set_attribute("llm.queue_seconds", dispatch["queue_seconds"])
+            span.set_attribute("llm.hedged", dispatch["hedged"])
+            span.set_attribute("plan.operator_count", len(response.output_parsed.operations))
 
         # Return response
-        return {"raw": response, "wayang_plan": response.output_parsed}
+        return {"raw": response, "wayang_plan": response.output_parsed, "queue_seconds": dispatch["queue_seconds"], "stream": dispatch.get("stream")}
+
+    def _stream_plan(self, params: Dict, estimated_tokens: int, check: Callable):
+        """
+        Helper function to stream a plan, checking each operation as soon as it is complete.
+        A fatal error stops the generation and starts it again with the errors added to the prompt.
+        The last attempt isn't stopped, so the debugger can still fix its plan
+
+        Args:
+            params (Dict): Parameters of the LLM call
+            estimated_tokens (int): Estimated input tokens
+            check (Callable): Function returning the fatal errors of a single operation
+
+        Returns:
+            Tuple: Response, and dispatch info with stream stats
+
+        """
+
+        start = time.perf_counter()
+        aborts = 0
+        messages = params["input"]
+        first_error_seconds = None
+
+        for attempt in range(self.stream_retries + 1):
+            # Retries use tokens too
+            if attempt:
+                budgets.check("builder", estimated_tokens)
+
+            reader = PlanStreamReader(check, abort=attempt < self.stream_retries, input_tokens=estimated_tokens)
+
+            try:
+                response, dispatch = llm_dispatcher.stream(self.client, params, estimated_tokens, "builder", reader.read)
+                break
+
+            except StreamAborted as e:
+                print(f"[INFO] Plan generation stopped early, retrying: {e}")
+                aborts += 1
+
+                # Time from the start of the attempt to the first fatal error
+                if first_error_seconds is None:
+                    first_error_seconds = e.elapsed
+                    metrics.observe("wayang_llm_stream_first_error_seconds", e.elapsed, model=params["model"])
+
+                # Record the tokens used until the abort
+                metrics.record_usage("builder", params["model"], e.usage)
+                budgets.record("builder", params["model"], e.usage)
+                metrics.inc("wayang_llm_stream_aborts_total", model=params["model"])
+
+                # Tell the model what went wrong before the next attempt
+                params["input"] = messages[:-1] + [{"role": "user", "content": messages[-1]["content"] + "\n\n" + self._retry_prompt(e)}]
+
+        # Errors of the last attempt, which isn't stopped
+        if first_error_seconds is None and reader.first_error_seconds is not None:
+            first_error_seconds = reader.first_error_seconds
+            metrics.observe("wayang_llm_stream_first_error_seconds", first_error_seconds, model=params["model"])
+
+        # Time until a complete plan without fatal errors, including stopped attempts
+        plan_seconds = time.perf_counter() - start
+        if not reader.errors:
+            metrics.observe("wayang_llm_stream_plan_seconds", plan_seconds, model=params["model"])
+
+        with self._stream_lock:
+            stats = self._stream_stats
+            stats["streamed"] += 1
+            stats["aborts"] += aborts
+            stats["plans_with_errors"] += int(bool(reader.errors))
+            stats["plan_seconds"] += plan_seconds
+
+            if first_error_seconds is not None:
+                stats["first_errors"] += 1
+                stats["first_error_seconds"] += first_error_seconds
+
+        dispatch["stream"] = {"aborts": aborts, "first_error_seconds": first_error_seconds, "plan_seconds": plan_seconds, "errors": reader.errors}
+
+        return response, dispatch
+
+    def get_stream_stats(self) -> Dict:
+        """
+        Gets streamed plans, early stops and mean times to the first error and to an executable plan
+
+        Returns:
+            Dict: Streaming settings and stats
+
+        """
+
+        with self._stream_lock:
+            stats = dict(self._stream_stats)
+
+        return {
+            "enabled": self.stream,
+            "max_retries": self.stream_retries,
+            "streamed": stats["streamed"],
+            "aborts": stats["aborts"],
+            "plans_with_errors": stats["plans_with_errors"],
+            "first_error_seconds_mean": stats["first_error_seconds"] / stats["first_errors"] if stats["first_errors"] else None,
+            "plan_seconds_mean": stats["plan_seconds"] / stats["streamed"] if stats["streamed"] else None,
+        }
+
+    @staticmethod
+    def _retry_prompt(aborted: StreamAborted) -> str:
+        """
+        Helper function to describe the errors of a stopped plan for the next attempt
+
+        """
+
+        errors = "\n".join(f"- {error}" for error in aborted.errors)
+
+        return f"Your previous plan was stopped after {len(aborted.operations)} operations because of these errors:\n{errors}\nGenerate the full plan again without these errors."
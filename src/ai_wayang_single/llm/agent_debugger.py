@@ -1,8 +1,13 @@
-from openai import OpenAI
 from typing import List
 from ai_wayang_single.config.settings import DEBUGGER_MODEL_CONFIG
 from ai_wayang_single.llm.prompt_loader import PromptLoader
+from ai_wayang_single.llm.prompt_registry import prompt_registry
+from ai_wayang_single.llm.chat_history import ChatHistory
+from ai_wayang_single.utils.budget import budgets
+from ai_wayang_single.utils.metrics import metrics
+from ai_wayang_single.utils.tracer import tracer
 from ai_wayang_single.llm.models import WayangPlan
+from ai_wayang_single.llm.llm_dispatcher import llm_dispatcher
 
 
 class Debugger:
@@ -18,15 +23,58 @@ class Debugger:
         reasoning: str | None = None,
         system_prompt: str | None = None,
         version: int | None = None,
+        history_token_budget: int | None = None,
+        client=None,
     ):
-        self.client = OpenAI()
+        self._client = client
         self.model = model or DEBUGGER_MODEL_CONFIG.get("model")
         self.reasoning = reasoning or DEBUGGER_MODEL_CONFIG.get("reason_effort")
-        self.system_prompt = (
-            system_prompt or PromptLoader().load_debugger_system_prompt()
-        )
+        self._system_prompt = system_prompt
         self.version = version or 0
-        self.chat = []
+        self.history_token_budget = history_token_budget or int(DEBUGGER_MODEL_CONFIG.get("history_token_budget"))
+        self._history = None
+
+    @property
+    def client(self):
+        """
+        OpenAI client, created on first use so the server starts without importing the OpenAI SDK.
+        Retries are left to the LLM dispatcher, which paces them for all calls
+
+        """
+
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(max_retries=0)
+
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+
+    @property
+    def system_prompt(self) -> str:
+        """
+        System prompt, the current version from the prompt registry unless given
+
+        """
+
+        if self._system_prompt is None:
+            return prompt_registry.get("debugger")
+
+        return self._system_prompt
+
+    @property
+    def history(self) -> ChatHistory:
+        """
+        Chat history of the debug session, created with the system prompt on first use
+
+        """
+
+        if self._history is None:
+            self._history = ChatHistory(self.system_prompt, token_budget=self.history_token_budget)
+
+        return self._history
 
     def set_model_and_reasoning(self, model: str, reasoning: str) -> None:
         """
@@ -86,42 +134,62 @@ class Debugger:
 
         """
 
-        # increment version
-        self.version += 1
+        # Version of the failed plan
+        failed_version = self.version
 
         # Create new user prompt
         prompt = PromptLoader().load_debugger_prompt(
             query, plan, wayang_errors, val_errors
         )
 
-        # Add user prompt to chat
-        self.chat.append({"role": "user", "content": prompt})
+        # Build bounded chat from earlier attempts and the new prompt
+        messages = self.history.build_messages(prompt)
+        history_tokens = self.history.estimate_messages_tokens(messages)
+        print(f"[INFO] Debugger request is ~{history_tokens} tokens")
+
+        # Check budget before calling the LLM
+        budgets.check("debugger", history_tokens)
+
+        # increment version
+        self.version += 1
 
         # Add model and current chat
-        params = {"model": self.model, "input": self.chat, "text_format": WayangPlan}
+        params = {"model": self.model, "input": messages, "text_format": WayangPlan}
 
         # Initialize effort
         effort = self.reasoning
         if effort:
             params["reasoning"] = {"effort": effort}
 
-        # Generate response
-        response = self.client.responses.parse(**params)
-
-        # Format text answer from agent
+        # Generate response, waiting for the provider's rate limits in the shared dispatcher
+        with tracer.span("Debugger.debug_plan", {"llm.model": self.model, "llm.reasoning": str(effort), "plan.version": self.version}) as span:
+            response, dispatch = llm_dispatcher.parse(self.client, params, history_tokens, "debugger")
+
+            # Record latency and token usage
+            metrics.record_usage("debugger", self.model, response.usage, dispatch["latency"])
+            budgets.record("debugger", self.model, response.usage)
+            span.set_attribute("llm.input_tokens", response.usage.input_tokens)
+            span.set_attribute("llm.output_tokens", response.usage.output_tokens)
+            span.set_attribute("llm.history_tokens", history_tokens)
+            span.set_attribute("llm.queue_seconds", dispatch["queue_seconds"])
+            span.set_attribute("llm.hedged", dispatch["hedged"])
+            span.set_attribute("plan.operator_count", len(response.output_parsed.operations))
+
+        # Get fixed plan from agent
         wayang_plan = response.output_parsed
-        answer = PromptLoader().load_debugger_answer(wayang_plan)
 
-        # Add agent answer to chat - necessary if another debug iteration is needed
-        self.chat.append({"role": "assistant", "content": answer})
+        # Add attempt to history - necessary if another debug iteration is needed
+        self.history.add_attempt(failed_version, plan, wayang_errors, val_errors, wayang_plan.thoughts)
 
         # Return output
-        return {"raw": response, "wayang_plan": wayang_plan, "version": self.version}
+        return {"raw": response, "wayang_plan": wayang_plan, "version": self.version, "history_tokens": history_tokens, "queue_seconds": dispatch["queue_seconds"]}
 
     def start_debugger(self) -> None:
         """
-        Cleans the Debugger Agents chat so it only includes the system prompt
+        Cleans the Debugger Agents chat so it only includes the system prompt.
+        A debug session uses the system prompt version current at its start
 
         """
 
-        self.chat = [{"role": "system", "content": self.system_prompt}]
+        self.history.system_prompt = self.system_prompt
+        self.history.start()
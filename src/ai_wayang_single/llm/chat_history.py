@@ -0,0 +1,202 @@
+from typing import List, Dict
+from ai_wayang_single.llm.models import WayangPlan
+from ai_wayang_single.wayang.error_distiller import ErrorDistiller
+
+
+class ChatHistory:
+    """
+    Bounded chat history for the Debugger Agent.
+    Keeps the system prompt and the latest prompt (query, failed plan and errors) verbatim,
+    while earlier debug iterations are compressed into a short digest of what was tried and why it failed
+
+    """
+
+    def __init__(self, system_prompt: str, token_budget: int | None = None, max_error_chars: int = 300):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.max_error_chars = max_error_chars
+        self.attempts = []
+
+    def start(self) -> None:
+        """
+        Clears earlier attempts so the history only includes the system prompt
+
+        """
+
+        self.attempts = []
+
+    def add_attempt(self, version: int, failed_plan: WayangPlan, wayang_errors, val_errors: List, thoughts: str | None) -> None:
+        """
+        Adds a finished debug iteration to the digest
+
+        Args:
+            version (int): Version of the failed plan
+            failed_plan (WayangPlan): The failed plan sent to the Debugger
+            wayang_errors: The error given by the Wayang server if any
+            val_errors (List): The errors given by the PlanValidator if any
+            thoughts (str | None): The Debugger's reasoning on its fix
+
+        """
+
+        self.attempts.append({
+            "version": version,
+            "plan": self._summarize_plan(failed_plan),
+            "error": self._summarize_error(wayang_errors, val_errors),
+            "fix": self._truncate(thoughts or "", self.max_error_chars),
+        })
+
+    def build_messages(self, prompt: str) -> List[Dict]:
+        """
+        Builds the messages for the next Debugger call within the token budget.
+        The oldest attempts are dropped from the digest first when the budget is exceeded
+
+        Args:
+            prompt (str): The latest prompt with the query, failed plan and errors
+
+        Returns:
+            List[Dict]: Messages for the model
+
+        """
+
+        # The system prompt and latest prompt are always kept verbatim
+        fixed_tokens = self.estimate_tokens(self.system_prompt) + self.estimate_tokens(prompt)
+
+        # Add digest lines from newest to oldest until budget is used
+        lines = []
+        used_tokens = fixed_tokens
+
+        for attempt in reversed(self.attempts):
+            line = self._format_attempt(attempt)
+            line_tokens = self.estimate_tokens(line)
+
+            if self.token_budget and used_tokens + line_tokens > self.token_budget:
+                break
+
+            lines.insert(0, line)
+            used_tokens += line_tokens
+
+        # Tell the Debugger if attempts were left out
+        omitted = len(self.attempts) - len(lines)
+        if omitted:
+            lines.insert(0, f"- {omitted} earlier attempts omitted")
+
+        if self.token_budget and fixed_tokens > self.token_budget:
+            print(f"[WARNING] Debugger prompt alone is ~{fixed_tokens} tokens and exceeds the history budget of {self.token_budget}")
+
+        # Build messages
+        messages = [{"role": "system", "content": self.system_prompt}]
+
+        if lines:
+            digest = "Summary of earlier debugging iterations (oldest first):\n" + "\n".join(lines)
+            messages.append({"role": "user", "content": digest})
+
+        messages.append({"role": "user", "content": prompt})
+
+        return messages
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        Rough token estimate, around four characters per token
+
+        Args:
+            text (str): Text to estimate
+
+        Returns:
+            int: Estimated number of tokens
+
+        """
+
+        return (len(text) + 3) // 4
+
+    def estimate_messages_tokens(self, messages: List[Dict]) -> int:
+        """
+        Rough token estimate of a list of messages
+
+        Args:
+            messages (List[Dict]): Messages for the model
+
+        Returns:
+            int: Estimated number of tokens
+
+        """
+
+        return sum(self.estimate_tokens(m["content"]) for m in messages)
+
+    def _format_attempt(self, attempt: Dict) -> str:
+        """
+        Helper function to format an attempt as a single digest line
+
+        Args:
+            attempt (Dict): A recorded attempt
+
+        Returns:
+            str: The digest line
+
+        """
+
+        line = f"- Plan version {attempt['version']}: tried {attempt['plan']}, failed with: {attempt['error']}"
+
+        if attempt["fix"]:
+            line += f". Fix applied: {attempt['fix']}"
+
+        return line
+
+    def _summarize_plan(self, plan: WayangPlan) -> str:
+        """
+        Helper function to summarize a plan as its operator chain
+
+        Args:
+            plan (WayangPlan): Plan to summarize
+
+        Returns:
+            str: Compact plan summary
+
+        """
+
+        # List to store operators
+        operators = []
+
+        for op in getattr(plan, "operations", []):
+            source = op.table or op.inputFileName
+            name = f"{op.id}:{op.operatorName}"
+            operators.append(f"{name}[{source}]" if source else name)
+
+        return " -> ".join(operators) or "an empty plan"
+
+    def _summarize_error(self, wayang_errors, val_errors: List) -> str:
+        """
+        Helper function to summarize the errors of a failed plan
+
+        Args:
+            wayang_errors: The error given by the Wayang server if any
+            val_errors (List): The errors given by the PlanValidator if any
+
+        Returns:
+            str: Compact error summary
+
+        """
+
+        if val_errors:
+            return self._truncate("; ".join(str(e) for e in val_errors), self.max_error_chars)
+
+        if wayang_errors:
+            # Use the root-cause exception and message
+            return self._truncate(ErrorDistiller().summarize(wayang_errors), self.max_error_chars)
+
+        return "unknown error"
+
+    def _truncate(self, text: str, max_chars: int) -> str:
+        """
+        Helper function to truncate text to a maximum length
+
+        Args:
+            text (str): Text to truncate
+            max_chars (int): Maximum number of characters
+
+        Returns:
+            str: Truncated text on a single line
+
+        """
+
+        text = " ".join(text.split())
+        return text if len(text) <= max_chars else text[: max_chars - 3] + "..."
@@ -0,0 +1,462 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextvars import copy_context
+from typing import Callable, Dict, Tuple
+import threading
+import time
+from ai_wayang_single.config.settings import LLM_DISPATCH_CONFIG
+from ai_wayang_single.utils.budget import budgets
+from ai_wayang_single.utils.metrics import metrics
+
+# Latencies kept per model for the hedging percentile
+LATENCY_WINDOW = 200
+
+# Seconds to wait after a rate limit error without a retry-after header
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a rate per minute, holding at most one minute of tokens.
+    Callers reserve what they need and are told how long to wait, so waiting callers are served in order
+
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Takes tokens from the bucket, going into debt if there aren't enough
+
+        Args:
+            amount (float): Tokens to take
+
+        Returns:
+            float: Seconds to wait until the tokens are covered
+
+        """
+
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+        return max(-self.available / self.rate, 0.0)
+
+    def adjust(self, amount: float) -> None:
+        """
+        Corrects an earlier reservation, e.g. with the actual token usage. Negative amounts give tokens back
+
+        """
+
+        self._refill()
+        self.available = min(self.available - amount, self.capacity)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Empties the bucket so the next tokens are available in the given seconds, e.g. after a rate limit error
+
+        """
+
+        self._refill()
+        self.available = min(self.available, -seconds * self.rate)
+
+    def _refill(self) -> None:
+        """
+        Helper function to add the tokens refilled since the last update
+
+        """
+
+        now = time.monotonic()
+        self.available = min(self.available + (now - self.updated) * self.rate, self.capacity)
+        self.updated = now
+
+
+class LLMDispatcher:
+    """
+    Shared dispatcher for all LLM calls of the agents.
+    Calls wait for the request (RPM) and token (TPM) budgets of the provider in token buckets instead of running into
+    rate limit errors. Rate limit errors still happening pause all calls for the retry time before trying again.
+    Connection errors, timeouts and server errors are retried after a backoff for that call only, since the clients don't retry.
+    Optionally a call slower than a percentile of earlier calls is hedged: a duplicate is sent and the first answer wins
+
+    """
+
+    def __init__(
+        self,
+        max_rpm: float | None = None,
+        max_tpm: float | None = None,
+        hedge_percentile: float | None = None,
+        hedge_min_samples: int = 20,
+        max_retries: int = 3,
+        max_workers: int = 16,
+    ):
+        self.requests = TokenBucket(max_rpm) if max_rpm else None
+        self.tokens = TokenBucket(max_tpm) if max_tpm else None
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_retries = max_retries
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._pool = None
+        self._stats = {"calls": 0, "queued": 0, "queue_seconds": 0.0, "max_queue_seconds": 0.0, "rate_limited": 0, "hedged": 0, "hedge_wins": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "LLMDispatcher":
+        """
+        Creates a dispatcher from the dispatch config
+
+        Args:
+            config (Dict): LLM dispatch config
+
+        Returns:
+            LLMDispatcher: Dispatcher
+
+        """
+
+        return cls(
+            max_rpm=float(config["max_rpm"]) if config.get("max_rpm") else None,
+            max_tpm=float(config["max_tpm"]) if config.get("max_tpm") else None,
+            hedge_percentile=float(config["hedge_percentile"]) if config.get("hedge_percentile") else None,
+            hedge_min_samples=int(config.get("hedge_min_samples")),
+            max_retries=int(config.get("max_retries")),
+        )
+
+    def parse(self, client, params: Dict, estimated_tokens: int, agent: str) -> Tuple[object, Dict]:
+        """
+        Calls client.responses.parse once the rate limits allow it
+
+        Args:
+            client: OpenAI client, or a stub with the same interface
+            params (Dict): Parameters of responses.parse
+            estimated_tokens (int): Estimated input tokens, reserved from the token budget until the usage is known
+            agent (str): Calling agent, for metrics
+
+        Returns:
+            Tuple[object, Dict]: Response, and seconds queued, seconds of the call and whether it was hedged
+
+        """
+
+        return self._dispatch(lambda: self._call(client, params, estimated_tokens, agent), params, estimated_tokens, agent)
+
+    def stream(self, client, params: Dict, estimated_tokens: int, agent: str, consume: Callable) -> Tuple[object, Dict]:
+        """
+        Calls client.responses.stream once the rate limits allow it. Streamed calls aren't hedged
+
+        Args:
+            client: OpenAI client, or a stub with the same interface
+            params (Dict): Parameters of responses.stream
+            estimated_tokens (int): Estimated input tokens, reserved from the token budget until the usage is known
+            agent (str): Calling agent, for metrics
+            consume (Callable): Function reading the stream and returning the final response
+
+        Returns:
+            Tuple[object, Dict]: Response, and seconds queued, seconds of the call and whether it was hedged
+
+        """
+
+        return self._dispatch(lambda: (consume(client.responses.stream(**params)), False), params, estimated_tokens, agent)
+
+    def _dispatch(self, call: Callable, params: Dict, estimated_tokens: int, agent: str) -> Tuple[object, Dict]:
+        """
+        Helper function to run a call once the rate limits allow it, retrying after rate limit and transient errors
+
+        Returns:
+            Tuple[object, Dict]: Response, and seconds queued, seconds of the call and whether it was hedged
+
+        """
+
+        queue_seconds = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            queue_seconds += self._admit(estimated_tokens)
+            start = time.perf_counter()
+
+            try:
+                response, hedged = call()
+                break
+
+            except Exception as e:
+                # Give the reservation back, except for tokens used before failing, e.g. by an aborted stream
+                used = getattr(e, "usage", None)
+                used = used if isinstance(used, dict) else {}
+                self._adjust(used.get("input_tokens", 0) + used.get("output_tokens", 0) - estimated_tokens)
+
+                if not (self._is_rate_limit(e) or self._is_transient(e)) or attempt == self.max_retries:
+                    raise
+
+                # Transient errors only delay this call
+                if not self._is_rate_limit(e):
+                    retry_after = DEFAULT_RETRY_AFTER * (2 ** attempt)
+                    print(f"[INFO] LLM call failed ({type(e).__name__}), retrying in {retry_after:.1f} seconds")
+                    time.sleep(retry_after)
+                    continue
+
+                # Pause all calls until the provider's limit resets
+                retry_after = self._retry_after(e, attempt)
+                print(f"[INFO] LLM rate limit hit, pausing calls for {retry_after:.1f} seconds")
+                self._pause(retry_after)
+
+                with self._lock:
+                    self._stats["rate_limited"] += 1
+                metrics.inc("wayang_llm_rate_limited_total", agent=agent)
+
+        latency = time.perf_counter() - start
+
+        # Correct the token reservation with the actual usage
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._adjust(usage.input_tokens + usage.output_tokens - estimated_tokens)
+
+        self._record(params["model"], latency, queue_seconds, hedged)
+        metrics.observe("wayang_llm_queue_seconds", queue_seconds, agent=agent)
+
+        return response, {"queue_seconds": queue_seconds, "latency": latency, "hedged": hedged}
+
+    def get_stats(self) -> Dict:
+        """
+        Gets calls, queueing delay, rate limit errors and hedges
+
+        Returns:
+            Dict: Dispatcher stats and limits
+
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            thresholds = {model: self._hedge_threshold(model) for model in self._latencies}
+
+        return {
+            **stats,
+            "queue_seconds_mean": stats["queue_seconds"] / stats["calls"] if stats["calls"] else 0.0,
+            "max_rpm": self.requests.capacity if self.requests else None,
+            "max_tpm": self.tokens.capacity if self.tokens else None,
+            "hedge_percentile": self.hedge_percentile,
+            "hedge_after_seconds": thresholds,
+        }
+
+    def _admit(self, estimated_tokens: int) -> float:
+        """
+        Helper function to reserve a request and the estimated tokens, and wait until they are covered
+
+        Returns:
+            float: Seconds waited
+
+        """
+
+        with self._lock:
+            delay = 0.0
+
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1))
+            if self.tokens:
+                delay = max(delay, self.tokens.reserve(estimated_tokens))
+
+            if delay > 0:
+                self._stats["queued"] += 1
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    def _call(self, client, params: Dict, estimated_tokens: int, agent: str) -> Tuple[object, bool]:
+        """
+        Helper function to call the LLM, hedged with a duplicate if the call is slower than the percentile
+
+        Returns:
+            Tuple[object, bool]: Response, and True if the duplicate answered first
+
+        """
+
+        threshold = self._hedge_threshold(params["model"])
+
+        if threshold is None:
+            return client.responses.parse(**params), False
+
+        primary = self._get_pool().submit(client.responses.parse, **params)
+        done, _ = wait([primary], timeout=threshold)
+
+        # Only hedge if the budgets allow another call right away, a hedge must not queue behind other calls
+        if done or not self._try_reserve(estimated_tokens):
+            return primary.result(), False
+
+        with self._lock:
+            self._stats["hedged"] += 1
+
+        hedge = self._get_pool().submit(client.responses.parse, **params)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+
+        # Prefer a succesful answer if the first one failed
+        winner = next(iter(done))
+        if winner.exception() is not None:
+            winner = hedge if winner is primary else primary
+
+        # The other call still uses tokens when it finishes, recorded against the request that started it
+        loser = hedge if winner is primary else primary
+        context = copy_context()
+        loser.add_done_callback(lambda future: context.run(self._record_hedge_loser, future, params["model"], agent, estimated_tokens))
+
+        metrics.inc("wayang_llm_hedged_total", model=params["model"], winner="hedge" if winner is hedge else "primary")
+
+        if winner is hedge:
+            with self._lock:
+                self._stats["hedge_wins"] += 1
+
+        return winner.result(), winner is hedge
+
+    def _try_reserve(self, estimated_tokens: int) -> bool:
+        """
+        Helper function to reserve a hedge request only if it needs no waiting
+
+        """
+
+        with self._lock:
+            delays = []
+
+            if self.requests:
+                delays.append(self.requests.reserve(1))
+            if self.tokens:
+                delays.append(self.tokens.reserve(estimated_tokens))
+
+            if any(delay > 0 for delay in delays):
+                # Give the reservation back
+                if self.requests:
+                    self.requests.adjust(-1)
+                if self.tokens:
+                    self.tokens.adjust(-estimated_tokens)
+
+                return False
+
+        return True
+
+    def _record_hedge_loser(self, future, model: str, agent: str, estimated_tokens: int) -> None:
+        """
+        Helper function to record the tokens of the slower of two hedged calls in the budgets,
+        and correct its token reservation with the actual usage
+
+        """
+
+        # A failed call gives its reservation back
+        if future.exception() is not None:
+            self._adjust(-estimated_tokens)
+            return None
+
+        usage = getattr(future.result(), "usage", None)
+        if usage is None:
+            return None
+
+        used = usage.input_tokens + usage.output_tokens
+        self._adjust(used - estimated_tokens)
+        budgets.record(agent, model, usage)
+        metrics.inc("wayang_llm_hedge_wasted_tokens_total", used, model=model)
+
+    def _hedge_threshold(self, model: str) -> float | None:
+        """
+        Helper function to get the latency after which a call is hedged, None if hedging is off or too few samples
+
+        """
+
+        if not self.hedge_percentile:
+            return None
+
+        latencies = self._latencies.get(model)
+
+        if not latencies or len(latencies) < self.hedge_min_samples:
+            return None
+
+        values = sorted(latencies)
+        index = min(int(len(values) * self.hedge_percentile / 100), len(values) - 1)
+
+        return values[index]
+
+    def _record(self, model: str, latency: float, queue_seconds: float, hedged: bool) -> None:
+        """
+        Helper function to record a finished call
+
+        """
+
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(latency)
+            self._stats["calls"] += 1
+            self._stats["queue_seconds"] += queue_seconds
+            self._stats["max_queue_seconds"] = max(self._stats["max_queue_seconds"], queue_seconds)
+
+    def _adjust(self, tokens: float) -> None:
+        """
+        Helper function to correct the token budget
+
+        """
+
+        if self.tokens:
+            with self._lock:
+                self.tokens.adjust(tokens)
+
+    def _pause(self, seconds: float) -> None:
+        """
+        Helper function to pause all calls
+
+        """
+
+        with self._lock:
+            for bucket in (self.requests, self.tokens):
+                if bucket:
+                    bucket.pause(seconds)
+
+        # Without limits there's no bucket to hold other calls back, so at least this call waits
+        if not self.requests and not self.tokens:
+            time.sleep(seconds)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """
+        Helper function to get the thread pool for hedged calls, created on first use
+
+        """
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-hedge")
+
+            return self._pool
+
+    @staticmethod
+    def _is_rate_limit(error: Exception) -> bool:
+        """
+        Helper function to check if an error is a rate limit error (HTTP 429), without importing the OpenAI SDK
+
+        """
+
+        return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """
+        Helper function to check if an error is a connection error, timeout or server error (HTTP 5xx), without importing the OpenAI SDK
+
+        """
+
+        status_code = getattr(error, "status_code", None)
+
+        return (isinstance(status_code, int) and status_code >= 500) or type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+    @staticmethod
+    def _retry_after(error: Exception, attempt: int) -> float:
+        """
+        Helper function to get the seconds to wait after a rate limit error, from the retry-after header if given
+
+        """
+
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+
+        try:
+            return float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER * (2 ** attempt)
+
+
+# Shared dispatcher for all agents of the process
+llm_dispatcher = LLMDispatcher.from_config(LLM_DISPATCH_CONFIG)
@@ -0,0 +1,268 @@
+from pathlib import Path
+from typing import List, Dict, Tuple
+import json
+import os
+import re
+import threading
+from ai_wayang_single.config.settings import ROUTER_CONFIG
+
+# Keywords hinting that the query combines several data sources
+JOIN_KEYWORDS = ("join", "combine", "together with", "along with", "for each", "match", "across", "related to", "belonging to")
+
+# Keywords hinting at aggregations or ordering
+AGGREGATION_KEYWORDS = ("sum", "total", "average", "avg", "count", "number of", "group", "per ", "top", "most", "highest", "lowest", "rank", "order by", "sorted")
+
+
+class ModelRouter:
+    """
+    Routes queries to a tier in an escalation ladder of (model, reasoning) pairs.
+    Simple queries start at the cheap, fast tier and escalate to stronger tiers only after validation or execution fails.
+    Per-tier latency, success rate and token usage are recorded so the ladder can be tuned
+
+    """
+
+    def __init__(
+        self,
+        tiers: List[Tuple[str, str | None]] | None = None,
+        thresholds: List[int] | None = None,
+        stats_file: str | None = None,
+        data_folder: str | Path | None = None,
+    ):
+        self.tiers = tiers or self.parse_tiers(ROUTER_CONFIG.get("ladder"))
+        self.thresholds = thresholds or [int(t) for t in str(ROUTER_CONFIG.get("complexity_thresholds")).split(",") if t.strip()]
+        self.stats_file = stats_file or ROUTER_CONFIG.get("stats_file")
+        self.data_folder = Path(data_folder) if data_folder else Path(__file__).resolve().parent.parent.parent.parent / "data"
+        self.source_names = self._load_source_names()
+        self._lock = threading.Lock()
+        self.stats = self._load_stats()
+
+    def route(self, query: str) -> int:
+        """
+        Chooses the starting tier for a query from its complexity
+
+        Args:
+            query (str): A query in natural language
+
+        Returns:
+            int: Index of the starting tier
+
+        """
+
+        score = self.complexity(query)["score"]
+
+        # Each threshold passed moves the query one tier up
+        tier = sum(1 for threshold in self.thresholds if score >= threshold)
+
+        return min(tier, len(self.tiers) - 1)
+
+    def escalate(self, tier: int) -> int:
+        """
+        Gets the next, stronger tier. Stays at the last tier if already there
+
+        Args:
+            tier (int): Current tier
+
+        Returns:
+            int: Next tier
+
+        """
+
+        return min(tier + 1, len(self.tiers) - 1)
+
+    def get_tier(self, tier: int) -> Tuple[str, str | None]:
+        """
+        Gets model and reasoning of a tier
+
+        Args:
+            tier (int): Tier index
+
+        Returns:
+            Tuple[str, str | None]: Model and reasoning level
+
+        """
+
+        return self.tiers[tier]
+
+    def complexity(self, query: str) -> Dict:
+        """
+        Computes complexity signals for a query
+
+        Args:
+            query (str): A query in natural language
+
+        Returns:
+            Dict: Signals and the combined complexity score
+
+        """
+
+        text = query.lower()
+        words = re.findall(r"[a-z0-9_]+", text)
+
+        # Tables and text files mentioned, also in plural
+        sources = {name for name in self.source_names if name in words or f"{name}s" in words}
+
+        # Keywords hits
+        joins = sum(text.count(keyword) for keyword in JOIN_KEYWORDS)
+        aggregations = sum(1 for keyword in AGGREGATION_KEYWORDS if keyword in text)
+
+        # Combined score. Every source after the first likely needs a join
+        score = 2 * max(len(sources) - 1, 0) + 2 * joins + aggregations + len(words) // 40
+
+        return {
+            "sources": sorted(sources),
+            "joins": joins,
+            "aggregations": aggregations,
+            "words": len(words),
+            "score": score,
+        }
+
+    def record(self, tier: int, agent: str, latency: float, success: bool, usage: Dict | None = None) -> None:
+        """
+        Records the outcome of a plan generated at a tier
+
+        Args:
+            tier (int): Tier index
+            agent (str): Agent that generated the plan, e.g. builder or debugger
+            latency (float): Seconds spent generating the plan
+            success (bool): True if the plan validated and executed successfully
+            usage (Dict | None): Token usage from the response
+
+        """
+
+        model, reasoning = self.get_tier(tier)
+        key = f"{model}:{reasoning or ''}"
+        usage = usage or {}
+
+        with self._lock:
+            # Initialize stats for tier
+            stats = self.stats.setdefault(key, {
+                "calls": 0,
+                "successes": 0,
+                "latency_seconds": 0.0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "reasoning_tokens": 0,
+                "agents": {},
+            })
+
+            # Update stats
+            stats["calls"] += 1
+            stats["successes"] += int(success)
+            stats["latency_seconds"] += latency
+            stats["input_tokens"] += usage.get("input_tokens") or 0
+            stats["output_tokens"] += usage.get("output_tokens") or 0
+            stats["reasoning_tokens"] += (usage.get("output_tokens_details") or {}).get("reasoning_tokens") or 0
+            stats["agents"][agent] = stats["agents"].get(agent, 0) + 1
+
+            self._save_stats()
+
+    def get_stats(self) -> Dict:
+        """
+        Gets recorded stats per tier with success rate and average latency
+
+        Returns:
+            Dict: Stats per model:reasoning pair
+
+        """
+
+        with self._lock:
+            output = {}
+
+            for key, stats in self.stats.items():
+                calls = stats["calls"] or 1
+                output[key] = {
+                    **stats,
+                    "success_rate": stats["successes"] / calls,
+                    "avg_latency_seconds": stats["latency_seconds"] / calls,
+                    "avg_tokens": (stats["input_tokens"] + stats["output_tokens"]) / calls,
+                }
+
+            return output
+
+    @staticmethod
+    def parse_tiers(tiers: str | None) -> List[Tuple[str, str | None]]:
+        """
+        Parses a comma separated list of model:reasoning pairs, e.g. "gpt-5-nano:low,gpt-5-mini:medium"
+
+        Args:
+            tiers (str | None): Comma separated list of model:reasoning pairs
+
+        Returns:
+            List[Tuple[str, str | None]]: List of (model, reasoning) pairs
+
+        """
+
+        # List to store pairs
+        output = []
+
+        for tier in (tiers or "").split(","):
+            tier = tier.strip()
+
+            if not tier:
+                continue
+
+            # Reasoning is optional
+            model, _, reasoning = tier.partition(":")
+            output.append((model.strip(), reasoning.strip() or None))
+
+        return output
+
+    def reload_source_names(self) -> None:
+        """
+        Reloads the names of tables and text files, e.g. after the schemas changed
+
+        """
+
+        self.source_names = self._load_source_names()
+        print(f"[INFO] ModelRouter reloaded {len(self.source_names)} source names")
+
+    def _load_source_names(self) -> List[str]:
+        """
+        Helper function to get names of tables and text files from the schema folder
+
+        Returns:
+            List[str]: Lower-cased source names
+
+        """
+
+        # List to store names
+        names = []
+
+        schema_folder = self.data_folder / "schemas"
+
+        for root, _, files in os.walk(schema_folder):
+            for file in files:
+                if file.endswith(".json"):
+                    names.append(os.path.splitext(file)[0].lower())
+
+        return names
+
+    def _load_stats(self) -> Dict:
+        """
+        Helper function to load stats from the stats file if any
+
+        Returns:
+            Dict: Stats per model:reasoning pair
+
+        """
+
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return {}
+
+        with open(self.stats_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_stats(self) -> None:
+        """
+        Helper function to save stats to the stats file if any. Called with the lock held
+
+        """
+
+        if not self.stats_file:
+            return None
+
+        # Write to a temporary file first, so a crash or another worker never leaves half a file. One per process
+        tmp_path = f"{self.stats_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.stats, f, indent=4)
+        os.replace(tmp_path, self.stats_file)
@@ -18,6 +18,8 @@ class WayangOperation(BaseModel):
     table: Optional[str] = None
     inputFileName: Optional[str] = None
     columnNames: List[str] = Field(default_factory=list)
+    sampleSize: Optional[int] = None
+    limit: Optional[int] = None
 
 class WayangPlan(BaseModel):
     operations: List[WayangOperation]
@@ -0,0 +1,175 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextvars import copy_context
+from typing import List, Dict, Tuple
+import threading
+import time
+from ai_wayang_single.config.settings import SPECULATIVE_CONFIG
+from ai_wayang_single.llm.agent_builder import Builder
+from ai_wayang_single.llm.model_router import ModelRouter
+from ai_wayang_single.wayang.plan_mapper import PlanMapper
+from ai_wayang_single.wayang.plan_validator import PlanValidator
+from ai_wayang_single.utils.budget import BudgetExceeded
+
+
+class PlanSpeculator:
+    """
+    Generates several candidate plans concurrently with the Builder Agent.
+    Each candidate is mapped and validated locally as soon as it arrives, so the best valid
+    plan can be executed first and the other valid plans kept as fallbacks
+
+    """
+
+    def __init__(
+        self,
+        builder: Builder,
+        plan_mapper: PlanMapper,
+        plan_validator: PlanValidator,
+        candidates: List[Tuple[str, str | None]] | None = None,
+        max_candidates: int | None = None,
+        max_workers: int | None = None,
+        first_valid_wins: bool | None = None,
+    ):
+        self.builder = builder
+        self.plan_mapper = plan_mapper
+        self.plan_validator = plan_validator
+        self.candidates = candidates or ModelRouter.parse_tiers(SPECULATIVE_CONFIG.get("candidates"))
+        self.max_candidates = max_candidates or int(SPECULATIVE_CONFIG.get("max_candidates"))
+        self.max_workers = max_workers or int(SPECULATIVE_CONFIG.get("max_workers"))
+        self.first_valid_wins = (
+            first_valid_wins
+            if first_valid_wins is not None
+            else SPECULATIVE_CONFIG.get("first_valid_wins") == "True"
+        )
+
+    def generate(self, prompt: str) -> List[Dict]:
+        """
+        Generates candidate plans concurrently and ranks them.
+        Candidates are ranked by validity, number of validation errors and then the order of the candidate list.
+        At most max_workers LLM calls are in flight. With first valid wins, candidates not started yet are never requested,
+        but calls already in flight can't be cancelled: they finish in the background and their tokens still count
+        against the budgets of the request and client
+
+        Args:
+            prompt (str): A query in natural language
+
+        Returns:
+            List[Dict]: Ranked candidates. The first one is the one to execute first
+
+        Raises:
+            BudgetExceeded: If no candidate produced a plan and a candidate stopped because the budget ran out
+
+        """
+
+        # Only request as many candidates as the budget allows
+        variants = self.candidates[: self.max_candidates]
+
+        if not variants:
+            raise ValueError("No candidate models configured for speculative plan generation")
+
+        # List to store finished candidates
+        finished = []
+
+        # Set once a valid plan wins, so queued candidates skip their LLM call
+        stop = threading.Event()
+
+        # Not using a with-block, so pending candidates don't block when first valid wins
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(variants)))
+
+        try:
+            # Request all candidates. Each copies the context, so their spans belong to the current trace
+            futures = {
+                pool.submit(copy_context().run, self._build_candidate, prompt, model, reasoning, rank, stop): rank
+                for rank, (model, reasoning) in enumerate(variants)
+            }
+            pending = set(futures)
+
+            # Collect candidates as they complete
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    finished.append(future.result())
+
+                # Stop waiting once a valid plan exists, if first valid wins
+                if self.first_valid_wins and any(c["val_success"] for c in finished):
+                    stop.set()
+                    break
+
+        finally:
+            # Cancel candidates not started yet. Running candidates finish in the background
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        # Only keep candidates that produced a plan and could be mapped, a mapping error isn't a better plan than validation errors
+        candidates = [c for c in finished if c["wayang_plan"] is not None and c["mapped_plan"] is not None]
+
+        if not candidates:
+            # Out of budget rather than a failed generation, so the query stops with the budget status
+            for c in finished:
+                if isinstance(c["error"], BudgetExceeded):
+                    raise c["error"]
+
+            errors = "; ".join(str(c["error"]) for c in finished)
+            raise Exception(f"No candidate plan could be generated: {errors}")
+
+        # Rank candidates, best first
+        candidates.sort(key=lambda c: (not c["val_success"], len(c["val_errors"]), c["rank"]))
+
+        return candidates
+
+    def _build_candidate(self, prompt: str, model: str, reasoning: str | None, rank: int, stop: threading.Event | None = None) -> Dict:
+        """
+        Helper function to generate, map and validate a single candidate
+
+        Args:
+            prompt (str): A query in natural language
+            model (str): GPT-model for the candidate
+            reasoning (str | None): Reasoning level for the candidate
+            rank (int): Position in the candidate list, used for ranking ties
+            stop (threading.Event | None): Set when another candidate already won
+
+        Returns:
+            Dict: The candidate with its plans and validation result
+
+        """
+
+        # Initialize candidate
+        candidate = {
+            "model": model,
+            "reasoning": reasoning,
+            "rank": rank,
+            "raw": None,
+            "wayang_plan": None,
+            "mapped_plan": None,
+            "val_success": False,
+            "val_errors": [],
+            "latency": None,
+            "error": None,
+        }
+
+        start = time.perf_counter()
+
+        # Skip the LLM call if a valid plan already won while this candidate was queued
+        if stop is not None and stop.is_set():
+            candidate["error"] = "Skipped, a valid candidate already won"
+            candidate["latency"] = 0.0
+            return candidate
+
+        try:
+            # Generate plan
+            response = self.builder.generate_plan(prompt, model=model, reasoning=reasoning)
+            candidate["raw"] = response.get("raw")
+            candidate["wayang_plan"] = response.get("wayang_plan")
+
+            # Map and validate plan
+            candidate["mapped_plan"] = self.plan_mapper.plan_to_json(candidate["wayang_plan"])
+            val_success, val_errors = self.plan_validator.validate_plan(candidate["mapped_plan"])
+            candidate["val_success"] = val_success
+            candidate["val_errors"] = val_errors
+
+        except Exception as e:
+            print(f"[ERROR] Candidate {model} ({reasoning}) failed: {e}")
+            candidate["error"] = e
+
+        candidate["latency"] = time.perf_counter() - start
+
+        return candidate
@@ -0,0 +1,216 @@
+from typing import Callable, Dict, List
+import json
+import time
+from ai_wayang_single.llm.models import WayangOperation
+
+
+class StreamAborted(Exception):
+    """
+    Raised when a streamed plan is stopped early because an operation has a fatal structural error
+
+    """
+
+    def __init__(self, errors: List[str], operations: List[WayangOperation], elapsed: float, usage: Dict):
+        super().__init__(f"Plan generation stopped after {len(operations)} operations: {'; '.join(errors)}")
+        self.errors = errors
+        self.operations = operations
+        self.elapsed = elapsed
+        self.usage = usage
+
+
+class IncrementalPlanParser:
+    """
+    Parses the operations of a WayangPlan from streamed JSON text as they arrive.
+    Each operation is returned as soon as its object in the operations array is closed,
+    so it can be mapped and validated while the rest of the plan is still being generated
+
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.operations = []
+        self.errors = []
+        self._objects = 0
+        self._position = 0
+        self._array_start = None
+        self._object_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._done = False
+
+    def feed(self, delta: str) -> List[WayangOperation]:
+        """
+        Adds streamed text and returns the operations completed by it.
+        Completed objects that aren't valid operations are skipped and added to errors
+
+        Args:
+            delta (str): Next part of the JSON text
+
+        Returns:
+            List[WayangOperation]: Operations completed by this part, in order
+
+        """
+
+        self.text += delta
+
+        # List to store completed operations
+        completed = []
+
+        # Find the start of the operations array first
+        if self._array_start is None:
+            key = self.text.find('"operations"')
+            if key == -1:
+                return completed
+
+            bracket = self.text.find("[", key)
+            if bracket == -1:
+                return completed
+
+            self._array_start = bracket
+            self._position = bracket + 1
+
+        # Scan the new text for operation objects, strings may contain braces
+        while self._position < len(self.text) and not self._done:
+            char = self.text[self._position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+
+            elif char == '"':
+                self._in_string = True
+
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = self._position
+                self._depth += 1
+
+            elif char == "}":
+                self._depth -= 1
+
+                if self._depth == 0:
+                    # Move past the object first, so an invalid object is never read again
+                    obj = self.text[self._object_start : self._position + 1]
+                    self._object_start = None
+                    self._objects += 1
+
+                    try:
+                        operation = WayangOperation(**json.loads(obj))
+                    except (TypeError, ValueError) as e:
+                        self.errors.append(f"Operation {self._objects}: Not a valid operation - {e}")
+                    else:
+                        self.operations.append(operation)
+                        completed.append(operation)
+
+            elif char == "]" and self._depth == 0:
+                self._done = True
+
+            self._position += 1
+
+        return completed
+
+
+class PlanStreamReader:
+    """
+    Reads a streamed plan response, checking each operation as soon as it is complete.
+    The first operation with a fatal structural error aborts the stream, unless abort is off
+
+    """
+
+    def __init__(self, check: Callable | None = None, abort: bool = True, input_tokens: int = 0):
+        self.check = check
+        self.abort = abort
+        self.input_tokens = input_tokens
+        self.parser = IncrementalPlanParser()
+        self.errors = []
+        self.first_error_seconds = None
+        self.plan_seconds = None
+        self._start = None
+
+    def read(self, stream):
+        """
+        Reads the stream until the final response, checking operations as they arrive
+
+        Args:
+            stream: Stream manager from client.responses.stream
+
+        Returns:
+            The final response
+
+        Raises:
+            StreamAborted: If an operation has a fatal error and abort is on
+
+        """
+
+        self._start = time.perf_counter()
+
+        # Leaving the stream manager closes the connection, which also stops the generation
+        with stream as events:
+            for event in events:
+                if event.type != "response.output_text.delta":
+                    continue
+
+                self._check(self._feed(event.delta))
+
+            response = events.get_final_response()
+
+        self.plan_seconds = time.perf_counter() - self._start
+
+        return response
+
+    def usage(self) -> Dict:
+        """
+        Estimates the usage of an aborted stream, roughly 4 characters per token
+
+        Returns:
+            Dict: Usage in the format of a response
+
+        """
+
+        return {"input_tokens": self.input_tokens, "output_tokens": len(self.parser.text) // 4}
+
+    def _feed(self, delta: str) -> List[str]:
+        """
+        Helper function to parse the next part of the stream and get the errors of completed operations
+
+        """
+
+        done = len(self.parser.operations)
+        invalid = len(self.parser.errors)
+
+        operations = self.parser.feed(delta)
+        errors = self.parser.errors[invalid:]
+
+        for offset, operation in enumerate(operations):
+            # Operations before this one
+            previous = self.parser.operations[: done + offset]
+
+            if any(op.id == operation.id for op in previous):
+                errors.append(f"Operation id {operation.id}: Id used by an earlier operation")
+
+            if self.check is not None:
+                errors += self.check(operation)
+
+        return errors
+
+    def _check(self, errors: List[str]) -> None:
+        """
+        Helper function to record errors, and abort the stream on the first one if abort is on
+
+        """
+
+        if not errors:
+            return None
+
+        if self.first_error_seconds is None:
+            self.first_error_seconds = time.perf_counter() - self._start
+
+        self.errors += errors
+
+        if self.abort:
+            raise StreamAborted(errors, list(self.parser.operations), self.first_error_seconds, self.usage())
@@ -1,8 +1,26 @@
 from pathlib import Path
+import hashlib
 import os
 import json
 from typing import List, Dict
+from ai_wayang_single.config.settings import DEBUGGER_MODEL_CONFIG
 from ai_wayang_single.llm.models import WayangPlan
+from ai_wayang_single.wayang.error_distiller import ErrorDistiller
+
+# Sections of the system prompts and their source files or folders, relative to the prompt or data folder
+SECTIONS = {
+    "builder_template": [("prompts", "builder_prompts/system_prompt.txt")],
+    "debugger_template": [("prompts", "debugger_prompts/system_prompt.txt")],
+    "data": [("prompts", "data.txt"), ("data", "schemas")],
+    "operators": [("prompts", "operators.txt")],
+    "examples": [("prompts", "few_shot.txt"), ("data", "few_shot_examples")],
+}
+
+# Sections in each agent's system prompt
+AGENT_SECTIONS = {
+    "builder": ["builder_template", "data", "operators", "examples"],
+    "debugger": ["debugger_template", "operators"],
+}
 
 
 class PromptLoader:
@@ -14,52 +32,137 @@ class PromptLoader:
         self.prompt_folder = Path(__file__).resolve().parent / "prompts"
         self.data_folder = Path(__file__).resolve().parent.parent.parent.parent / "data"
     
-    def load_builder_system_prompt(self) -> str:
+    def load_section(self, section: str) -> str:
         """
-        Load and prepare system prompt for Builder Agent
+        Load a section of the system prompts: a system prompt template, data (with schemas), operators or examples
+
+        Args:
+            section (str): Section name, see SECTIONS
 
         Returns:
-            (str): Builder's system prompt
+            (str): Section text
+
+        """
+
+        if section == "builder_template":
+            return self._read_file(self.prompt_folder, "builder_prompts/system_prompt.txt")
+        if section == "debugger_template":
+            return self._read_file(self.prompt_folder, "debugger_prompts/system_prompt.txt")
+        if section == "data":
+            return self.load_data_prompt()
+        if section == "operators":
+            return self.load_operators()
+        if section == "examples":
+            return self.load_few_shot_prompt()
+
+        raise ValueError(f"Unknown prompt section {section}")
+
+    def render_system_prompt(self, agent: str, sections: Dict[str, str]) -> str:
+        """
+        Fill an agent's system prompt template with its sections
+
+        Args:
+            agent (str): builder or debugger
+            sections (Dict[str, str]): Section texts, at least the agent's sections in AGENT_SECTIONS
+
+        Returns:
+            (str): Agent's system prompt
 
         """
 
         # Get system prompt template
-        system_prompt = self._read_file(self.prompt_folder, "builder_prompts/system_prompt.txt")
-        
-        # Get general prompt templates
-        data_prompt = self.load_data_prompt()
-        operator_prompt = self.load_operators()
-        few_shot_prompt = self.load_few_shot_prompt()
+        system_prompt = sections[f"{agent}_template"]
 
         # Fill system prompt template
-        system_prompt = system_prompt.replace("{data}", data_prompt)
-        system_prompt = system_prompt.replace("{operators}", operator_prompt)
-        system_prompt = system_prompt.replace("{examples}", few_shot_prompt)
+        if agent == "builder":
+            system_prompt = system_prompt.replace("{data}", sections["data"])
+        system_prompt = system_prompt.replace("{operators}", sections["operators"])
+        if agent == "builder":
+            system_prompt = system_prompt.replace("{examples}", sections["examples"])
 
         return system_prompt
-    
 
-    def load_debugger_system_prompt(self) -> str:
+    def section_fingerprints(self) -> Dict[str, str]:
         """
-        Load and prepare system prompt for Debugger Agent
+        Fingerprint of each section's source files, from their paths, sizes and modification times
 
         Returns:
-            (str): Debuggers's system prompt
+            (Dict[str, str]): Hash per section
 
         """
 
-        # Load system prompt template
-        system_prompt = self._read_file(self.prompt_folder, "debugger_prompts/system_prompt.txt")
+        # Dict to store fingerprints
+        fingerprints = {}
 
-        # Load general prompt templates
-        operators_prompt = self.load_operators()
+        for section, sources in SECTIONS.items():
+            # List to store file stats
+            entries = []
 
-        # Fill system prompt
-        system_prompt = system_prompt.replace("{operators}", operators_prompt)
+            for source in sources:
+                path = (self.prompt_folder if source[0] == "prompts" else Path(self.data_folder)) / source[1]
 
-        # Get and return system prompt
-        return system_prompt
-    
+                for file in self._walk(path):
+                    try:
+                        stat = os.stat(file)
+                    except FileNotFoundError:
+                        continue
+                    entries.append(f"{file}:{stat.st_size}:{stat.st_mtime_ns}")
+
+            fingerprints[section] = hashlib.sha256("\n".join(sorted(entries)).encode("utf-8")).hexdigest()
+
+        return fingerprints
+
+    def fingerprint(self) -> str:
+        """
+        Fingerprint of all files the system prompts are built from
+
+        Returns:
+            (str): Hash of the source files
+
+        """
+
+        return hashlib.sha256(json.dumps(self.section_fingerprints(), sort_keys=True).encode("utf-8")).hexdigest()
+
+    def save_snapshot(self, path: str | Path, prompts: Dict[str, str]) -> None:
+        """
+        Save built system prompts with the fingerprint of their source files, so restarts can skip building them
+
+        Args:
+            path (str | Path): Snapshot file
+            prompts (Dict[str, str]): System prompt per agent
+
+        """
+
+        snapshot = {"fingerprint": self.fingerprint(), "prompts": prompts}
+
+        # Write to a temporary file first, so readers never see half a snapshot. One per process, workers may save at once
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str | Path) -> Dict | None:
+        """
+        Load a prompt snapshot if it was built from the current prompt, schema and few-shot files
+
+        Args:
+            path (str | Path): Snapshot file
+
+        Returns:
+            (Dict | None): Snapshot, or None if missing or outdated
+
+        """
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if snapshot.get("fingerprint") != self.fingerprint():
+            return None
+
+        return snapshot
 
     def load_debugger_prompt(self, query: str, failed_plan: WayangPlan, wayang_errors: str, val_errors: List) -> str:
         """
@@ -80,6 +183,11 @@ class PromptLoader:
         # Get prompt template
         prompt_template = self._read_file(self.prompt_folder, "debugger_prompts/prompt.txt")
 
+        # Distill long Wayang stack traces to root cause and failing operators
+        if wayang_errors and DEBUGGER_MODEL_CONFIG.get("distill_errors") == "True":
+            distiller = ErrorDistiller()
+            wayang_errors = distiller.to_prompt(distiller.distill(wayang_errors, failed_plan))
+
         # Convert to correct JSON from WayangPlan model
         if hasattr(failed_plan, "model_dump"):
             failed_plan = json.dumps(failed_plan.model_dump(), indent=4)
@@ -104,34 +212,6 @@ class PromptLoader:
         return prompt_template
     
     
-    def load_debugger_answer(self, wayang_plan: WayangPlan) -> str:
-        """
-        Load and prepare Debugger Agents answer. It is for it to keep track of its own answers when debugging in multiple iterations
-
-        Args:
-            wayang_plan (WayangPlan): The WayangPlan fixed by the Debugger Agent in current iteration
-
-        Returns:
-            (str): The answer to be linked to the Debugger Agent's chat in current session
-
-        """
-
-        # Load answer template
-        answer_prompt = self._read_file(self.prompt_folder, "debugger_prompts/answer.txt")
-
-        # Load debuggers fixed plan and thoughts
-        fixed_plan = json.dumps([op.model_dump() for op in wayang_plan.operations], indent=2, ensure_ascii=False)
-        thoughts = wayang_plan.thoughts
-        
-        # Fill template
-        answer_prompt = answer_prompt.replace("{fixed_plan}", fixed_plan)
-        answer_prompt = answer_prompt.replace("{thoughts}", thoughts)
-
-        # Return prompt
-        return answer_prompt
-    
-
-    
     def load_data_prompt(self) -> str:
         """
         Loads data prompt with schemas in it
@@ -307,6 +387,23 @@ class PromptLoader:
         return output
 
     
+    def _walk(self, path: Path) -> List[str]:
+        """
+        Helper function to list a file, or all files in a folder and lower level folders
+
+        Args:
+            path (Path): File or folder
+
+        Returns:
+            (List[str]): File paths
+
+        """
+
+        if path.is_file():
+            return [str(path)]
+
+        return [os.path.join(root, file) for root, _, files in os.walk(path) for file in files]
+
     def _read_file(self, folder: str | Path, file: str) -> str:
         """
         Helper function to open prompt template files
@@ -0,0 +1,179 @@
+from typing import Callable, Dict, List
+import threading
+import time
+from ai_wayang_single.config.settings import PROMPT_CONFIG
+from ai_wayang_single.llm.prompt_loader import PromptLoader, SECTIONS, AGENT_SECTIONS
+from ai_wayang_single.utils.metrics import metrics
+
+
+class PromptRegistry:
+    """
+    Holds the current, versioned system prompts of the agents and reloads them when their source files change.
+    Each prompt section (templates, data with schemas, operators, examples) is fingerprinted from its files,
+    so only changed sections are rebuilt. The new prompts are swapped in as a whole, so a request sees
+    either the old or the new version. Listeners are told which sections changed, e.g. to invalidate plan caches
+
+    """
+
+    def __init__(self, loader: PromptLoader | None = None, reload_interval_seconds: float | None = None, snapshot_file: str | None = None):
+        self.loader = loader or PromptLoader()
+        self.reload_interval_seconds = reload_interval_seconds if reload_interval_seconds is not None else float(PROMPT_CONFIG.get("reload_interval_seconds"))
+        self.snapshot_file = snapshot_file or PROMPT_CONFIG.get("snapshot_file")
+        self._lock = threading.Lock()
+        self._state = None
+        self._last_check = 0.0
+        self._listeners = []
+
+    @property
+    def version(self) -> int:
+        """
+        Version of the current prompts, increased on each reload
+
+        """
+
+        return self._load()["version"]
+
+    def get(self, agent: str) -> str:
+        """
+        Gets the current system prompt of an agent. Prompts are built on first use
+
+        Args:
+            agent (str): builder or debugger
+
+        Returns:
+            str: System prompt
+
+        """
+
+        return self._load()["prompts"][agent]
+
+    def on_reload(self, callback: Callable[[List[str]], None]) -> None:
+        """
+        Registers a function called with the changed sections after each reload
+
+        Args:
+            callback (Callable[[List[str]], None]): Listener
+
+        """
+
+        self._listeners.append(callback)
+
+    def refresh_if_due(self) -> List[str]:
+        """
+        Reloads changed sections if the reload interval has passed since the last check. Called between requests
+
+        Returns:
+            List[str]: Changed sections, empty if none or not due
+
+        """
+
+        if PROMPT_CONFIG.get("hot_reload") != "True":
+            return []
+
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._last_check < self.reload_interval_seconds:
+                return []
+
+            self._last_check = now
+
+        return self.refresh()
+
+    def refresh(self) -> List[str]:
+        """
+        Rebuilds the sections whose files changed and swaps in the new prompts
+
+        Returns:
+            List[str]: Changed sections
+
+        """
+
+        with self._lock:
+            # Prompts not loaded yet are built from the current files anyway
+            if self._state is None:
+                return []
+
+            state = self._state
+            fingerprints = self.loader.section_fingerprints()
+            changed = [section for section in SECTIONS if fingerprints[section] != state["fingerprints"].get(section)]
+
+            if not changed:
+                return []
+
+            try:
+                # Rebuild changed sections, and sections not cached yet when prompts came from a snapshot
+                sections = dict(state["sections"])
+                for section in SECTIONS:
+                    if section in changed or section not in sections:
+                        sections[section] = self.loader.load_section(section)
+
+                prompts = dict(state["prompts"])
+                for agent, agent_sections in AGENT_SECTIONS.items():
+                    if set(agent_sections) & set(changed):
+                        prompts[agent] = self.loader.render_system_prompt(agent, sections)
+
+            except Exception as e:
+                # Keep serving the old prompts, e.g. if a schema file is half written. Retried on the next check
+                print(f"[ERROR] Couldn't reload prompts, keeping version {state['version']}: {e}")
+                return []
+
+            # Swap in the new version as a whole
+            self._state = {"version": state["version"] + 1, "prompts": prompts, "sections": sections, "fingerprints": fingerprints}
+            self._save_snapshot(prompts)
+
+        print(f"[INFO] Prompts reloaded to version {self._state['version']}, changed sections: {', '.join(changed)}")
+        metrics.inc("wayang_prompt_reloads_total")
+
+        for listener in self._listeners:
+            listener(changed)
+
+        return changed
+
+    def _load(self) -> Dict:
+        """
+        Helper function to get the current state, building the prompts or loading the snapshot on first use
+
+        Returns:
+            Dict: Version, prompts, cached sections and fingerprints
+
+        """
+
+        state = self._state
+        if state is not None:
+            return state
+
+        with self._lock:
+            if self._state is not None:
+                return self._state
+
+            fingerprints = self.loader.section_fingerprints()
+
+            # Use snapshot if built from the current files
+            snapshot = self.loader.load_snapshot(self.snapshot_file) if self.snapshot_file else None
+
+            if snapshot:
+                sections = {}
+                prompts = snapshot["prompts"]
+            else:
+                sections = {section: self.loader.load_section(section) for section in SECTIONS}
+                prompts = {agent: self.loader.render_system_prompt(agent, sections) for agent in AGENT_SECTIONS}
+                self._save_snapshot(prompts)
+
+            self._state = {"version": 1, "prompts": prompts, "sections": sections, "fingerprints": fingerprints}
+            self._last_check = time.monotonic()
+
+            return self._state
+
+    def _save_snapshot(self, prompts: Dict[str, str]) -> None:
+        """
+        Helper function to save the prompts to the snapshot file if configured
+
+        """
+
+        if self.snapshot_file:
+            self.loader.save_snapshot(self.snapshot_file, prompts)
+
+
+# Shared prompt registry for the whole process
+prompt_registry = PromptRegistry()
@@ -1,16 +1,32 @@
 # Import libraries
 from mcp.server.fastmcp import FastMCP
-from typing import Optional
-from ai_wayang_single.config.settings import MCP_CONFIG, INPUT_CONFIG, OUTPUT_CONFIG, DEBUGGER_MODEL_CONFIG
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Dict, List, Optional
+from ai_wayang_single.config.settings import MCP_CONFIG, INPUT_CONFIG, OUTPUT_CONFIG, DEBUGGER_MODEL_CONFIG, SPECULATIVE_CONFIG, ROUTER_CONFIG, TEMPLATE_CONFIG, RESULT_CONFIG, BATCH_CONFIG, SHARED_CONFIG, SCHEDULER_CONFIG, PUSHDOWN_CONFIG, PARTITION_CONFIG
 from ai_wayang_single.llm.agent_builder import Builder
 from ai_wayang_single.llm.agent_debugger import Debugger
+from ai_wayang_single.llm.plan_speculator import PlanSpeculator
+from ai_wayang_single.llm.model_router import ModelRouter
+from ai_wayang_single.llm.prompt_registry import prompt_registry
+from ai_wayang_single.llm.llm_dispatcher import llm_dispatcher
 from ai_wayang_single.wayang.plan_mapper import PlanMapper
 from ai_wayang_single.wayang.plan_validator import PlanValidator
 from ai_wayang_single.wayang.wayang_executor import WayangExecutor
+from ai_wayang_single.wayang.execution_scheduler import ExecutionScheduler, QueueFull
+from ai_wayang_single.wayang.sql_pushdown import SqlPushdown
+from ai_wayang_single.wayang.plan_templates import PlanTemplateLibrary
+from ai_wayang_single.wayang.result_store import ResultStore
+from ai_wayang_single.utils.budget import budgets, BudgetExceeded
 from ai_wayang_single.utils.logger import Logger
-from ai_wayang_single.utils.schema_loader import SchemaLoader
+from ai_wayang_single.utils.metrics import metrics
+from ai_wayang_single.utils.shared_store import shared_store
+from ai_wayang_single.utils.tracer import tracer
 from datetime import datetime
 import os
+import json
+import threading
+import time
 
 # Initialize MCP-server
 mcp = FastMCP(name="AI-Wayang-Simple", 
@@ -19,7 +35,8 @@ mcp = FastMCP(name="AI-Wayang-Simple",
 # Initialize configs
 config = {
     "input_config": INPUT_CONFIG,
-    "output_config": OUTPUT_CONFIG
+    "output_config": OUTPUT_CONFIG,
+    "partition_config": PARTITION_CONFIG
 }
 
 # Initialize agents and objects
@@ -29,12 +46,46 @@ debugger_agent = Debugger() # Initialize debugger agent
 plan_mapper = PlanMapper(config=config) # Initialize mapper
 plan_validator = PlanValidator() # Initialize validator
 wayang_executor = WayangExecutor() # Wayang executor
+execution_scheduler = ExecutionScheduler.from_config(SCHEDULER_CONFIG) # Admission control and priorities for Wayang executions
+sql_pushdown = SqlPushdown.from_config(PUSHDOWN_CONFIG, INPUT_CONFIG, plan_mapper) # Plans reading only from the JDBC database run as SQL
+plan_speculator = PlanSpeculator(builder_agent, plan_mapper, plan_validator) # Speculative plan generation
+model_router = ModelRouter() # Model routing and escalation ladder
+plan_templates = PlanTemplateLibrary(shared_store=shared_store) # Plan templates for recurring query shapes, shared by workers
+result_store = ResultStore(shared_store=shared_store) # Spooled Wayang outputs, fetched in pages from any worker
+result_parser = None # Typed columns and summaries of results, created on first use since it imports pandas
+
+def _invalidate_plan_caches(changed: List[str]) -> None:
+    """
+    Helper function to invalidate plan templates, table sizes and routing source names after a prompt reload.
+    Templates using removed tables or columns are dropped after schema changes, all templates after operator changes
+
+    Args:
+        changed (List[str]): Changed prompt sections
+
+    """
+
+    # Heavy plans are recognized, and large reads partitioned, by table statistics from the schemas
+    if "data" in changed:
+        wayang_executor.pool.reload_table_sizes()
+        plan_mapper.reload_table_stats()
+        model_router.reload_source_names()
+
+    if "operators" in changed:
+        plan_templates.clear()
+        print("[INFO] Plan templates cleared after operator changes")
+    elif "data" in changed:
+        removed = plan_templates.reload_schemas()
+        print(f"[INFO] Plan templates reloaded schemas, {removed} templates removed")
+
+# Invalidate dependent caches when prompts are reloaded
+prompt_registry.on_reload(_invalidate_plan_caches)
 
 # To store the last sessions output
 last_session_result = "Nothing to output"
+last_session_job_id = None
 
 @mcp.tool()
-def query_wayang(describe_wayang_plan: str, model: Optional[str] = "gpt-5-nano", reasoning: Optional[str] = "low", use_debugger: Optional[str] = "True") -> str:
+def query_wayang(describe_wayang_plan: str, model: Optional[str] = None, reasoning: Optional[str] = "low", use_debugger: Optional[str] = "True", client_id: Optional[str] = None) -> str:
     """
     Generates and execute a Wayang plan based on given query in national language.
     The query provided must be in Englis
@@ -42,6 +93,8 @@ def query_wayang(describe_wayang_plan: str, model: Optional[str] = "gpt-5-nano",
     Args:
         describe_wayang_plan (str):
             A detailed description in English of what query or task should be executed
+        client_id (Optional[str]):
+            Identifier of the calling client, used for per-client budget limits
     
     Returns:
         Execution output from Wayang server
@@ -52,18 +105,123 @@ def query_wayang(describe_wayang_plan: str, model: Optional[str] = "gpt-5-nano",
     - Be as detailed in the description as possible
     """
 
+    # Reload prompts between requests if their files changed
+    prompt_registry.refresh_if_due()
+
+    # Trace the whole query as the root span
+    with tracer.span("query_wayang", {"query.length": len(describe_wayang_plan), "debugger.enabled": use_debugger == "True"}):
+        # Account tokens, time and iterations of the query against its budget
+        with budgets.request(client_id):
+            return _query_wayang(describe_wayang_plan, model, reasoning, use_debugger)
+
+
+def _query_wayang(describe_wayang_plan: str, model: Optional[str], reasoning: Optional[str], use_debugger: Optional[str]) -> str:
+    """
+    Helper function running the query pipeline for query_wayang: build, map, validate, execute and debug
+
+    Args:
+        describe_wayang_plan (str): A detailed description in English of what query or task should be executed
+        model (Optional[str]): GPT-model, or None to use the model router or default model
+        reasoning (Optional[str]): Reasoning level
+        use_debugger (Optional[str]): "True" to debug failed plans
+
+    Returns:
+        str: Execution output from Wayang server or an error message
+
+    """
+
+    return _run_query(describe_wayang_plan, model, reasoning, use_debugger)["output"]
+
+
+def _execute_plan(plan: Dict, priority: str, client_id: str | None):
+    """
+    Helper function to execute a mapped plan, as SQL on the database if it can be pushed down, else in Wayang through the scheduler
+
+    Args:
+        plan (Dict): Mapped JSON Wayang plan
+        priority (str): Scheduler priority, interactive or batch
+        client_id (str | None): Client of the query
+
+    Returns:
+        Status code and output like WayangExecutor.execute_plan
+
+    """
+
+    try:
+        pushed = sql_pushdown.execute_plan(plan, result_store=result_store)
+
+        if pushed is not None:
+            return pushed
+
+        # Large table reads are split into partitions only for Wayang, templates and the debugger keep the plan as built
+        return execution_scheduler.run(lambda: wayang_executor.execute_plan(plan_mapper.partition_reads(plan), result_store=result_store), priority, client_id)
+    finally:
+        # The output file may be cleaned up once the plan finished
+        plan_mapper.output_manager.release(plan)
+
+
+def _run_query(describe_wayang_plan: str, model: Optional[str], reasoning: Optional[str], use_debugger: Optional[str], debugger: Debugger | None = None, execute=None, builder: Builder | None = None, session: bool = True) -> Dict:
+    """
+    Helper function running the query pipeline: build, map, validate, execute and debug.
+    Queries running concurrently, e.g. in a batch, need their own builder and debugger since they keep model and chat history
+
+    Args:
+        describe_wayang_plan (str): A detailed description in English of what query or task should be executed
+        model (Optional[str]): GPT-model, or None to use the model router or default model
+        reasoning (Optional[str]): Reasoning level
+        use_debugger (Optional[str]): "True" to debug failed plans
+        debugger (Debugger | None): Debugger for this query. Defaults to the shared debugger agent
+        execute: Function executing a mapped plan, returning status code and output. Defaults to the Wayang executor
+        builder (Builder | None): Builder for this query. Defaults to the shared builder agent
+        session (bool): Whether the result becomes the last session result. False for batch queries
+
+    Returns:
+        Dict: Output for the client, status (success, failure, budget, rejected or error), job id and plan hash of the result and time per stage
+
+    """
+
     # Declaring variable as global
-    global last_session_result
+    global last_session_result, last_session_job_id
+    if session:
+        last_session_job_id = None
+
+    # Shared agents and executor unless given
+    builder = builder or builder_agent
+    debugger = debugger or debugger_agent
+    client_id = budgets.current().client_id if budgets.current() else None
+    execute = execute or (lambda plan: _execute_plan(plan, "interactive", client_id))
+
+    # Start time for end-to-end duration
+    query_start = time.perf_counter()
+
+    # Seconds spent per stage. Build includes mapping and validation of the first plan
+    timings = {"build": 0.0, "execute": 0.0, "debug": 0.0}
+
+    # Route to a tier in the escalation ladder if no model is given
+    tier = None
+    if model is None and ROUTER_CONFIG.get("use_router") == "True":
+        tier = model_router.route(describe_wayang_plan)
+        model, reasoning = model_router.get_tier(tier)
+        print(f"[INFO] Query routed to tier {tier}: {model} ({reasoning})")
+    else:
+        model = model or "gpt-5-nano"
 
     # Sets parametre (mainly for evaluation)
-    builder_agent.set_model_and_reasoning(model, reasoning)
-    debugger_agent.set_model_and_reasoning(model, reasoning)
+    builder.set_model_and_reasoning(model, reasoning)
+    debugger.set_model_and_reasoning(model, reasoning)
+
+    # Best plan so far, returned if the budget runs out
+    best_plan = None
 
     try:
         # Set up logger 
         logger = Logger()
         logger.add_message("User query: Plan description from client LLM", describe_wayang_plan)
-        logger.add_message("Architecture", {"model": model, "architecture": "Single", "debugger": use_debugger})
+        logger.add_message("Architecture", {"model": model, "reasoning": reasoning, "architecture": "Single", "debugger": use_debugger})
+
+        # Log routing decision
+        if tier is not None:
+            logger.add_message("Router: ModelRouter routed query", {"tier": tier, "model": model, "reasoning": reasoning, "complexity": model_router.complexity(describe_wayang_plan)})
         
         # Initialize variables
         status_code = None # Status code from validator or Wayang server
@@ -73,37 +231,96 @@ def query_wayang(describe_wayang_plan: str, model: Optional[str] = "gpt-5-nano",
 
         ### --- Generate Wayang Plan Draft --- ###
 
-        # Generate plan
-        print("[INFO] Generates raw plan")
-        response = builder_agent.generate_plan(describe_wayang_plan)
-        raw_plan = response.get("wayang_plan")
+        # Fallback candidates from speculative generation, executed if the best plan fails
+        fallback_candidates = []
 
-        # Logging
-        print("[INFO] Draft generated")
-        logger.add_message("Agent Usage: BuilderAgent Information", {"model": str(response["raw"].model), "usage": response["raw"].usage.model_dump()})
-        logger.add_message("Agent: BuilderAgent Raw Plan", raw_plan.model_dump())
+        # Where the first plan came from: template, speculative or builder
+        plan_source = "builder"
+
+        # Mapped plan, only set here if mapped and validated during generation
+        wayang_plan = None
+
+        # Look for a matching plan template, so the LLM can be skipped
+        with metrics.timer(stage="template"):
+            template_match = plan_templates.match(describe_wayang_plan) if TEMPLATE_CONFIG.get("use_templates") == "True" else None
+
+        if template_match:
+            # Use the filled template plan
+            plan_source = "template"
+            raw_plan = template_match["wayang_plan"]
+
+            # Logging
+            print(f"[INFO] Plan filled from template {template_match['template_id']}")
+            logger.add_message("Class: PlanTemplateLibrary Plan filled from template", {"template_id": template_match["template_id"], "params": template_match["params"]})
+            logger.add_message("Agent: BuilderAgent Raw Plan", raw_plan.model_dump())
+
+        elif SPECULATIVE_CONFIG.get("use_speculative") == "True":
+            # Generate candidate plans concurrently, already mapped and validated
+            plan_source = "speculative"
+            print("[INFO] Generates candidate plans speculatively")
+            with metrics.timer(stage="build"):
+                candidates = plan_speculator.generate(describe_wayang_plan)
+
+            # Logging
+            print(f"[INFO] {len(candidates)} candidate plans generated")
+            for candidate in candidates:
+                logger.add_message("Agent Usage: BuilderAgent Candidate Information", {"model": candidate["model"], "reasoning": candidate["reasoning"], "latency": candidate["latency"], "valid": candidate["val_success"], "usage": candidate["raw"].usage.model_dump()})
+
+            # Use the best candidate and keep the other valid ones as fallbacks
+            best = candidates[0]
+            raw_plan = best["wayang_plan"]
+            wayang_plan = best["mapped_plan"]
+            val_success, val_errors = best["val_success"], best["val_errors"]
+            fallback_candidates = [c for c in candidates[1:] if c["val_success"]]
+
+            # Logging
+            logger.add_message("Agent: BuilderAgent Raw Plan", raw_plan.model_dump())
+            logger.add_message("Class: PlanMapper Mapped plan finalized for execution", {"version": 1, "plan": wayang_plan})
+
+        else:
+            # Generate plan
+            print("[INFO] Generates raw plan")
+            build_start = time.perf_counter()
+            with metrics.timer(stage="build"):
+                response = builder.generate_plan(describe_wayang_plan, model=model, reasoning=reasoning, check=_check_operation)
+            build_latency = time.perf_counter() - build_start
+            raw_plan = response.get("wayang_plan")
+
+            # Logging
+            print("[INFO] Draft generated")
+            logger.add_message("Agent Usage: BuilderAgent Information", {"model": str(response["raw"].model), "queue_seconds": response["queue_seconds"], "usage": response["raw"].usage.model_dump()})
+            if response["stream"]:
+                logger.add_message("Agent Usage: BuilderAgent Stream", response["stream"])
+            logger.add_message("Agent: BuilderAgent Raw Plan", raw_plan.model_dump())
 
 
         ### --- Map Raw Plan to Executable Plan --- ###
 
-        # Map plan
-        print("[INFO] Mapping plan")
-        wayang_plan = plan_mapper.plan_to_json(raw_plan)
+        if wayang_plan is None:
+            # Map plan
+            print("[INFO] Mapping plan")
+            with metrics.timer(stage="map"):
+                wayang_plan = plan_mapper.plan_to_json(raw_plan)
 
-        # Logging
-        print("[INFO] Plan mapped")
-        logger.add_message("Class: PlanMapper Mapped plan finalized for execution", {"version": 1, "plan": wayang_plan})
+            # Logging
+            print("[INFO] Plan mapped")
+            logger.add_message("Class: PlanMapper Mapped plan finalized for execution", {"version": 1, "plan": wayang_plan})
 
 
-        ### --- Validate Plan --- ###
+            ### --- Validate Plan --- ###
 
-        # Logging
-        print("[INFO] Validating plan")
-        logger.add_message(f"Class: PlanValidator Validates Plan", "")
+            # Logging
+            print("[INFO] Validating plan")
+            logger.add_message(f"Class: PlanValidator Validates Plan", "")
 
 
-        # Validate plan before execution
-        val_success, val_errors = plan_validator.validate_plan(wayang_plan)
+            # Validate plan before execution
+            with metrics.timer(stage="validate"):
+                val_success, val_errors = plan_validator.validate_plan(wayang_plan)
+
+        # Keep track of the best plan so far
+        best_plan = _best_plan(best_plan, version, raw_plan, val_success, val_errors)
+        timings["build"] = time.perf_counter() - query_start
 
         # Tell and log validation result
         if val_success:
@@ -121,13 +338,44 @@ def query_wayang(describe_wayang_plan: str, model: Optional[str] = "gpt-5-nano",
         if val_success:
             # Execute plan in Wayang
             print("[INFO] Plan sent to Wayang for execution")
-            status_code, result = wayang_executor.execute_plan(wayang_plan)
-            logger.add_message("Wayang: Wayang plan sent to Wayang", "")
+            execute_start = time.perf_counter()
+            with metrics.timer(stage="execute"):
+                status_code, result = execute(wayang_plan)
+            timings["execute"] += time.perf_counter() - execute_start
+            logger.add_message("Wayang: Wayang plan sent to Wayang", {"status_code": status_code, "output": result})
             
             # Log if plan couldn't execute
             if status_code != 200:
                 print(f"[INFO] Couldn't execute plan succesfully, status {status_code}")
                 logger.add_message("Err: Wayang error. Plan executed unsucessful", {"status_code": status_code, "output": result})
+
+        # Record outcome of the Builder's tier
+        if tier is not None and plan_source == "builder":
+            # Time waiting for rate limits doesn't count against the tier
+            model_router.record(tier, "builder", build_latency - response["queue_seconds"], status_code == 200, response["raw"].usage.model_dump())
+
+        # Record failed template, so templates that keep failing are dropped
+        if plan_source == "template" and status_code != 200:
+            plan_templates.record_failure(template_match["template_id"])
+
+
+        ### --- Execute Fallback Plans If Best Plan Failed --- ###
+
+        if status_code != 200:
+            for fallback in fallback_candidates:
+                # Execute fallback plan in Wayang
+                print("[INFO] Fallback plan sent to Wayang for execution")
+                execute_start = time.perf_counter()
+                with metrics.timer(stage="execute"):
+                    fallback_status, fallback_result = execute(fallback["mapped_plan"])
+                timings["execute"] += time.perf_counter() - execute_start
+                logger.add_message("Wayang: Fallback plan sent to Wayang", {"status_code": fallback_status, "output": fallback_result})
+
+                # Use fallback result if executed succesfully. Otherwise the best plan is debugged
+                if fallback_status == 200:
+                    status_code, result = fallback_status, fallback_result
+                    raw_plan, wayang_plan = fallback["wayang_plan"], fallback["mapped_plan"]
+                    break
         
 
         ### --- Debug Plan --- ###
@@ -142,106 +390,647 @@ def query_wayang(describe_wayang_plan: str, model: Optional[str] = "gpt-5-nano",
 
             # Set debugging parameters
             max_itr = int(DEBUGGER_MODEL_CONFIG.get("max_itr")) # Get max iterations for debugging
-            debugger_agent.set_vesion(version) # Set version to number of plans already created this session
-            debugger_agent.start_debugger() # Load debugger session 
+            debugger.set_vesion(version) # Set version to number of plans already created this session
+            debugger.start_debugger() # Load debugger session 
 
             # Debug and execute plan up to max iterations
-            for _ in range(max_itr):
+            for iteration in range(1, max_itr + 1):
+                # Trace each debug iteration with its child spans
+                with tracer.span("debug_iteration", {"debug.iteration": iteration, "plan.version": version + 1}) as iteration_span:
 
-                # Map and anonymize plan from executable json to raw format
-                failed_plan = plan_mapper.plan_from_json(wayang_plan)
-                logger.add_message("Class: PlanMapper Simplifies JSON", "")
-                print(f"[INFO] PlanMapper Simplifies JSON")
+                    # Map and anonymize plan from executable json to raw format
+                    failed_plan = plan_mapper.plan_from_json(wayang_plan)
+                    logger.add_message("Class: PlanMapper Simplifies JSON", "")
+                    print(f"[INFO] PlanMapper Simplifies JSON")
 
-                # Debug plan
-                response = debugger_agent.debug_plan(describe_wayang_plan, failed_plan, wayang_errors=result, val_errors=val_errors) # Debug plan
-                version = debugger_agent.get_version() # Current plan version
-                raw_plan = response.get("wayang_plan") # Get only the debugged plan
-                print("[INFO] Plan debugged by debugger")
+                    # Escalate to a stronger tier after a failed plan
+                    if tier is not None:
+                        tier = model_router.escalate(tier)
+                        debugger.set_model_and_reasoning(*model_router.get_tier(tier))
+                        print(f"[INFO] Debugger escalated to tier {tier}: {debugger.model} ({debugger.reasoning})")
 
-                # Get current plan version
-                version = debugger_agent.get_version()
+                    # Debug plan
+                    debug_start = time.perf_counter()
+                    with metrics.timer(stage="debug", iteration=iteration):
+                        response = debugger.debug_plan(describe_wayang_plan, failed_plan, wayang_errors=result, val_errors=val_errors) # Debug plan
+                    debug_latency = time.perf_counter() - debug_start
+                    timings["debug"] += debug_latency
+                    version = debugger.get_version() # Current plan version
+                    raw_plan = response.get("wayang_plan") # Get only the debugged plan
+                    print("[INFO] Plan debugged by debugger")
 
-                # Logging
-                logger.add_message(f"Agent Usage: DebuggerAgent. Debug version {version} information", {"model": str(response["raw"].model), "usage": response["raw"].usage.model_dump()})
-                logger.add_message(f"Agent: DebuggerAgent's thoughts, plan {version}", {"version": version, "thoughts": raw_plan.thoughts})
-                logger.add_message(f"Agent: DebuggerAgent's plan: {version}", {"version": version, "plan": raw_plan.model_dump()})
+                    # Get current plan version
+                    version = debugger.get_version()
+                    iteration_span.set_attribute("llm.model", debugger.model)
 
+                    # Logging
+                    logger.add_message(f"Agent Usage: DebuggerAgent. Debug version {version} information", {"model": str(response["raw"].model), "history_tokens": response["history_tokens"], "queue_seconds": response["queue_seconds"], "usage": response["raw"].usage.model_dump()})
+                    logger.add_message(f"Agent: DebuggerAgent's thoughts, plan {version}", {"version": version, "thoughts": raw_plan.thoughts})
+                    logger.add_message(f"Agent: DebuggerAgent's plan: {version}", {"version": version, "plan": raw_plan.model_dump()})
 
-                # Map the debugged plan to JSON-format
-                wayang_plan = plan_mapper.plan_to_json(raw_plan)
-                print("[INFO] Plan mapped by PlanMapper")
-                logger.add_message("Class: PlanMapper Mapped Debug Plan", {"version": version, "plan": wayang_plan})
+
+                    # Map the debugged plan to JSON-format
+                    with metrics.timer(stage="map"):
+                        wayang_plan = plan_mapper.plan_to_json(raw_plan)
+                    print("[INFO] Plan mapped by PlanMapper")
+                    logger.add_message("Class: PlanMapper Mapped Debug Plan", {"version": version, "plan": wayang_plan})
                 
-                # Validate debugged plan
-                val_success, val_errors = plan_validator.validate_plan(wayang_plan)
+                    # Validate debugged plan
+                    with metrics.timer(stage="validate"):
+                        val_success, val_errors = plan_validator.validate_plan(wayang_plan)
 
-                print(f"[INFO] PlanValidator validates debugger's plan")
-                logger.add_message("Class: PlanValidator Validated Debugger Plan", "")
+                    print(f"[INFO] PlanValidator validates debugger's plan")
+                    logger.add_message("Class: PlanValidator Validated Debugger Plan", "")
 
-                # If plan failed validation, continue debugging
-                if not val_success:
-                    # Logging failure
-                    print(f"[INFO] Plan {version} failed validation: {val_errors}")
-                    logger.add_message(f"Err: PlanValidator Val error. Failed validation", {"version": version, "errors": val_errors})
-                    status_code = 400
-                    result = None
-                    continue
+                    # Keep track of the best plan so far
+                    best_plan = _best_plan(best_plan, version, raw_plan, val_success, val_errors)
 
-                print(f"[INFO] Succesfully validated and debugged plan, version {version}") # If plan validation succesfully
+                    # If plan failed validation, continue debugging
+                    if not val_success:
+                        # Logging failure
+                        print(f"[INFO] Plan {version} failed validation: {val_errors}")
+                        logger.add_message(f"Err: PlanValidator Val error. Failed validation", {"version": version, "errors": val_errors})
+                        status_code = 400
+                        result = None
+
+                        # Record failed outcome of the Debugger's tier
+                        if tier is not None:
+                            model_router.record(tier, "debugger", debug_latency - response["queue_seconds"], False, response["raw"].usage.model_dump())
+
+                        continue
+
+                    print(f"[INFO] Succesfully validated and debugged plan, version {version}") # If plan validation succesfully
                 
-                # Execute Wayang plan
-                print(f"[INFO] Plan {version} sent to Wayang for execution")
-                status_code, result = wayang_executor.execute_plan(wayang_plan)
-                logger.add_message("Wayang: Wayang plan sent to Wayang", "")
+                    # Execute Wayang plan
+                    print(f"[INFO] Plan {version} sent to Wayang for execution")
+                    execute_start = time.perf_counter()
+                    with metrics.timer(stage="execute"):
+                        status_code, result = execute(wayang_plan)
+                    timings["execute"] += time.perf_counter() - execute_start
+                    logger.add_message("Wayang: Wayang plan sent to Wayang", {"status_code": status_code, "output": result})
 
-                # Break debugging loop if sucessfully executed
-                if status_code == 200:
-                    break
+                    # Record outcome of the Debugger's tier
+                    if tier is not None:
+                        model_router.record(tier, "debugger", debug_latency - response["queue_seconds"], status_code == 200, response["raw"].usage.model_dump())
 
-                # Continue debugging if execution failed
-                if status_code != 200:
-                    print(f"[ERROR] Couldn't execute plan version {version}, status {status_code}")
-                    logger.add_message(f"Err: Wayang error. Plan version {version} executed unsucessful", {"status_code": status_code, "output": result})
-                    continue
+                    iteration_span.set_attribute("http.status_code", status_code)
+
+                    # Break debugging loop if sucessfully executed
+                    if status_code == 200:
+                        break
+
+                    # Continue debugging if execution failed
+                    if status_code != 200:
+                        print(f"[ERROR] Couldn't execute plan version {version}, status {status_code}")
+                        logger.add_message(f"Err: Wayang error. Plan version {version} executed unsucessful", {"status_code": status_code, "output": result})
+                        continue
             
         # Return output when success
         if status_code == 200:
             print("[INFO] Plan succesfully executed")
+            logger.add_message("Budget: Request totals", budgets.current().to_dict())
             logger.add_message("Final: Sucessful. Plan executed", "Success")
 
+            # Learn a template from the succesful plan for recurring query shapes
+            if TEMPLATE_CONFIG.get("use_templates") == "True" and plan_source != "template":
+                template_id = plan_templates.add(describe_wayang_plan, raw_plan)
+                logger.add_message("Class: PlanTemplateLibrary Template added", {"template_id": template_id})
+
+            # Record query metrics and trace attributes
+            tracer.set_attributes({"llm.model": model, "plan.source": plan_source, "plan.version": version, "plan.operator_count": len(wayang_plan.get("operators", [])), "http.status_code": status_code})
+            metrics.inc("wayang_queries_total", outcome="success", source=plan_source)
+            metrics.observe("wayang_query_duration_seconds", time.perf_counter() - query_start, outcome="success")
+            metrics.observe("wayang_debug_iterations", version - 1, buckets=(0, 1, 2, 3, 4, 5, 10))
+
+            # Large results are returned as preview, the rest can be fetched in pages
+            output = result_store.format_for_client(result)
+            if session:
+                last_session_job_id = result["job_id"]
+                last_session_result = output
+
+            # Share the job, so any worker can return its result
+            _record_job({"job_id": result["job_id"], "status": "success", "output": output, "plan_hash": plan_mapper.plan_hash(raw_plan), "finished": datetime.now().isoformat()})
+
+            # Keep a typed Parquet copy of the result
+            if RESULT_CONFIG.get("write_parquet") == "True":
+                try:
+                    parser = _get_result_parser()
+                    parquet = parser.to_parquet(parser.parse_file(result["path"]), result_store.parquet_path(result["job_id"]))
+                    logger.add_message("Class: ResultParser Parquet copy written", {"job_id": result["job_id"], "path": parquet})
+                except Exception as e:
+                    # The result is still returned if the copy fails
+                    print(f"[ERROR] Couldn't write Parquet copy: {e}")
+
             # Return result to client
-            return result
+            return {"output": output, "status": "success", "job_id": result["job_id"], "plan_hash": plan_mapper.plan_hash(raw_plan), "timings": timings}
 
         # If failed to execute plan after debugging
         if status_code != 200:
             print(f"[ERROR] Couldn't execute plan succesfully, status {status_code}")
+            logger.add_message("Budget: Request totals", budgets.current().to_dict())
             logger.add_message("Final: Unsucessful. Plan executed unsucessful", {"status_code": status_code, "output": result})
             
+            # Record query metrics and trace attributes
+            tracer.set_attributes({"llm.model": model, "plan.source": plan_source, "plan.version": version, "plan.operator_count": len(wayang_plan.get("operators", [])), "http.status_code": status_code})
+            metrics.inc("wayang_queries_total", outcome="failure", source=plan_source)
+            metrics.observe("wayang_query_duration_seconds", time.perf_counter() - query_start, outcome="failure")
+            metrics.observe("wayang_debug_iterations", version - 1, buckets=(0, 1, 2, 3, 4, 5, 10))
+
             # Return failure to client
-            return "Couldn't execute wayang plan succesfully"
+            return {"output": "Couldn't execute wayang plan succesfully", "status": "failure", "job_id": None, "plan_hash": plan_mapper.plan_hash(raw_plan), "timings": timings}
+
+    except BudgetExceeded as e:
+        # Stop early when the budget runs out, before another LLM call
+        print(f"[INFO] Budget exceeded: {e}")
+        logger.add_message("Budget: Request totals", budgets.current().to_dict())
+        logger.add_message("Final: Budget exceeded. Stopped early", {"reason": e.reason, "message": str(e), "best_version": best_plan["version"] if best_plan else None})
+
+        # Record query metrics and trace attributes
+        tracer.set_attributes({"budget.exceeded": e.reason})
+        metrics.inc("wayang_queries_total", outcome="budget")
+        metrics.observe("wayang_query_duration_seconds", time.perf_counter() - query_start, outcome="budget")
+
+        # Return the best plan so far to the client
+        if best_plan is None:
+            return {"output": f"Budget exceeded before a plan was generated: {e}", "status": "budget", "job_id": None, "plan_hash": None, "timings": timings}
+
+        validation = "passed validation" if best_plan["valid"] else f"failed validation with {best_plan['errors']} errors"
+        output = f"Budget exceeded, stopped early: {e}. Best plan so far (version {best_plan['version']}, {validation}):\n{json.dumps(best_plan['plan'].model_dump(), indent=2)}"
+        return {"output": output, "status": "budget", "job_id": None, "plan_hash": plan_mapper.plan_hash(best_plan["plan"]), "timings": timings}
+
+    except QueueFull as e:
+        # Reject when Wayang is overloaded, so the client can retry later instead of waiting
+        print(f"[INFO] Execution rejected: {e}")
+        logger.add_message("Final: Rejected. Execution queue full", {"priority": e.priority, "queued": e.queued})
+
+        tracer.set_attributes({"scheduler.rejected": e.priority})
+        metrics.inc("wayang_queries_total", outcome="rejected")
+        metrics.observe("wayang_query_duration_seconds", time.perf_counter() - query_start, outcome="rejected")
+
+        return {"output": f"Wayang is busy: {e}", "status": "rejected", "job_id": None, "plan_hash": None, "timings": timings}
 
     except Exception as e:
         # Prints if an exception happened
         print(f"[ERROR] {e}")
 
+        # Record query metrics and mark trace as failed
+        tracer.current_span().set_error(str(e))
+        metrics.inc("wayang_queries_total", outcome="error")
+        metrics.observe("wayang_query_duration_seconds", time.perf_counter() - query_start, outcome="error")
+
         # Return error to client LLM to explain to user
         msg = f"An error occured, explain for the user: {e}"
         # Return error message to client
-        return msg
+        return {"output": msg, "status": "error", "job_id": None, "plan_hash": None, "timings": timings}
+
+
+def _best_plan(best: dict | None, version: int, raw_plan, val_success: bool, val_errors: list) -> dict:
+    """
+    Helper function to keep the best plan of a query so far.
+    Plans passing validation beat plans failing it, then fewer validation errors, then the newer version
+
+    Args:
+        best (dict | None): Best plan so far
+        version (int): Version of the new plan
+        raw_plan (WayangPlan): The new plan
+        val_success (bool): True if the new plan passed validation
+        val_errors (list): Validation errors of the new plan
+
+    Returns:
+        dict: The better of the two plans
+
+    """
+
+    candidate = {"version": version, "plan": raw_plan, "valid": val_success, "errors": len(val_errors or [])}
+
+    if best is None or (not candidate["valid"], candidate["errors"]) <= (not best["valid"], best["errors"]):
+        return candidate
+
+    return best
+
+
+def _check_operation(operation) -> List[str]:
+    """
+    Helper function to map and validate a single operation while the plan is streamed
+
+    Args:
+        operation (WayangOperation): Completed operation
+
+    Returns:
+        List[str]: Fatal errors, empty if none
+
+    """
+
+    try:
+        mapped = plan_mapper.map_operation(operation)
+    except Exception as e:
+        return [f"Operation id {operation.id}: Couldn't map operator - {e}"]
+
+    # Skipped operators, e.g. an output without output folder, are left to the validation of the full plan
+    if mapped is None:
+        return []
+
+    return plan_validator.validate_operation(mapped)
 
 
 @mcp.tool()
-def get_wayang_result() -> str:
+def query_wayang_batch(queries: List[str], model: Optional[str] = None, reasoning: Optional[str] = "low", use_debugger: Optional[str] = "True", client_id: Optional[str] = None) -> str:
+    """
+    Generates and executes Wayang plans for several queries in natural language in one call.
+    Plans are built concurrently, and queries resulting in the same plan share one execution in Wayang.
+    The queries provided must be in English
+
+    Args:
+        queries (List[str]):
+            Detailed descriptions in English of the queries or tasks to be executed
+        client_id (Optional[str]):
+            Identifier of the calling client, used for per-client budget limits
+
+    Returns:
+        str: Per query its output, status, job id and time per stage, and totals for the batch in JSON
+    
+    Notes:
+    - Use this instead of several query_wayang calls for related questions, e.g. a report
+    - Large results are returned as preview with a job id, see fetch_result_page
+    """
+
+    max_queries = int(BATCH_CONFIG.get("max_queries"))
+
+    if len(queries) > max_queries:
+        return f"Too many queries in batch: {len(queries)}, the maximum is {max_queries}"
+
+    # Reload prompts between requests if their files changed, the whole batch uses one version
+    prompt_registry.refresh_if_due()
+
+    with tracer.span("query_wayang_batch", {"batch.size": len(queries)}):
+        return json.dumps(_run_batch(queries, model, reasoning, use_debugger, client_id), indent=4)
+
+
+def _run_batch(queries: List[str], model: Optional[str], reasoning: Optional[str], use_debugger: Optional[str], client_id: Optional[str]) -> Dict:
+    """
+    Helper function running a batch of queries.
+    Each distinct query runs the whole pipeline in a build worker with its own builder, debugger and budget.
+    Mapped plans go through a shared execution pool, where equal plans are executed once
+
+    Args:
+        queries (List[str]): Queries in natural language
+        model (Optional[str]): GPT-model, or None to use the model router or default model
+        reasoning (Optional[str]): Reasoning level
+        use_debugger (Optional[str]): "True" to debug failed plans
+        client_id (Optional[str]): Client sending the batch
+
+    Returns:
+        Dict: Results in the order of the queries and totals for the batch
+
+    """
+
+    batch_start = time.perf_counter()
+
+    # Identical queries are run once
+    distinct = list(dict.fromkeys(queries))
+
+    # Executions per plan, so equal plans from different queries share one execution
+    executions = {}
+    shared = {"executions": 0}
+    lock = threading.Lock()
+    execute_pool = ThreadPoolExecutor(max_workers=int(BATCH_CONFIG.get("max_execute_workers")))
+
+    def execute(plan: Dict):
+        key = _plan_key(plan)
+
+        with lock:
+            future = executions.get(key)
+
+            if future is None:
+                # Batch plans wait behind interactive plans, in the context of the query so its trace and budget apply
+                future = execute_pool.submit(copy_context().run, _execute_plan, plan, "batch", client_id)
+                executions[key] = future
+            else:
+                shared["executions"] += 1
+                metrics.inc("wayang_batch_shared_executions_total")
+
+                # The plan's own output file is never written
+                plan_mapper.output_manager.release(plan)
+
+        return future.result()
+
+    def run(query: str) -> Dict:
+        start = time.perf_counter()
+
+        # Each query gets its own span, budget, builder and debugger chat history
+        with tracer.span("query_wayang", {"query.length": len(query), "debugger.enabled": use_debugger == "True", "batch.size": len(queries)}):
+            with budgets.request(client_id):
+                builder = Builder(system_prompt=builder_agent.system_prompt, client=builder_agent.client)
+                debugger = Debugger(system_prompt=debugger_agent.system_prompt, client=debugger_agent.client)
+                output = _run_query(query, model, reasoning, use_debugger, debugger=debugger, execute=execute, builder=builder, session=False)
+
+        return {**output, "latency": time.perf_counter() - start}
+
+    print(f"[INFO] Batch of {len(queries)} queries ({len(distinct)} distinct)")
+
+    try:
+        with ThreadPoolExecutor(max_workers=int(BATCH_CONFIG.get("max_build_workers"))) as build_pool:
+            # Queries run in a copy of the batch context, so their spans belong to the batch trace
+            futures = [build_pool.submit(copy_context().run, run, query) for query in distinct]
+            outputs = dict(zip(distinct, [future.result() for future in futures]))
+    finally:
+        execute_pool.shutdown(wait=True)
+
+    # Results in the order of the queries, repeated queries point to their first occurence
+    results = []
+    for index, query in enumerate(queries):
+        output = outputs[query]
+        first = queries.index(query)
+
+        results.append({
+            "index": index,
+            "query": query,
+            "status": output["status"],
+            "output": output["output"],
+            "job_id": output["job_id"],
+            "plan_hash": output["plan_hash"],
+            "duplicate_of": first if first != index else None,
+            "latency_seconds": round(output["latency"], 3),
+            "timings_seconds": {stage: round(seconds, 3) for stage, seconds in output["timings"].items()},
+        })
+
+    return {
+        "queries": len(queries),
+        "distinct_queries": len(distinct),
+        "succeeded": sum(r["status"] == "success" for r in results),
+        "executions": len(executions),
+        "shared_executions": shared["executions"],
+        "duration_seconds": round(time.perf_counter() - batch_start, 3),
+        "results": results,
+    }
+
+
+def _plan_key(plan: Dict) -> str:
+    """
+    Helper function to get a key of a mapped plan for sharing executions.
+    Output file names are left out, since each mapping gets its own file
+
+    Args:
+        plan (Dict): Mapped JSON plan
+
+    Returns:
+        str: Key of the plan
+
+    """
+
+    operators = [
+        {**op, "data": {k: v for k, v in (op.get("data") or {}).items() if k != "filename"}} if op.get("operatorName") == "textFileOutput" else op
+        for op in plan.get("operators", [])
+    ]
+
+    return json.dumps(operators, sort_keys=True, default=str)
+
+
+def _record_job(job: Dict) -> None:
+    """
+    Helper function to save a finished job to the shared store, as the job itself and as the last job
+
+    Args:
+        job (Dict): Job id, status, output for the client, plan hash and finish time
+
+    """
+
+    try:
+        shared_store.set("jobs", job["job_id"], job)
+        shared_store.set("jobs", "last", job)
+        shared_store.trim("jobs", int(SHARED_CONFIG.get("max_jobs")))
+    except Exception as e:
+        # The result is still returned to the client if the store is unavailable
+        print(f"[ERROR] Couldn't record job {job['job_id']}: {e}")
+
+@mcp.tool()
+def get_wayang_result(job_id: Optional[str] = None) -> str:
     """
     Get the current result from query_wayang or from the Wayang execution.
+    With a job id, get the result of that job, also if it ran on another worker.
+
+    Args:
+        job_id (Optional[str]): Job id of a result, given by query_wayang
 
     Returns:
         The output result or output error from Wayang
     
     """
 
-    return last_session_result
+    if not job_id:
+        job = shared_store.get("jobs", "last")
+        return job["output"] if job else last_session_result
+
+    job = shared_store.get("jobs", job_id)
+
+    if job:
+        return job["output"]
+
+    # Jobs removed from the store still have their result on disk until it's removed
+    try:
+        return result_store.format_for_client(result_store.get(job_id))
+    except KeyError as e:
+        return f"No result found: {e}"
+
+@mcp.tool()
+def fetch_result_page(job_id: str, offset: int = 0, limit: int = 100) -> str:
+    """
+    Get a page of rows from a large Wayang result, when query_wayang only returned a preview.
+
+    Args:
+        job_id (str): Job id of the result, given with the preview
+        offset (int): First row to get, starting at 0
+        limit (int): Maximum rows to get
+
+    Returns:
+        str: Rows with total_rows and next_offset in JSON. next_offset is null on the last page
+    
+    """
+
+    try:
+        return json.dumps(result_store.fetch_page(job_id, offset, limit), indent=4)
+    except KeyError as e:
+        return f"No result found: {e}"
+
+@mcp.tool()
+def get_result_summary(job_id: str, top_k: int = 5) -> str:
+    """
+    Get a compact summary of a Wayang result instead of its rows: row count and per column its type,
+    nulls, distinct values, min, max, mean and most frequent values.
+    reliable is false if some rows have another number of columns than most rows, e.g. text containing commas.
+
+    Args:
+        job_id (str): Job id of the result, given with the preview
+        top_k (int): Number of most frequent values per column
+
+    Returns:
+        str: Summary in JSON
+    
+    """
+
+    try:
+        result = result_store.get(job_id)
+    except KeyError as e:
+        return f"No result found: {e}"
+
+    with metrics.timer(stage="summarize"):
+        parser = _get_result_parser()
+        summary = parser.summarize(parser.parse_file(result["path"]), top_k)
+
+    return json.dumps({"job_id": job_id, **summary}, indent=4)
+
+def _get_result_parser():
+    """
+    Helper function to get the result parser, created on first use
+
+    Returns:
+        ResultParser: Shared result parser
+
+    """
+
+    global result_parser
+
+    if result_parser is None:
+        from ai_wayang_single.wayang.result_parser import ResultParser
+        result_parser = ResultParser()
+
+    return result_parser
+
+
+@mcp.tool()
+def get_output_stats() -> str:
+    """
+    Get the number and size of textFileOutput files in the output folder and the retention limits.
+
+    Returns:
+        str: Output folder usage in JSON
+    
+    """
+
+    return json.dumps(plan_mapper.output_manager.get_stats(), indent=4)
+
+@mcp.tool()
+def get_scheduler_stats() -> str:
+    """
+    Get running and queued Wayang executions, rejections and queue times per priority (interactive and batch).
+
+    Returns:
+        str: Scheduler stats in JSON
+    
+    """
+
+    return json.dumps(execution_scheduler.get_stats(), indent=4)
+
+@mcp.tool()
+def get_backend_stats() -> str:
+    """
+    Get health, outstanding requests and failures of each Wayang backend.
+
+    Returns:
+        str: Backend stats in JSON
+    
+    """
+
+    return json.dumps(wayang_executor.pool.get_stats(), indent=4)
+
+@mcp.tool()
+def reload_prompts() -> str:
+    """
+    Reload the agents' system prompts now if prompt templates, schemas, operators or few-shot examples changed.
+    Changes are otherwise picked up between requests.
+
+    Returns:
+        str: Prompt version and changed sections in JSON
+    
+    """
+
+    changed = prompt_registry.refresh()
+
+    return json.dumps({"version": prompt_registry.version, "changed": changed}, indent=4)
+
+@mcp.tool()
+def get_llm_dispatch_stats() -> str:
+    """
+    Get LLM calls, queueing delay for the provider's rate limits, rate limit errors and hedged calls.
+
+    Returns:
+        str: LLM dispatch stats in JSON
+    
+    """
+
+    return json.dumps(llm_dispatcher.get_stats(), indent=4)
+
+@mcp.tool()
+def get_stream_stats() -> str:
+    """
+    Get streamed plan generations, early stops for fatal errors, time to first error and time to an executable plan.
+
+    Returns:
+        str: Plan streaming stats in JSON
+    
+    """
+
+    return json.dumps(builder_agent.get_stream_stats(), indent=4)
+
+@mcp.tool()
+def get_sql_pushdown_stats() -> str:
+    """
+    Get plans executed directly as SQL on the database, and plans left to Wayang with the reasons.
+
+    Returns:
+        str: SQL pushdown stats in JSON
+    
+    """
+
+    return json.dumps(sql_pushdown.get_stats(), indent=4)
+
+@mcp.tool()
+def get_partition_stats() -> str:
+    """
+    Get tables whose reads are split into partitions, their key ranges and the partitioned reads so far.
+
+    Returns:
+        str: Partitioned read stats in JSON
+    
+    """
+
+    return json.dumps(plan_mapper.get_partition_stats(), indent=4)
+
+@mcp.tool()
+def get_model_router_stats() -> str:
+    """
+    Get recorded latency, success rate and token usage per model tier in the escalation ladder.
+
+    Returns:
+        str: Stats per model and reasoning level in JSON
+    
+    """
+
+    return json.dumps(model_router.get_stats(), indent=4)
+
+@mcp.tool()
+def get_budget_report() -> str:
+    """
+    Get aggregate LLM tokens and cost per model and per client, and the configured budget limits.
+
+    Returns:
+        str: Cost report in JSON
+    
+    """
+
+    return json.dumps(budgets.get_report(), indent=4)
+
+@mcp.tool()
+def get_metrics() -> str:
+    """
+    Get latency, token and Wayang server metrics of the running server in the Prometheus text format.
+
+    Returns:
+        str: Counters and histograms, e.g. duration per stage (build, map, validate, execute, debug)
+    
+    """
+
+    return metrics.render()
 
 @mcp.tool()
 def load_schemas() -> str:
@@ -258,7 +1047,8 @@ def load_schemas() -> str:
         relative_path = os.path.join(base_dir, "..", "..", "..", "data", "schemas") # Relative path to output folder
         output_folder = os.path.abspath(relative_path) # Absolute path to folder
         
-        # Initialize schema loader
+        # Initialize schema loader, imported here since it pulls in pandas and SQLAlchemy
+        from ai_wayang_single.utils.schema_loader import SchemaLoader
         schema_loader = SchemaLoader(config, output_folder)
         
         # For output messages
@@ -270,6 +1060,10 @@ def load_schemas() -> str:
         # Load textfiles
         msg.append(schema_loader.get_and_save_textfile_schemas())
 
+        # Rebuild prompts with the new schemas
+        changed = prompt_registry.refresh()
+        msg.append(f"Prompts at version {prompt_registry.version}" + (f", reloaded sections: {', '.join(changed)}" if changed else ""))
+
         # Returns msg as str to client
         return "\n".join(msg)
 
@@ -0,0 +1,386 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Tuple
+import threading
+import time
+from ai_wayang_single.config.settings import BUDGET_CONFIG
+from ai_wayang_single.utils.metrics import metrics
+
+# The budget of the request currently handled in this thread or task
+_current_budget = ContextVar("current_budget", default=None)
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised before an LLM call that would exceed a budget limit
+
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class RequestBudget:
+    """
+    Running totals of a single request, checked against the request limits
+
+    """
+
+    def __init__(self, client_id: str, max_tokens: int | None, max_seconds: float | None, max_iterations: int | None):
+        self.client_id = client_id
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.max_iterations = max_iterations
+        self.started = time.perf_counter()
+        self.tokens = 0
+        self.cost = 0.0
+        self.iterations = 0
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Seconds since the request started
+
+        """
+
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict:
+        """
+        Gets the running totals as dict, e.g. for logs
+
+        Returns:
+            Dict: Totals of the request
+
+        """
+
+        return {
+            "client_id": self.client_id,
+            "tokens": self.tokens,
+            "cost_usd": round(self.cost, 6),
+            "iterations": self.iterations,
+            "llm_calls": self.llm_calls,
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
+
+
+class BudgetManager:
+    """
+    Accounts tokens, time, iterations and cost of LLM calls.
+    Each request gets a RequestBudget with per-request limits, and clients share a token limit over a rolling window.
+    Running totals are checked before each LLM call, so a runaway debug loop is stopped before spending more.
+    Tokens and cost are also aggregated per model for cost reports
+
+    """
+
+    def __init__(
+        self,
+        max_tokens_per_request: int | None = None,
+        max_seconds_per_request: float | None = None,
+        max_iterations_per_request: int | None = None,
+        max_tokens_per_client: int | None = None,
+        client_window_seconds: float | None = None,
+        model_prices: Dict[str, Tuple[float, float, float]] | None = None,
+    ):
+        self.max_tokens_per_request = max_tokens_per_request or self._optional(BUDGET_CONFIG.get("max_tokens_per_request"), int)
+        self.max_seconds_per_request = max_seconds_per_request or self._optional(BUDGET_CONFIG.get("max_seconds_per_request"), float)
+        self.max_iterations_per_request = max_iterations_per_request or self._optional(BUDGET_CONFIG.get("max_iterations_per_request"), int)
+        self.max_tokens_per_client = max_tokens_per_client or self._optional(BUDGET_CONFIG.get("max_tokens_per_client"), int)
+        self.client_window_seconds = client_window_seconds or float(BUDGET_CONFIG.get("client_window_seconds"))
+        self.model_prices = model_prices or self.parse_prices(BUDGET_CONFIG.get("model_prices"))
+        self._lock = threading.Lock()
+        self.clients = {}
+        self.models = {}
+
+    @contextmanager
+    def request(self, client_id: str | None = None):
+        """
+        Starts a budget for a request. LLM calls inside the block are checked and recorded against it
+
+        Args:
+            client_id (str | None): Client sending the request, used for per-client limits
+
+        Yields:
+            RequestBudget: The budget of the request
+
+        """
+
+        budget = RequestBudget(
+            client_id or "default",
+            self.max_tokens_per_request,
+            self.max_seconds_per_request,
+            self.max_iterations_per_request,
+        )
+        token = _current_budget.set(budget)
+
+        try:
+            yield budget
+        finally:
+            _current_budget.reset(token)
+
+    def current(self) -> RequestBudget | None:
+        """
+        Gets the budget of the current request if any
+
+        Returns:
+            RequestBudget | None: Current budget
+
+        """
+
+        return _current_budget.get()
+
+    def check(self, agent: str, estimated_tokens: int = 0) -> None:
+        """
+        Checks the running totals before an LLM call
+
+        Args:
+            agent (str): Agent about to call the LLM, e.g. builder or debugger
+            estimated_tokens (int): Estimated input tokens of the call
+
+        Raises:
+            BudgetExceeded: If the call would exceed a limit
+
+        """
+
+        budget = _current_budget.get()
+
+        # Calls outside a request are only accounted
+        if budget is None:
+            return None
+
+        if budget.max_seconds is not None and budget.elapsed >= budget.max_seconds:
+            self._exceeded("time", f"Time budget of {budget.max_seconds:g} seconds used ({budget.elapsed:.1f} seconds)")
+
+        if budget.max_tokens is not None and budget.tokens + estimated_tokens > budget.max_tokens:
+            self._exceeded("tokens", f"Token budget of {budget.max_tokens} tokens per request used ({budget.tokens} tokens, next call ~{estimated_tokens})")
+
+        if agent == "debugger" and budget.max_iterations is not None and budget.iterations >= budget.max_iterations:
+            self._exceeded("iterations", f"Iteration budget of {budget.max_iterations} debug iterations used")
+
+        if self.max_tokens_per_client is not None:
+            used = self.client_tokens(budget.client_id)
+
+            if used + estimated_tokens > self.max_tokens_per_client:
+                self._exceeded("client_tokens", f"Token budget of {self.max_tokens_per_client} tokens for client {budget.client_id} used ({used} tokens in the last {self.client_window_seconds:g} seconds)")
+
+    def record(self, agent: str, model: str, usage) -> float:
+        """
+        Records token usage of an LLM response against the current request, its client and the model
+
+        Args:
+            agent (str): Agent that made the request, e.g. builder or debugger
+            model (str): GPT-model
+            usage: Usage from the response, as model or dict
+
+        Returns:
+            float: Cost of the response in USD
+
+        """
+
+        # Usage can be a pydantic model from the OpenAI client
+        if hasattr(usage, "model_dump"):
+            usage = usage.model_dump()
+
+        usage = usage or {}
+        input_tokens = usage.get("input_tokens") or 0
+        cached_tokens = (usage.get("input_tokens_details") or {}).get("cached_tokens") or 0
+        output_tokens = usage.get("output_tokens") or 0
+        reasoning_tokens = (usage.get("output_tokens_details") or {}).get("reasoning_tokens") or 0
+
+        cost = self.cost(model, input_tokens, cached_tokens, output_tokens)
+        tokens = input_tokens + output_tokens
+
+        # Request totals
+        budget = _current_budget.get()
+        if budget is not None:
+            with budget._lock:
+                budget.tokens += tokens
+                budget.cost += cost
+                budget.llm_calls += 1
+                budget.iterations += int(agent == "debugger")
+
+        with self._lock:
+            # Client totals within the rolling window
+            if budget is not None:
+                self.clients.setdefault(budget.client_id, deque()).append((time.time(), tokens, cost))
+
+            # Model totals
+            totals = self.models.setdefault(model, {
+                "calls": 0,
+                "input_tokens": 0,
+                "cached_tokens": 0,
+                "output_tokens": 0,
+                "reasoning_tokens": 0,
+                "cost_usd": 0.0,
+                "agents": {},
+            })
+            totals["calls"] += 1
+            totals["input_tokens"] += input_tokens
+            totals["cached_tokens"] += cached_tokens
+            totals["output_tokens"] += output_tokens
+            totals["reasoning_tokens"] += reasoning_tokens
+            totals["cost_usd"] += cost
+            totals["agents"][agent] = totals["agents"].get(agent, 0) + 1
+
+        metrics.inc("wayang_llm_cost_usd_total", cost, agent=agent, model=model)
+
+        return cost
+
+    def cost(self, model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+        """
+        Computes the cost of tokens from the price table.
+        Models not in the table cost nothing, dated snapshots use the price of their base model
+
+        Args:
+            model (str): GPT-model
+            input_tokens (int): Input tokens, including cached tokens
+            cached_tokens (int): Cached input tokens
+            output_tokens (int): Output tokens, including reasoning tokens
+
+        Returns:
+            float: Cost in USD
+
+        """
+
+        # Longest matching model name, so gpt-5-mini isn't priced as gpt-5
+        names = [name for name in self.model_prices if model == name or model.startswith(f"{name}-20")]
+        if not names:
+            return 0.0
+
+        input_price, cached_price, output_price = self.model_prices[max(names, key=len)]
+
+        return ((input_tokens - cached_tokens) * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+    def client_tokens(self, client_id: str) -> int:
+        """
+        Gets the tokens a client used within the rolling window
+
+        Args:
+            client_id (str): Client id
+
+        Returns:
+            int: Tokens used
+
+        """
+
+        with self._lock:
+            entries = self.clients.get(client_id)
+
+            if not entries:
+                return 0
+
+            # Drop entries older than the window
+            cutoff = time.time() - self.client_window_seconds
+            while entries and entries[0][0] < cutoff:
+                entries.popleft()
+
+            return sum(tokens for _, tokens, _ in entries)
+
+    def get_report(self) -> Dict:
+        """
+        Gets aggregate tokens and cost per model and per client
+
+        Returns:
+            Dict: Report with models, clients, totals and limits
+
+        """
+
+        # Clients are pruned to the window first
+        for client_id in list(self.clients):
+            self.client_tokens(client_id)
+
+        with self._lock:
+            models = {model: {**totals, "cost_usd": round(totals["cost_usd"], 6)} for model, totals in self.models.items()}
+            clients = {
+                client_id: {
+                    "tokens": sum(tokens for _, tokens, _ in entries),
+                    "cost_usd": round(sum(cost for _, _, cost in entries), 6),
+                    "calls": len(entries),
+                }
+                for client_id, entries in self.clients.items()
+            }
+
+        return {
+            "models": models,
+            "clients": clients,
+            "total_cost_usd": round(sum(m["cost_usd"] for m in models.values()), 6),
+            "limits": {
+                "max_tokens_per_request": self.max_tokens_per_request,
+                "max_seconds_per_request": self.max_seconds_per_request,
+                "max_iterations_per_request": self.max_iterations_per_request,
+                "max_tokens_per_client": self.max_tokens_per_client,
+                "client_window_seconds": self.client_window_seconds,
+            },
+        }
+
+    @staticmethod
+    def parse_prices(prices: str | None) -> Dict[str, Tuple[float, float, float]]:
+        """
+        Parses a comma separated price table, e.g. "gpt-5-nano:0.05/0.005/0.40".
+        Prices are USD per million input, cached input and output tokens
+
+        Args:
+            prices (str | None): Comma separated model:input/cached/output prices
+
+        Returns:
+            Dict[str, Tuple[float, float, float]]: Prices per model
+
+        """
+
+        # Dict to store prices
+        output = {}
+
+        for entry in (prices or "").split(","):
+            model, _, values = entry.strip().partition(":")
+
+            if not model or not values:
+                continue
+
+            parts = [float(v) for v in values.split("/")]
+
+            # Cached price defaults to the input price
+            if len(parts) == 2:
+                parts = [parts[0], parts[0], parts[1]]
+
+            output[model.strip()] = tuple(parts[:3])
+
+        return output
+
+    def _exceeded(self, reason: str, message: str) -> None:
+        """
+        Helper function to record and raise an exceeded budget
+
+        Args:
+            reason (str): Limit that was hit, e.g. tokens
+            message (str): Explanation
+
+        Raises:
+            BudgetExceeded: Always
+
+        """
+
+        metrics.inc("wayang_budget_exceeded_total", reason=reason)
+        raise BudgetExceeded(reason, message)
+
+    def _optional(self, value, cast):
+        """
+        Helper function to cast an optional setting
+
+        Args:
+            value: Setting value or None
+            cast: Type to cast to
+
+        Returns:
+            The cast value, or None if not set
+
+        """
+
+        return cast(value) if value not in (None, "") else None
+
+
+# Shared budget manager for the whole process
+budgets = BudgetManager()
@@ -73,7 +73,8 @@ class Logger:
         os.makedirs(self.folder_path, exist_ok=True)
 
         # Create path for log file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Microseconds, so sessions started in the same second get their own file
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"log_{timestamp}.json"
         filepath = os.path.join(self.folder_path, filename)
 
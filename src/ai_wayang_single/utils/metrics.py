@@ -0,0 +1,359 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+import bisect
+import threading
+import time
+
+# Default histogram buckets in seconds. Plans take from milliseconds to minutes
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Help text and type of known metrics
+METRIC_HELP = {
+    "wayang_queries_total": ("counter", "Queries handled by query_wayang by outcome"),
+    "wayang_query_duration_seconds": ("histogram", "End-to-end duration of query_wayang"),
+    "wayang_stage_duration_seconds": ("histogram", "Duration of each pipeline stage"),
+    "wayang_debug_iterations": ("histogram", "Debug iterations used per query"),
+    "wayang_llm_requests_total": ("counter", "LLM requests by agent and model"),
+    "wayang_llm_request_duration_seconds": ("histogram", "Duration of LLM requests"),
+    "wayang_llm_queue_seconds": ("histogram", "Time LLM calls waited for the rate limits by agent"),
+    "wayang_llm_rate_limited_total": ("counter", "LLM calls answered with a rate limit error by agent"),
+    "wayang_llm_hedged_total": ("counter", "Hedged LLM calls by model and which call answered first"),
+    "wayang_llm_hedge_wasted_tokens_total": ("counter", "Tokens used by the slower call of hedged LLM calls"),
+    "wayang_llm_stream_aborts_total": ("counter", "Streamed plan generations stopped early for a fatal error by model"),
+    "wayang_llm_stream_first_error_seconds": ("histogram", "Time from the start of a streamed plan generation to its first fatal error"),
+    "wayang_llm_stream_plan_seconds": ("histogram", "Time until a streamed plan is complete without fatal errors, including stopped attempts"),
+    "wayang_llm_tokens_total": ("counter", "LLM tokens by agent, model and type"),
+    "wayang_llm_cost_usd_total": ("counter", "LLM cost in USD by agent and model"),
+    "wayang_budget_exceeded_total": ("counter", "Requests stopped by a budget limit by reason"),
+    "wayang_output_files_removed_total": ("counter", "textFileOutput files removed by retention and quota"),
+    "wayang_prompt_reloads_total": ("counter", "System prompt reloads after prompt, schema or example changes"),
+    "wayang_batch_shared_executions_total": ("counter", "Plan executions in a batch shared with an equal plan of another query"),
+    "wayang_backend_requests_total": ("counter", "Plan executions per Wayang backend by outcome"),
+    "wayang_backend_failovers_total": ("counter", "Plan executions moved to another backend after a connection error"),
+    "wayang_backend_probes_failed_total": ("counter", "Failed health probes per Wayang backend"),
+    "wayang_scheduler_queue_seconds": ("histogram", "Time plans waited for an execution slot by priority"),
+    "wayang_scheduler_rejected_total": ("counter", "Plans rejected because the queue of their priority was full"),
+    "wayang_sql_pushdown_total": ("counter", "Plans executed as SQL, or left to Wayang as not translatable or after a database error"),
+    "wayang_sql_pushdown_duration_seconds": ("histogram", "Duration of plans executed as SQL, including writing the result"),
+    "wayang_partitioned_reads_total": ("counter", "Table reads split into partitions read over separate JDBC connections by table"),
+    "wayang_http_requests_total": ("counter", "Requests to the Wayang server by status code"),
+    "wayang_http_request_duration_seconds": ("histogram", "Duration of requests to the Wayang server"),
+}
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms for the pipeline.
+    Renders all metrics in the Prometheus text format
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increments a counter
+
+        Args:
+            name (str): Name of the counter
+            value (float): Value to add
+            **labels: Labels of the counter
+
+        """
+
+        key = (name, self._labels(labels))
+
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple = DEFAULT_BUCKETS, **labels) -> None:
+        """
+        Observes a value in a histogram
+
+        Args:
+            name (str): Name of the histogram
+            value (float): Observed value
+            buckets (Tuple): Upper bounds of buckets, only used when the histogram is created
+            **labels: Labels of the histogram
+
+        """
+
+        key = (name, self._labels(labels))
+
+        with self._lock:
+            # Initialize histogram
+            histogram = self.histograms.setdefault(key, {
+                "buckets": tuple(buckets),
+                "counts": [0] * len(buckets),
+                "sum": 0.0,
+                "count": 0,
+            })
+
+            # Add to the first bucket the value fits in. Cumulative counts are computed when rendering
+            index = bisect.bisect_left(histogram["buckets"], value)
+            if index < len(histogram["counts"]):
+                histogram["counts"][index] += 1
+
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextmanager
+    def timer(self, name: str = "wayang_stage_duration_seconds", **labels):
+        """
+        Times a block of code and observes the duration in a histogram
+
+        Args:
+            name (str): Name of the histogram
+            **labels: Labels of the histogram, e.g. stage
+
+        """
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_usage(self, agent: str, model: str, usage, latency: float | None = None) -> None:
+        """
+        Records token usage and latency of an LLM response
+
+        Args:
+            agent (str): Agent that made the request, e.g. builder or debugger
+            model (str): GPT-model
+            usage: Usage from the response, as model or dict
+            latency (float | None): Duration of the request in seconds
+
+        """
+
+        # Usage can be a pydantic model from the OpenAI client
+        if hasattr(usage, "model_dump"):
+            usage = usage.model_dump()
+
+        usage = usage or {}
+
+        # Token types
+        tokens = {
+            "input": usage.get("input_tokens") or 0,
+            "cached": (usage.get("input_tokens_details") or {}).get("cached_tokens") or 0,
+            "output": usage.get("output_tokens") or 0,
+            "reasoning": (usage.get("output_tokens_details") or {}).get("reasoning_tokens") or 0,
+        }
+
+        self.inc("wayang_llm_requests_total", agent=agent, model=model)
+
+        for token_type, count in tokens.items():
+            self.inc("wayang_llm_tokens_total", count, agent=agent, model=model, type=token_type)
+
+        if latency is not None:
+            self.observe("wayang_llm_request_duration_seconds", latency, agent=agent, model=model)
+
+    def record_http(self, status_code, latency: float) -> None:
+        """
+        Records status and latency of a request to the Wayang server
+
+        Args:
+            status_code: HTTP status code, or "error" if the request failed
+            latency (float): Duration of the request in seconds
+
+        """
+
+        self.inc("wayang_http_requests_total", status=status_code)
+        self.observe("wayang_http_request_duration_seconds", latency, status=status_code)
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the Prometheus text format
+
+        Returns:
+            str: Metrics as text
+
+        """
+
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {k: {**v, "counts": list(v["counts"])} for k, v in self.histograms.items()}
+
+        lines = []
+        described = set()
+
+        # Render counters
+        for (name, labels), value in sorted(counters.items()):
+            self._describe(lines, described, name, "counter")
+            lines.append(f"{name}{self._format_labels(labels)} {self._format_value(value)}")
+
+        # Render histograms with cumulative buckets
+        for (name, labels), histogram in sorted(histograms.items()):
+            self._describe(lines, described, name, "histogram")
+
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._format_labels(labels + (('le', self._format_value(bound)),))} {cumulative}")
+
+            lines.append(f"{name}_bucket{self._format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {self._format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        """
+        Gets counters and histogram sums and counts as a dict, e.g. for reports
+
+        Returns:
+            Dict: Metrics by name and labels
+
+        """
+
+        with self._lock:
+            output = {"counters": {}, "histograms": {}}
+
+            for (name, labels), value in self.counters.items():
+                output["counters"][f"{name}{self._format_labels(labels)}"] = value
+
+            for (name, labels), histogram in self.histograms.items():
+                output["histograms"][f"{name}{self._format_labels(labels)}"] = {
+                    "sum": histogram["sum"],
+                    "count": histogram["count"],
+                }
+
+            return output
+
+    def reset(self) -> None:
+        """
+        Removes all recorded metrics
+
+        """
+
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def _labels(self, labels: Dict) -> Tuple:
+        """
+        Helper function to turn labels into a sorted, hashable tuple
+
+        Args:
+            labels (Dict): Labels
+
+        Returns:
+            Tuple: Sorted (name, value) pairs
+
+        """
+
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def _format_labels(self, labels: Tuple) -> str:
+        """
+        Helper function to format labels in the Prometheus text format
+
+        Args:
+            labels (Tuple): Sorted (name, value) pairs
+
+        Returns:
+            str: Formatted labels, e.g. {stage="build"}
+
+        """
+
+        if not labels:
+            return ""
+
+        escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels]
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def _format_value(self, value: float) -> str:
+        """
+        Helper function to format numbers without trailing .0 for integers
+
+        Args:
+            value (float): Number
+
+        Returns:
+            str: Formatted number
+
+        """
+
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+    def _describe(self, lines: list, described: set, name: str, metric_type: str) -> None:
+        """
+        Helper function to add HELP and TYPE lines once per metric
+
+        Args:
+            lines (list): Output lines, changed in place
+            described (set): Names already described, changed in place
+            name (str): Name of the metric
+            metric_type (str): Fallback type if the metric is unknown
+
+        """
+
+        if name in described:
+            return None
+
+        metric_type, help_text = METRIC_HELP.get(name, (metric_type, name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        described.add(name)
+
+
+class MetricsServer:
+    """
+    Serves metrics on a Prometheus-style text endpoint at /metrics
+
+    """
+
+    def __init__(self, registry: Metrics, port: int, host: str = "0.0.0.0"):
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.server = None
+
+    def start(self) -> None:
+        """
+        Starts the endpoint in a background thread
+
+        """
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                # Only serve metrics
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Don't print a line per scrape
+                return None
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"[INFO] Metrics endpoint started on port {self.port}")
+
+    def stop(self) -> None:
+        """
+        Stops the endpoint
+
+        """
+
+        if self.server:
+            self.server.shutdown()
+            self.server = None
+
+
+# Shared registry for the whole process
+metrics = Metrics()
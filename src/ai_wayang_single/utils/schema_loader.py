@@ -14,6 +14,8 @@ class SchemaLoader():
     def __init__(self, config, output_folder):
         self.config = config["input_config"]
         self.output_folder = output_folder
+        # Only tables with at least this many rows are partitioned, so only they need a partition key
+        self.partition_min_rows = int((config.get("partition_config") or {}).get("min_rows") or 0)
 
     def get_and_save_textfile_schemas(self) -> str:
         """
@@ -99,7 +101,7 @@ class SchemaLoader():
     def get_and_save_table_schemas(self) -> str:
         """
         Get all tables in the database, get two example records of each tables. Adds them to data_schema_examples folder.
-        If a table already exists, it is not added again.
+        If a table already exists, it is not added again, only its row count, size and partition key are updated.
 
         Returns:
             str: Information on number of added schemas.
@@ -118,9 +120,14 @@ class SchemaLoader():
             schemas = self._get_schemas()
             # Add example records to schemas
             schemas = self._add_record_examples(schemas)
+            # Get table sizes, used to route heavy plans
+            sizes = self._get_table_sizes()
+            # Get key columns with their min and max, used to partition large reads. Smaller tables aren't scanned
+            keys = self._get_partition_keys(schemas, [table for table, size in sizes.items() if size["row_count"] >= self.partition_min_rows])
 
             schema_exists_counter = 0
             schema_added_counter = 0
+            schema_updated_counter = 0
 
             # Go over each unique table in the schema:
             for table_name, table_data in schemas.groupby("table_name"):
@@ -128,13 +135,18 @@ class SchemaLoader():
                 # Get filepath to output schema
                 filepath = f"{output_folder}/{table_name}.json"
 
-                # Continueto next if file already exists
+                # Only update the statistics if file already exists, descriptions may have been added by hand
                 if os.path.isfile(filepath):
                     schema_exists_counter += 1
+
+                    if self._update_table_stats(filepath, table_name, sizes.get(table_name), keys.get(table_name)):
+                        print(f"[INFO] {table_name} statistics updated in {output_folder}")
+                        schema_updated_counter += 1
+
                     continue
 
                 # Format schema to json structure
-                schema = self._format_to_json_jdbc(table_name, table_data)
+                schema = self._format_to_json_jdbc(table_name, table_data, sizes.get(table_name), keys.get(table_name))
 
                 # Convert everything to strings (errors with other datatypes)
                 schema = json.loads(json.dumps(schema, default=str))
@@ -146,7 +158,7 @@ class SchemaLoader():
                 print(f"[INFO] {table_name} schema added to {output_folder}")
                 schema_added_counter += 1
 
-            msg = f"[INFO] Added table schemas. Added {schema_added_counter} schemas and {schema_exists_counter} schemas already exists"
+            msg = f"[INFO] Added table schemas. Added {schema_added_counter} schemas and {schema_exists_counter} schemas already exists, statistics updated in {schema_updated_counter} of them"
             print(msg)
 
             return msg
@@ -185,6 +197,130 @@ class SchemaLoader():
         return schemas
     
     
+    def _get_table_sizes(self) -> dict:
+        """
+        Helper function to get estimated row counts and sizes of tables from the database statistics, postgress
+
+        Returns:
+            dict: Table name to row count and size in bytes
+
+        """
+
+        # Engine to get statistics
+        engine = create_engine(f"postgresql+psycopg2://{self.config['jdbc_username']}:{self.config['jdbc_password']}@{self.config['jdbc_uri'].split('://')[1]}")
+
+        # Query to get estimated row counts and sizes, without scanning the tables
+        query = """
+        SELECT
+        c.relname AS table_name,
+        c.reltuples::bigint AS row_count,
+        pg_total_relation_size(c.oid) AS size_bytes
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relkind = 'r';
+        """
+
+        sizes = pd.read_sql(query, engine)
+
+        return {row["table_name"]: {"row_count": max(int(row["row_count"]), 0), "size_bytes": int(row["size_bytes"])} for _, row in sizes.iterrows()}
+
+    def _get_partition_keys(self, schemas: DataFrame, tables: List[str]) -> dict:
+        """
+        Helper function to get a key column and its min and max value for each table, postgress.
+        The key is the first primary key column if it is an integer, else the first integer column
+
+        Args:
+            schemas (DataFrame): DF of schemas
+            tables (List[str]): Tables to get keys for, each is scanned for the min and max
+
+        Returns:
+            dict: Table name to key column, min and max
+
+        """
+
+        if not tables:
+            return {}
+
+        # Engine to get keys and statistics
+        engine = create_engine(f"postgresql+psycopg2://{self.config['jdbc_username']}:{self.config['jdbc_password']}@{self.config['jdbc_uri'].split('://')[1]}")
+
+        # Query to get the first column of primary keys
+        query = """
+        SELECT
+        tc.table_name,
+        kcu.column_name
+        FROM information_schema.table_constraints tc
+        JOIN information_schema.key_column_usage kcu
+        ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
+        WHERE tc.constraint_type = 'PRIMARY KEY' AND tc.table_schema = 'public' AND kcu.ordinal_position = 1;
+        """
+
+        primary_keys = {row["table_name"]: row["column_name"] for _, row in pd.read_sql(query, engine).iterrows()}
+
+        keys = {}
+
+        for table_name, table_data in schemas[schemas["table_name"].isin(tables)].groupby("table_name"):
+            # Only integer columns can be split into ranges
+            integers = table_data[table_data["data_type"].isin(["smallint", "integer", "bigint"])]["column_name"].tolist()
+
+            if not integers:
+                continue
+
+            column = primary_keys.get(table_name) if primary_keys.get(table_name) in integers else integers[0]
+
+            try:
+                bounds = pd.read_sql(f'SELECT MIN("{column}") AS min, MAX("{column}") AS max FROM "{table_name}";', engine)
+            except Exception as e:
+                print(f"[Error] {e}")
+                continue
+
+            if bounds["min"].isna().iloc[0]:
+                continue
+
+            keys[table_name] = {"column": column, "min": int(bounds["min"].iloc[0]), "max": int(bounds["max"].iloc[0])}
+
+        return keys
+
+    def _update_table_stats(self, filepath: str, table_name: str, size: dict | None, key: dict | None) -> bool:
+        """
+        Helper function to write the row count, size and partition key of a table into its existing schema file
+
+        Args:
+            filepath (str): Schema file of the table
+            table_name (str): Name of table
+            size (dict | None): Estimated row count and size in bytes of the table
+            key (dict | None): Key column with its min and max value, None removes an outdated key
+
+        Returns:
+            bool: True if the file was changed
+
+        """
+
+        with open(filepath, "r", encoding="utf-8") as f:
+            schema = json.load(f)
+
+        table = schema.get(table_name)
+
+        if not isinstance(table, dict):
+            return False
+
+        updated = {**table, **(size or {})}
+        updated.pop("partition_key", None)
+
+        if key:
+            updated["partition_key"] = key
+
+        # Unchanged files are left alone, so the prompts aren't rebuilt
+        if updated == table:
+            return False
+
+        schema[table_name] = json.loads(json.dumps(updated, default=str))
+
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(schema, f, indent=2, ensure_ascii=False)
+
+        return True
+
     def _add_record_examples(self, schemas: DataFrame) -> DataFrame:
         """
         Helper function. Take the schemas in DF and returns two examples of each column from each available table
@@ -254,13 +390,15 @@ class SchemaLoader():
 
     
 
-    def _format_to_json_jdbc(self, table_name: str, table_data: DataFrame) -> str:
+    def _format_to_json_jdbc(self, table_name: str, table_data: DataFrame, size: dict | None = None, key: dict | None = None) -> str:
         """
         Helper function. Take a schema and examples for a table and returns it as JSON
 
         Args:
             table_name (str): Name of table
             table_data (DataFrame): Column and data from table
+            size (dict | None): Estimated row count and size in bytes of the table
+            key (dict | None): Key column with its min and max value, used to partition reads
         
         Returns:
             str: JSON of formatted schema with example
@@ -276,6 +414,14 @@ class SchemaLoader():
             }
         }
 
+        # Add table size if known
+        if size:
+            schema_json[table_name].update(size)
+
+        # Add partition key if known
+        if key:
+            schema_json[table_name]["partition_key"] = key
+
         # Go over each row of table data
         for _, row in table_data.iterrows():
             # Get fields
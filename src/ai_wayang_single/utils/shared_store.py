@@ -0,0 +1,283 @@
+from typing import Any, Dict, List, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from ai_wayang_single.config.settings import SHARED_CONFIG
+
+# Seconds a connection waits for another process' write lock before failing
+BUSY_TIMEOUT_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_updated ON entries (namespace, updated);
+CREATE TABLE IF NOT EXISTS versions (
+    namespace TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SharedStore:
+    """
+    Key-value store for state shared by worker processes, e.g. job status, plan templates and result indexes.
+    Backed by SQLite in WAL mode, so readers never block the writer and every worker on the host sees the same state.
+    Values are stored as JSON in namespaces, and each namespace has a version increased on every change,
+    so workers can check cheaply if their in-memory copies are still current.
+    Without a file the store is in memory and only shared by the threads of one process
+
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._local = threading.local()
+
+        # In-memory databases are shared between connections of the process by name
+        if path:
+            self._uri = f"file:{os.path.abspath(path)}"
+        else:
+            self._uri = f"file:ai_wayang_{uuid.uuid4().hex}?mode=memory&cache=shared"
+
+        # Keep one connection open, an in-memory database is removed with its last connection
+        self._keepalive = self._connect()
+        self._keepalive.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "SharedStore":
+        """
+        Creates a shared store from the shared state config
+
+        Args:
+            config (Dict): Shared state config
+
+        Returns:
+            SharedStore: Shared store, in memory if no store file is set
+
+        """
+
+        return cls(config.get("store_file"))
+
+    @property
+    def shared(self) -> bool:
+        """
+        True if the store is a file shared with other processes
+
+        """
+
+        return bool(self.path)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """
+        Gets a value
+
+        Args:
+            namespace (str): Namespace, e.g. jobs
+            key (str): Key in the namespace
+            default (Any): Returned if the key doesn't exist
+
+        Returns:
+            Any: The value
+
+        """
+
+        row = self._connection().execute("SELECT value FROM entries WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """
+        Sets a value, replacing an existing value of the key
+
+        Args:
+            namespace (str): Namespace
+            key (str): Key in the namespace
+            value (Any): JSON serializable value
+
+        """
+
+        data = json.dumps(value, default=str)
+
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, updated) VALUES (?, ?, ?, ?)",
+                (namespace, key, data, time.time()),
+            )
+            self._bump(connection, namespace)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        """
+        Deletes a value
+
+        Args:
+            namespace (str): Namespace
+            key (str): Key in the namespace
+
+        Returns:
+            bool: True if the key existed
+
+        """
+
+        with self._transaction() as connection:
+            deleted = connection.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key)).rowcount
+
+            if deleted:
+                self._bump(connection, namespace)
+
+        return bool(deleted)
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        """
+        Gets all values of a namespace
+
+        Args:
+            namespace (str): Namespace
+
+        Returns:
+            Dict[str, Any]: Values by key, oldest first
+
+        """
+
+        rows = self._connection().execute("SELECT key, value FROM entries WHERE namespace = ? ORDER BY updated", (namespace,)).fetchall()
+
+        return {key: json.loads(value) for key, value in rows}
+
+    def count(self, namespace: str) -> int:
+        """
+        Counts the values of a namespace
+
+        Args:
+            namespace (str): Namespace
+
+        Returns:
+            int: Number of values
+
+        """
+
+        return self._connection().execute("SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    def clear(self, namespace: str) -> None:
+        """
+        Deletes all values of a namespace
+
+        Args:
+            namespace (str): Namespace
+
+        """
+
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            self._bump(connection, namespace)
+
+    def trim(self, namespace: str, max_items: int) -> List[Tuple[str, Any]]:
+        """
+        Deletes the least recently updated values until the namespace has at most max_items values
+
+        Args:
+            namespace (str): Namespace
+            max_items (int): Values to keep
+
+        Returns:
+            List[Tuple[str, Any]]: Deleted keys and values, so their files can be removed
+
+        """
+
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT key, value FROM entries WHERE namespace = ? ORDER BY updated DESC LIMIT -1 OFFSET ?",
+                (namespace, max_items),
+            ).fetchall()
+
+            if rows:
+                connection.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", [(namespace, key) for key, _ in rows])
+                self._bump(connection, namespace)
+
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def version(self, namespace: str) -> int:
+        """
+        Gets the version of a namespace, increased on every change by any worker
+
+        Args:
+            namespace (str): Namespace
+
+        Returns:
+            int: Version, 0 if never changed
+
+        """
+
+        row = self._connection().execute("SELECT version FROM versions WHERE namespace = ?", (namespace,)).fetchone()
+
+        return row[0] if row else 0
+
+    def _bump(self, connection: sqlite3.Connection, namespace: str) -> None:
+        """
+        Helper function to increase the version of a namespace within a write transaction
+
+        """
+
+        connection.execute(
+            "INSERT INTO versions (namespace, version) VALUES (?, 1) ON CONFLICT(namespace) DO UPDATE SET version = version + 1",
+            (namespace,),
+        )
+
+    def _transaction(self) -> sqlite3.Connection:
+        """
+        Helper function to get the thread's connection as a write transaction.
+        The write lock is taken at the start, so concurrent writers wait instead of failing on upgrade
+
+        Returns:
+            sqlite3.Connection: Connection usable as a context manager, committing on success and rolling back on errors
+
+        """
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Helper function to get the connection of the current thread, connections can't be shared by threads
+
+        Returns:
+            sqlite3.Connection: Connection
+
+        """
+
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Helper function to open a connection in WAL mode
+
+        Returns:
+            sqlite3.Connection: Connection
+
+        """
+
+        connection = sqlite3.connect(self._uri, uri=True, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False)
+
+        if self.path:
+            # WAL lets readers continue while a worker writes. Normal sync is durable enough for caches and job status
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+
+        return connection
+
+
+# Shared state of the process, shared with other workers if a store file is set
+shared_store = SharedStore.from_config(SHARED_CONFIG)
@@ -0,0 +1,284 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List
+import json
+import os
+import requests
+import secrets
+import threading
+import time
+from ai_wayang_single.config.settings import TRACE_CONFIG
+
+# The span currently active in this thread or task
+_current_span = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A single timed operation in a trace
+
+    """
+
+    def __init__(self, name: str, trace_id: str, parent: "Span | None" = None, attributes: Dict | None = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.status = "ok"
+        self.status_message = ""
+        self.children = []
+
+    def set_attribute(self, key: str, value) -> None:
+        """
+        Sets an attribute on the span
+
+        Args:
+            key (str): Attribute name, e.g. plan.version
+            value: Attribute value. Must be str, bool, int or float
+
+        """
+
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        """
+        Marks the span as failed
+
+        Args:
+            message (str): Error message
+
+        """
+
+        self.status = "error"
+        self.status_message = message
+
+    def to_otlp(self) -> Dict:
+        """
+        Converts the span to the OTLP JSON format
+
+        Returns:
+            Dict: The span in OTLP JSON
+
+        """
+
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time or time.time_ns()),
+            "attributes": [{"key": k, "value": self._otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2 if self.status == "error" else 1, "message": self.status_message},
+        }
+
+        if self.parent:
+            span["parentSpanId"] = self.parent.span_id
+
+        return span
+
+    def _otlp_value(self, value) -> Dict:
+        """
+        Helper function to convert an attribute value to an OTLP AnyValue
+
+        Args:
+            value: Attribute value
+
+        Returns:
+            Dict: OTLP AnyValue
+
+        """
+
+        # bool before int, since bool is a subclass of int
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+
+        return {"stringValue": str(value)}
+
+
+class Tracer:
+    """
+    Creates trace trees of spans and exports finished traces in OTLP-compatible JSON.
+    Traces are appended as JSON lines to a local file and/or posted to an OTLP/HTTP collector
+
+    """
+
+    def __init__(self, trace_file: str | None = None, collector_url: str | None = None, service_name: str | None = None):
+        self.trace_file = trace_file or TRACE_CONFIG.get("trace_file")
+        self.collector_url = collector_url or TRACE_CONFIG.get("collector_url")
+        self.service_name = service_name or TRACE_CONFIG.get("service_name")
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        True if traces are exported anywhere
+
+        """
+
+        return bool(self.trace_file or self.collector_url)
+
+    @contextmanager
+    def span(self, name: str, attributes: Dict | None = None):
+        """
+        Starts a span as child of the current span. Starts a new trace if there is no current span.
+        The trace is exported when its root span ends
+
+        Args:
+            name (str): Name of the span, e.g. Builder.generate_plan
+            attributes (Dict | None): Attributes of the span
+
+        Yields:
+            Span: The started span
+
+        """
+
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+
+        span = Span(name, trace_id, parent, attributes)
+        if parent:
+            parent.children.append(span)
+
+        token = _current_span.set(span)
+
+        try:
+            yield span
+
+        except Exception as e:
+            span.set_error(str(e))
+            raise
+
+        finally:
+            span.end_time = time.time_ns()
+            _current_span.reset(token)
+
+            # Export the whole tree when the root ends
+            if parent is None and self.enabled:
+                self.export(span)
+
+    def current_span(self) -> Span | None:
+        """
+        Gets the current span if any
+
+        Returns:
+            Span | None: Current span
+
+        """
+
+        return _current_span.get()
+
+    def set_attributes(self, attributes: Dict) -> None:
+        """
+        Sets attributes on the current span if any
+
+        Args:
+            attributes (Dict): Attributes to set
+
+        """
+
+        span = _current_span.get()
+
+        if span:
+            for key, value in attributes.items():
+                span.set_attribute(key, value)
+
+    def export(self, root: Span) -> None:
+        """
+        Exports a finished trace to the trace file and/or the collector
+
+        Args:
+            root (Span): Root span of the trace
+
+        """
+
+        payload = self.to_otlp(root)
+
+        # Append trace to file as a JSON line
+        if self.trace_file:
+            try:
+                folder = os.path.dirname(os.path.abspath(self.trace_file))
+                os.makedirs(folder, exist_ok=True)
+
+                with self._lock:
+                    with open(self.trace_file, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(payload) + "\n")
+
+            except OSError as e:
+                print(f"[WARNING] Couldn't write trace to {self.trace_file}: {e}")
+
+        # Send trace to collector in the background, so the client isn't kept waiting
+        if self.collector_url:
+            threading.Thread(target=self._post, args=(payload,), daemon=True).start()
+
+    def to_otlp(self, root: Span) -> Dict:
+        """
+        Converts a trace tree to an OTLP JSON ExportTraceServiceRequest
+
+        Args:
+            root (Span): Root span of the trace
+
+        Returns:
+            Dict: The trace in OTLP JSON
+
+        """
+
+        return {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]
+                },
+                "scopeSpans": [{
+                    "scope": {"name": "ai_wayang_single"},
+                    "spans": [span.to_otlp() for span in self._flatten(root)],
+                }],
+            }]
+        }
+
+    def _flatten(self, root: Span) -> List[Span]:
+        """
+        Helper function to list all spans in a trace tree
+
+        Args:
+            root (Span): Root span
+
+        Returns:
+            List[Span]: Spans, parents before children
+
+        """
+
+        spans = [root]
+
+        for child in root.children:
+            spans.extend(self._flatten(child))
+
+        return spans
+
+    def _post(self, payload: Dict) -> None:
+        """
+        Helper function to post a trace to the OTLP/HTTP collector
+
+        Args:
+            payload (Dict): The trace in OTLP JSON
+
+        """
+
+        url = self.collector_url.rstrip("/")
+        if not url.endswith("/v1/traces"):
+            url += "/v1/traces"
+
+        try:
+            requests.post(url, json=payload, timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"[WARNING] Couldn't send trace to collector: {e}")
+
+
+# Shared tracer for the whole process
+tracer = Tracer()
@@ -0,0 +1,353 @@
+from pathlib import Path
+from typing import Dict, List
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+import requests
+from ai_wayang_single.utils.metrics import metrics
+
+# Bytes per row for tables with a row count but no size in their schema
+ROW_BYTES_ESTIMATE = 100
+
+# Table read by a jdbcRemoteInput, e.g. "(SELECT a, b FROM lineitem) as X"
+TABLE_FROM = re.compile(r"\bFROM\s+\"?(\w+)\"?", re.IGNORECASE)
+
+# Partitioned read of a table, e.g. "(SELECT a FROM lineitem WHERE ... /* partition 1 of 4 */) as X"
+PARTITION_OF = re.compile(r"/\* partition \d+ of (\d+) \*/")
+
+
+class Backend:
+    """
+    A Wayang REST server in the backend pool with its health and load
+
+    """
+
+    def __init__(self, url: str, max_concurrency: int | None = None, heavy: bool = False):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.heavy = heavy
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+
+    def has_capacity(self) -> bool:
+        """
+        True if the backend is below its concurrency cap
+
+        """
+
+        return self.max_concurrency is None or self.outstanding < self.max_concurrency
+
+    def to_dict(self) -> Dict:
+        """
+        Backend state for stats
+
+        """
+
+        return {
+            "url": self.url,
+            "heavy": self.heavy,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class BackendPool:
+    """
+    Pool of Wayang REST servers plans are executed on.
+    Plans go to the healthy backend with the fewest outstanding requests, waiting while all are at their concurrency cap.
+    Backends failing a request or a health probe are taken out until a probe succeeds again.
+    Heavy plans, with an estimated input size over the threshold, go to the heavy backends if any are healthy
+
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        heavy_urls: List[str] | None = None,
+        max_concurrency: int | None = None,
+        heavy_plan_bytes: int | None = None,
+        probe_interval_seconds: float = 10.0,
+        probe_timeout_seconds: float = 2.0,
+        queue_timeout_seconds: float = 300.0,
+        data_folder: str | Path | None = None,
+    ):
+        self.backends = [Backend(url, max_concurrency) for url in urls]
+        self.backends += [Backend(url, max_concurrency, heavy=True) for url in heavy_urls or []]
+        self.heavy_plan_bytes = heavy_plan_bytes
+        self.probe_interval_seconds = probe_interval_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.data_folder = Path(data_folder) if data_folder else Path(__file__).resolve().parent.parent.parent.parent / "data"
+        self._condition = threading.Condition()
+        self._table_sizes = None
+        self._prober = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "BackendPool":
+        """
+        Creates a backend pool from the Wayang config
+
+        Args:
+            config (Dict): Wayang config
+
+        Returns:
+            BackendPool: Backend pool
+
+        """
+
+        return cls(
+            urls=cls._split(config.get("server_url")),
+            heavy_urls=cls._split(config.get("heavy_url")),
+            max_concurrency=int(config["max_concurrency"]) if config.get("max_concurrency") else None,
+            heavy_plan_bytes=int(config["heavy_plan_bytes"]) if config.get("heavy_plan_bytes") else None,
+            probe_interval_seconds=float(config.get("probe_interval_seconds") or 10),
+            queue_timeout_seconds=float(config.get("queue_timeout_seconds") or 300),
+        )
+
+    def acquire(self, plan: Dict, exclude: List[Backend] | None = None) -> Backend | None:
+        """
+        Picks a backend for a plan and counts the request as outstanding. Waits while all backends are at their cap
+
+        Args:
+            plan (Dict): Mapped Wayang plan
+            exclude (List[Backend] | None): Backends already tried for this plan
+
+        Returns:
+            Backend | None: The backend, or None if every backend was tried
+
+        Raises:
+            TimeoutError: If no backend had capacity within the queue timeout
+
+        """
+
+        # Start health probes on first use, only worth it with more than one backend
+        if self._prober is None and len(self.backends) > 1:
+            self._start_probing()
+
+        exclude = exclude or []
+        heavy = self.heavy_plan_bytes is not None and self.estimate_input_bytes(plan) >= self.heavy_plan_bytes
+        deadline = time.monotonic() + self.queue_timeout_seconds
+
+        with self._condition:
+            while True:
+                candidates = [backend for backend in self.backends if backend not in exclude]
+
+                if not candidates:
+                    return None
+
+                backend = self._pick(candidates, heavy)
+
+                if backend is not None:
+                    backend.outstanding += 1
+                    backend.requests += 1
+                    return backend
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No Wayang backend had capacity within {self.queue_timeout_seconds} seconds")
+
+                self._condition.wait(remaining)
+
+    def release(self, backend: Backend, error: str | None = None) -> None:
+        """
+        Ends an outstanding request. A connection error takes the backend out until a probe succeeds
+
+        Args:
+            backend (Backend): Backend of the request
+            error (str | None): Connection error, None if the backend answered
+
+        """
+
+        with self._condition:
+            backend.outstanding -= 1
+
+            if error is not None:
+                backend.healthy = False
+                backend.failures += 1
+                backend.last_error = error
+
+            self._condition.notify_all()
+
+        metrics.inc("wayang_backend_requests_total", backend=backend.url, outcome="error" if error else "ok")
+
+        if error is not None:
+            print(f"[ERROR] Wayang backend {backend.url} failed, taken out until healthy: {error}")
+
+    def probe(self) -> None:
+        """
+        Checks each backend once. Any HTTP answer counts as healthy, since the plan endpoint only accepts POST
+
+        """
+
+        for backend in self.backends:
+            try:
+                requests.get(backend.url, timeout=self.probe_timeout_seconds)
+                healthy, error = True, None
+            except requests.exceptions.RequestException as e:
+                healthy, error = False, str(e)
+                metrics.inc("wayang_backend_probes_failed_total", backend=backend.url)
+
+            with self._condition:
+                if healthy and not backend.healthy:
+                    print(f"[INFO] Wayang backend {backend.url} healthy again")
+
+                backend.healthy = healthy
+                backend.last_error = error or backend.last_error
+                self._condition.notify_all()
+
+    def estimate_input_bytes(self, plan: Dict) -> int:
+        """
+        Estimates the input size of a plan from the sizes of its input files and tables
+
+        Args:
+            plan (Dict): Mapped Wayang plan
+
+        Returns:
+            int: Estimated input bytes, 0 for unknown inputs
+
+        """
+
+        total = 0
+
+        for operator in plan.get("operators", []):
+            data = operator.get("data") or {}
+
+            if operator.get("operatorName") == "textFileInput" and data.get("filename"):
+                # File URLs are quoted, e.g. file:///data/my%20file.txt
+                path = urllib.parse.unquote(urllib.parse.urlparse(data["filename"]).path)
+                try:
+                    total += os.path.getsize(path)
+                except OSError:
+                    pass
+
+            elif operator.get("operatorName") == "jdbcRemoteInput" and data.get("table"):
+                match = TABLE_FROM.search(data["table"])
+                if match:
+                    # A partition reads its share of the table
+                    partition = PARTITION_OF.search(data["table"])
+                    total += self._get_table_sizes().get(match.group(1).lower(), 0) // (int(partition.group(1)) if partition else 1)
+
+        return total
+
+    def reload_table_sizes(self) -> None:
+        """
+        Reloads table sizes from the table schemas on next use, e.g. after load_schemas
+
+        """
+
+        self._table_sizes = None
+
+    def get_stats(self) -> Dict:
+        """
+        Gets health and load of each backend
+
+        Returns:
+            Dict: Backends and the heavy plan threshold
+
+        """
+
+        with self._condition:
+            return {"heavy_plan_bytes": self.heavy_plan_bytes, "backends": [backend.to_dict() for backend in self.backends]}
+
+    def stop(self) -> None:
+        """
+        Stops the health probes
+
+        """
+
+        self._stop.set()
+
+    def _pick(self, candidates: List[Backend], heavy: bool) -> Backend | None:
+        """
+        Helper function to pick the least loaded backend. Called with the lock held
+
+        Args:
+            candidates (List[Backend]): Backends not tried yet
+            heavy (bool): True to prefer heavy backends
+
+        Returns:
+            Backend | None: The backend, or None if all candidates are at their cap
+
+        """
+
+        healthy = [backend for backend in candidates if backend.healthy]
+
+        # Heavy plans go to heavy backends, other plans stay off them while other backends are healthy
+        if any(backend.heavy for backend in healthy) and any(not backend.heavy for backend in healthy):
+            healthy = [backend for backend in healthy if backend.heavy == heavy]
+
+        # Try unhealthy backends when no healthy one is left, the last probe may be outdated
+        pool = healthy or candidates
+        available = [backend for backend in pool if backend.has_capacity()]
+
+        if not available:
+            return None
+
+        return min(available, key=lambda backend: (backend.outstanding, backend.failures))
+
+    def _start_probing(self) -> None:
+        """
+        Helper function to start the health probes in a background thread
+
+        """
+
+        def run():
+            while not self._stop.wait(self.probe_interval_seconds):
+                self.probe()
+
+        self._prober = threading.Thread(target=run, name="wayang-backend-probe", daemon=True)
+        self._prober.start()
+
+    def _get_table_sizes(self) -> Dict[str, int]:
+        """
+        Helper function to get table sizes from the table schemas, loaded on first use.
+        Uses the size in bytes if the schema has one, else the row count times a row size estimate
+
+        Returns:
+            Dict[str, int]: Lower-cased table name to estimated bytes
+
+        """
+
+        if self._table_sizes is not None:
+            return self._table_sizes
+
+        # Dict to store sizes
+        sizes = {}
+
+        for root, _, files in os.walk(self.data_folder / "schemas" / "tables"):
+            for file in files:
+                if not file.endswith(".json"):
+                    continue
+
+                with open(os.path.join(root, file), "r", encoding="utf-8") as f:
+                    schema = json.load(f)
+
+                for table, data in schema.items():
+                    if data.get("size_bytes"):
+                        sizes[table.lower()] = int(data["size_bytes"])
+                    elif data.get("row_count"):
+                        sizes[table.lower()] = int(data["row_count"]) * ROW_BYTES_ESTIMATE
+
+        self._table_sizes = sizes
+
+        return sizes
+
+    @staticmethod
+    def _split(urls: str | None) -> List[str]:
+        """
+        Helper function to split comma separated URLs
+
+        """
+
+        return [url.strip() for url in (urls or "").split(",") if url.strip()]
@@ -0,0 +1,386 @@
+from typing import List, Dict
+import json
+import re
+
+# Exception header, e.g. "Caused by: java.lang.ClassCastException: message"
+EXCEPTION_PATTERN = re.compile(
+    r'^(?:Exception in thread "[^"]*"\s+)?(?P<caused>Caused by:\s*)?'
+    r'(?P<exception>(?:[a-zA-Z_$][\w$]*\.)+[\w$]*(?:Exception|Error|Throwable|Failure)[\w$]*)'
+    r'(?::\s*(?P<message>.*))?$'
+)
+
+# Stack frame, e.g. "at org.apache.wayang.java.operators.JavaMapOperator.evaluate(JavaMapOperator.java:71)"
+FRAME_PATTERN = re.compile(r"^at\s+(?P<frame>.+)$")
+
+# Wayang operator class names, e.g. JavaReduceByOperator or SparkMapOperator
+OPERATOR_CLASS_PATTERN = re.compile(r"\b(?:Java|Spark|Flink|Jdbc|Postgres|Sqlite3)?(?P<name>[A-Z][A-Za-z]*?)(?P<kind>Operator|Source|Sink)\b")
+
+# Frames which tell where in the plan or UDF an error happened
+RELEVANT_FRAME_MARKERS = ("org.apache.wayang", "$anonfun", "__wrapper", "scala.tools.reflect")
+
+# Wayang operator class names (without platform prefix) to operatorName in plans
+OPERATOR_CLASS_NAMES = {
+    "map": "map",
+    "flatmap": "flatMap",
+    "filter": "filter",
+    "globalreduce": "reduce",
+    "reduce": "reduce",
+    "reduceby": "reduceBy",
+    "materializedgroupby": "groupBy",
+    "groupby": "groupBy",
+    "sort": "sort",
+    "distinct": "distinct",
+    "count": "count",
+    "randomsample": "sample",
+    "reservoirsample": "sample",
+    "shufflepartitionsample": "sample",
+    "bernoullisample": "sample",
+    "sample": "sample",
+    "join": "join",
+    "unionall": "union",
+    "union": "union",
+    "tablesource": "jdbcRemoteInput",
+    "textfilesource": "textFileInput",
+    "textfilesink": "textFileOutput",
+}
+
+# Fields of an operation holding Scala code
+UDF_FIELDS = ("udf", "keyUdf", "thisKeyUdf", "thatKeyUdf")
+
+
+class ErrorDistiller:
+    """
+    Distills long Wayang/JVM error bodies into a short, structured error for the Debugger Agent.
+    Keeps the root-cause exception, its message and the frames tied to operators or UDFs,
+    and maps them back to operator ids in the failed plan
+
+    """
+
+    def __init__(self, max_frames: int = 5, max_message_chars: int = 1500):
+        self.max_frames = max_frames
+        self.max_message_chars = max_message_chars
+
+    def distill(self, error, plan=None) -> Dict:
+        """
+        Distills a Wayang error body
+
+        Args:
+            error: Error body from the Wayang server, as text or JSON
+            plan: The failed plan, either a WayangPlan or a JSON Wayang plan, to map errors to operator ids
+
+        Returns:
+            Dict: Structured error with exception, message, root cause, the causes in between, relevant frames and operator ids
+
+        """
+
+        # Flatten JSON error bodies to text
+        text = self._to_text(error)
+
+        # Parse exception chain and frames
+        chain = self._parse_chain(text)
+        frames = self._relevant_frames(text)
+
+        # Outermost and innermost exception
+        outer = chain[0] if chain else {"exception": None, "message": self._first_line(text)}
+        root = chain[-1] if chain else outer
+
+        # Distinct exceptions in between, outermost first, e.g. a UDF error wrapped by the platform and by Wayang
+        causes = []
+        for cause in chain[1:-1]:
+            entry = {"exception": cause["exception"], "message": self._truncate(cause["message"])}
+            if (cause["exception"], cause["message"]) not in ((outer["exception"], outer["message"]), (root["exception"], root["message"])) and entry not in causes:
+                causes.append(entry)
+
+        # Map error back to operators in the plan
+        operators = self._match_operators(text, plan) if plan is not None else []
+
+        return {
+            "exception": outer["exception"],
+            "message": self._truncate(outer["message"]),
+            "root_cause": {
+                "exception": root["exception"],
+                "message": self._truncate(root["message"]),
+            },
+            "causes": causes,
+            "frames": frames,
+            "operator_ids": [op["id"] for op in operators],
+            "operators": operators,
+            "original_length": len(text),
+        }
+
+    def summarize(self, error) -> str:
+        """
+        Summarizes a Wayang error as a single line with the root cause
+
+        Args:
+            error: Error body from the Wayang server, as text or JSON
+
+        Returns:
+            str: Root-cause exception and message
+
+        """
+
+        root = self.distill(error)["root_cause"]
+        message = " ".join((root["message"] or "").split())
+
+        if root["exception"]:
+            return f"{root['exception']}: {message}" if message else root["exception"]
+
+        return message
+
+    def to_prompt(self, distilled: Dict) -> str:
+        """
+        Formats a distilled error as text for the Debugger Agent's prompt
+
+        Args:
+            distilled (Dict): Output from distill
+
+        Returns:
+            str: The distilled error as text
+
+        """
+
+        lines = []
+        root = distilled["root_cause"]
+
+        # Root cause first, as it is usually the actual problem
+        if root["exception"]:
+            lines.append(f"Root cause: {root['exception']}")
+        if root["message"]:
+            lines.append(f"Message: {root['message']}")
+
+        # Outer exception if different from the root cause
+        if distilled["exception"] and distilled["exception"] != root["exception"]:
+            outer = distilled["exception"]
+            if distilled["message"]:
+                outer += f": {self._first_line(distilled['message'])}"
+            lines.append(f"Raised as: {outer}")
+
+        # Exceptions between the outer exception and the root cause
+        for cause in distilled.get("causes", []):
+            line = cause["exception"] or ""
+            if cause["message"]:
+                line += f": {self._first_line(cause['message'])}" if line else self._first_line(cause["message"])
+            lines.append(f"Through: {line}")
+
+        # Operators the error points to
+        if distilled["operators"]:
+            operators = ", ".join(f"{op['id']} ({op['operatorName']})" for op in distilled["operators"])
+            lines.append(f"Likely failing operators (id): {operators}")
+
+        # Relevant frames
+        if distilled["frames"]:
+            lines.append("Relevant stack frames:")
+            lines.extend(f"  at {frame}" for frame in distilled["frames"])
+
+        return "\n".join(lines)
+
+    def _to_text(self, error) -> str:
+        """
+        Helper function to flatten an error body to text
+
+        Args:
+            error: Error body as str, dict or list
+
+        Returns:
+            str: Error as text
+
+        """
+
+        if error is None:
+            return ""
+
+        # Parse JSON if the server returned a JSON error body
+        if isinstance(error, str):
+            try:
+                error = json.loads(error)
+            except ValueError:
+                return error
+
+        if isinstance(error, dict):
+            return "\n".join(self._to_text(v) for v in error.values() if isinstance(v, (str, dict, list)))
+
+        if isinstance(error, list):
+            return "\n".join(self._to_text(v) for v in error)
+
+        return str(error)
+
+    def _parse_chain(self, text: str) -> List[Dict]:
+        """
+        Helper function to parse the chain of exceptions from a stack trace
+
+        Args:
+            text (str): Error as text
+
+        Returns:
+            List[Dict]: Exceptions with messages, outermost first
+
+        """
+
+        # List to store exceptions
+        chain = []
+        current = None
+
+        for line in text.splitlines():
+            stripped = line.strip()
+
+            # Frames and "... n more" end a message
+            if FRAME_PATTERN.match(stripped) or re.match(r"^\.\.\. \d+ more", stripped):
+                current = None
+                continue
+
+            match = EXCEPTION_PATTERN.match(stripped)
+
+            # New exception in the chain. Nested "Caused by" lines may be repeated inside messages
+            if match and (match.group("caused") or not chain or current is None):
+                current = {"exception": match.group("exception"), "message": match.group("message") or ""}
+                chain.append(current)
+                continue
+
+            # Continuation of a multi-line message, e.g. Scala compile errors
+            if current is not None and stripped:
+                current["message"] = f"{current['message']}\n{stripped}".strip()
+
+        return chain
+
+    def _relevant_frames(self, text: str) -> List[str]:
+        """
+        Helper function to keep only frames tied to Wayang operators or UDFs.
+        Frames of the root cause come first
+
+        Args:
+            text (str): Error as text
+
+        Returns:
+            List[str]: Relevant, de-duplicated frames
+
+        """
+
+        # Split trace into one section per exception in the chain
+        sections = re.split(r"^\s*Caused by:", text, flags=re.MULTILINE)
+
+        # List to store frames
+        frames = []
+
+        # Go over sections from the root cause and outwards
+        for section in reversed(sections):
+            for line in section.splitlines():
+                match = FRAME_PATTERN.match(line.strip())
+
+                if not match:
+                    continue
+
+                frame = match.group("frame").strip()
+
+                if any(marker in frame for marker in RELEVANT_FRAME_MARKERS) and frame not in frames:
+                    frames.append(frame)
+
+                if len(frames) >= self.max_frames:
+                    return frames
+
+        return frames
+
+    def _match_operators(self, text: str, plan) -> List[Dict]:
+        """
+        Helper function to map an error back to operators in the plan.
+        Matches Wayang operator classes and UDF code quoted in the error
+
+        Args:
+            text (str): Error as text
+            plan: WayangPlan or JSON Wayang plan
+
+        Returns:
+            List[Dict]: Matched operators with id and operatorName
+
+        """
+
+        operations = self._operations(plan)
+
+        # Operator names mentioned by Wayang operator classes
+        names = set()
+        for match in OPERATOR_CLASS_PATTERN.finditer(text):
+            # Sources and sinks are named by their kind, e.g. TextFileSink
+            key = match.group("name") if match.group("kind") == "Operator" else match.group("name") + match.group("kind")
+            name = OPERATOR_CLASS_NAMES.get(key.lower())
+            if name:
+                names.add(name)
+
+        # Code lines quoted in the error, e.g. by the Scala compiler
+        quoted = [
+            " ".join(line.split())
+            for line in text.splitlines()
+            if len(line.strip()) > 10 and not FRAME_PATTERN.match(line.strip())
+        ]
+
+        # List to store matched operators
+        matched = []
+
+        for op in operations:
+            udfs = [" ".join(str(op[f]).split()) for f in UDF_FIELDS if op.get(f)]
+
+            # An UDF quoted in the error is the strongest signal
+            udf_match = any(udf in line or line in udf for udf in udfs for line in quoted)
+
+            if udf_match or op.get("operatorName") in names:
+                matched.append({"id": op.get("id"), "operatorName": op.get("operatorName"), "udf_match": udf_match})
+
+        # Prefer UDF matches if any
+        if any(op["udf_match"] for op in matched):
+            matched = [op for op in matched if op["udf_match"]]
+
+        return [{"id": op["id"], "operatorName": op["operatorName"]} for op in matched]
+
+    def _operations(self, plan) -> List[Dict]:
+        """
+        Helper function to get operations as flat dicts from a WayangPlan or a JSON Wayang plan
+
+        Args:
+            plan: WayangPlan or JSON Wayang plan
+
+        Returns:
+            List[Dict]: Operations
+
+        """
+
+        # Abstract WayangPlan
+        if hasattr(plan, "operations"):
+            return [op.model_dump() for op in plan.operations]
+
+        # JSON Wayang plan, with operator fields nested in data
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return [{**op, **op.get("data", {})} for op in plan.get("operators", [])]
+
+    def _first_line(self, text: str) -> str:
+        """
+        Helper function to get the first non-empty line of a text
+
+        Args:
+            text (str): Text
+
+        Returns:
+            str: First non-empty line
+
+        """
+
+        for line in (text or "").splitlines():
+            if line.strip():
+                return line.strip()
+
+        return ""
+
+    def _truncate(self, text: str) -> str:
+        """
+        Helper function to truncate long messages
+
+        Args:
+            text (str): Message
+
+        Returns:
+            str: Truncated message
+
+        """
+
+        text = text or ""
+        return text if len(text) <= self.max_message_chars else text[: self.max_message_chars - 3] + "..."
@@ -0,0 +1,206 @@
+from collections import OrderedDict, deque
+from typing import Callable, Dict
+import threading
+import time
+from ai_wayang_single.utils.metrics import metrics
+
+# Priority classes, highest first
+PRIORITIES = ("interactive", "batch")
+
+
+class QueueFull(Exception):
+    """
+    Raised when a plan can't be queued because the queue of its priority class is full
+
+    """
+
+    def __init__(self, priority: str, queued: int):
+        super().__init__(f"{queued} {priority} plans already waiting for Wayang, try again later")
+        self.priority = priority
+        self.queued = queued
+
+
+class ExecutionScheduler:
+    """
+    Admission control in front of the Wayang executor.
+    At most max_concurrent plans run at once, the others wait in a queue per priority class.
+    Interactive plans are started before batch plans, and batch plans never take the last free slots,
+    so batch workloads can't starve interactive queries. Within a class, clients take turns, so one client's
+    burst doesn't delay the others. A full queue rejects new plans instead of letting them wait without end
+
+    """
+
+    def __init__(self, max_concurrent: int | None = None, max_queue: int = 100, max_batch_concurrent: int | None = None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+
+        # Keep one slot free for interactive plans unless set
+        if max_batch_concurrent is None and max_concurrent is not None:
+            max_batch_concurrent = max(max_concurrent - 1, 1)
+        self.max_batch_concurrent = max_batch_concurrent
+
+        self._condition = threading.Condition()
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._stats = {priority: {"started": 0, "rejected": 0, "queue_seconds": 0.0, "max_queue_seconds": 0.0} for priority in PRIORITIES}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "ExecutionScheduler":
+        """
+        Creates a scheduler from the scheduler config
+
+        Args:
+            config (Dict): Scheduler config
+
+        Returns:
+            ExecutionScheduler: Scheduler
+
+        """
+
+        return cls(
+            max_concurrent=int(config["max_concurrent"]) if config.get("max_concurrent") else None,
+            max_queue=int(config.get("max_queue")),
+            max_batch_concurrent=int(config["max_batch_concurrent"]) if config.get("max_batch_concurrent") else None,
+        )
+
+    def run(self, execute: Callable, priority: str = "interactive", client_id: str | None = None):
+        """
+        Runs an execution once admitted, waiting in the queue of its priority class until then
+
+        Args:
+            execute (Callable): Function executing the plan
+            priority (str): interactive or batch
+            client_id (str | None): Client of the plan, clients take turns within a class
+
+        Returns:
+            The result of execute
+
+        Raises:
+            QueueFull: If the queue of the priority class is full
+
+        """
+
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority}, use one of {', '.join(PRIORITIES)}")
+
+        queued = time.perf_counter()
+        self._admit(priority, client_id or "default")
+        self._record_wait(priority, time.perf_counter() - queued)
+
+        try:
+            return execute()
+        finally:
+            with self._condition:
+                self._running[priority] -= 1
+                self._dispatch()
+
+    def get_stats(self) -> Dict:
+        """
+        Gets running and queued plans, rejections and queue times per priority class
+
+        Returns:
+            Dict: Limits and stats per priority class
+
+        """
+
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_batch_concurrent": self.max_batch_concurrent,
+                "max_queue": self.max_queue,
+                "priorities": {
+                    priority: {
+                        "running": self._running[priority],
+                        "queued": self._queued[priority],
+                        "clients_queued": len(self._queues[priority]),
+                        "started": stats["started"],
+                        "rejected": stats["rejected"],
+                        "queue_seconds_mean": stats["queue_seconds"] / stats["started"] if stats["started"] else 0.0,
+                        "queue_seconds_max": stats["max_queue_seconds"],
+                    }
+                    for priority, stats in self._stats.items()
+                },
+            }
+
+    def _admit(self, priority: str, client_id: str) -> None:
+        """
+        Helper function to wait until the plan may start
+
+        """
+
+        with self._condition:
+            if self._queued[priority] >= self.max_queue:
+                self._stats[priority]["rejected"] += 1
+                metrics.inc("wayang_scheduler_rejected_total", priority=priority)
+                raise QueueFull(priority, self._queued[priority])
+
+            # Queue the plan, then let the dispatcher decide, so earlier plans keep their turn
+            ticket = {"started": False}
+            self._queues[priority].setdefault(client_id, deque()).append(ticket)
+            self._queued[priority] += 1
+            self._dispatch()
+
+            while not ticket["started"]:
+                self._condition.wait()
+
+    def _dispatch(self) -> None:
+        """
+        Helper function to start queued plans while slots are free. Called with the lock held
+
+        """
+
+        started = False
+
+        for priority in PRIORITIES:
+            while self._queues[priority] and self._has_slot(priority):
+                # Clients take turns: the first client's oldest plan starts and the client moves to the back
+                client_id, tickets = next(iter(self._queues[priority].items()))
+                ticket = tickets.popleft()
+
+                if tickets:
+                    self._queues[priority].move_to_end(client_id)
+                else:
+                    del self._queues[priority][client_id]
+
+                ticket["started"] = True
+                self._queued[priority] -= 1
+                self._running[priority] += 1
+                started = True
+
+            # Lower classes only start if no higher class is waiting
+            if self._queues[priority]:
+                break
+
+        if started:
+            self._condition.notify_all()
+
+    def _has_slot(self, priority: str) -> bool:
+        """
+        Helper function to check if a plan of the priority class may start. Called with the lock held
+
+        """
+
+        running = sum(self._running.values())
+
+        if self.max_concurrent is not None and running >= self.max_concurrent:
+            return False
+
+        if priority == "batch" and self.max_batch_concurrent is not None and self._running["batch"] >= self.max_batch_concurrent:
+            return False
+
+        return True
+
+    def _record_wait(self, priority: str, seconds: float) -> None:
+        """
+        Helper function to record the queue time of a started plan
+
+        """
+
+        with self._condition:
+            stats = self._stats[priority]
+            stats["started"] += 1
+            stats["queue_seconds"] += seconds
+            stats["max_queue_seconds"] = max(stats["max_queue_seconds"], seconds)
+
+        metrics.observe("wayang_scheduler_queue_seconds", seconds, priority=priority)
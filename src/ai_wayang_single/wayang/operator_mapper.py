@@ -1,4 +1,3 @@
-from datetime import datetime
 import os
 import urllib.parse
 
@@ -11,11 +10,12 @@ class OperatorMapper:
         self.op = operation
     
     ### Input operators
-    def jdbc_input(self, config):
+    def jdbc_input(self, config, condition=None):
         
-        # Get only relevant queries
+        # Get only relevant queries, a condition reads only a partition of the table
         columns = ", ".join(self.op.columnNames)
-        table_query = f"(SELECT {columns} FROM {self.op.table}) as X"
+        where = f" WHERE {condition}" if condition else ""
+        table_query = f"(SELECT {columns} FROM {self.op.table}{where}) as X"
 
         return {
             "id": self.op.id,
@@ -141,6 +141,54 @@ class OperatorMapper:
         }
     
 
+    def distinct(self):
+        return {
+            "id": self.op.id,
+            "cat": "unary",
+            "input": self.op.input,
+            "output": self.op.output,
+            "operatorName": "distinct",
+            "data": {}
+        }
+
+    def count(self):
+        return {
+            "id": self.op.id,
+            "cat": "unary",
+            "input": self.op.input,
+            "output": self.op.output,
+            "operatorName": "count",
+            "data": {}
+        }
+
+    def sample(self):
+        return {
+            "id": self.op.id,
+            "cat": "unary",
+            "input": self.op.input,
+            "output": self.op.output,
+            "operatorName": "sample",
+            "data": {
+                "sampleSize": self.op.sampleSize,
+                "method": "random"
+            }
+        }
+
+    def limit(self):
+        # Wayang has no limit operator, a sample of any elements doesn't draw randomly but doesn't keep a sort order either
+        return {
+            "id": self.op.id,
+            "cat": "unary",
+            "input": self.op.input,
+            "output": self.op.output,
+            "operatorName": "sample",
+            "data": {
+                "sampleSize": self.op.limit,
+                "method": "any"
+            }
+        }
+    
+
     ### Binary operators
     def join(self):
         return {
@@ -156,25 +204,31 @@ class OperatorMapper:
         }
 
 
+    def union(self):
+        return {
+            "id": self.op.id,
+            "cat": "binary",
+            "input": self.op.input,
+            "output": self.op.output,
+            "operatorName": "union",
+            "data": {}
+        }
+
+
     ### Output operators
     
-    def textfile_output(self, config):
+    def textfile_output(self, output_manager, plan_hash=None):
 
-        # Get folder output
-        folder = config["output_folder"]
+        # Get unique filename, the folder check is cached by the output manager
+        filename = output_manager.new_filename(plan_hash)
 
         # Validate if folder path exists
-        if not os.path.isdir(folder):
+        if filename is None:
             print("[Warning] Folder path don't exists. Skipping output operation")
             return None
         
         # Ensure correct folder format
-        folder = self._ensure_path_format(folder)
-
-        # Create .txt filename with current timestamp        
-        now = datetime.now()
-        timestamp = now.strftime("%Y%m%d_%H%M%S")
-        filename = f"output_{timestamp}.txt"
+        folder = self._ensure_path_format(output_manager.folder)
 
         # Create path for output file
         path = folder + filename
@@ -0,0 +1,278 @@
+from typing import Dict, List
+import os
+import threading
+import time
+import uuid
+from ai_wayang_single.utils.metrics import metrics
+
+# Seconds a folder check is trusted before the folder is checked again
+FOLDER_CHECK_TTL = 60.0
+
+# Seconds a file handed out for a plan is kept from the cleanup, unless released when the plan finishes before.
+# Plans that are mapped but never executed, e.g. rejected by the validator, are never released
+ACTIVE_FILE_TTL = 6 * 3600.0
+
+# File names of textFileOutput files, other files in the folder are never removed
+OUTPUT_PREFIX = "output_"
+OUTPUT_SUFFIX = ".txt"
+
+
+class OutputManager:
+    """
+    Names and cleans up the files written by textFileOutput operators.
+    Each mapped plan gets its own file from a random file id and the plan hash, so concurrent plans never overwrite each other.
+    Old files are removed by age, and the oldest files are removed when the folder is over its file or size quota.
+    Files of plans still executing are never removed
+
+    """
+
+    def __init__(
+        self,
+        folder: str | None = None,
+        max_age_seconds: float | None = None,
+        max_bytes: int | None = None,
+        max_files: int | None = None,
+        cleanup_interval_seconds: float = 60.0,
+    ):
+        self.folder = folder
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.cleanup_interval_seconds = cleanup_interval_seconds
+        self._lock = threading.Lock()
+        self._folder_checked = None
+        self._folder_exists = False
+        self._last_cleanup = 0.0
+        self._active = {}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "OutputManager":
+        """
+        Creates an output manager from the output config
+
+        Args:
+            config (Dict): Output config
+
+        Returns:
+            OutputManager: Output manager
+
+        """
+
+        return cls(
+            folder=config.get("output_folder"),
+            max_age_seconds=cls._optional(config.get("max_age_seconds"), float),
+            max_bytes=cls._optional(config.get("max_bytes"), int),
+            max_files=cls._optional(config.get("max_files"), int),
+            cleanup_interval_seconds=float(config.get("cleanup_interval_seconds") or 60),
+        )
+
+    def folder_exists(self) -> bool:
+        """
+        Checks if the output folder exists. The answer is cached, so mapping doesn't hit the disk for each plan
+
+        Returns:
+            bool: True if the folder exists
+
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            if self._folder_checked is None or now - self._folder_checked > FOLDER_CHECK_TTL:
+                self._folder_exists = bool(self.folder) and os.path.isdir(self.folder)
+                self._folder_checked = now
+
+            return self._folder_exists
+
+    def new_filename(self, plan_hash: str | None = None) -> str | None:
+        """
+        Gets a unique file name for the output of a plan, and runs the cleanup when it is due.
+        The file is kept from the cleanup until released
+
+        Args:
+            plan_hash (str | None): Hash of the plan, to find the output of a plan
+
+        Returns:
+            str | None: File name in the output folder, or None if the folder doesn't exist
+
+        """
+
+        if not self.folder_exists():
+            return None
+
+        self.cleanup_if_due()
+
+        file_id = uuid.uuid4().hex[:12]
+        filename = f"{OUTPUT_PREFIX}{file_id}_{plan_hash or 'noplan'}{OUTPUT_SUFFIX}"
+
+        with self._lock:
+            self._active[filename] = time.monotonic()
+
+        return filename
+
+    def release(self, plan: Dict) -> None:
+        """
+        Releases the output files of a mapped plan that finished, so the cleanup may remove them
+
+        Args:
+            plan (Dict): Mapped JSON Wayang plan
+
+        """
+
+        with self._lock:
+            for op in plan.get("operators", []):
+                if op.get("operatorName") == "textFileOutput":
+                    self._active.pop(os.path.basename((op.get("data") or {}).get("filename") or ""), None)
+
+    def cleanup_if_due(self) -> None:
+        """
+        Runs the cleanup if the cleanup interval has passed since the last run
+
+        """
+
+        # Nothing to enforce without limits
+        if self.max_age_seconds is None and self.max_bytes is None and self.max_files is None:
+            return None
+
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._last_cleanup < self.cleanup_interval_seconds:
+                return None
+
+            self._last_cleanup = now
+
+        self.cleanup()
+
+    def cleanup(self) -> Dict:
+        """
+        Removes output files older than the maximum age, then the oldest files until the folder is within its quota
+
+        Returns:
+            Dict: Removed files and bytes, and the files and bytes left
+
+        """
+
+        files = self._list_files()
+        active = self._active_files()
+        now = time.time()
+
+        # Lists to store removed and kept files
+        removed = []
+        kept = []
+
+        for entry in files:
+            if entry["name"] not in active and self.max_age_seconds is not None and now - entry["mtime"] > self.max_age_seconds:
+                removed.append(entry)
+            else:
+                kept.append(entry)
+
+        # Oldest files first until within quota. Active files count towards the quota but are kept
+        kept.sort(key=lambda entry: entry["mtime"])
+        removable = [entry for entry in kept if entry["name"] not in active]
+        total = sum(entry["size"] for entry in kept)
+
+        while removable and ((self.max_files is not None and len(kept) > self.max_files) or (self.max_bytes is not None and total > self.max_bytes)):
+            entry = removable.pop(0)
+            kept.remove(entry)
+            total -= entry["size"]
+            removed.append(entry)
+
+        # Remove files, a file may already be gone
+        removed_bytes = 0
+        for entry in removed:
+            try:
+                os.remove(entry["path"])
+                removed_bytes += entry["size"]
+            except FileNotFoundError:
+                pass
+
+        if removed:
+            print(f"[INFO] OutputManager removed {len(removed)} output files ({removed_bytes} bytes)")
+            metrics.inc("wayang_output_files_removed_total", len(removed))
+
+        return {"removed_files": len(removed), "removed_bytes": removed_bytes, "files": len(kept), "bytes": total}
+
+    def get_stats(self) -> Dict:
+        """
+        Gets the files and bytes in the output folder and the configured limits
+
+        Returns:
+            Dict: Output folder usage and limits
+
+        """
+
+        files = self._list_files()
+
+        return {
+            "folder": self.folder,
+            "files": len(files),
+            "bytes": sum(entry["size"] for entry in files),
+            "max_age_seconds": self.max_age_seconds,
+            "max_bytes": self.max_bytes,
+            "max_files": self.max_files,
+        }
+
+    def _active_files(self) -> set:
+        """
+        Helper function to get the files of plans still executing, forgetting files handed out too long ago
+
+        Returns:
+            set: File names kept from the cleanup
+
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            for filename, handed_out in list(self._active.items()):
+                if now - handed_out > ACTIVE_FILE_TTL:
+                    del self._active[filename]
+
+            return set(self._active)
+
+    def _list_files(self) -> List[Dict]:
+        """
+        Helper function to list the output files with size and modification time
+
+        Returns:
+            List[Dict]: Output files
+
+        """
+
+        if not self.folder_exists():
+            return []
+
+        # List to store files
+        files = []
+
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not (entry.name.startswith(OUTPUT_PREFIX) and entry.name.endswith(OUTPUT_SUFFIX)):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                if entry.is_file():
+                    files.append({"name": entry.name, "path": entry.path, "size": stat.st_size, "mtime": stat.st_mtime})
+
+        return files
+
+    @staticmethod
+    def _optional(value, cast):
+        """
+        Helper function to cast an optional setting
+
+        Args:
+            value: Setting value or None
+            cast: Type to cast to
+
+        Returns:
+            The cast value, or None if not set
+
+        """
+
+        return cast(value) if value not in (None, "") else None
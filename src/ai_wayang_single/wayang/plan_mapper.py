@@ -1,8 +1,20 @@
 from ai_wayang_single.llm.models import WayangOperation, WayangPlan
 from ai_wayang_single.wayang.operator_mapper import OperatorMapper
-from typing import List
+from ai_wayang_single.wayang.output_manager import OutputManager
+from ai_wayang_single.utils.metrics import metrics
+from ai_wayang_single.utils.tracer import tracer
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List
+import hashlib
 import json
+import math
+import os
 import re
+import threading
+
+# Hash of the plan currently mapped in this thread or task, used to name its output file
+_current_plan_hash = ContextVar("current_plan_hash", default=None)
 
 class PlanMapper:
     """
@@ -11,8 +23,20 @@ class PlanMapper:
 
     """
 
-    def __init__(self, config):
+    def __init__(self, config, data_folder: str | Path | None = None):
         self.config = config
+        self.output_manager = OutputManager.from_config(self.config["output_config"])
+
+        # Partitioned JDBC reads of large tables, from the key statistics in the table schemas
+        partition_config = self.config.get("partition_config") or {}
+        self.partition_reads_enabled = partition_config.get("partition_reads") == "True"
+        self.partitions = int(partition_config.get("partitions") or 4)
+        self.partition_min_rows = int(partition_config.get("min_rows") or 0)
+        self.partition_strategy = partition_config.get("strategy") or "range"
+        self.data_folder = Path(data_folder) if data_folder else Path(__file__).resolve().parent.parent.parent.parent / "data"
+        self._table_stats = None
+        self._partition_stats = {"plans": 0, "reads": 0, "partitions_read": 0, "tables": {}}
+        self._lock = threading.Lock()
 
         self.operator_map = {
 
@@ -28,12 +52,17 @@ class PlanMapper:
             "reduceBy": lambda op: OperatorMapper(op).reduceby(),
             "groupBy": lambda op: OperatorMapper(op).groupby(),
             "sort": lambda op: OperatorMapper(op).sort(),
+            "distinct": lambda op: OperatorMapper(op).distinct(),
+            "count": lambda op: OperatorMapper(op).count(),
+            "sample": lambda op: OperatorMapper(op).sample(),
+            "limit": lambda op: OperatorMapper(op).limit(),
 
             # Binary operators
             "join": lambda op: OperatorMapper(op).join(),
+            "union": lambda op: OperatorMapper(op).union(),
 
             # Output operators
-            "textFileOutput": lambda op: OperatorMapper(op).textfile_output(self.config["output_config"])
+            "textFileOutput": lambda op: OperatorMapper(op).textfile_output(self.output_manager, _current_plan_hash.get())
         }
         
 
@@ -49,6 +78,15 @@ class PlanMapper:
 
         """
 
+        with tracer.span("PlanMapper.plan_to_json", {"plan.operator_count": len(getattr(plan, "operations", []))}):
+            return self._plan_to_json(plan)
+
+    def _plan_to_json(self, plan: WayangPlan):
+        """
+        Helper function to map an abstract plan, see plan_to_json
+
+        """
+
         # Check if input plan is a WayangPlan model
         if not isinstance(plan, WayangPlan):
             raise ValueError("Abstract, raw plan must be in WayangPlan format")
@@ -59,8 +97,12 @@ class PlanMapper:
         # Filter operators in abstract plan
         operations = plan.operations
 
-        # Map operators
-        mapped_operators = self._map_operators(operations)
+        # Map operators, output files are named after the plan hash
+        token = _current_plan_hash.set(self.plan_hash(plan))
+        try:
+            mapped_operators = self._map_operators(operations)
+        finally:
+            _current_plan_hash.reset(token)
 
         # Add operators to JSON plan
         mapped_plan["operators"] = mapped_operators
@@ -69,6 +111,22 @@ class PlanMapper:
         return mapped_plan
     
 
+    def plan_hash(self, plan: WayangPlan) -> str:
+        """
+        Hashes the operations of an abstract plan, so equal plans get the same hash
+
+        Args:
+            plan (WayangPlan): Abstract WayangPlan
+
+        Returns:
+            str: Short hash of the operations
+
+        """
+
+        operations = json.dumps([op.model_dump() for op in plan.operations], sort_keys=True, default=str)
+
+        return hashlib.sha256(operations.encode("utf-8")).hexdigest()[:12]
+
     def plan_from_json(self, plan: str) -> WayangPlan:
         """
         Converts a JSON Wayang plan to a more simple, abstract WayangPlan easier for modification.
@@ -112,6 +170,11 @@ class PlanMapper:
                     if match:
                         op_data["table"] = match.group(1)
 
+                # A sample of any elements is a limit
+                if op_data.get("operatorName") == "sample" and flat_op_data.get("method") == "any":
+                    op_data["operatorName"] = "limit"
+                    op_data["limit"] = op_data.pop("sampleSize", None)
+
                 # Append to the operation list
                 operations.append(WayangOperation(**op_data))
             
@@ -122,6 +185,285 @@ class PlanMapper:
             raise ValueError("[Error] Not a correctly formatted JSON-plan")
 
 
+    def map_operation(self, op: WayangOperation) -> dict | None:
+        """
+        Maps a single operation, e.g. while a plan is still being streamed
+
+        Args:
+            op (WayangOperation): Operation to be mapped
+
+        Returns:
+            dict | None: Mapped operation, None if it was skipped
+
+        Raises:
+            ValueError: If the operator isn't supported
+
+        """
+
+        if op.operatorName not in self.operator_map:
+            raise ValueError(f"Operator {op.operatorName} is not supported")
+
+        return self.operator_map[op.operatorName](op)
+
+
+    def partition_reads(self, plan: Dict) -> Dict:
+        """
+        Splits JDBC reads of large tables into partitions, each read over its own connection, combined again by unions.
+        Partitions are key ranges from the min and max of the table's key column, or hashes of the key.
+        Consumers of a read take the last union as input instead. The operators are then sorted so inputs come first,
+        and renumbered so input ids stay smaller than operation ids
+
+        Args:
+            plan (Dict): Mapped JSON Wayang plan
+
+        Returns:
+            Dict: Plan with partitioned reads, the same plan if no read is large enough
+
+        """
+
+        if not self.partition_reads_enabled or self.partitions < 2:
+            return plan
+
+        operators = plan.get("operators", [])
+
+        # New ids follow the highest id in the plan, the plan is renumbered at the end
+        next_id = max((op["id"] for op in operators), default=0) + 1
+
+        # List to store operators of the partitioned plan
+        partitioned = []
+        tables = []
+
+        # Dict to store the last union replacing each partitioned read
+        replaced = {}
+
+        for op in operators:
+            stats = self._partition_table(op)
+
+            if stats is None:
+                partitioned.append(op)
+                continue
+
+            conditions = self._partition_conditions(stats)
+
+            # Skip tables with fewer keys than partitions
+            if len(conditions) < 2:
+                partitioned.append(op)
+                continue
+
+            # A read per partition
+            reads = []
+
+            for condition in conditions:
+                read = WayangOperation(cat="input", id=next_id, operatorName="jdbcRemoteInput", table=stats["table"], columnNames=list(op["data"]["columnNames"]))
+                reads.append(OperatorMapper(read).jdbc_input(self.config["input_config"], condition))
+                next_id += 1
+
+            # Combine pairwise, so no union waits on a long chain
+            level = reads
+            unions = []
+
+            while len(level) > 2:
+                combined = []
+
+                for left, right in zip(level[0::2], level[1::2]):
+                    union = OperatorMapper(WayangOperation(cat="binary", id=next_id, operatorName="union", input=[left["id"], right["id"]])).union()
+                    left["output"] = right["output"] = [next_id]
+                    unions.append(union)
+                    combined.append(union)
+                    next_id += 1
+
+                # Odd one out joins the next level
+                if len(level) % 2:
+                    combined.append(level[-1])
+
+                level = combined
+
+            # Last union replaces the read
+            last = OperatorMapper(WayangOperation(cat="binary", id=next_id, operatorName="union", input=[level[0]["id"], level[1]["id"]], output=list(op["output"]))).union()
+            level[0]["output"] = level[1]["output"] = [next_id]
+            replaced[op["id"]] = next_id
+            next_id += 1
+
+            partitioned += reads + unions + [last]
+            tables.append((stats["table"], len(reads)))
+
+        if not tables:
+            return plan
+
+        # Consumers of a partitioned read now read from its last union
+        partitioned = [{**op, "input": [replaced.get(input_id, input_id) for input_id in op.get("input", [])]} for op in partitioned]
+
+        with self._lock:
+            self._partition_stats["plans"] += 1
+
+            for table, count in tables:
+                self._partition_stats["reads"] += 1
+                self._partition_stats["partitions_read"] += count
+                self._partition_stats["tables"][table] = self._partition_stats["tables"].get(table, 0) + 1
+
+        for table, count in tables:
+            metrics.inc("wayang_partitioned_reads_total", table=table)
+            print(f"[INFO] Read of {table} split into {count} partitions")
+
+        return {**plan, "operators": self._renumber(partitioned)}
+
+    def get_partition_stats(self) -> Dict:
+        """
+        Gets partition settings, the tables that can be partitioned and the partitioned reads so far
+
+        Returns:
+            Dict: Settings and stats
+
+        """
+
+        with self._lock:
+            stats = json.loads(json.dumps(self._partition_stats))
+
+        return {
+            "enabled": self.partition_reads_enabled,
+            "partitions": self.partitions,
+            "min_rows": self.partition_min_rows,
+            "strategy": self.partition_strategy,
+            "partitionable_tables": {
+                table: data for table, data in self._get_table_stats().items()
+                if data.get("partition_key") and (data.get("row_count") or 0) >= self.partition_min_rows
+            },
+            **stats,
+        }
+
+    def reload_table_stats(self) -> None:
+        """
+        Reloads table statistics from the table schemas on next use, e.g. after load_schemas
+
+        """
+
+        with self._lock:
+            self._table_stats = None
+
+    def _partition_table(self, op: Dict) -> Dict | None:
+        """
+        Helper function to get the statistics of the table read by an operator, if the read should be partitioned
+
+        """
+
+        if op.get("operatorName") != "jdbcRemoteInput":
+            return None
+
+        data = op.get("data") or {}
+        match = re.fullmatch(r"\(SELECT\s+.+\s+FROM\s+([a-zA-Z0-9_]+)\)\s+as\s+X", data.get("table", ""), re.IGNORECASE | re.DOTALL)
+
+        # Only whole table reads from the mapper, not reads already filtered or partitioned
+        if not match or not data.get("columnNames"):
+            return None
+
+        table = match.group(1)
+        stats = self._get_table_stats().get(table) or self._get_table_stats().get(table.lower()) or {}
+
+        if not stats.get("partition_key") or (stats.get("row_count") or 0) < self.partition_min_rows:
+            return None
+
+        return {"table": table, **stats["partition_key"]}
+
+    def _partition_conditions(self, stats: Dict) -> List[str]:
+        """
+        Helper function to get the WHERE condition of each partition.
+        The first and last range are open, so keys outside stale statistics are still read. Null keys go to the first partition
+
+        """
+
+        column = stats["column"]
+
+        if self.partition_strategy == "hash":
+            conditions = [f"MOD(ABS({column}), {self.partitions}) = {i}" for i in range(self.partitions)]
+        else:
+            # Bounds of equally wide key ranges, fewer ranges for tables with few keys
+            width = (stats["max"] - stats["min"] + 1) / self.partitions
+            bounds = sorted({stats["min"] + math.ceil(i * width) for i in range(1, self.partitions)} - {stats["min"]})
+
+            if not bounds:
+                return []
+
+            conditions = [f"{column} < {bounds[0]}"]
+            conditions += [f"{column} >= {low} AND {column} < {high}" for low, high in zip(bounds, bounds[1:])]
+            conditions.append(f"{column} >= {bounds[-1]}")
+
+        conditions[0] = f"({conditions[0]} OR {column} IS NULL)"
+
+        return [f"{condition} /* partition {i + 1} of {len(conditions)} */" for i, condition in enumerate(conditions)]
+
+    def _renumber(self, operators: List[Dict]) -> List[Dict]:
+        """
+        Helper function to sort operators so every operator follows its inputs, and number them from 1 in that order.
+        Operators keep their relative order where the inputs allow it
+
+        """
+
+        # Number of unsorted inputs of each operator
+        ids = {op["id"] for op in operators}
+        waiting = {op["id"]: len([i for i in op.get("input", []) if i in ids]) for op in operators}
+
+        # List to store sorted operators
+        ordered = []
+        remaining = list(operators)
+
+        while remaining:
+            ready = next((op for op in remaining if waiting[op["id"]] == 0), None)
+
+            # A cycle can't be sorted, leave the rest as it is for Wayang to report
+            if ready is None:
+                ordered += remaining
+                break
+
+            remaining.remove(ready)
+            ordered.append(ready)
+
+            for op in remaining:
+                waiting[op["id"]] -= op.get("input", []).count(ready["id"])
+
+        numbers = {op["id"]: number for number, op in enumerate(ordered, start=1)}
+
+        return [
+            {
+                **op,
+                "id": numbers[op["id"]],
+                "input": [numbers.get(i, i) for i in op.get("input", [])],
+                "output": [numbers.get(i, i) for i in op.get("output", [])],
+            }
+            for op in ordered
+        ]
+
+    def _get_table_stats(self) -> Dict[str, Dict]:
+        """
+        Helper function to get row counts and partition keys from the table schemas, loaded on first use
+
+        """
+
+        with self._lock:
+            if self._table_stats is not None:
+                return self._table_stats
+
+        # Dict to store stats
+        stats = {}
+
+        for root, _, files in os.walk(self.data_folder / "schemas" / "tables"):
+            for file in files:
+                if not file.endswith(".json"):
+                    continue
+
+                try:
+                    with open(os.path.join(root, file), "r", encoding="utf-8") as f:
+                        schema = json.load(f)
+                except (OSError, ValueError):
+                    continue
+
+                for table, data in schema.items():
+                    stats[table] = {key: data[key] for key in ("row_count", "size_bytes", "partition_key") if data.get(key) is not None}
+
+        with self._lock:
+            self._table_stats = stats
+
+        return stats
+
     def _new_plan(self):
         """
         Initialize a new JSON Wayang plan
@@ -0,0 +1,443 @@
+from pathlib import Path
+from typing import List, Dict
+from datetime import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+from ai_wayang_single.config.settings import TEMPLATE_CONFIG
+from ai_wayang_single.llm.models import WayangPlan
+from ai_wayang_single.utils.shared_store import SharedStore
+
+# Fields of an operation where parameter slots can be placed
+SLOT_FIELDS = ("udf", "keyUdf", "thisKeyUdf", "thatKeyUdf", "table", "inputFileName")
+
+# Literals in queries, most specific first. Quoted strings, dates, decimals and integers
+LITERAL_PATTERNS = [
+    ("string", re.compile(r"'([^']+)'|\"([^\"]+)\"")),
+    ("date", re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")),
+    ("float", re.compile(r"(?<![\w.])(-?\d+\.\d+)(?![\w.])")),
+    ("int", re.compile(r"(?<![\w.])(-?\d+)(?![\w.])")),
+]
+
+# Regex to capture each slot type in a query
+SLOT_REGEX = {
+    "string": r"(?P<{name}>[^'\"]+)",
+    "date": r"(?P<{name}>\d{{4}}-\d{{2}}-\d{{2}})",
+    "float": r"(?P<{name}>-?\d+\.\d+)",
+    "int": r"(?P<{name}>-?\d+)",
+    "table": r"(?P<{name}>[A-Za-z_]\w*)",
+}
+
+# Namespace of templates in the shared store
+SHARED_NAMESPACE = "templates"
+
+
+class PlanTemplateLibrary:
+    """
+    Library of parameterized plan templates for recurring query shapes.
+    Successful plans are generalized into templates with typed parameter slots for literals and table names.
+    New queries matching a template get the slots filled, so the plan can be mapped without calling the LLM.
+    With a shared store file, templates are kept there instead of the template file, so all workers learn from each other
+
+    """
+
+    def __init__(self, template_file: str | None = None, max_failures: int | None = None, data_folder: str | Path | None = None, shared_store: SharedStore | None = None):
+        self.template_file = template_file or TEMPLATE_CONFIG.get("template_file")
+        self.max_failures = max_failures or int(TEMPLATE_CONFIG.get("max_failures"))
+        self.data_folder = Path(data_folder) if data_folder else Path(__file__).resolve().parent.parent.parent.parent / "data"
+        self.shared_store = shared_store if shared_store is not None and shared_store.shared else None
+        self.table_columns = self._load_table_columns()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.templates = self._load_templates()
+
+    def add(self, query: str, plan: WayangPlan) -> str:
+        """
+        Generalizes a successful plan into a template and adds it to the library
+
+        Args:
+            query (str): The natural-language query the plan answers
+            plan (WayangPlan): The successful plan
+
+        Returns:
+            str: Id of the template
+
+        """
+
+        # Normalize whitespace so small formatting differences still match
+        query = " ".join(query.split())
+        plan_dict = plan.model_dump()
+
+        # Find literals in the query which are also used in the plan
+        slots = []
+        pattern_parts = []
+        last_end = 0
+
+        for start, end, slot_type, value in self._find_literals(query):
+            name = f"p{len(slots)}"
+
+            # Only literals used in the plan become slots
+            if not self._replace_in_plan(plan_dict, slot_type, value, "{{" + name + "}}"):
+                continue
+
+            # Keep quotes around string literals in the pattern
+            quote = query[start] if slot_type == "string" else ""
+
+            pattern_parts.append(re.escape(query[last_end:start]))
+            pattern_parts.append(re.escape(quote) + SLOT_REGEX[slot_type].format(name=name) + re.escape(quote))
+            last_end = end
+            slots.append({"name": name, "type": slot_type, "example": value})
+
+        pattern_parts.append(re.escape(query[last_end:]))
+
+        # Allow any amount of whitespace where the query had whitespace
+        pattern = "".join(pattern_parts).replace(r"\ ", r"\s+")
+
+        template_id = hashlib.sha1(pattern.encode("utf-8")).hexdigest()[:12]
+
+        with self._lock:
+            # Replace existing template for the same query shape
+            self.templates[template_id] = {
+                "id": template_id,
+                "pattern": pattern,
+                "slots": slots,
+                "plan": plan_dict,
+                "hits": self.templates.get(template_id, {}).get("hits", 0),
+                "failures": 0,
+                "created": datetime.now().strftime("%Y%m%d_%H%M%S"),
+            }
+
+            self._save_template(template_id)
+
+        return template_id
+
+    def match(self, query: str) -> Dict | None:
+        """
+        Finds a template matching the query and fills its slots
+
+        Args:
+            query (str): A query in natural language
+
+        Returns:
+            Dict | None: Template id, parameters and the filled WayangPlan, or None if no template matches
+
+        """
+
+        query = " ".join(query.split())
+
+        with self._lock:
+            # Pick up templates added or removed by other workers
+            self._sync()
+
+            # Try most used templates first
+            templates = sorted(self.templates.values(), key=lambda t: t["hits"], reverse=True)
+
+        for template in templates:
+            match = re.fullmatch(template["pattern"], query, re.IGNORECASE)
+
+            if not match:
+                continue
+
+            params = match.groupdict()
+
+            # Table slots must be known tables with the columns used by the plan
+            if not self._valid_tables(template, params):
+                continue
+
+            # Fill slots in a copy of the plan
+            plan_dict = json.loads(json.dumps(template["plan"]))
+            for slot in template["slots"]:
+                self._fill_in_plan(plan_dict, "{{" + slot["name"] + "}}", params[slot["name"]])
+
+            with self._lock:
+                template["hits"] += 1
+                self._save_template(template["id"])
+
+            return {
+                "template_id": template["id"],
+                "params": params,
+                "wayang_plan": WayangPlan(**plan_dict),
+            }
+
+        return None
+
+    def record_failure(self, template_id: str) -> None:
+        """
+        Records a failed plan from a template. Templates failing too often are removed
+
+        Args:
+            template_id (str): Id of the template
+
+        """
+
+        with self._lock:
+            template = self.templates.get(template_id)
+
+            if not template:
+                return None
+
+            template["failures"] += 1
+
+            if template["failures"] >= self.max_failures:
+                print(f"[INFO] Template {template_id} removed after {template['failures']} failures")
+                del self.templates[template_id]
+
+            self._save_template(template_id)
+
+    def clear(self) -> None:
+        """
+        Removes all templates, e.g. if schemas changed
+
+        """
+
+        with self._lock:
+            self.templates = {}
+
+            if self.shared_store:
+                self.shared_store.clear(SHARED_NAMESPACE)
+            else:
+                self._save_templates()
+
+    def reload_schemas(self) -> int:
+        """
+        Reloads table columns from the table schemas and removes templates using tables or columns that are gone
+
+        Returns:
+            int: Removed templates
+
+        """
+
+        table_columns = self._load_table_columns()
+
+        with self._lock:
+            self.table_columns = table_columns
+
+            # Tables and columns read with fixed names, table slots are checked when matched
+            stale = [
+                template_id for template_id, template in self.templates.items()
+                if any(
+                    op.get("table") and "{{" not in op["table"]
+                    and (op["table"].lower() not in table_columns or not set(op.get("columnNames") or []).issubset(table_columns[op["table"].lower()]))
+                    for op in template["plan"]["operations"]
+                )
+            ]
+
+            for template_id in stale:
+                del self.templates[template_id]
+                self._save_template(template_id)
+
+        return len(stale)
+
+    def _find_literals(self, query: str) -> List:
+        """
+        Helper function to find literals and table names in a query
+
+        Args:
+            query (str): A normalized query
+
+        Returns:
+            List: Tuples of (start, end, type, value) ordered by position, without overlaps
+
+        """
+
+        # List to store literals
+        literals = []
+        taken = set()
+
+        # Literals, most specific type first
+        for slot_type, pattern in LITERAL_PATTERNS:
+            for match in pattern.finditer(query):
+                span = range(match.start(), match.end())
+
+                if taken.intersection(span):
+                    continue
+
+                value = next(g for g in match.groups() if g is not None)
+                literals.append((match.start(), match.end(), slot_type, value))
+                taken.update(span)
+
+        # Table names
+        for match in re.finditer(r"[A-Za-z_]\w*", query):
+            if match.group(0).lower() in self.table_columns and not taken.intersection(range(match.start(), match.end())):
+                literals.append((match.start(), match.end(), "table", match.group(0)))
+
+        return sorted(literals)
+
+    def _replace_in_plan(self, plan_dict: Dict, slot_type: str, value: str, placeholder: str) -> bool:
+        """
+        Helper function to replace a literal with a placeholder in the slot fields of a plan
+
+        Args:
+            plan_dict (Dict): Plan as dict, changed in place
+            slot_type (str): Type of the slot
+            value (str): Literal value from the query
+            placeholder (str): Placeholder to insert
+
+        Returns:
+            bool: True if the literal was found in the plan
+
+        """
+
+        found = False
+
+        # Numbers must stand alone, so e.g. getField(1) or t._1 is not replaced
+        if slot_type in ("int", "float"):
+            pattern = re.compile(r"(?<![\w.(_])" + re.escape(value) + r"(?![\w.])")
+        elif slot_type == "table":
+            pattern = re.compile(r"\b" + re.escape(value) + r"\b", re.IGNORECASE)
+        else:
+            pattern = re.compile(re.escape(value))
+
+        for op in plan_dict["operations"]:
+            for field in SLOT_FIELDS:
+                # Table slots only in table fields, other slots only in code
+                if (field == "table") != (slot_type == "table") or not op.get(field):
+                    continue
+
+                replaced, count = pattern.subn(placeholder, op[field])
+
+                if count:
+                    op[field] = replaced
+                    found = True
+
+        return found
+
+    def _fill_in_plan(self, plan_dict: Dict, placeholder: str, value: str) -> None:
+        """
+        Helper function to fill a placeholder in the slot fields of a plan
+
+        Args:
+            plan_dict (Dict): Plan as dict, changed in place
+            placeholder (str): Placeholder to fill
+            value (str): Value to insert
+
+        """
+
+        for op in plan_dict["operations"]:
+            for field in SLOT_FIELDS:
+                if op.get(field):
+                    op[field] = op[field].replace(placeholder, value)
+
+    def _valid_tables(self, template: Dict, params: Dict) -> bool:
+        """
+        Helper function to check table slots refer to known tables with the columns the plan uses
+
+        Args:
+            template (Dict): The matched template
+            params (Dict): Slot values from the query
+
+        Returns:
+            bool: True if all table slots are valid
+
+        """
+
+        for slot in template["slots"]:
+            if slot["type"] != "table":
+                continue
+
+            table = params[slot["name"]].lower()
+
+            if table not in self.table_columns:
+                return False
+
+            # Columns read from the table slot must exist in the new table
+            for op in template["plan"]["operations"]:
+                if op.get("table") == "{{" + slot["name"] + "}}":
+                    if not set(op.get("columnNames") or []).issubset(self.table_columns[table]):
+                        return False
+
+        return True
+
+    def _load_table_columns(self) -> Dict:
+        """
+        Helper function to load table names and columns from the table schemas
+
+        Returns:
+            Dict: Lower-cased table name to set of column names
+
+        """
+
+        # Dict to store tables
+        tables = {}
+
+        table_folder = self.data_folder / "schemas" / "tables"
+
+        for root, _, files in os.walk(table_folder):
+            for file in files:
+                if not file.endswith(".json"):
+                    continue
+
+                with open(os.path.join(root, file), "r", encoding="utf-8") as f:
+                    schema = json.load(f)
+
+                for table, data in schema.items():
+                    tables[table.lower()] = set(data.get("columns", {}).keys())
+
+        return tables
+
+    def _load_templates(self) -> Dict:
+        """
+        Helper function to load templates from the shared store or the template file if any
+
+        Returns:
+            Dict: Templates by id
+
+        """
+
+        if self.shared_store:
+            self._version = self.shared_store.version(SHARED_NAMESPACE)
+            return self.shared_store.items(SHARED_NAMESPACE)
+
+        if not self.template_file or not os.path.exists(self.template_file):
+            return {}
+
+        with open(self.template_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_templates(self) -> None:
+        """
+        Helper function to save templates to the template file if any
+
+        """
+
+        if not self.template_file:
+            return None
+
+        with open(self.template_file, "w", encoding="utf-8") as f:
+            json.dump(self.templates, f, indent=4)
+
+    def _save_template(self, template_id: str) -> None:
+        """
+        Helper function to save an added, changed or removed template. Called with the lock held
+
+        Args:
+            template_id (str): Id of the template
+
+        """
+
+        if not self.shared_store:
+            self._save_templates()
+            return None
+
+        template = self.templates.get(template_id)
+
+        if template is None:
+            self.shared_store.delete(SHARED_NAMESPACE, template_id)
+        else:
+            self.shared_store.set(SHARED_NAMESPACE, template_id, template)
+
+        # Skip reloading our own change, unless another worker changed templates in between
+        version = self.shared_store.version(SHARED_NAMESPACE)
+        if version == self._version + 1:
+            self._version = version
+
+    def _sync(self) -> None:
+        """
+        Helper function to reload templates if another worker changed them. Called with the lock held
+
+        """
+
+        if self.shared_store and self.shared_store.version(SHARED_NAMESPACE) != self._version:
+            self.templates = self._load_templates()
@@ -1,3 +1,5 @@
+from ai_wayang_single.utils.tracer import tracer
+
 class PlanValidator:
     """
     Validates Wayang plans
@@ -7,68 +9,123 @@ class PlanValidator:
         """
         Validates a JSON Wayang Plan to verify it is executable in Wayang server
 
+        """
+
+        with tracer.span("PlanValidator.validate_plan", {"plan.operator_count": len(plan.get("operators", []))}) as span:
+            valid, errors = self._validate_plan(plan)
+
+            # Record validation result
+            span.set_attribute("validation.valid", valid)
+            span.set_attribute("validation.error_count", len(errors))
+
+        return valid, errors
+
+    def _validate_plan(self, plan):
+        """
+        Helper function to validate each operation of a plan
+
         """
         
         # List for errors found
         errors = []
         
         # Go over each operation
-        for i, operation in enumerate(plan.get("operators", [])):
-            try:
-                # Get parameters
-                op_id = int(operation.get("id", -1))
-                op_input = operation.get("input", [])
-                op_output = operation.get("output", [])
-                op_cat = operation.get("cat", None)
-
-                # Check that op_id is larger than zero
-                if op_id > 0:
-                    dummy = None
-                else:
-                    errors.append(f"Operation id {op_id}: ID must be larger than zero and a number")
-
-                # Check input ids are lower than id
-                for input_id in op_input:
-                    if input_id >= op_id:
-                        errors.append(f"Operation id {op_id}: Input id {input_id} ≥ operation id. Input ids must be smaller than operation id")
-
-                # Check output ids are higher than id
-                for output_id in op_output:
-                    if output_id <= op_id:
-                        errors.append(f"Operation id {op_id}: Output id {output_id} ≤ operation id. Output ids must be larger than operation id")
-                
-                if op_cat == "unary":
-
-                    # Check that operator have a single input
-                    if len(op_output) < 1 and i != len(plan["operators"]) - 1:
-                        if i != len(plan["operators"]) - 2:
-                            errors.append(f"Operation id {op_id}: Missing output operator")
-
-                    # Check if input operator is longer than one
-                    if len(op_input) != 1:
-                        errors.append(f"Operation id {op_id}: Unary operators can only have one input id")
-
-                    # Check if there is more than one output operator
-                    if len(op_output) > 1:
-                        errors.append(f"Operation id {op_id}: Unary operators can only have up to one output id")
-                                  
-                if op_cat == "binary":
-
-                    # Must have an output id if it is not the last operation
-                    if len(op_output) < 1 and i != len(plan["operators"]) - 1:
-                        if i != len(plan["operators"]) - 2:
-                            errors.append(f"Operation id {op_id}: Missing output operator") 
-                    
-                    # Check that operators have two inputs
-                    if len(op_input) != 2:
-                        errors.append(f"Operation id {op_id}: Binary operators must have two input ids")
-
-            except Exception as e:
-                errors.append(f"Operation id {op_id}: Unexpected error - {e}")
+        operators = plan.get("operators", [])
+        for i, operation in enumerate(operators):
+            errors += self._validate_operation(operation, near_end=i >= len(operators) - 2)
 
         # If any errors, return false and the erros
         if errors:
             return False, errors
         # Else return true and an empty error list
         else:
-            return True, []
\ No newline at end of file
+            return True, []
+
+    def validate_operation(self, operation):
+        """
+        Validates a single JSON Wayang operation, e.g. while a plan is still being streamed.
+        Missing output ids aren't checked, since it isn't known yet which operations end the plan
+
+        Args:
+            operation (dict): Mapped operation
+
+        Returns:
+            List[str]: Errors found, empty if none
+
+        """
+
+        return self._validate_operation(operation, near_end=None)
+
+    def _validate_operation(self, operation, near_end):
+        """
+        Helper function to validate an operation
+
+        Args:
+            operation (dict): Mapped operation
+            near_end (bool | None): True if it is one of the last two operations, None if unknown
+
+        Returns:
+            List[str]: Errors found
+
+        """
+
+        # List for errors found
+        errors = []
+        op_id = operation.get("id", -1)
+
+        try:
+            # Get parameters
+            op_id = int(operation.get("id", -1))
+            op_input = operation.get("input", [])
+            op_output = operation.get("output", [])
+            op_cat = operation.get("cat", None)
+            op_name = operation.get("operatorName", None)
+
+            # Check samples and limits have a size
+            if op_name == "sample":
+                sample_size = (operation.get("data") or {}).get("sampleSize")
+                if not isinstance(sample_size, int) or isinstance(sample_size, bool) or sample_size < 1:
+                    errors.append(f"Operation id {op_id}: sampleSize of a sample, or limit of a limit, must be a whole number larger than zero")
+
+            # Check that op_id is larger than zero
+            if op_id <= 0:
+                errors.append(f"Operation id {op_id}: ID must be larger than zero and a number")
+
+            # Check input ids are lower than id
+            for input_id in op_input:
+                if input_id >= op_id:
+                    errors.append(f"Operation id {op_id}: Input id {input_id} ≥ operation id. Input ids must be smaller than operation id")
+
+            # Check output ids are higher than id
+            for output_id in op_output:
+                if output_id <= op_id:
+                    errors.append(f"Operation id {op_id}: Output id {output_id} ≤ operation id. Output ids must be larger than operation id")
+
+            if op_cat == "unary":
+
+                # Check that operator have a single input
+                if len(op_output) < 1 and near_end is False:
+                    errors.append(f"Operation id {op_id}: Missing output operator")
+
+                # Check if input operator is longer than one
+                if len(op_input) != 1:
+                    errors.append(f"Operation id {op_id}: Unary operators can only have one input id")
+
+                # Check if there is more than one output operator
+                if len(op_output) > 1:
+                    errors.append(f"Operation id {op_id}: Unary operators can only have up to one output id")
+
+            if op_cat == "binary":
+
+                # Must have an output id if it is not the last operation
+                if len(op_output) < 1 and near_end is False:
+                    errors.append(f"Operation id {op_id}: Missing output operator")
+
+                # Check that operators have two inputs
+                if len(op_input) != 2:
+                    errors.append(f"Operation id {op_id}: Binary operators must have two input ids")
+
+        except Exception as e:
+            errors.append(f"Operation id {op_id}: Unexpected error - {e}")
+
+        return errors
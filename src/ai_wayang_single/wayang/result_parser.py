@@ -0,0 +1,310 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import csv
+import importlib.util
+import pandas as pd
+from pandas import DataFrame
+from ai_wayang_single.config.settings import RESULT_CONFIG
+
+# Wrapper around a whole output line, e.g. (1,2), [1, 2] or Record(1, 2)
+LINE_WRAPPER = r"^\s*(?:Record)?[\(\[](.*)[\)\]]\s*$"
+
+# Parentheses of nested tuples, e.g. (key,(a,b)), which are flattened to columns
+NESTED_PARENTHESES = r"[()]"
+
+# Lines read at a time when parsing a result file
+PARSE_CHUNK_LINES = 100_000
+
+# ISO dates as written by Wayang for SQL dates
+ISO_DATE = r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?)?$"
+
+
+class ResultParser:
+    """
+    Parses Wayang output lines into typed columns and summarizes them.
+    Lines are Scala tuple or Record toString output, so cells are split on commas and typed per column
+    as numbers, dates, booleans or text. All steps are vectorized with pandas
+
+    """
+
+    def __init__(self, top_k: int | None = None):
+        self.top_k = top_k or int(RESULT_CONFIG.get("summary_top_k"))
+
+    def parse_lines(self, lines: Iterable[str], columns: List[str] | None = None) -> DataFrame:
+        """
+        Parses output lines into a table
+
+        Args:
+            lines (Iterable[str]): Output lines
+            columns (List[str] | None): Column names. Defaults to c0, c1, ...
+
+        Returns:
+            DataFrame: Typed table with a row per non-empty line
+
+        """
+
+        return self._parse(pd.Series(list(lines), dtype="string"), columns)
+
+    def parse_text(self, text: str, columns: List[str] | None = None) -> DataFrame:
+        """
+        Parses a whole output into a table
+
+        Args:
+            text (str): Output from Wayang
+            columns (List[str] | None): Column names. Defaults to c0, c1, ...
+
+        Returns:
+            DataFrame: Typed table with a row per non-empty line
+
+        """
+
+        return self.parse_lines(text.splitlines(), columns)
+
+    def parse_file(self, path: str | Path, columns: List[str] | None = None) -> DataFrame:
+        """
+        Parses an output file into a table, reading it in chunks of lines
+
+        Args:
+            path (str | Path): Output file, e.g. from the result store
+            columns (List[str] | None): Column names. Defaults to c0, c1, ...
+
+        Returns:
+            DataFrame: Typed table with a row per non-empty line
+
+        """
+
+        # Read whole lines without any csv handling, the line wrappers are parsed afterwards
+        reader = pd.read_csv(
+            path,
+            sep="\x1f",
+            header=None,
+            names=["line"],
+            dtype="string",
+            quoting=csv.QUOTE_NONE,
+            skip_blank_lines=True,
+            keep_default_na=False,
+            chunksize=PARSE_CHUNK_LINES,
+            encoding_errors="replace",
+        )
+
+        # Split each chunk to cells as text, types are inferred once over all rows
+        chunks = [self._split(chunk["line"]) for chunk in reader]
+
+        if not chunks:
+            return DataFrame(columns=columns or [])
+
+        cells = pd.concat([cells for cells, _ in chunks], ignore_index=True)
+        widths = pd.concat([widths for _, widths in chunks], ignore_index=True)
+
+        return self._type_columns(cells, columns, widths)
+
+    def summarize(self, table: DataFrame, top_k: int | None = None) -> Dict:
+        """
+        Summarizes a table with row count and per-column statistics
+
+        Args:
+            table (DataFrame): Parsed table
+            top_k (int | None): Number of most frequent values per column
+
+        Returns:
+            Dict: Rows, whether the columns are reliable, and per column its type, nulls, distinct values, min, max, mean (numbers) and top values
+
+        """
+
+        top_k = top_k or self.top_k
+
+        # List to store column summaries
+        columns = []
+
+        for name in table.columns:
+            column = table[name]
+            values = column.dropna()
+
+            summary = {
+                "name": str(name),
+                "type": self._type_name(column),
+                "nulls": int(column.isna().sum()),
+                "distinct": int(values.nunique()),
+            }
+
+            # Range of numbers and dates, mean only for numbers
+            if len(values) and summary["type"] in ("integer", "float", "date"):
+                summary["min"] = self._scalar(values.min())
+                summary["max"] = self._scalar(values.max())
+
+                if summary["type"] != "date":
+                    summary["mean"] = round(float(values.mean()), 6)
+
+            # Most frequent values
+            counts = values.value_counts().head(top_k)
+            summary["top"] = [{"value": self._scalar(value), "count": int(count)} for value, count in counts.items()]
+
+            columns.append(summary)
+
+        # Cells are split on every comma, so rows with commas inside text shift their columns
+        irregular_rows = int(table.attrs.get("irregular_rows", 0))
+
+        return {"rows": int(len(table)), "reliable": irregular_rows == 0, "irregular_rows": irregular_rows, "columns": columns}
+
+    def to_parquet(self, table: DataFrame, path: str | Path) -> str | None:
+        """
+        Writes a table as Parquet, if pyarrow is installed
+
+        Args:
+            table (DataFrame): Parsed table
+            path (str | Path): Parquet file
+
+        Returns:
+            str | None: Path of the file, or None if pyarrow isn't installed
+
+        """
+
+        # pyarrow is optional, the server works without Parquet copies
+        if importlib.util.find_spec("pyarrow") is None:
+            print("[INFO] pyarrow not installed, Parquet copy skipped")
+            return None
+
+        table.to_parquet(path, index=False)
+
+        return str(path)
+
+    def _parse(self, lines: pd.Series, columns: List[str] | None) -> DataFrame:
+        """
+        Helper function to split and type lines
+
+        """
+
+        lines = lines[lines.str.strip() != ""]
+
+        if lines.empty:
+            return DataFrame(columns=columns or [])
+
+        cells, widths = self._split(lines)
+
+        return self._type_columns(cells, columns, widths)
+
+    def _split(self, lines: pd.Series) -> Tuple[DataFrame, pd.Series]:
+        """
+        Helper function to split lines into text cells
+
+        Args:
+            lines (pd.Series): Output lines
+
+        Returns:
+            Tuple[DataFrame, pd.Series]: Text cells, padded with nulls where lines have fewer cells, and the number of cells per line
+
+        """
+
+        lines = lines.astype("string").reset_index(drop=True)
+
+        # Remove the line wrapper where there is one, and flatten nested tuples
+        unwrapped = lines.str.extract(LINE_WRAPPER, expand=False).fillna(lines)
+        unwrapped = unwrapped.str.replace(NESTED_PARENTHESES, "", regex=True)
+
+        cells = unwrapped.str.split(",", expand=True)
+        widths = unwrapped.str.count(",").astype("int64") + 1
+
+        # Cells are trimmed and unquoted, empty cells are nulls
+        for name in cells.columns:
+            cells[name] = cells[name].str.strip().str.strip("'\"").replace("", pd.NA)
+
+        return cells, widths
+
+    def _type_columns(self, cells: DataFrame, columns: List[str] | None, widths: pd.Series) -> DataFrame:
+        """
+        Helper function to type each column of text cells
+
+        Args:
+            cells (DataFrame): Text cells
+            columns (List[str] | None): Column names. Defaults to c0, c1, ...
+            widths (pd.Series): Number of cells per line
+
+        Returns:
+            DataFrame: Typed table, with the number of lines not as wide as most lines in its attrs
+
+        """
+
+        # Dict to store typed columns
+        output = {}
+
+        for position, name in enumerate(cells.columns):
+            label = columns[position] if columns and position < len(columns) else f"c{position}"
+            output[label] = self._type_column(cells[name])
+
+        table = DataFrame(output)
+
+        # Lines with another number of cells than most lines, e.g. text with a comma in it
+        table.attrs["irregular_rows"] = int((widths != widths.mode().iloc[0]).sum())
+
+        return table
+
+    def _type_column(self, column: pd.Series) -> pd.Series:
+        """
+        Helper function to type a column of text cells. A type is used if every non-null cell has it
+
+        Args:
+            column (pd.Series): Text cells
+
+        Returns:
+            pd.Series: Typed column, text if no other type fits
+
+        """
+
+        column = column.astype("string")
+        values = column.dropna()
+
+        if values.empty:
+            return column
+
+        # Numbers, as integers if all are whole
+        numbers = pd.to_numeric(values, errors="coerce")
+        if numbers.notna().all():
+            if values.str.fullmatch(r"[+-]?\d+").all():
+                # Parsed from the text, since converting the numbers would wrap values beyond int64 around.
+                # Such values stay text, a float would round them
+                try:
+                    return column.astype("Int64")
+                except (OverflowError, TypeError, ValueError):
+                    return column
+            return pd.to_numeric(column, errors="coerce").astype("float64")
+
+        # Booleans
+        lowered = values.str.lower()
+        if lowered.isin(["true", "false"]).all():
+            return column.str.lower().map({"true": True, "false": False}).astype("boolean")
+
+        # Dates
+        if values.str.fullmatch(ISO_DATE).all():
+            return pd.to_datetime(column, errors="coerce", format="ISO8601")
+
+        return column
+
+    def _type_name(self, column: pd.Series) -> str:
+        """
+        Helper function to get the summary type name of a column
+
+        """
+
+        if pd.api.types.is_bool_dtype(column):
+            return "boolean"
+        if pd.api.types.is_integer_dtype(column):
+            return "integer"
+        if pd.api.types.is_float_dtype(column):
+            return "float"
+        if pd.api.types.is_datetime64_any_dtype(column):
+            return "date"
+
+        return "text"
+
+    def _scalar(self, value):
+        """
+        Helper function to turn pandas and NumPy values into JSON values
+
+        """
+
+        if isinstance(value, pd.Timestamp):
+            return value.isoformat()
+        if hasattr(value, "item"):
+            return value.item()
+
+        return value
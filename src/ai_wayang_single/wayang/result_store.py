@@ -0,0 +1,414 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable
+import os
+import re
+import tempfile
+import threading
+import uuid
+from ai_wayang_single.config.settings import RESULT_CONFIG
+from ai_wayang_single.utils.shared_store import SharedStore
+
+# Byte offset of every n-th line is indexed, so pages can seek instead of reading from the start
+INDEX_EVERY = 1000
+
+# Chunk size when re-indexing a result file
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Job ids are file name safe, so a client can't read other files
+JOB_ID = re.compile(r"^[\w-]{1,64}$")
+
+# Namespace of result metadata in the shared store
+SHARED_NAMESPACE = "results"
+
+
+class ResultStore:
+    """
+    Spools Wayang outputs to disk as they stream in and serves them in pages.
+    Only a bounded preview is kept in memory, so large results neither fill the server's memory nor the client's context.
+    With a shared store file, result metadata and line indexes are shared, so any worker can serve pages of any result
+
+    """
+
+    def __init__(
+        self,
+        folder: str | Path | None = None,
+        preview_lines: int | None = None,
+        preview_chars: int | None = None,
+        max_page_lines: int | None = None,
+        max_results: int | None = None,
+        shared_store: SharedStore | None = None,
+    ):
+        self.folder = Path(folder or RESULT_CONFIG.get("result_folder") or Path(tempfile.gettempdir()) / "ai_wayang_results")
+        self.preview_lines = preview_lines or int(RESULT_CONFIG.get("preview_lines"))
+        self.preview_chars = preview_chars or int(RESULT_CONFIG.get("preview_chars"))
+        self.max_page_lines = max_page_lines or int(RESULT_CONFIG.get("max_page_lines"))
+        self.max_results = max_results or int(RESULT_CONFIG.get("max_results"))
+        self.shared_store = shared_store
+        self._lock = threading.Lock()
+        self.results = OrderedDict()
+
+        os.makedirs(self.folder, exist_ok=True)
+
+    def write(self, chunks: Iterable[bytes], job_id: str | None = None) -> Dict:
+        """
+        Writes a streamed result to disk
+
+        Args:
+            chunks (Iterable[bytes]): Chunks of the result, e.g. from response.iter_content
+            job_id (str | None): Id of the result. A new id is created if not given
+
+        Returns:
+            Dict: Result metadata with job_id, rows, bytes and preview
+
+        """
+
+        job_id = job_id or uuid.uuid4().hex[:16]
+        path = self._path(job_id)
+
+        # Spool chunks to disk while counting and indexing lines, a partly written file is removed if the stream breaks
+        try:
+            with open(path, "wb") as f:
+                result = self._spool(chunks, f)
+        except BaseException:
+            self._remove(path)
+            raise
+
+        result.update({"job_id": job_id, "path": str(path)})
+
+        # List to store removed results
+        removed = []
+
+        with self._lock:
+            self.results[job_id] = result
+
+            # Remove oldest results over the limit. Shared results are removed by the shared limit
+            while len(self.results) > self.max_results:
+                old_id, old = self.results.popitem(last=False)
+                if not self._shared():
+                    removed.append((old_id, old))
+
+        if self._shared():
+            self.shared_store.set(SHARED_NAMESPACE, job_id, result)
+            removed = self.shared_store.trim(SHARED_NAMESPACE, self.max_results)
+
+        for old_id, old in removed:
+            self._remove(old["path"])
+            self._remove(self.parquet_path(old_id))
+
+        return self.public(result)
+
+    def fetch_page(self, job_id: str, offset: int = 0, limit: int = 100) -> Dict:
+        """
+        Gets a page of result rows
+
+        Args:
+            job_id (str): Id of the result
+            offset (int): First row, starting at 0
+            limit (int): Maximum rows, capped at the maximum page size
+
+        Returns:
+            Dict: Rows of the page with offset, total rows and the offset of the next page if any
+
+        Raises:
+            KeyError: If the result doesn't exist
+
+        """
+
+        result = self._get(job_id)
+        offset = max(offset, 0)
+        limit = max(min(limit, self.max_page_lines), 0)
+
+        # Seek to the indexed line before the offset
+        block = min(offset // INDEX_EVERY, len(result["index"]) - 1)
+        skip = offset - block * INDEX_EVERY
+
+        # List to store rows
+        rows = []
+
+        if offset < result["rows"] and limit:
+            try:
+                with open(result["path"], "rb") as f:
+                    f.seek(result["index"][block])
+
+                    for number, line in enumerate(f):
+                        if number < skip:
+                            continue
+
+                        rows.append(line.decode("utf-8", errors="replace").rstrip("\r\n"))
+
+                        if len(rows) >= limit:
+                            break
+
+            # Removed by another worker over the shared limit
+            except FileNotFoundError:
+                with self._lock:
+                    self.results.pop(job_id, None)
+                raise KeyError(f"No result with job id {job_id}")
+
+        next_offset = offset + len(rows)
+
+        return {
+            "job_id": job_id,
+            "offset": offset,
+            "limit": limit,
+            "returned": len(rows),
+            "total_rows": result["rows"],
+            "next_offset": next_offset if next_offset < result["rows"] else None,
+            "rows": rows,
+        }
+
+    def get(self, job_id: str) -> Dict:
+        """
+        Gets the metadata of a result
+
+        Args:
+            job_id (str): Id of the result
+
+        Returns:
+            Dict: Result metadata with job_id, rows, bytes and preview
+
+        Raises:
+            KeyError: If the result doesn't exist
+
+        """
+
+        return self.public(self._get(job_id))
+
+    def delete(self, job_id: str) -> None:
+        """
+        Deletes a result
+
+        Args:
+            job_id (str): Id of the result
+
+        """
+
+        with self._lock:
+            result = self.results.pop(job_id, None)
+
+        if self._shared():
+            self.shared_store.delete(SHARED_NAMESPACE, job_id)
+
+        self._remove(result["path"] if result else self._path(job_id))
+        self._remove(self.parquet_path(job_id))
+
+    def parquet_path(self, job_id: str) -> Path:
+        """
+        Gets the file of a result's Parquet copy
+
+        Args:
+            job_id (str): Id of the result
+
+        Returns:
+            Path: Parquet file next to the result
+
+        """
+
+        return self.folder / f"result_{job_id}.parquet"
+
+    def public(self, result: Dict) -> Dict:
+        """
+        Gets result metadata without the internal line index
+
+        Args:
+            result (Dict): Result metadata
+
+        Returns:
+            Dict: Metadata for callers
+
+        """
+
+        return {k: v for k, v in result.items() if k != "index"}
+
+    def format_for_client(self, result: Dict) -> str:
+        """
+        Formats a result for the client. Small results are returned whole, large results as preview with paging hint
+
+        Args:
+            result (Dict): Result metadata
+
+        Returns:
+            str: Text for the client
+
+        """
+
+        preview = result["preview"]
+        shown = len(preview.splitlines())
+
+        if shown >= result["rows"] and not preview.endswith("..."):
+            return preview
+
+        return (
+            f"{preview}\n"
+            f"[Showing the first {shown} of {result['rows']} rows ({result['bytes']} bytes). "
+            f"Get more with fetch_result_page(job_id=\"{result['job_id']}\", offset={shown}, limit={self.max_page_lines}) "
+            f"or column statistics with get_result_summary(job_id=\"{result['job_id']}\")]"
+        )
+
+    def _get(self, job_id: str) -> Dict:
+        """
+        Helper function to get a result, from the shared store if written by another worker,
+        or re-indexed from disk if the server restarted
+
+        Args:
+            job_id (str): Id of the result
+
+        Returns:
+            Dict: Result metadata with index
+
+        """
+
+        with self._lock:
+            if job_id in self.results:
+                return self.results[job_id]
+
+        if not JOB_ID.match(job_id):
+            raise KeyError(f"Invalid job id {job_id}")
+
+        # Written by another worker
+        result = self.shared_store.get(SHARED_NAMESPACE, job_id) if self._shared() else None
+
+        if result is not None:
+            with self._lock:
+                self.results[job_id] = result
+
+            return result
+
+        path = self._path(job_id)
+
+        if not path.is_file():
+            raise KeyError(f"No result with job id {job_id}")
+
+        # Rebuild the line index of a result written before a restart
+        with open(path, "rb") as f:
+            result = self._spool(iter(lambda: f.read(READ_CHUNK_SIZE), b""))
+
+        result.update({"job_id": job_id, "path": str(path)})
+
+        with self._lock:
+            self.results[job_id] = result
+
+        return result
+
+    def _spool(self, chunks: Iterable[bytes], f=None) -> Dict:
+        """
+        Helper function to count and index the lines of a result, optionally writing the chunks to a file
+
+        Args:
+            chunks (Iterable[bytes]): Chunks of the result
+            f: Binary file to write the chunks to, or None to only index
+
+        Returns:
+            Dict: Rows, bytes, line index and preview
+
+        """
+
+        # Initialize counters
+        rows = 0
+        size = 0
+        index = [0]
+        preview = b""
+        last_byte = b"\n"
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+
+            if f is not None:
+                f.write(chunk)
+
+            rows = self._index_chunk(chunk, size, rows, index)
+            size += len(chunk)
+            last_byte = chunk[-1:]
+
+            # Keep the start of the result as preview
+            if len(preview) < self.preview_chars and preview.count(b"\n") < self.preview_lines:
+                preview += chunk[: self.preview_chars]
+
+        # A last line without newline is still a row
+        if size and last_byte != b"\n":
+            rows += 1
+
+        return {"rows": rows, "bytes": size, "index": index, "preview": self._preview(preview)}
+
+    def _index_chunk(self, chunk: bytes, base: int, rows: int, index: list) -> int:
+        """
+        Helper function to count the lines of a chunk and index the start of every INDEX_EVERY-th line
+
+        Args:
+            chunk (bytes): Chunk of the result
+            base (int): Byte offset of the chunk
+            rows (int): Complete lines before the chunk
+            index (list): Line index, changed in place
+
+        Returns:
+            int: Complete lines including the chunk
+
+        """
+
+        newlines = chunk.count(b"\n")
+
+        # Line number whose start is indexed next
+        target = len(index) * INDEX_EVERY
+        position = -1
+        done = rows
+
+        while target <= rows + newlines:
+            # The line starts after the newline ending the line before it
+            for _ in range(target - done):
+                position = chunk.find(b"\n", position + 1)
+
+            done = target
+            index.append(base + position + 1)
+            target += INDEX_EVERY
+
+        return rows + newlines
+
+    def _preview(self, data: bytes) -> str:
+        """
+        Helper function to cut the preview to the configured lines and characters
+
+        Args:
+            data (bytes): Start of the result
+
+        Returns:
+            str: Preview, ending with ... if a line was cut
+
+        """
+
+        text = data.decode("utf-8", errors="replace")
+        lines = text.splitlines()[: self.preview_lines]
+        preview = "\n".join(lines)
+
+        if len(preview) > self.preview_chars:
+            preview = preview[: self.preview_chars] + "..."
+
+        return preview
+
+    def _shared(self) -> bool:
+        """
+        Helper function to check if results are shared with other workers
+
+        """
+
+        return self.shared_store is not None and self.shared_store.shared
+
+    def _path(self, job_id: str) -> Path:
+        """
+        Helper function to get the file of a result
+
+        """
+
+        return self.folder / f"result_{job_id}.txt"
+
+    def _remove(self, path: str | Path) -> None:
+        """
+        Helper function to remove a result file if it exists
+
+        """
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,384 @@
+from typing import List
+import re
+
+# Tokens of the Scala subset, in match order
+TOKEN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<number>\d+\.\d+(?:[eE][+-]?\d+)?[dDfF]? | \d+(?:[eE][+-]?\d+)?[lLdDfF]?)
+    | (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<char>'(?:[^'\\]|\\.)')
+    | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<operator>=>|==|!=|<=|>=|&&|\|\||[-+*/%<>!=.,:;()\[\]{}])
+    """,
+    re.VERBOSE,
+)
+
+# Binary operators by precedence, lowest first
+PRECEDENCE = [("||",), ("&&",), ("==", "!="), ("<", "<=", ">", ">="), ("+", "-"), ("*", "/", "%")]
+
+# Escapes in Scala string literals
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "'": "'", "\\": "\\"}
+
+
+class ScalaSyntaxError(ValueError):
+    """
+    Raised when a UDF is outside the Scala subset the parser understands
+
+    """
+
+
+class Node:
+    """
+    Node of a parsed Scala expression.
+    Kinds: lambda (value: parameter names), name, number, string, boolean, tuple, select (value: member),
+    call (value: method, children: target and arguments), cast (value: type), binary and unary (value: operator), if,
+    and block (value: names of the vals, children: their expressions and the result)
+
+    """
+
+    def __init__(self, kind: str, value=None, children: List["Node"] | None = None):
+        self.kind = kind
+        self.value = value
+        self.children = children or []
+
+    def __repr__(self) -> str:
+        return f"Node({self.kind!r}, {self.value!r}, {self.children!r})"
+
+
+class ScalaLambdaParser:
+    """
+    Parses the Scala lambdas of Wayang UDFs into expression trees.
+    Covers the subset plans use for relational work: field access, tuples, arithmetic, comparisons, boolean logic,
+    conversions like toString, toDouble and asInstanceOf, string methods, if/else and math.max/min
+
+    """
+
+    def parse(self, text: str) -> Node:
+        """
+        Parses a lambda, e.g. (r: Record) => r.getField(0).toString
+
+        Args:
+            text (str): Scala lambda
+
+        Returns:
+            Node: Lambda node with the parameter names as value and the body as child
+
+        Raises:
+            ScalaSyntaxError: If the text isn't a lambda in the supported subset
+
+        """
+
+        self._tokens = self._tokenize(text)
+        self._position = 0
+
+        node = self._lambda()
+
+        if self._peek() is not None:
+            raise ScalaSyntaxError(f"Unexpected {self._peek()[1]!r} in UDF: {text}")
+
+        return node
+
+    def _tokenize(self, text: str) -> List[tuple]:
+        """
+        Helper function to split a lambda into (kind, text) tokens
+
+        """
+
+        tokens = []
+        position = 0
+
+        while position < len(text):
+            match = TOKEN.match(text, position)
+
+            if match is None:
+                raise ScalaSyntaxError(f"Unexpected {text[position]!r} in UDF: {text}")
+
+            if match.lastgroup != "space":
+                tokens.append((match.lastgroup, match.group()))
+
+            position = match.end()
+
+        return tokens
+
+    def _peek(self, offset: int = 0) -> tuple | None:
+        """
+        Helper function to get a token ahead without consuming it
+
+        """
+
+        index = self._position + offset
+        return self._tokens[index] if index < len(self._tokens) else None
+
+    def _accept(self, text: str) -> bool:
+        """
+        Helper function to consume the next token if it has the given text
+
+        """
+
+        token = self._peek()
+
+        if token is not None and token[1] == text and token[0] in ("operator", "name"):
+            self._position += 1
+            return True
+
+        return False
+
+    def _expect(self, text: str) -> None:
+        """
+        Helper function to consume a token that must be next
+
+        """
+
+        if not self._accept(text):
+            found = self._peek()[1] if self._peek() else "end of UDF"
+            raise ScalaSyntaxError(f"Expected {text!r}, found {found!r}")
+
+    def _lambda(self) -> Node:
+        """
+        Helper function to parse parameters and body: (a: A, b: B) => body, a => body or (a) => body
+
+        """
+
+        # Single parameter without parentheses
+        if self._peek() and self._peek()[0] == "name" and self._peek(1) == ("operator", "=>"):
+            name = self._peek()[1]
+            self._position += 2
+            return Node("lambda", [name], [self._expression()])
+
+        self._expect("(")
+        names = []
+
+        while not self._accept(")"):
+            token = self._peek()
+            if token is None or token[0] != "name":
+                raise ScalaSyntaxError("Expected a parameter name")
+
+            names.append(token[1])
+            self._position += 1
+
+            # Types are skipped, e.g. (String, Int) or org.apache.wayang.basic.data.Record
+            if self._accept(":"):
+                self._skip_type()
+
+            self._accept(",")
+
+        self._expect("=>")
+
+        return Node("lambda", names, [self._expression()])
+
+    def _skip_type(self) -> None:
+        """
+        Helper function to skip a type annotation up to the next parameter or the end of the parameters
+
+        """
+
+        depth = 0
+
+        while self._peek() is not None:
+            text = self._peek()[1]
+
+            if depth == 0 and text in (",", ")"):
+                return None
+
+            if text in ("(", "["):
+                depth += 1
+            elif text in (")", "]"):
+                depth -= 1
+
+            self._position += 1
+
+    def _expression(self) -> Node:
+        """
+        Helper function to parse an expression, including if/else
+
+        """
+
+        if self._accept("if"):
+            self._expect("(")
+            condition = self._expression()
+            self._expect(")")
+            then = self._expression()
+            self._expect("else")
+            return Node("if", None, [condition, then, self._expression()])
+
+        return self._binary(0)
+
+    def _binary(self, level: int) -> Node:
+        """
+        Helper function to parse binary operators by precedence level
+
+        """
+
+        if level == len(PRECEDENCE):
+            return self._unary()
+
+        node = self._binary(level + 1)
+
+        while self._peek() and self._peek()[0] == "operator" and self._peek()[1] in PRECEDENCE[level]:
+            operator = self._peek()[1]
+            self._position += 1
+            node = Node("binary", operator, [node, self._binary(level + 1)])
+
+        return node
+
+    def _unary(self) -> Node:
+        """
+        Helper function to parse ! and unary minus
+
+        """
+
+        for operator in ("!", "-"):
+            if self._accept(operator):
+                return Node("unary", operator, [self._unary()])
+
+        return self._postfix(self._primary())
+
+    def _postfix(self, node: Node) -> Node:
+        """
+        Helper function to parse member access and method calls, e.g. r.getField(0).toString.toDouble
+
+        """
+
+        while self._accept("."):
+            token = self._peek()
+            if token is None or token[0] != "name":
+                raise ScalaSyntaxError("Expected a member name after '.'")
+
+            member = token[1]
+            self._position += 1
+
+            # Casts, e.g. r.getField(0).asInstanceOf[Int]
+            if member == "asInstanceOf":
+                self._expect("[")
+                cast = self._peek()[1] if self._peek() else None
+                self._position += 1
+                self._expect("]")
+                node = Node("cast", cast, [node])
+
+            elif self._peek() == ("operator", "("):
+                node = Node("call", member, [node] + self._arguments())
+
+            else:
+                node = Node("select", member, [node])
+
+        return node
+
+    def _arguments(self) -> List[Node]:
+        """
+        Helper function to parse call arguments. Arguments using _ become lambdas, e.g. g.map(_._2)
+
+        """
+
+        self._expect("(")
+        arguments = []
+
+        while not self._accept(")"):
+            # Lambda arguments, e.g. g.map(t => t._2)
+            if self._peek() and self._peek()[0] == "name" and self._peek(1) == ("operator", "=>"):
+                argument = self._lambda()
+            else:
+                argument = self._expression()
+
+                if self._uses_placeholder(argument):
+                    argument = Node("lambda", ["_"], [argument])
+
+            arguments.append(argument)
+            self._accept(",")
+
+        return arguments
+
+    def _uses_placeholder(self, node: Node) -> bool:
+        """
+        Helper function to check if an expression uses the _ placeholder
+
+        """
+
+        if node.kind == "name" and node.value == "_":
+            return True
+
+        return node.kind != "lambda" and any(self._uses_placeholder(child) for child in node.children)
+
+    def _primary(self) -> Node:
+        """
+        Helper function to parse literals, names and parenthesized expressions or tuples
+
+        """
+
+        token = self._peek()
+
+        if token is None:
+            raise ScalaSyntaxError("Unexpected end of UDF")
+
+        kind, text = token
+        self._position += 1
+
+        if kind == "number":
+            suffix = text[-1].lower() if text[-1].isalpha() and not text[-1] in "eE" else ""
+            digits = text.rstrip("lLdDfF")
+            is_float = suffix in ("d", "f") or "." in digits or "e" in digits.lower()
+            return Node("number", float(digits) if is_float else int(digits))
+
+        if kind in ("string", "char"):
+            return Node("string", self._unescape(text[1:-1]))
+
+        if kind == "name":
+            if text in ("true", "false"):
+                return Node("boolean", text == "true")
+            return Node("name", text)
+
+        if text == "(":
+            items = [self._expression()]
+
+            while self._accept(","):
+                items.append(self._expression())
+
+            self._expect(")")
+
+            return items[0] if len(items) == 1 else Node("tuple", None, items)
+
+        if text == "{":
+            return self._block()
+
+        raise ScalaSyntaxError(f"Unexpected {text!r} in UDF")
+
+    def _block(self) -> Node:
+        """
+        Helper function to parse a block of vals and a result, e.g. { val d = r.getField(2).toString; d >= "1994" }
+
+        """
+
+        names = []
+        children = []
+
+        while self._accept("val"):
+            token = self._peek()
+            if token is None or token[0] != "name":
+                raise ScalaSyntaxError("Expected a name after val")
+
+            self._position += 1
+
+            # Types are skipped, e.g. val d: String = ...
+            if self._accept(":"):
+                while self._peek() is not None and self._peek()[1] != "=":
+                    self._position += 1
+
+            self._expect("=")
+            names.append(token[1])
+            children.append(self._expression())
+            self._accept(";")
+
+        children.append(self._expression())
+        self._accept(";")
+        self._expect("}")
+
+        return Node("block", names, children) if names else children[0]
+
+    @staticmethod
+    def _unescape(text: str) -> str:
+        """
+        Helper function to resolve escapes in string literals
+
+        """
+
+        return re.sub(r"\\(.)", lambda match: ESCAPES.get(match.group(1), match.group(1)), text)
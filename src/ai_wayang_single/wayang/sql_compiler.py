@@ -0,0 +1,972 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List
+import re
+from ai_wayang_single.llm.models import WayangOperation, WayangPlan
+from ai_wayang_single.wayang.scala_lambda import Node, ScalaLambdaParser, ScalaSyntaxError
+
+# Table and column names used without quoting, like the queries of jdbcRemoteInput
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Scala types of asInstanceOf and conversions, to SQL type and scalar type
+CASTS = {
+    "Int": ("INTEGER", "int"),
+    "Integer": ("INTEGER", "int"),
+    "Long": ("BIGINT", "long"),
+    "Double": ("DOUBLE PRECISION", "double"),
+    "String": ("TEXT", "string"),
+    "Boolean": ("BOOLEAN", "boolean"),
+}
+
+CONVERSIONS = {"toInt": "Int", "toLong": "Long", "toDouble": "Double"}
+
+NUMERIC = ("int", "long", "double")
+
+# Comparison and boolean operators of Scala to SQL
+COMPARISONS = {"==": "=", "!=": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+LOGICAL = {"&&": "AND", "||": "OR"}
+
+# Aggregates of group iterables, e.g. g.map(_._2).sum
+GROUP_AGGREGATES = {"sum": "SUM", "max": "MAX", "min": "MIN"}
+
+
+class NotTranslatable(Exception):
+    """
+    Raised when a plan or UDF can't be expressed as a single SQL statement with the same result
+
+    """
+
+
+class Scalar:
+    """
+    A single SQL value of a plan element, with its Scala type: string, int, long, double, boolean,
+    or any for a record field that isn't converted yet. Values from toString keep their source for later conversions
+
+    """
+
+    def __init__(self, sql: str, type: str, source: "Scalar | None" = None, aggregate: bool = False):
+        self.sql = sql
+        self.type = type
+        self.source = source
+        self.aggregate = aggregate
+
+
+class Composite:
+    """
+    A tuple or Wayang record of values
+
+    """
+
+    def __init__(self, kind: str, items: List):
+        self.kind = kind
+        self.items = items
+
+
+class Group:
+    """
+    The iterable of a group after groupBy, only usable by aggregates in the following map
+
+    """
+
+    def __init__(self, element, mapped=None):
+        self.element = element
+        self.mapped = mapped
+
+
+class Relation:
+    """
+    A compiled operator: its SQL, the shape of its elements with column names as leaves,
+    a rank column if its rows are sorted, and the key UDF if it is a groupBy
+
+    """
+
+    def __init__(self, sql: str, shape, rank: str | None = None, group_key: str | None = None):
+        self.sql = sql
+        self.shape = shape
+        self.rank = rank
+        self.group_key = group_key
+
+
+class SqlQuery:
+    """
+    A plan compiled to SQL, with the shape to format result rows like Wayang's output
+
+    """
+
+    def __init__(self, sql: str, shape):
+        self.sql = sql
+        self.shape = shape
+
+    def format_row(self, row) -> str:
+        """
+        Formats a result row like the toString output Wayang writes for an element
+
+        Args:
+            row: Result row, with the columns in the order of the shape's leaves
+
+        Returns:
+            str: Output line, e.g. (F,383140) or Record[1, AIR]
+
+        """
+
+        values = iter(row)
+        return self._format(self.shape, values)
+
+    def _format(self, shape, values: Iterable) -> str:
+        """
+        Helper function to format a value of the shape
+
+        """
+
+        if isinstance(shape, Composite):
+            items = [self._format(item, values) for item in shape.items]
+
+            if shape.kind == "record":
+                return "Record[" + ", ".join(items) + "]"
+
+            return "(" + ",".join(items) + ")"
+
+        return format_scalar(next(values), shape.type)
+
+
+class PlanSqlCompiler:
+    """
+    Compiles a WayangPlan reading only from JDBC tables into a single SQL statement.
+    Covers filters, maps, joins, unions, reduceBy, reduce, groupBy followed by a map over the groups, sort,
+    distinct, count, limit and sample.
+    Each operator becomes a subquery and UDFs are translated from a subset of Scala.
+    Anything outside the subset raises NotTranslatable, so the plan runs in Wayang instead
+
+    """
+
+    def __init__(self):
+        self.parser = ScalaLambdaParser()
+
+    def compile(self, plan: WayangPlan) -> SqlQuery:
+        """
+        Compiles a plan to SQL
+
+        Args:
+            plan (WayangPlan): Abstract Wayang plan
+
+        Returns:
+            SqlQuery: SQL statement and the shape of its rows
+
+        Raises:
+            NotTranslatable: If the plan can't be expressed as SQL
+
+        """
+
+        operations = {op.id: op for op in plan.operations}
+
+        if len(operations) != len(plan.operations):
+            raise NotTranslatable("Operation ids aren't unique")
+
+        # The plan ends in the single operation no other operation reads from
+        consumed = {input_id for op in plan.operations for input_id in op.input}
+        sinks = [op for op in plan.operations if op.id not in consumed]
+
+        if len(sinks) != 1:
+            raise NotTranslatable(f"Plan has {len(sinks)} final operations, expected one")
+
+        sink = sinks[0]
+
+        # The output file is replaced by the result of the statement
+        if sink.operatorName == "textFileOutput":
+            if len(sink.input) != 1 or sink.input[0] not in operations:
+                raise NotTranslatable("Output operation must have one input")
+            sink = operations[sink.input[0]]
+
+        # Inputs and outputs must describe the same graph, and every operation must lead to the result
+        for op in plan.operations:
+            consumers = {other.id for other in plan.operations if op.id in other.input}
+            if op.output and set(op.output) != consumers:
+                raise NotTranslatable(f"Operation id {op.id}: Output ids don't match the operations reading from it")
+
+        self._operations = operations
+        self._aliases = 0
+        self._compiled = set()
+
+        relation = self._compile(sink, set())
+
+        if len(self._compiled) + int(sink is not sinks[0]) < len(operations):
+            raise NotTranslatable("Plan has operations that don't lead to the result")
+
+        if relation.group_key is not None:
+            raise NotTranslatable("groupBy must be followed by a map over the groups")
+
+        sql = f"SELECT * FROM ({relation.sql}) AS result ORDER BY result.{relation.rank}" if relation.rank else relation.sql
+
+        return SqlQuery(sql, relation.shape)
+
+    def _compile(self, op: WayangOperation, visiting: set) -> Relation:
+        """
+        Helper function to compile an operation and its inputs
+
+        """
+
+        if op.id in visiting:
+            raise NotTranslatable("Plan has a cycle")
+
+        inputs = []
+        for input_id in op.input:
+            if input_id not in self._operations:
+                raise NotTranslatable(f"Operation id {op.id}: Unknown input id {input_id}")
+            inputs.append(self._compile(self._operations[input_id], visiting | {op.id}))
+
+        self._compiled.add(op.id)
+        compile_operator = getattr(self, f"_compile_{op.operatorName.lower()}", None)
+
+        if compile_operator is None:
+            raise NotTranslatable(f"Operator {op.operatorName} has no SQL translation")
+
+        # Only a map can read groups, and sorted rows only stay sorted through maps, filters and limits
+        for relation in inputs:
+            if relation.group_key is not None and op.operatorName != "map":
+                raise NotTranslatable("groupBy must be followed by a map over the groups")
+
+        try:
+            return compile_operator(op, inputs)
+        except ScalaSyntaxError as e:
+            raise NotTranslatable(f"Operation id {op.id}: {e}")
+
+    ### Operators
+
+    def _compile_jdbcremoteinput(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        names = [op.table] + list(op.columnNames)
+
+        if not op.columnNames or not all(name and IDENTIFIER.match(name) for name in names):
+            raise NotTranslatable(f"Operation id {op.id}: Table and columns must be plain names")
+
+        columns = ", ".join(f"{column} AS c{i}" for i, column in enumerate(op.columnNames))
+        shape = Composite("record", [Scalar(f"c{i}", "any") for i in range(len(op.columnNames))])
+
+        return Relation(f"SELECT {columns} FROM {op.table}", shape)
+
+    def _compile_filter(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+        predicate = self._apply(op.udf, [self._bind(relation.shape, alias)])
+
+        if not isinstance(predicate, Scalar) or predicate.type != "boolean":
+            raise NotTranslatable(f"Operation id {op.id}: Filter UDF must return a boolean")
+
+        return Relation(f"SELECT * FROM ({relation.sql}) AS {alias} WHERE {predicate.sql}", relation.shape, relation.rank)
+
+    def _compile_map(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+        element = self._bind(relation.shape, alias)
+
+        # A map over the groups of a groupBy aggregates each group
+        if relation.group_key is not None:
+            key = self._leaves(self._apply(relation.group_key, [element]))
+            columns, shape = self._project(self._apply(op.udf, [Group(element)]))
+            group_by = ", ".join(leaf.sql for leaf in key)
+            return Relation(f"SELECT {columns} FROM ({relation.sql}) AS {alias} GROUP BY {group_by}", shape)
+
+        columns, shape = self._project(self._apply(op.udf, [element]))
+
+        # Keep the rank of sorted rows
+        if relation.rank:
+            columns += f", {alias}.{relation.rank} AS {relation.rank}"
+
+        return Relation(f"SELECT {columns} FROM ({relation.sql}) AS {alias}", shape, relation.rank)
+
+    def _compile_groupby(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+
+        # Check the key now, it is translated again for the alias of the following map
+        self._leaves(self._apply(op.keyUdf, [self._bind(relation.shape, alias)]))
+
+        return Relation(relation.sql, relation.shape, group_key=op.keyUdf)
+
+    def _compile_reduceby(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+        element = self._bind(relation.shape, alias)
+        key = [leaf.sql for leaf in self._leaves(self._apply(op.keyUdf, [element]))]
+
+        value = self._aggregate(op, element, key)
+        columns, shape = self._project(value)
+
+        return Relation(f"SELECT {columns} FROM ({relation.sql}) AS {alias} GROUP BY {', '.join(key)}", shape)
+
+    def _compile_reduce(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+        value = self._aggregate(op, self._bind(relation.shape, alias), [])
+        columns, shape = self._project(value)
+
+        # Reducing no elements gives no output in Wayang, not a row of nulls
+        return Relation(f"SELECT {columns} FROM ({relation.sql}) AS {alias} HAVING COUNT(*) > 0", shape)
+
+    def _compile_sort(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+        key = self._leaves(self._apply(op.keyUdf, [self._bind(relation.shape, alias)]))
+
+        # Scala orders strings by character codes, so the C collation is used
+        order = ", ".join(f"{leaf.sql} COLLATE \"C\"" if leaf.type == "string" else leaf.sql for leaf in key)
+        columns = ", ".join(f"{alias}.{leaf.sql}" for leaf in self._leaves(relation.shape))
+
+        # The rank keeps the order through later maps and filters, and orders the final result
+        rank = f"rank{op.id}"
+        return Relation(f"SELECT {columns}, ROW_NUMBER() OVER (ORDER BY {order}) AS {rank} FROM ({relation.sql}) AS {alias}", relation.shape, rank)
+
+    def _compile_join(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        if len(inputs) != 2:
+            raise NotTranslatable(f"Operation id {op.id}: Join must have two inputs")
+
+        (left, right), (left_alias, right_alias) = inputs, (self._alias(), self._alias())
+        left_element, right_element = self._bind(left.shape, left_alias), self._bind(right.shape, right_alias)
+
+        this_key = self._leaves(self._apply(op.thisKeyUdf, [left_element]))
+        that_key = self._leaves(self._apply(op.thatKeyUdf, [right_element]))
+
+        if len(this_key) != len(that_key):
+            raise NotTranslatable(f"Operation id {op.id}: Join keys differ in size")
+
+        condition = " AND ".join(self._compare("==", a, b).sql for a, b in zip(this_key, that_key))
+        columns, shape = self._project(Composite("tuple", [left_element, right_element]))
+
+        return Relation(f"SELECT {columns} FROM ({left.sql}) AS {left_alias} JOIN ({right.sql}) AS {right_alias} ON {condition}", shape)
+
+    def _compile_union(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        if len(inputs) != 2:
+            raise NotTranslatable(f"Operation id {op.id}: Union must have two inputs")
+
+        (left, right), (left_alias, right_alias) = inputs, (self._alias(), self._alias())
+
+        # Both sides must format the same, the columns are matched by position
+        if self._signature(left.shape) != self._signature(right.shape):
+            raise NotTranslatable(f"Operation id {op.id}: Union inputs have different element types")
+
+        left_columns = ", ".join(f"{left_alias}.{leaf.sql}" for leaf in self._leaves(left.shape))
+        right_columns = ", ".join(f"{right_alias}.{leaf.sql}" for leaf in self._leaves(right.shape))
+
+        return Relation(f"SELECT {left_columns} FROM ({left.sql}) AS {left_alias} UNION ALL SELECT {right_columns} FROM ({right.sql}) AS {right_alias}", left.shape)
+
+    def _compile_distinct(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+        columns = ", ".join(f"{alias}.{leaf.sql}" for leaf in self._leaves(relation.shape))
+
+        return Relation(f"SELECT DISTINCT {columns} FROM ({relation.sql}) AS {alias}", relation.shape)
+
+    def _compile_count(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+
+        # Counting no elements gives 0, like Wayang
+        return Relation(f"SELECT COUNT(*) AS c0 FROM ({relation.sql}) AS {alias}", Scalar("c0", "long"))
+
+    def _compile_limit(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+        columns = ", ".join(f"{alias}.{leaf.sql}" for leaf in self._leaves(relation.shape))
+
+        # Any elements, like Wayang's sample with the any method, which doesn't keep a sort order
+        return Relation(f"SELECT {columns} FROM ({relation.sql}) AS {alias} LIMIT {self._size(op, op.limit)}", relation.shape)
+
+    def _compile_sample(self, op: WayangOperation, inputs: List[Relation]) -> Relation:
+        relation, alias = self._single(op, inputs)
+        columns = ", ".join(f"{alias}.{leaf.sql}" for leaf in self._leaves(relation.shape))
+
+        return Relation(f"SELECT {columns} FROM ({relation.sql}) AS {alias} ORDER BY RANDOM() LIMIT {self._size(op, op.sampleSize)}", relation.shape)
+
+    ### Helpers for operators
+
+    def _single(self, op: WayangOperation, inputs: List[Relation]) -> tuple:
+        """
+        Helper function to get the single input of a unary operator and a new alias for it
+
+        """
+
+        if len(inputs) != 1:
+            raise NotTranslatable(f"Operation id {op.id}: {op.operatorName} must have one input")
+
+        return inputs[0], self._alias()
+
+    def _size(self, op: WayangOperation, size) -> int:
+        """
+        Helper function to check the number of elements of a limit or sample
+
+        """
+
+        if not isinstance(size, int) or isinstance(size, bool) or size < 1:
+            raise NotTranslatable(f"Operation id {op.id}: {op.operatorName} needs a number of elements larger than zero")
+
+        return size
+
+    def _signature(self, shape) -> tuple | str:
+        """
+        Helper function to get the structure and types of a shape, e.g. ("tuple", "string", "long")
+
+        """
+
+        if isinstance(shape, Composite):
+            return (shape.kind,) + tuple(self._signature(item) for item in shape.items)
+
+        return shape.type
+
+    def _alias(self) -> str:
+        """
+        Helper function to get a new subquery alias
+
+        """
+
+        self._aliases += 1
+        return f"t{self._aliases}"
+
+    def _bind(self, shape, alias: str):
+        """
+        Helper function to refer to the columns of a shape through a subquery alias
+
+        """
+
+        if isinstance(shape, Composite):
+            return Composite(shape.kind, [self._bind(item, alias) for item in shape.items])
+
+        return Scalar(f"{alias}.{shape.sql}", shape.type)
+
+    def _project(self, value) -> tuple:
+        """
+        Helper function to turn a value into a select list, with a column per scalar
+
+        Returns:
+            tuple: Select list and the shape with the column names as leaves
+
+        """
+
+        columns = []
+
+        def rebuild(value):
+            if isinstance(value, Composite):
+                return Composite(value.kind, [rebuild(item) for item in value.items])
+
+            if not isinstance(value, Scalar):
+                raise NotTranslatable("Groups can only be used through aggregates")
+
+            name = f"c{len(columns)}"
+            columns.append(f"{value.sql} AS {name}")
+            return Scalar(name, value.type)
+
+        shape = rebuild(value)
+
+        return ", ".join(columns), shape
+
+    def _leaves(self, value) -> List[Scalar]:
+        """
+        Helper function to get the scalars of a value in order
+
+        """
+
+        if isinstance(value, Composite):
+            return [leaf for item in value.items for leaf in self._leaves(item)]
+
+        if not isinstance(value, Scalar):
+            raise NotTranslatable("Groups can only be used through aggregates")
+
+        return [value]
+
+    def _aggregate(self, op: WayangOperation, element, key: List[str]):
+        """
+        Helper function to translate the reduce UDF of reduceBy and reduce, e.g. (a, b) => (a._1, a._2 + b._2).
+        Each part of the result must combine the same part of both elements: a sum, max or min,
+        or a part equal to the group key, which is the same for all elements of a group
+
+        """
+
+        udf = self.parser.parse(op.udf or "")
+
+        if len(udf.value) != 2:
+            raise NotTranslatable(f"Operation id {op.id}: Reduce UDF must take two elements")
+
+        first, second = udf.value
+
+        def combine(node: Node, path: tuple):
+            part = self._part(element, path)
+
+            # Tuples combine part by part
+            if node.kind == "tuple":
+                if not isinstance(part, Composite) or len(part.items) != len(node.children):
+                    raise NotTranslatable(f"Operation id {op.id}: Reduce UDF changes the element shape")
+                return Composite(part.kind, [combine(child, path + (i,)) for i, child in enumerate(node.children)])
+
+            # A part taken from one element must be the same in all elements of the group
+            if self._path(node, first) == path or self._path(node, second) == path:
+                if not all(leaf.sql in key for leaf in self._leaves(part)):
+                    raise NotTranslatable(f"Operation id {op.id}: Reduce UDF keeps a part that isn't the group key")
+                return part
+
+            function = self._combiner(node, first, second, path)
+
+            if function is None or not isinstance(part, Scalar):
+                raise NotTranslatable(f"Operation id {op.id}: Reduce UDF isn't a sum, max or min")
+
+            if function == "SUM" and part.type not in NUMERIC:
+                raise NotTranslatable(f"Operation id {op.id}: Sum of non-numeric values")
+
+            sql = f"{function}({part.sql} COLLATE \"C\")" if part.type == "string" else f"{function}({part.sql})"
+            return Scalar(sql, part.type, aggregate=True)
+
+        return combine(udf.children[0], ())
+
+    def _combiner(self, node: Node, first: str, second: str, path: tuple) -> str | None:
+        """
+        Helper function to recognize a + b, math.max(a, b), math.min(a, b) and if (a > b) a else b for the same part
+
+        """
+
+        def both(x: Node, y: Node) -> bool:
+            return self._path(x, first) == path and self._path(y, second) == path or self._path(x, second) == path and self._path(y, first) == path
+
+        if node.kind == "binary" and node.value == "+" and both(*node.children):
+            return "SUM"
+
+        if node.kind == "call" and node.value in ("max", "min") and len(node.children) == 3:
+            target = node.children[0]
+            if target.kind == "name" and target.value in ("math", "Math") and both(node.children[1], node.children[2]):
+                return node.value.upper()
+
+        if node.kind == "if":
+            condition, then, otherwise = node.children
+            if condition.kind == "binary" and condition.value in ("<", "<=", ">", ">=") and both(*condition.children):
+                larger = condition.value in (">", ">=")
+                left, right = condition.children
+
+                if self._same(then, left) and self._same(otherwise, right):
+                    return "MAX" if larger else "MIN"
+                if self._same(then, right) and self._same(otherwise, left):
+                    return "MIN" if larger else "MAX"
+
+        return None
+
+    def _same(self, x: Node, y: Node) -> bool:
+        """
+        Helper function to check if two expressions are the same
+
+        """
+
+        return repr(x) == repr(y)
+
+    def _path(self, node: Node, name: str) -> tuple | None:
+        """
+        Helper function to get the part of an element an expression refers to, e.g. a._2._1 is (1, 0)
+
+        """
+
+        if node.kind == "name":
+            return () if node.value == name else None
+
+        if node.kind == "select" and re.fullmatch(r"_\d+", node.value):
+            inner = self._path(node.children[0], name)
+            return inner + (int(node.value[1:]) - 1,) if inner is not None else None
+
+        if node.kind == "call" and node.value == "getField" and len(node.children) == 2 and node.children[1].kind == "number":
+            inner = self._path(node.children[0], name)
+            return inner + (int(node.children[1].value),) if inner is not None else None
+
+        return None
+
+    def _part(self, value, path: tuple):
+        """
+        Helper function to get a part of a value by its path
+
+        """
+
+        for index in path:
+            if not isinstance(value, Composite) or index >= len(value.items):
+                raise NotTranslatable("UDF refers to a part the element doesn't have")
+            value = value.items[index]
+
+        return value
+
+    ### UDF translation
+
+    def _apply(self, udf: str | None, arguments: List):
+        """
+        Helper function to translate a UDF applied to values
+
+        """
+
+        if not udf:
+            raise NotTranslatable("Operation has no UDF")
+
+        return self._call_lambda(self.parser.parse(udf), arguments)
+
+    def _call_lambda(self, node: Node, arguments: List):
+        """
+        Helper function to translate the body of a lambda with its parameters bound to values
+
+        """
+
+        if node.kind != "lambda" or len(node.value) != len(arguments):
+            raise NotTranslatable("UDF takes a different number of arguments")
+
+        return self._eval(node.children[0], dict(zip(node.value, arguments)))
+
+    def _eval(self, node: Node, env: Dict):
+        """
+        Helper function to translate an expression to a value
+
+        """
+
+        if node.kind == "name":
+            if node.value not in env:
+                raise NotTranslatable(f"Unknown name {node.value} in UDF")
+            return env[node.value]
+
+        if node.kind == "number":
+            if isinstance(node.value, float):
+                return Scalar(f"CAST({node.value!r} AS DOUBLE PRECISION)", "double")
+            return Scalar(str(node.value), "int" if abs(node.value) < 2**31 else "long")
+
+        if node.kind == "string":
+            if "\x00" in node.value:
+                raise NotTranslatable("String literal with a null character")
+            return Scalar("'" + node.value.replace("'", "''") + "'", "string")
+
+        if node.kind == "boolean":
+            return Scalar("TRUE" if node.value else "FALSE", "boolean")
+
+        if node.kind == "tuple":
+            return Composite("tuple", [self._eval(child, env) for child in node.children])
+
+        if node.kind == "cast":
+            return self._cast(self._scalar(self._eval(node.children[0], env)), node.value)
+
+        if node.kind == "select":
+            return self._member(self._eval(node.children[0], env), node.value, [], env)
+
+        if node.kind == "call":
+            target = node.children[0]
+
+            # math.max(a, b), math.min(a, b) and math.abs(a)
+            if target.kind == "name" and target.value in ("math", "Math") and target.value not in env:
+                return self._math(node.value, [self._scalar(self._eval(child, env)) for child in node.children[1:]])
+
+            return self._member(self._eval(target, env), node.value, node.children[1:], env)
+
+        if node.kind == "unary":
+            value = self._scalar(self._eval(node.children[0], env))
+
+            if node.value == "!" and value.type == "boolean":
+                return Scalar(f"(NOT {value.sql})", "boolean")
+            if node.value == "-" and value.type in NUMERIC:
+                return Scalar(f"(-{value.sql})", value.type)
+
+            raise NotTranslatable(f"Unsupported {node.value} on {value.type}")
+
+        if node.kind == "binary":
+            left, right = (self._scalar(self._eval(child, env)) for child in node.children)
+            return self._binary(node.value, left, right)
+
+        if node.kind == "block":
+            env = dict(env)
+            for name, child in zip(node.value, node.children):
+                env[name] = self._eval(child, env)
+            return self._eval(node.children[-1], env)
+
+        if node.kind == "if":
+            condition, then, otherwise = (self._scalar(self._eval(child, env)) for child in node.children)
+
+            if condition.type != "boolean":
+                raise NotTranslatable("if condition must be a boolean")
+
+            return Scalar(f"(CASE WHEN {condition.sql} THEN {then.sql} ELSE {otherwise.sql} END)", self._common_type(then, otherwise))
+
+        raise NotTranslatable(f"Unsupported expression {node.kind} in UDF")
+
+    def _scalar(self, value) -> Scalar:
+        """
+        Helper function to require a single value
+
+        """
+
+        if not isinstance(value, Scalar):
+            raise NotTranslatable("Expected a single value, not a tuple, record or group")
+
+        return value
+
+    def _member(self, value, member: str, arguments: List[Node], env: Dict):
+        """
+        Helper function to translate member access and method calls
+
+        """
+
+        # Groups: g.size, g.map(f).sum, g.head
+        if isinstance(value, Group):
+            return self._group_member(value, member, arguments, env)
+
+        # Tuple parts and record fields
+        if isinstance(value, Composite):
+            if value.kind == "tuple" and re.fullmatch(r"_\d+", member) and not arguments:
+                return self._part(value, (int(member[1:]) - 1,))
+
+            if value.kind == "record" and member == "getField" and len(arguments) == 1 and arguments[0].kind == "number":
+                return self._part(value, (int(arguments[0].value),))
+
+            raise NotTranslatable(f"Unsupported member {member} of a {value.kind}")
+
+        args = [self._scalar(self._eval(argument, env)) for argument in arguments]
+
+        if member == "toString" and not args:
+            if value.type == "string":
+                return value
+            if value.type == "double":
+                raise NotTranslatable("Text of doubles differs between Scala and SQL")
+            return Scalar(f"CAST({value.sql} AS TEXT)", "string", source=value)
+
+        if member in CONVERSIONS and not args:
+            return self._cast(value, CONVERSIONS[member])
+
+        if value.type == "string":
+            return self._string_method(value, member, args)
+
+        if value.type in NUMERIC and member == "abs" and not args:
+            return Scalar(f"ABS({value.sql})", value.type)
+
+        if member == "equals" and len(args) == 1:
+            return self._compare("==", value, args[0])
+
+        raise NotTranslatable(f"Unsupported method {member} on {value.type}")
+
+    def _group_member(self, group: Group, member: str, arguments: List[Node], env: Dict):
+        """
+        Helper function to translate aggregates over the elements of a group
+
+        """
+
+        if member in ("size", "length") and not arguments:
+            return Scalar("COUNT(*)", "int", aggregate=True)
+
+        if member in ("toList", "toSeq", "iterator", "toIterable") and not arguments:
+            return group
+
+        # Any element can stand for the group, as long as only its key is used
+        if member == "head" and not arguments and group.mapped is None:
+            return group.element
+
+        if member == "map" and len(arguments) == 1 and arguments[0].kind == "lambda":
+            return Group(group.element, self._scalar(self._call_lambda(arguments[0], [group.mapped or group.element])))
+
+        if member in GROUP_AGGREGATES and not arguments and group.mapped is not None:
+            mapped = group.mapped
+
+            if member == "sum" and mapped.type not in NUMERIC:
+                raise NotTranslatable("Sum of non-numeric values")
+
+            sql = f"{mapped.sql} COLLATE \"C\"" if mapped.type == "string" else mapped.sql
+            return Scalar(f"{GROUP_AGGREGATES[member]}({sql})", mapped.type, aggregate=True)
+
+        raise NotTranslatable(f"Unsupported group method {member}")
+
+    def _string_method(self, value: Scalar, member: str, args: List[Scalar]) -> Scalar:
+        """
+        Helper function to translate methods of strings
+
+        """
+
+        if member == "trim" and not args:
+            return Scalar(f"TRIM({value.sql})", "string")
+        if member == "toLowerCase" and not args:
+            return Scalar(f"LOWER({value.sql})", "string")
+        if member == "toUpperCase" and not args:
+            return Scalar(f"UPPER({value.sql})", "string")
+        if member in ("length", "size") and not args:
+            return Scalar(f"LENGTH({value.sql})", "int")
+        if member == "isEmpty" and not args:
+            return Scalar(f"(LENGTH({value.sql}) = 0)", "boolean")
+        if member == "nonEmpty" and not args:
+            return Scalar(f"(LENGTH({value.sql}) > 0)", "boolean")
+
+        if len(args) == 1 and args[0].type == "string":
+            other = args[0].sql
+
+            if member == "startsWith":
+                return Scalar(f"(LEFT({value.sql}, LENGTH({other})) = {other})", "boolean")
+            if member == "endsWith":
+                return Scalar(f"(RIGHT({value.sql}, LENGTH({other})) = {other})", "boolean")
+            if member == "contains":
+                return Scalar(f"(STRPOS({value.sql}, {other}) > 0)", "boolean")
+            if member in ("equals", "equalsIgnoreCase"):
+                if member == "equalsIgnoreCase":
+                    return Scalar(f"(LOWER({value.sql}) = LOWER({other}))", "boolean")
+                return self._compare("==", value, args[0])
+
+        # Scala substrings are zero-based with an exclusive end
+        if member == "substring" and args and all(arg.type in ("int", "long") for arg in args):
+            if len(args) == 1:
+                return Scalar(f"SUBSTRING({value.sql} FROM ({args[0].sql}) + 1)", "string")
+            if len(args) == 2:
+                return Scalar(f"SUBSTRING({value.sql} FROM ({args[0].sql}) + 1 FOR ({args[1].sql}) - ({args[0].sql}))", "string")
+
+        raise NotTranslatable(f"Unsupported string method {member}")
+
+    def _cast(self, value: Scalar, type: str | None) -> Scalar:
+        """
+        Helper function to translate asInstanceOf and conversions like toDouble
+
+        """
+
+        if type not in CASTS:
+            raise NotTranslatable(f"Unsupported conversion to {type}")
+
+        sql_type, scalar_type = CASTS[type]
+
+        if value.type == scalar_type:
+            return value
+
+        # Convert the original value of a toString, e.g. r.getField(0).toString.toDouble
+        if value.source is not None and scalar_type in NUMERIC:
+            value = value.source
+
+        # Scala truncates doubles converted to whole numbers
+        if value.type == "double" and scalar_type in ("int", "long"):
+            return Scalar(f"CAST(TRUNC({value.sql}) AS {sql_type})", scalar_type)
+
+        if scalar_type == "string" and value.type == "double":
+            raise NotTranslatable("Text of doubles differs between Scala and SQL")
+
+        return Scalar(f"CAST({value.sql} AS {sql_type})", scalar_type)
+
+    def _math(self, function: str, args: List[Scalar]) -> Scalar:
+        """
+        Helper function to translate math.max, math.min and math.abs
+
+        """
+
+        if function in ("max", "min") and len(args) == 2 and all(arg.type in NUMERIC for arg in args):
+            sql = "GREATEST" if function == "max" else "LEAST"
+            return Scalar(f"{sql}({args[0].sql}, {args[1].sql})", self._common_type(*args))
+
+        if function == "abs" and len(args) == 1 and args[0].type in NUMERIC:
+            return Scalar(f"ABS({args[0].sql})", args[0].type)
+
+        raise NotTranslatable(f"Unsupported function math.{function}")
+
+    def _binary(self, operator: str, left: Scalar, right: Scalar) -> Scalar:
+        """
+        Helper function to translate binary operators
+
+        """
+
+        if operator in LOGICAL:
+            if left.type != "boolean" or right.type != "boolean":
+                raise NotTranslatable(f"{operator} needs booleans")
+            return Scalar(f"({left.sql} {LOGICAL[operator]} {right.sql})", "boolean")
+
+        if operator in COMPARISONS:
+            return self._compare(operator, left, right)
+
+        # String concatenation, numbers other than doubles have the same text in Scala and SQL
+        if operator == "+" and "string" in (left.type, right.type):
+            if "double" in (left.type, right.type):
+                raise NotTranslatable("Text of doubles differs between Scala and SQL")
+            return Scalar(f"(CAST({left.sql} AS TEXT) || CAST({right.sql} AS TEXT))", "string")
+
+        if left.type not in NUMERIC or right.type not in NUMERIC:
+            raise NotTranslatable(f"{operator} needs numbers, got {left.type} and {right.type}")
+
+        # Integer division and remainder truncate in both Scala and SQL
+        return Scalar(f"({left.sql} {operator} {right.sql})", self._common_type(left, right))
+
+    def _compare(self, operator: str, left: Scalar, right: Scalar) -> Scalar:
+        """
+        Helper function to translate comparisons. Strings are ordered by character codes like in Scala
+
+        """
+
+        types = {left.type, right.type}
+
+        if operator in ("==", "!=") or types <= set(NUMERIC):
+            if len(types) == 2 and not types <= set(NUMERIC) and "any" not in types:
+                raise NotTranslatable(f"Comparison of {left.type} and {right.type}")
+            return Scalar(f"({left.sql} {COMPARISONS[operator]} {right.sql})", "boolean")
+
+        if types == {"string"}:
+            return Scalar(f"({left.sql} COLLATE \"C\" {COMPARISONS[operator]} {right.sql} COLLATE \"C\")", "boolean")
+
+        raise NotTranslatable(f"Ordering of {left.type} and {right.type}")
+
+    def _common_type(self, *values: Scalar) -> str:
+        """
+        Helper function to get the type of an expression over numbers, like Scala's numeric widening
+
+        """
+
+        types = {value.type for value in values}
+
+        if len(types) == 1:
+            return types.pop()
+
+        if not types <= set(NUMERIC):
+            raise NotTranslatable(f"Mixed types {', '.join(sorted(types))}")
+
+        return "double" if "double" in types else "long" if "long" in types else "int"
+
+
+def format_scalar(value, type: str) -> str:
+    """
+    Formats a value like Java's toString, the way Wayang writes it
+
+    Args:
+        value: Value from the database
+        type (str): Scala type of the value, any for unconverted record fields
+
+    Returns:
+        str: Text of the value
+
+    """
+
+    if value is None:
+        return "null"
+
+    if isinstance(value, bool) or type == "boolean":
+        return "true" if value else "false"
+
+    if type == "double" or isinstance(value, float):
+        return format_double(float(value))
+
+    if type in ("int", "long"):
+        return str(int(value))
+
+    # java.sql.Timestamp always has a fraction
+    if isinstance(value, datetime):
+        text = value.isoformat(sep=" ")
+        return text if value.microsecond else text + ".0"
+
+    if isinstance(value, date):
+        return value.isoformat()
+
+    if isinstance(value, Decimal):
+        return str(value)
+
+    return str(value)
+
+
+def format_double(value: float) -> str:
+    """
+    Formats a double like Java's Double.toString, e.g. 1.0, 0.25 and 1.2345E7
+
+    Args:
+        value (float): The number
+
+    Returns:
+        str: Text of the number
+
+    """
+
+    if value != value:
+        return "NaN"
+
+    if value in (float("inf"), float("-inf")):
+        return "Infinity" if value > 0 else "-Infinity"
+
+    if value == 0:
+        return "-0.0" if str(value).startswith("-") else "0.0"
+
+    # Plain notation between 10^-3 and 10^7, like Java
+    if 1e-3 <= abs(value) < 1e7:
+        text = repr(value)
+        return text if "." in text else text + ".0"
+
+    sign, digits, exponent = Decimal(repr(value)).normalize().as_tuple()
+    digits = "".join(str(digit) for digit in digits)
+    mantissa = digits[0] + "." + (digits[1:] or "0")
+
+    return ("-" if sign else "") + f"{mantissa}E{len(digits) - 1 + exponent}"
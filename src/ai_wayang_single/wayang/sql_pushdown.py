@@ -0,0 +1,286 @@
+from typing import Dict, Iterator, List, Tuple
+import os
+import threading
+import time
+import urllib.parse
+import uuid
+from ai_wayang_single.wayang.sql_compiler import NotTranslatable, PlanSqlCompiler, SqlQuery
+from ai_wayang_single.utils.metrics import metrics
+
+
+class SqlPushdown:
+    """
+    Fast path for plans reading only from the JDBC database.
+    Such plans are compiled to a single SQL statement and run directly on PostgreSQL through a connection pool,
+    instead of Wayang pulling whole tables over JDBC and running the UDFs row by row.
+    The output is written in the same format as Wayang's, to the result store and the plan's textFileOutput file.
+    Plans that can't be compiled, or fail in the database, are left to Wayang
+
+    """
+
+    def __init__(
+        self,
+        plan_mapper,
+        jdbc_uri: str = "",
+        username: str = "",
+        password: str = "",
+        enabled: bool = False,
+        pool_size: int = 5,
+        max_overflow: int = 5,
+        statement_timeout_seconds: float | None = 300,
+        fetch_rows: int = 10_000,
+    ):
+        self.plan_mapper = plan_mapper
+        self.jdbc_uri = jdbc_uri
+        self.username = username
+        self.password = password
+        self.enabled = enabled
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.statement_timeout_seconds = statement_timeout_seconds
+        self.fetch_rows = fetch_rows
+        self.compiler = PlanSqlCompiler()
+        self._engine = None
+        self._lock = threading.Lock()
+        self._stats = {"pushed": 0, "not_translatable": 0, "errors": 0, "seconds": 0.0, "rows": 0}
+        self._reasons = {}
+
+    @classmethod
+    def from_config(cls, config: Dict, input_config: Dict, plan_mapper) -> "SqlPushdown":
+        """
+        Creates the pushdown from the pushdown and input configs
+
+        Args:
+            config (Dict): SQL pushdown config
+            input_config (Dict): Input config with the JDBC connection
+            plan_mapper (PlanMapper): Mapper to turn executable plans back into abstract plans
+
+        Returns:
+            SqlPushdown: SQL pushdown
+
+        """
+
+        return cls(
+            plan_mapper,
+            jdbc_uri=input_config.get("jdbc_uri") or "",
+            username=input_config.get("jdbc_username") or "",
+            password=input_config.get("jdbc_password") or "",
+            enabled=config.get("use_pushdown") == "True",
+            pool_size=int(config.get("pool_size")),
+            max_overflow=int(config.get("max_overflow")),
+            statement_timeout_seconds=float(config["statement_timeout_seconds"]) if config.get("statement_timeout_seconds") else None,
+            fetch_rows=int(config.get("fetch_rows")),
+        )
+
+    def compile(self, plan: Dict) -> SqlQuery:
+        """
+        Compiles an executable plan to SQL
+
+        Args:
+            plan (Dict): Mapped JSON Wayang plan
+
+        Returns:
+            SqlQuery: SQL statement and the shape of its rows
+
+        Raises:
+            NotTranslatable: If the plan reads from other sources or can't be expressed as SQL
+
+        """
+
+        operators = plan.get("operators", [])
+        inputs = [op for op in operators if op.get("cat") == "input"]
+
+        if not inputs:
+            raise NotTranslatable("Plan has no input")
+
+        # Every input must come from the database the pushdown is connected to
+        for op in inputs:
+            if op.get("operatorName") != "jdbcRemoteInput":
+                raise NotTranslatable(f"Input {op.get('operatorName')} isn't in the database")
+
+            if (op.get("data") or {}).get("uri") != self.jdbc_uri:
+                raise NotTranslatable("Input from another database")
+
+        try:
+            wayang_plan = self.plan_mapper.plan_from_json(plan)
+        except ValueError as e:
+            raise NotTranslatable(str(e))
+
+        return self.compiler.compile(wayang_plan)
+
+    def execute_plan(self, plan: Dict, result_store=None) -> Tuple | None:
+        """
+        Executes a plan as SQL if possible
+
+        Args:
+            plan (Dict): Mapped JSON Wayang plan
+            result_store (ResultStore | None): Store to spool the output to
+
+        Returns:
+            Tuple | None: Status code and output like WayangExecutor.execute_plan, or None to execute in Wayang
+
+        """
+
+        if not self.enabled or not self.jdbc_uri:
+            return None
+
+        try:
+            query = self.compile(plan)
+        except NotTranslatable as e:
+            self._record_fallback("not_translatable", str(e))
+            return None
+
+        start = time.perf_counter()
+        job_id = None
+
+        # Files of the plan's textFileOutput operators get the same output as from Wayang
+        paths = self._output_paths(plan)
+        files = []
+
+        try:
+            with self._get_engine().connect() as connection:
+                with connection.begin():
+                    # Session settings only for this transaction, dates as text must match Java's toString
+                    if self.statement_timeout_seconds:
+                        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.statement_timeout_seconds * 1000)}")
+                    connection.exec_driver_sql("SET LOCAL DateStyle = 'ISO, YMD'")
+
+                    # Stream rows with a server-side cursor, without parameters so % in literals needs no escaping
+                    result = connection.execution_options(stream_results=True, max_row_buffer=self.fetch_rows, no_parameters=True).exec_driver_sql(query.sql)
+                    counter = {"rows": 0}
+                    files = [open(path, "wb") for path in paths]
+                    lines = self._lines(query, result, counter, files)
+
+                    if result_store is not None:
+                        job_id = uuid.uuid4().hex[:16]
+                        output = result_store.write(lines, job_id=job_id)
+                    else:
+                        output = b"".join(lines).decode("utf-8")
+
+                    for f in files:
+                        f.close()
+
+        except Exception as e:
+            # Remove partly written output, Wayang runs the plan instead
+            if job_id is not None:
+                result_store.delete(job_id)
+
+            for f in files:
+                f.close()
+                self._remove(f.name)
+
+            print(f"[INFO] SQL pushdown failed, executing in Wayang: {str(e).splitlines()[0]}")
+            self._record_fallback("error", type(e).__name__)
+            return None
+
+        duration = time.perf_counter() - start
+
+        with self._lock:
+            self._stats["pushed"] += 1
+            self._stats["seconds"] += duration
+            self._stats["rows"] += counter["rows"]
+
+        metrics.inc("wayang_sql_pushdown_total", outcome="pushed")
+        metrics.observe("wayang_sql_pushdown_duration_seconds", duration)
+        print(f"[INFO] Plan executed as SQL in {duration:.3f} seconds, {counter['rows']} rows")
+
+        return 200, output
+
+    def get_stats(self) -> Dict:
+        """
+        Gets pushed down plans, fallbacks to Wayang and their most common reasons
+
+        Returns:
+            Dict: Settings and stats
+
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            reasons = sorted(self._reasons.items(), key=lambda item: -item[1])[:10]
+
+        return {
+            "enabled": self.enabled,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            **stats,
+            "seconds_mean": stats["seconds"] / stats["pushed"] if stats["pushed"] else 0.0,
+            "fallback_reasons": [{"reason": reason, "count": count} for reason, count in reasons],
+        }
+
+    def _lines(self, query: SqlQuery, result, counter: Dict, files: List) -> Iterator[bytes]:
+        """
+        Helper function to format streamed rows as output lines, a chunk per fetch, also written to the output files
+
+        """
+
+        for rows in result.partitions(self.fetch_rows):
+            counter["rows"] += len(rows)
+            chunk = "".join(query.format_row(row) + "\n" for row in rows).encode("utf-8")
+
+            for f in files:
+                f.write(chunk)
+
+            yield chunk
+
+    @staticmethod
+    def _output_paths(plan: Dict) -> List[str]:
+        """
+        Helper function to get the local paths of the plan's textFileOutput files, e.g. from file:///tmp/output_x.txt
+
+        """
+
+        # List to store paths
+        paths = []
+
+        for op in plan.get("operators", []):
+            if op.get("operatorName") != "textFileOutput":
+                continue
+
+            url = urllib.parse.urlparse((op.get("data") or {}).get("filename") or "")
+            if url.scheme in ("", "file") and url.path:
+                paths.append(urllib.parse.unquote(url.path))
+
+        return paths
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        """
+        Helper function to remove a partly written output file
+
+        """
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _record_fallback(self, outcome: str, reason: str) -> None:
+        """
+        Helper function to record a plan left to Wayang
+
+        """
+
+        with self._lock:
+            self._stats[outcome + ("s" if outcome == "error" else "")] += 1
+            self._reasons[reason] = self._reasons.get(reason, 0) + 1
+
+        metrics.inc("wayang_sql_pushdown_total", outcome=outcome)
+
+    def _get_engine(self):
+        """
+        Helper function to get the pooled engine, created on first use so the server starts without importing SQLAlchemy
+
+        """
+
+        with self._lock:
+            if self._engine is None:
+                from sqlalchemy import create_engine
+
+                # Same connection as Wayang's JDBC input, e.g. jdbc:postgresql://localhost:5432/tpch
+                address = self.jdbc_uri.split("://")[1]
+                url = f"postgresql+psycopg2://{urllib.parse.quote(self.username)}:{urllib.parse.quote(self.password)}@{address}"
+
+                self._engine = create_engine(url, pool_size=self.pool_size, max_overflow=self.max_overflow, pool_pre_ping=True)
+
+            return self._engine
@@ -1,36 +1,134 @@
 from ai_wayang_single.config.settings import WAYANG_CONFIG
+from ai_wayang_single.wayang.backend_pool import BackendPool
+from ai_wayang_single.utils.metrics import metrics
+from ai_wayang_single.utils.tracer import tracer
 import requests
+import time
+import urllib3
+
+# Bytes read at a time when streaming output into a result store
+STREAM_CHUNK_SIZE = 64 * 1024
 
 class WayangExecutor:
     """
-    Executes a JSON Wayang Plan in Wayang server (JSON API) and returns output
+    Executes a JSON Wayang Plan in Wayang server (JSON API) and returns output.
+    Plans are spread over a pool of Wayang servers, and retried on another server if a server can't be reached
 
     """
 
-    def __init__(self, url: str | None = None):
-        self.url = url or WAYANG_CONFIG.get("server_url")
+    def __init__(self, url: str | None = None, pool: BackendPool | None = None):
+        self.pool = pool or (BackendPool.from_config({**WAYANG_CONFIG, "server_url": url}) if url else BackendPool.from_config(WAYANG_CONFIG))
+
+    @property
+    def url(self) -> str | None:
+        """
+        URL of the first Wayang server in the pool
+
+        """
+
+        return self.pool.backends[0].url if self.pool.backends else None
+
+    @url.setter
+    def url(self, url: str) -> None:
+        """
+        Replaces the pool with a single Wayang server, e.g. a stub server in benchmarks
+
+        """
+
+        self.pool = BackendPool([url])
 
-    def execute_plan(self, plan: str):
+    def execute_plan(self, plan: str, result_store=None):
         """
         Execute a JSON Wayang plan and returns output
-        Also returns the error stack if the server supports it
+        Also returns the error stack if the server supports it.
+        With a result store, a succesful output is streamed to disk instead of being read into memory
 
         Args: 
             plan (str): Wayang JSON plan to be executed
+            result_store (ResultStore | None): Store to spool succesful outputs to
 
         Returns:
-            Output from Wayang
+            Output from Wayang, or the result metadata from the store if spooled
+
+        """
+
+        with tracer.span("WayangExecutor.execute_plan", {"plan.operator_count": len(plan.get("operators", []))}) as span:
+            start = time.perf_counter()
+
+            # List to store backends that couldn't be reached
+            tried = []
+
+            while True:
+                # Least loaded healthy backend not tried yet, heavy plans on heavy backends
+                backend = self.pool.acquire(plan, exclude=tried)
+
+                if backend is None:
+                    metrics.record_http("error", time.perf_counter() - start)
+                    raise Exception(f"No Wayang backend reachable, tried {len(tried)}: {tried[-1].last_error if tried else 'no backends configured'}")
+
+                span.set_attribute("http.url", backend.url)
+
+                try:
+                    # Send plan to Wayang server, the body is read as it streams in
+                    with requests.post(url=backend.url, json=plan, stream=True) as response:
+                        span.set_attribute("http.status_code", response.status_code)
+
+                        # Spool succesful output to the result store
+                        if response.status_code == 200 and result_store is not None:
+                            result = result_store.write(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+                            span.set_attribute("result.rows", result["rows"])
+                        else:
+                            result = response.text
+
+                # Fail over to another backend only if the connection was never made, so the plan never ran.
+                # A connection lost after the plan was sent may have run it already, and is not retried
+                except requests.exceptions.ConnectionError as e:
+                    self.pool.release(backend, error=str(e))
+
+                    if not self._is_connect_error(e):
+                        metrics.record_http("error", time.perf_counter() - start)
+                        raise Exception(e)
+
+                    tried.append(backend)
+                    metrics.inc("wayang_backend_failovers_total", backend=backend.url)
+                    continue
+
+                # Handle other request exceptions
+                except requests.exceptions.RequestException as e:
+                    self.pool.release(backend)
+                    metrics.record_http("error", time.perf_counter() - start)
+                    raise Exception(e)
+
+                self.pool.release(backend)
+
+                # Record latency and status
+                metrics.record_http(response.status_code, time.perf_counter() - start)
+
+                # Return status code and body/output/result from Wayang server
+                return response.status_code, result
+
+    @staticmethod
+    def _is_connect_error(error: Exception) -> bool:
+        """
+        Helper function to check if a request failed while connecting, before the plan was sent
 
         """
 
-        try:
-            # Send plan to Wayang server
-            response = requests.post(url=self.url, json=plan)
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+
+        # Walk the wrapped errors, e.g. MaxRetryError with a NewConnectionError as reason
+        seen = set()
+        current = error
+
+        while current is not None and id(current) not in seen:
+            seen.add(id(current))
+
+            if isinstance(current, urllib3.exceptions.NewConnectionError):
+                return True
 
-            # Return status code and body/output/result from Wayang server
-            return response.status_code, response.text
+            reason = getattr(current, "reason", None)
+            wrapped = current.args[0] if current.args and isinstance(current.args[0], BaseException) else None
+            current = reason if isinstance(reason, BaseException) else wrapped or current.__cause__
 
-        # Handle request exceptions
-        except requests.exceptions.RequestException as e:
-            raise Exception(e)
-    
\ No newline at end of file
+        return False
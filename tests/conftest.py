@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Add src folder, so modules can be found
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
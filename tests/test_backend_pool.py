@@ -0,0 +1,82 @@
+import json
+import socket
+import pytest
+from ai_wayang_single.bench.stub_wayang import StubWayangServer
+from ai_wayang_single.wayang.backend_pool import BackendPool
+from ai_wayang_single.wayang.wayang_executor import WayangExecutor
+
+
+def read(table: str) -> dict:
+    return {"operators": [{"id": 1, "operatorName": "jdbcRemoteInput", "data": {"table": f"(SELECT a FROM {table}) as X"}}]}
+
+
+def unreachable_url() -> str:
+    # A port nothing listens on, connections are refused before the plan is sent
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    return f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture
+def stub():
+    server = StubWayangServer()
+    yield server
+    server.stop()
+
+
+def test_plans_over_large_tables_are_routed_to_heavy_backends(tmp_path):
+    (tmp_path / "schemas" / "tables").mkdir(parents=True)
+    (tmp_path / "schemas" / "tables" / "lineitem.json").write_text(json.dumps({"lineitem": {"columns": {}, "row_count": 6000000, "size_bytes": 900_000_000}}))
+    (tmp_path / "schemas" / "tables" / "nation.json").write_text(json.dumps({"nation": {"columns": {}, "row_count": 25, "size_bytes": 8192}}))
+    pool = BackendPool(["http://light"], heavy_urls=["http://heavy"], heavy_plan_bytes=100_000_000, probe_interval_seconds=3600, data_folder=tmp_path)
+
+    try:
+        assert pool.estimate_input_bytes(read("lineitem")) == 900_000_000
+        heavy = pool.acquire(read("lineitem"))
+        light = pool.acquire(read("nation"))
+    finally:
+        pool.stop()
+
+    assert heavy.url == "http://heavy"
+    assert light.url == "http://light"
+
+
+def test_unreachable_backends_fail_over(stub):
+    dead = unreachable_url()
+    pool = BackendPool([dead, stub.start()], probe_interval_seconds=3600)
+
+    try:
+        status_code, output = WayangExecutor(pool=pool).execute_plan(read("nation"))
+        backends = {backend["url"]: backend for backend in pool.get_stats()["backends"]}
+    finally:
+        pool.stop()
+
+    assert status_code == 200
+    assert output == "1,jdbcRemoteInput\n"
+    assert backends[dead]["healthy"] is False
+
+
+def test_no_reachable_backend_raises():
+    pool = BackendPool([unreachable_url(), unreachable_url()], probe_interval_seconds=3600)
+
+    try:
+        with pytest.raises(Exception, match="No Wayang backend reachable, tried 2"):
+            WayangExecutor(pool=pool).execute_plan(read("nation"))
+    finally:
+        pool.stop()
+
+
+def test_errors_from_a_reachable_backend_are_not_retried(stub):
+    failing = StubWayangServer(error_rate=1.0)
+    pool = BackendPool([failing.start(), stub.start()], probe_interval_seconds=3600)
+
+    try:
+        status_code, _ = WayangExecutor(pool=pool).execute_plan(read("nation"))
+    finally:
+        pool.stop()
+        failing.stop()
+
+    # The plan may have run, so it isn't sent to another backend
+    assert status_code == 500
@@ -0,0 +1,51 @@
+import pytest
+from ai_wayang_single.server import mcp_server
+from ai_wayang_single.utils.tracer import tracer
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    # Agents get a placeholder client, so no OpenAI client is created
+    monkeypatch.setattr(mcp_server.builder_agent, "_client", object())
+    monkeypatch.setattr(mcp_server.debugger_agent, "_client", object())
+
+    # Each query maps to the plan of its first word, executions record the span they run in
+    executions = []
+
+    def run_query(query, model, reasoning, use_debugger, debugger=None, execute=None, builder=None, session=True):
+        plan = {"operators": [{"id": 1, "operatorName": "textFileInput", "data": {"filename": query.split()[0]}}]}
+        status_code, output = execute(plan)
+        return {"output": output, "status": "success", "job_id": None, "plan_hash": None, "timings": {}}
+
+    def execute_plan(plan, priority, client_id):
+        with tracer.span("WayangExecutor.execute_plan") as span:
+            executions.append(span)
+        return 200, plan["operators"][0]["data"]["filename"]
+
+    monkeypatch.setattr(mcp_server, "_run_query", run_query)
+    monkeypatch.setattr(mcp_server, "_execute_plan", execute_plan)
+
+    return executions
+
+
+def test_execute_span_is_child_of_query_span(batch):
+    with tracer.span("query_wayang_batch") as root:
+        mcp_server._run_batch(["orders per day", "lineitem per day"], None, None, "False", None)
+
+    assert len(batch) == 2
+    for span in batch:
+        assert span.parent.name == "query_wayang"
+        assert span.parent.parent is root
+        assert span.trace_id == root.trace_id
+
+
+def test_equal_plans_share_one_execution(batch):
+    report = mcp_server._run_batch(["orders per day", "orders per month", "lineitem per day", "orders per day"], None, None, "False", None)
+
+    # Repeated queries run once, queries mapping to equal plans share the execution
+    assert report["distinct_queries"] == 3
+    assert report["executions"] == 2
+    assert report["shared_executions"] == 1
+    assert len(batch) == 2
+    assert [result["output"] for result in report["results"]] == ["orders", "orders", "lineitem", "orders"]
+    assert [result["duplicate_of"] for result in report["results"]] == [None, None, None, 0]
@@ -0,0 +1,70 @@
+import pytest
+from ai_wayang_single.utils.budget import BudgetExceeded, BudgetManager
+
+PRICES = "gpt-5:1.25/0.125/10,gpt-5-mini:0.25/0.025/2"
+
+
+def usage(input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> dict:
+    return {"input_tokens": input_tokens, "input_tokens_details": {"cached_tokens": cached_tokens}, "output_tokens": output_tokens}
+
+
+def test_request_token_budget_stops_the_next_call():
+    manager = BudgetManager(max_tokens_per_request=1000)
+
+    with manager.request("a") as budget:
+        manager.check("builder", 500)
+        manager.record("builder", "gpt-5-mini", usage(600, 200))
+
+        with pytest.raises(BudgetExceeded) as error:
+            manager.check("debugger", 300)
+
+    assert error.value.reason == "tokens"
+    assert budget.tokens == 800
+
+
+def test_debug_iterations_are_limited():
+    manager = BudgetManager(max_iterations_per_request=2)
+
+    with manager.request("a"):
+        for _ in range(2):
+            manager.check("debugger")
+            manager.record("debugger", "gpt-5-mini", usage(10, 10))
+
+        # The builder isn't a debug iteration
+        manager.check("builder")
+
+        with pytest.raises(BudgetExceeded, match="2 debug iterations"):
+            manager.check("debugger")
+
+
+def test_client_budget_spans_requests():
+    manager = BudgetManager(max_tokens_per_client=1000, client_window_seconds=60)
+
+    for _ in range(2):
+        with manager.request("a"):
+            manager.record("builder", "gpt-5-mini", usage(400, 100))
+
+    with manager.request("a"):
+        with pytest.raises(BudgetExceeded) as error:
+            manager.check("builder", 1)
+
+    # Other clients have their own budget
+    with manager.request("b"):
+        manager.check("builder", 1)
+
+    assert error.value.reason == "client_tokens"
+
+
+def test_cost_uses_the_longest_matching_model_and_cached_price():
+    manager = BudgetManager(model_prices=BudgetManager.parse_prices(PRICES))
+
+    assert manager.cost("gpt-5-mini", 1_000_000, 0, 0) == pytest.approx(0.25)
+    assert manager.cost("gpt-5-mini-2025-08-07", 1_000_000, 1_000_000, 1_000_000) == pytest.approx(0.025 + 2)
+    assert manager.cost("gpt-5", 0, 0, 1_000_000) == pytest.approx(10)
+    assert manager.cost("unknown", 1_000_000, 0, 1_000_000) == 0.0
+
+    with manager.request("a") as budget:
+        manager.record("builder", "gpt-5", usage(1_000_000, 0))
+
+    assert budget.cost == pytest.approx(1.25)
+    assert manager.get_report()["total_cost_usd"] == pytest.approx(1.25)
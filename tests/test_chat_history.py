@@ -0,0 +1,42 @@
+from ai_wayang_single.llm.chat_history import ChatHistory
+from ai_wayang_single.llm.models import WayangPlan
+
+
+def failed_plan(table: str) -> WayangPlan:
+    return WayangPlan(operations=[
+        {"cat": "input", "id": 1, "input": [], "output": [2], "operatorName": "jdbcRemoteInput", "table": table, "columnNames": ["c"]},
+        {"cat": "output", "id": 2, "input": [1], "output": [], "operatorName": "textFileOutput"},
+    ], thoughts="")
+
+
+def test_digest_stays_within_the_token_budget():
+    history = ChatHistory("system " * 100, token_budget=600, max_error_chars=100)
+    prompt = "latest prompt " * 50
+
+    for version in range(1, 21):
+        history.add_attempt(version, failed_plan(f"table_{version}"), None, ["x" * 500], "fixed " * 100)
+
+    messages = history.build_messages(prompt)
+    digest = messages[1]["content"]
+
+    # System prompt and latest prompt are kept verbatim, the digest keeps the newest attempts
+    assert messages[0]["content"] == history.system_prompt
+    assert messages[-1]["content"] == prompt
+    assert history.estimate_messages_tokens(messages) <= 600 + history.estimate_tokens(digest.split("\n- Plan")[0])
+    assert "Plan version 20: tried 1:jdbcRemoteInput[table_20] -> 2:textFileOutput" in digest
+    assert "Plan version 1:" not in digest
+    assert "earlier attempts omitted" in digest
+
+    # Errors and fixes are truncated to a line each
+    assert max(len(line) for line in digest.splitlines()) < 400
+
+
+def test_start_clears_the_digest():
+    history = ChatHistory("system", token_budget=1000)
+    history.add_attempt(1, failed_plan("orders"), "java.lang.RuntimeException: boom", [], None)
+
+    assert len(history.build_messages("prompt")) == 3
+
+    history.start()
+
+    assert len(history.build_messages("prompt")) == 2
@@ -0,0 +1,33 @@
+from ai_wayang_single.wayang.error_distiller import ErrorDistiller
+
+TRACE = """org.apache.wayang.core.api.exception.WayangException: Job failed.
+\tat org.apache.wayang.core.api.Job.execute(Job.java:100)
+Caused by: org.apache.spark.SparkException: Task 0 in stage 1.0 failed 1 times
+\tat org.apache.spark.scheduler.DAGScheduler.failJobAndIndependentStages(DAGScheduler.scala:10)
+Caused by: java.lang.RuntimeException: UDF of operator 3 failed
+\tat org.apache.wayang.java.operators.JavaMapOperator.evaluate(JavaMapOperator.java:40)
+Caused by: java.lang.RuntimeException: UDF of operator 3 failed
+\t... 5 more
+Caused by: java.lang.NumberFormatException: For input string: "N/A"
+\tat java.lang.Long.parseLong(Long.java:589)
+"""
+
+
+def test_every_distinct_exception_in_the_chain_is_kept():
+    distiller = ErrorDistiller()
+    distilled = distiller.distill(TRACE)
+
+    assert distilled["exception"] == "org.apache.wayang.core.api.exception.WayangException"
+    assert distilled["root_cause"]["exception"] == "java.lang.NumberFormatException"
+    assert [cause["message"] for cause in distilled["causes"]] == ["Task 0 in stage 1.0 failed 1 times", "UDF of operator 3 failed"]
+
+    prompt = distiller.to_prompt(distilled)
+    assert "Through: org.apache.spark.SparkException: Task 0 in stage 1.0 failed 1 times" in prompt
+    assert prompt.count("UDF of operator 3 failed") == 1
+
+
+def test_long_cause_messages_are_truncated():
+    distiller = ErrorDistiller(max_message_chars=20)
+    distilled = distiller.distill("java.lang.Exception: outer\nCaused by: java.lang.IllegalStateException: " + "x" * 100 + "\nCaused by: java.lang.Error: root")
+
+    assert distilled["causes"] == [{"exception": "java.lang.IllegalStateException", "message": "x" * 17 + "..."}]
@@ -0,0 +1,56 @@
+import json
+import pytest
+from ai_wayang_single.bench.evaluation import TPCH_PLANS_FILE, TpchEvaluation, add_postgres_functions, compare_results, parse_output
+from ai_wayang_single.bench.tpch_data import TpchGenerator
+from ai_wayang_single.llm.models import WayangPlan
+
+QUESTIONS = {question["question"]: question for question in TpchEvaluation.load_questions()}
+RECORDED = json.loads(TPCH_PLANS_FILE.read_text())
+
+
+@pytest.fixture(scope="module")
+def connection():
+    connection = TpchGenerator(0.01, 42).to_sqlite()
+    add_postgres_functions(connection)
+    yield connection
+    connection.close()
+
+
+def stub_evaluation(connection) -> TpchEvaluation:
+    # The recorded plans are abstract plans, so the mapper only has to load them
+    evaluation = TpchEvaluation(list(QUESTIONS.values()))
+    evaluation._connection = connection
+    evaluation._plan_mapper = type("Mapper", (), {"plan_from_json": staticmethod(lambda plan: WayangPlan(**plan))})()
+
+    return evaluation
+
+
+def run(connection, plan: dict) -> list:
+    evaluation = stub_evaluation(connection)
+
+    status, output = evaluation._execute_responder(plan)
+
+    assert status == 200 and evaluation._unverified is None
+    return parse_output(output)
+
+
+@pytest.mark.parametrize("recorded", RECORDED, ids=lambda recorded: QUESTIONS[recorded["query"]]["id"])
+def test_recorded_plans_match_the_reference(connection, recorded):
+    question = QUESTIONS[recorded["query"]]
+
+    assert compare_results(run(connection, recorded["plans"][-1]), connection.execute(question["sql"]).fetchall(), question["ordered"])
+
+
+def test_changed_plan_is_wrong(connection):
+    recorded = next(r for r in RECORDED if QUESTIONS[r["query"]]["id"] == "q6")
+    plan = json.loads(json.dumps(recorded["plans"][-1]).replace("1994-01-01", "1993-01-01"))
+
+    assert not compare_results(run(connection, plan), connection.execute(QUESTIONS[recorded["query"]]["sql"]).fetchall(), False)
+
+
+def test_plan_outside_the_compiler_subset_is_unverified(connection):
+    evaluation = stub_evaluation(connection)
+
+    status, output = evaluation._execute_responder({"operations": [{"cat": "input", "id": 1, "output": [2], "operatorName": "textFileInput", "inputFileName": "file:///tmp/x.txt"}, {"cat": "output", "id": 2, "input": [1], "operatorName": "textFileOutput"}]})
+
+    assert output == "" and evaluation._unverified
@@ -0,0 +1,76 @@
+import threading
+import time
+import pytest
+from ai_wayang_single.wayang.execution_scheduler import ExecutionScheduler, QueueFull
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting for the scheduler"
+        time.sleep(0.005)
+
+
+def queued(scheduler: ExecutionScheduler, priority: str) -> int:
+    return scheduler.get_stats()["priorities"][priority]["queued"]
+
+
+def submit(scheduler: ExecutionScheduler, name: str, priority: str, client_id: str, order: list, release: threading.Event | None = None) -> threading.Thread:
+    def execute():
+        order.append(name)
+        if release is not None:
+            release.wait(5)
+
+    thread = threading.Thread(target=scheduler.run, args=(execute, priority, client_id))
+    thread.start()
+
+    return thread
+
+
+def test_interactive_plans_start_first_and_clients_take_turns():
+    scheduler = ExecutionScheduler(max_concurrent=1, max_queue=3)
+    order = []
+    release = threading.Event()
+
+    # A running plan holds the only slot while the others queue up
+    threads = [submit(scheduler, "running", "interactive", "a", order, release)]
+    wait_for(lambda: order == ["running"])
+
+    for name, priority, client_id in [("batch", "batch", "b"), ("x1", "interactive", "x"), ("x2", "interactive", "x"), ("y1", "interactive", "y")]:
+        count = queued(scheduler, priority)
+        threads.append(submit(scheduler, name, priority, client_id, order))
+        wait_for(lambda: queued(scheduler, priority) == count + 1)
+
+    # The queue of a class is full
+    with pytest.raises(QueueFull):
+        scheduler.run(lambda: None, "interactive", "z")
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["running", "x1", "y1", "x2", "batch"]
+    assert scheduler.get_stats()["priorities"]["interactive"]["rejected"] == 1
+
+
+def test_batch_plans_leave_a_slot_for_interactive_plans():
+    scheduler = ExecutionScheduler(max_concurrent=2)
+    order = []
+    release = threading.Event()
+
+    threads = [submit(scheduler, "batch1", "batch", "b", order, release)]
+    wait_for(lambda: order == ["batch1"])
+
+    # The second batch plan waits although a slot is free, an interactive plan takes it
+    threads.append(submit(scheduler, "batch2", "batch", "b", order, release))
+    wait_for(lambda: queued(scheduler, "batch") == 1)
+    threads.append(submit(scheduler, "interactive", "interactive", "a", order, release))
+    wait_for(lambda: "interactive" in order)
+
+    assert order == ["batch1", "interactive"]
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["batch1", "interactive", "batch2"]
@@ -0,0 +1,53 @@
+import pytest
+from types import SimpleNamespace
+from ai_wayang_single.llm import llm_dispatcher as dispatcher_module
+from ai_wayang_single.llm.llm_dispatcher import LLMDispatcher
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class InternalServerError(Exception):
+    status_code = 503
+
+
+class Client:
+    """
+    Fake OpenAI client failing the first calls with the given errors
+
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.responses = self
+
+    def parse(self, **params):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(usage=SimpleNamespace(input_tokens=1, output_tokens=1))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "DEFAULT_RETRY_AFTER", 0.0)
+
+
+def test_transient_errors_are_retried():
+    client = Client(APIConnectionError("reset"), InternalServerError("unavailable"))
+
+    response, _ = LLMDispatcher(max_retries=3).parse(client, {"model": "m"}, 10, "builder")
+
+    assert client.calls == 3
+    assert response.usage.input_tokens == 1
+
+
+def test_other_errors_are_not_retried():
+    client = Client(ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        LLMDispatcher(max_retries=3).parse(client, {"model": "m"}, 10, "builder")
+
+    assert client.calls == 1
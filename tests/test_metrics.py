@@ -0,0 +1,65 @@
+import re
+import urllib.request
+from pathlib import Path
+from ai_wayang_single.utils.metrics import METRIC_HELP, Metrics, MetricsServer
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = Metrics()
+
+    for value in (0.02, 0.3, 0.3, 400):
+        registry.observe("wayang_stage_duration_seconds", value, buckets=(0.1, 1), stage="build")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE wayang_stage_duration_seconds histogram" in lines
+    assert 'wayang_stage_duration_seconds_bucket{stage="build",le="0.1"} 1' in lines
+    assert 'wayang_stage_duration_seconds_bucket{stage="build",le="1"} 3' in lines
+    assert 'wayang_stage_duration_seconds_bucket{stage="build",le="+Inf"} 4' in lines
+    assert 'wayang_stage_duration_seconds_count{stage="build"} 4' in lines
+
+
+def test_token_usage_is_counted_per_type():
+    registry = Metrics()
+
+    registry.record_usage("builder", "gpt-5-nano", {"input_tokens": 100, "input_tokens_details": {"cached_tokens": 40}, "output_tokens": 20, "output_tokens_details": {"reasoning_tokens": 5}}, latency=0.5)
+    registry.record_usage("builder", "gpt-5-nano", {"input_tokens": 50, "output_tokens": 10})
+    counters = registry.snapshot()["counters"]
+
+    assert counters['wayang_llm_requests_total{agent="builder",model="gpt-5-nano"}'] == 2
+    assert counters['wayang_llm_tokens_total{agent="builder",model="gpt-5-nano",type="input"}'] == 150
+    assert counters['wayang_llm_tokens_total{agent="builder",model="gpt-5-nano",type="cached"}'] == 40
+    assert counters['wayang_llm_tokens_total{agent="builder",model="gpt-5-nano",type="reasoning"}'] == 5
+
+
+def test_label_values_are_escaped():
+    registry = Metrics()
+    registry.inc("wayang_http_requests_total", status='a "b"\nc')
+
+    assert 'wayang_http_requests_total{status="a \\"b\\"\\nc"} 1' in registry.render().splitlines()
+
+
+def test_every_recorded_metric_is_described():
+    names = set()
+    for path in SRC.rglob("*.py"):
+        names.update(re.findall(r"metrics\.(?:inc|observe|timer)\(\s*\"(wayang_\w+)\"", path.read_text(encoding="utf-8")))
+
+    assert names
+    assert names - set(METRIC_HELP) == set()
+
+
+def test_endpoint_serves_metrics():
+    registry = Metrics()
+    registry.inc("wayang_queries_total", outcome="success")
+    server = MetricsServer(registry, port=0, host="127.0.0.1")
+    server.start()
+
+    try:
+        port = server.server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode("utf-8")
+    finally:
+        server.stop()
+
+    assert 'wayang_queries_total{outcome="success"} 1' in body.splitlines()
@@ -0,0 +1,51 @@
+import json
+import pytest
+from ai_wayang_single.llm.model_router import ModelRouter
+
+TIERS = [("gpt-5-nano", "low"), ("gpt-5-mini", "medium"), ("gpt-5", "high")]
+
+
+@pytest.fixture
+def router(tmp_path):
+    tables = tmp_path / "schemas" / "tables"
+    tables.mkdir(parents=True)
+    for table in ("orders", "customer", "lineitem"):
+        (tables / f"{table}.json").write_text("{}")
+
+    return ModelRouter(tiers=TIERS, thresholds=[3, 6], stats_file=str(tmp_path / "stats.json"), data_folder=tmp_path)
+
+
+def test_queries_are_routed_by_complexity(router):
+    assert router.route("List all orders") == 0
+    assert router.route("Total price of orders per customer") == 1
+    assert router.route("Join orders with customers and lineitems, then sum the total price per customer and rank the top 10") == 2
+
+
+def test_escalation_stops_at_the_strongest_tier(router):
+    assert router.escalate(0) == 1
+    assert router.escalate(2) == 2
+    assert router.get_tier(router.escalate(1)) == ("gpt-5", "high")
+
+
+def test_stats_are_saved_and_loaded(router, tmp_path):
+    router.record(0, "builder", 2.0, True, {"input_tokens": 100, "output_tokens": 50})
+    router.record(0, "debugger", 4.0, False, {"input_tokens": 10, "output_tokens": 5})
+
+    stats = ModelRouter(tiers=TIERS, thresholds=[3, 6], stats_file=str(tmp_path / "stats.json"), data_folder=tmp_path).get_stats()["gpt-5-nano:low"]
+
+    assert stats["calls"] == 2
+    assert stats["success_rate"] == 0.5
+    assert stats["avg_latency_seconds"] == 3.0
+    assert stats["agents"] == {"builder": 1, "debugger": 1}
+    assert list(tmp_path.glob("*.tmp")) == []
+    assert json.loads((tmp_path / "stats.json").read_text())["gpt-5-nano:low"]["input_tokens"] == 110
+
+
+def test_new_tables_count_after_reload(router, tmp_path):
+    assert router.complexity("Parts and suppliers")["sources"] == []
+
+    (tmp_path / "schemas" / "tables" / "part.json").write_text("{}")
+    (tmp_path / "schemas" / "tables" / "supplier.json").write_text("{}")
+    router.reload_source_names()
+
+    assert router.complexity("Parts and suppliers")["sources"] == ["part", "supplier"]
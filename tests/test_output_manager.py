@@ -0,0 +1,24 @@
+import os
+from ai_wayang_single.wayang.output_manager import OutputManager
+
+
+def test_cleanup_keeps_files_of_executing_plans(tmp_path):
+    manager = OutputManager(folder=str(tmp_path), max_files=0)
+
+    # Output file of a plan still executing, and a file of a finished plan
+    active = manager.new_filename("abc")
+    finished = manager.new_filename("def")
+    for filename in (active, finished):
+        (tmp_path / filename).write_text("1\n")
+
+    manager.release({"operators": [{"operatorName": "textFileOutput", "data": {"filename": f"file://{tmp_path}/{finished}"}}]})
+    report = manager.cleanup()
+
+    assert sorted(os.listdir(tmp_path)) == [active]
+    assert report["removed_files"] == 1
+
+    # Once released, the file is removed too
+    manager.release({"operators": [{"operatorName": "textFileOutput", "data": {"filename": f"file://{tmp_path}/{active}"}}]})
+    manager.cleanup()
+
+    assert os.listdir(tmp_path) == []
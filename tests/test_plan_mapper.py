@@ -0,0 +1,95 @@
+import json
+import pytest
+from ai_wayang_single.llm.models import WayangPlan
+from ai_wayang_single.wayang.plan_mapper import PlanMapper
+from ai_wayang_single.wayang.plan_validator import PlanValidator
+
+RECORD = "(r: org.apache.wayang.basic.data.Record) => "
+
+
+@pytest.fixture
+def mapper(tmp_path):
+    tables = tmp_path / "data" / "schemas" / "tables"
+    tables.mkdir(parents=True)
+    (tables / "orders.json").write_text(json.dumps({"orders": {"columns": {}, "row_count": 1500000, "partition_key": {"column": "o_orderkey", "min": 1, "max": 6000000}}}))
+    (tables / "lineitem.json").write_text(json.dumps({"lineitem": {"columns": {}, "row_count": 6000000, "partition_key": {"column": "l_orderkey", "min": 1, "max": 6000000}}}))
+    (tmp_path / "output").mkdir()
+
+    config = {
+        "input_config": {"jdbc_uri": "jdbc:postgresql://localhost:5432/tpch", "jdbc_username": "user", "jdbc_password": "", "input_folder": str(tmp_path)},
+        "output_config": {"output_folder": str(tmp_path / "output")},
+        "partition_config": {"partition_reads": "True", "partitions": 3, "min_rows": 1000000},
+    }
+
+    return PlanMapper(config, data_folder=tmp_path / "data")
+
+
+def operation(id: int, operatorName: str, input: list, output: list, **fields) -> dict:
+    cat = "input" if not input else "output" if not output else "binary" if len(input) == 2 else "unary"
+    return {"cat": cat, "id": id, "input": input, "output": output, "operatorName": operatorName, **fields}
+
+
+def join_plan() -> WayangPlan:
+    return WayangPlan(operations=[
+        operation(1, "jdbcRemoteInput", [], [3], table="orders", columnNames=["o_orderkey", "o_orderstatus"]),
+        operation(2, "jdbcRemoteInput", [], [3], table="lineitem", columnNames=["l_orderkey", "l_quantity"]),
+        operation(3, "join", [1, 2], [4], thisKeyUdf=RECORD + "r.getField(0)", thatKeyUdf=RECORD + "r.getField(0)"),
+        operation(4, "textFileOutput", [3], []),
+    ])
+
+
+def test_partitioned_plan_keeps_ids_and_order_valid(mapper):
+    plan = mapper.partition_reads(mapper.plan_to_json(join_plan()))
+    operators = plan["operators"]
+    ids = [op["id"] for op in operators]
+
+    # Three reads and two unions per table, the join and the output
+    assert len(operators) == 12
+    assert ids == list(range(1, 13))
+
+    # Every operator follows its inputs, and the validator accepts the rewritten plan
+    for op in operators:
+        assert all(input_id < op["id"] for input_id in op["input"])
+        assert all(output_id > op["id"] for output_id in op["output"])
+    assert PlanValidator().validate_plan(plan) == (True, [])
+
+    # The join reads from the last union of each table
+    join = next(op for op in operators if op["operatorName"] == "join")
+    unions = {op["id"]: op for op in operators if op["operatorName"] == "union"}
+    assert all(input_id in unions and unions[input_id]["output"] == [join["id"]] for input_id in join["input"])
+
+
+def test_inputs_and_outputs_agree_after_partitioning(mapper):
+    operators = {op["id"]: op for op in mapper.partition_reads(mapper.plan_to_json(join_plan()))["operators"]}
+
+    for op in operators.values():
+        for output_id in op["output"]:
+            assert op["id"] in operators[output_id]["input"]
+
+
+def test_small_tables_are_left_alone(mapper):
+    plan = mapper.plan_to_json(WayangPlan(operations=[
+        operation(1, "jdbcRemoteInput", [], [2], table="nation", columnNames=["n_name"]),
+        operation(2, "textFileOutput", [1], []),
+    ]))
+
+    assert mapper.partition_reads(plan) is plan
+
+
+@pytest.mark.parametrize("operatorName,field,method", [("limit", "limit", "any"), ("sample", "sampleSize", "random")])
+def test_limit_and_sample_round_trip(mapper, operatorName, field, method):
+    plan = WayangPlan(operations=[
+        operation(1, "jdbcRemoteInput", [], [2], table="nation", columnNames=["n_name"]),
+        operation(2, operatorName, [1], [3], **{field: 5}),
+        operation(3, "textFileOutput", [2], []),
+    ])
+
+    mapped = mapper.plan_to_json(plan)
+    sample = mapped["operators"][1]
+
+    assert sample["operatorName"] == "sample"
+    assert sample["data"] == {"sampleSize": 5, "method": method}
+
+    op = mapper.plan_from_json(mapped).operations[1]
+    assert op.operatorName == operatorName
+    assert getattr(op, field) == 5
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from ai_wayang_single.llm.plan_speculator import PlanSpeculator
+from ai_wayang_single.utils.budget import BudgetExceeded
+
+
+class Builder:
+    """
+    Fake builder answering with the model name as plan. Models in blocked wait until released
+
+    """
+
+    def __init__(self, blocked=(), error: Exception | None = None):
+        self.blocked = blocked
+        self.error = error
+        self.release = threading.Event()
+        self.calls = []
+
+    def generate_plan(self, prompt, model=None, reasoning=None):
+        self.calls.append(model)
+        if model in self.blocked:
+            self.release.wait(5)
+        if self.error:
+            raise self.error
+        return {"raw": None, "wayang_plan": model}
+
+
+class Mapper:
+    def plan_to_json(self, plan):
+        return {"model": plan}
+
+
+class Validator:
+    def __init__(self, errors: dict):
+        self.errors = errors
+
+    def validate_plan(self, plan):
+        errors = self.errors.get(plan["model"], [])
+        return not errors, errors
+
+
+def speculator(builder, errors: dict, models, first_valid_wins: bool) -> PlanSpeculator:
+    return PlanSpeculator(builder, Mapper(), Validator(errors), candidates=[(model, None) for model in models], max_candidates=len(models), max_workers=len(models), first_valid_wins=first_valid_wins)
+
+
+def test_candidates_are_ranked_by_validity_and_errors():
+    errors = {"a": ["x", "y"], "c": ["z"]}
+
+    candidates = speculator(Builder(), errors, ["a", "b", "c"], False).generate("query")
+
+    assert [c["model"] for c in candidates] == ["b", "c", "a"]
+    assert candidates[0]["val_success"] is True
+
+
+def test_first_valid_candidate_wins_without_waiting_for_slower_ones():
+    builder = Builder(blocked=("slow",))
+
+    try:
+        candidates = speculator(builder, {}, ["slow", "fast"], True).generate("query")
+    finally:
+        builder.release.set()
+
+    assert [c["model"] for c in candidates] == ["fast"]
+
+
+def test_budget_error_is_raised_if_no_candidate_has_a_plan():
+    builder = Builder(error=BudgetExceeded("request_tokens", "Request token budget exceeded"))
+
+    with pytest.raises(BudgetExceeded):
+        speculator(builder, {}, ["a", "b"], True).generate("query")
@@ -0,0 +1,40 @@
+import json
+from ai_wayang_single.llm.plan_stream import IncrementalPlanParser, PlanStreamReader
+
+
+def operation(id: int, **fields) -> dict:
+    return {"cat": "unary", "id": id, "input": [id - 1], "output": [id + 1], "operatorName": "map", "udf": "(r: Record) => r", **fields}
+
+
+def test_operations_are_returned_as_they_close():
+    text = json.dumps({"operations": [operation(1), operation(2)], "thoughts": "{ not an operation }"})
+    parser = IncrementalPlanParser()
+
+    completed = [op.id for i in range(0, len(text), 7) for op in parser.feed(text[i : i + 7])]
+
+    assert completed == [1, 2]
+    assert parser.errors == []
+
+
+def test_invalid_operation_is_skipped_and_parsing_continues():
+    # Regression: an invalid object was read again on the next feed and the depth went negative
+    text = json.dumps({"operations": [operation(1), {"id": "x"}, operation(3), operation(3)]})
+    parser = IncrementalPlanParser()
+
+    completed = [op.id for char in text for op in parser.feed(char)]
+
+    assert completed == [1, 3, 3]
+    assert len(parser.errors) == 1 and parser.errors[0].startswith("Operation 2: Not a valid operation")
+    assert parser._depth == 0
+
+
+def test_reader_without_abort_reports_errors_after_an_invalid_operation():
+    text = json.dumps({"operations": [operation(1), {"id": "x"}, operation(3), operation(3)]})
+    reader = PlanStreamReader(abort=False)
+    reader._start = 0.0
+
+    for i in range(0, len(text), 5):
+        reader._check(reader._feed(text[i : i + 5]))
+
+    assert any("Not a valid operation" in error for error in reader.errors)
+    assert "Operation id 3: Id used by an earlier operation" in reader.errors
@@ -0,0 +1,90 @@
+import json
+import pytest
+from ai_wayang_single.llm.models import WayangPlan
+from ai_wayang_single.server import mcp_server
+from ai_wayang_single.utils.budget import budgets
+from ai_wayang_single.utils.tracer import tracer
+from ai_wayang_single.wayang.plan_templates import PlanTemplateLibrary
+
+RECORD = "(r: org.apache.wayang.basic.data.Record) => "
+QUERY = "Names of customers in orders with a total price above 1000.5 placed after '1995-01-01'"
+
+
+@pytest.fixture
+def library(tmp_path):
+    tables = tmp_path / "schemas" / "tables"
+    tables.mkdir(parents=True)
+    (tables / "orders.json").write_text(json.dumps({"orders": {"columns": {"o_custkey": "int", "o_totalprice": "float", "o_orderdate": "date"}}}))
+    (tables / "archive.json").write_text(json.dumps({"archive": {"columns": {"o_custkey": "int", "o_totalprice": "float", "o_orderdate": "date"}}}))
+    (tables / "nation.json").write_text(json.dumps({"nation": {"columns": {"n_name": "text"}}}))
+
+    return PlanTemplateLibrary(template_file=str(tmp_path / "templates.json"), max_failures=2, data_folder=tmp_path)
+
+
+def operation(id: int, operatorName: str, input: list, output: list, **fields) -> dict:
+    cat = "input" if not input else "output" if not output else "unary"
+    return {"cat": cat, "id": id, "input": input, "output": output, "operatorName": operatorName, **fields}
+
+
+def orders_plan() -> WayangPlan:
+    return WayangPlan(operations=[
+        operation(1, "jdbcRemoteInput", [], [2], table="orders", columnNames=["o_custkey", "o_totalprice", "o_orderdate"]),
+        operation(2, "filter", [1], [3], udf=RECORD + "r.getDouble(1) > 1000.5 && r.getString(2) > \"1995-01-01\""),
+        operation(3, "textFileOutput", [2], []),
+    ], thoughts="Filter orders by price and date")
+
+
+def test_matching_query_fills_the_slots(library):
+    library.add(QUERY, orders_plan())
+
+    match = library.match("Names of customers in  archive with a total price above 250.0 placed after '1997-06-30'")
+    operations = match["wayang_plan"].operations
+
+    assert match["params"] == {"p0": "archive", "p1": "250.0", "p2": "1997-06-30"}
+    assert operations[0].table == "archive"
+    assert operations[1].udf == RECORD + "r.getDouble(1) > 250.0 && r.getString(2) > \"1997-06-30\""
+
+
+def test_other_shapes_and_unknown_tables_do_not_match(library):
+    library.add(QUERY, orders_plan())
+
+    assert library.match("Names of customers in orders with a total price below 1000.5") is None
+
+    # Unknown table, and a table without the columns the plan reads
+    assert library.match(QUERY.replace("orders", "shipments")) is None
+    assert library.match(QUERY.replace("orders", "nation")) is None
+
+
+def test_failing_templates_are_removed(library):
+    template_id = library.add(QUERY, orders_plan())
+
+    library.record_failure(template_id)
+    assert library.match(QUERY) is not None
+
+    library.record_failure(template_id)
+    assert library.match(QUERY) is None
+
+
+def test_matching_query_skips_the_builder(library, monkeypatch):
+    library.add(QUERY, orders_plan())
+    monkeypatch.setattr(mcp_server, "plan_templates", library)
+    monkeypatch.setitem(mcp_server.TEMPLATE_CONFIG, "use_templates", "True")
+
+    def generate_plan(*args, **kwargs):
+        raise AssertionError("Builder called for a query matching a template")
+
+    monkeypatch.setattr(mcp_server.builder_agent, "generate_plan", generate_plan)
+
+    # Executed plans are recorded, the result is a single row
+    executed = []
+
+    def execute(plan):
+        executed.append(plan)
+        return 200, mcp_server.result_store.write([b"Record[1]\n"])
+
+    with tracer.span("query_wayang"), budgets.request(None):
+        output = mcp_server._run_query(QUERY.replace("1000.5", "2000.0"), "gpt-5-nano", None, "False", execute=execute, session=False)
+
+    assert output["status"] == "success"
+    assert len(executed) == 1
+    assert "2000.0" in json.dumps(executed[0])
@@ -0,0 +1,56 @@
+import json
+import shutil
+from pathlib import Path
+import pytest
+from ai_wayang_single.llm.prompt_loader import PromptLoader
+from ai_wayang_single.llm.prompt_registry import PromptRegistry
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def registry(tmp_path):
+    # Copies of the bundled prompts and data, so files can be changed
+    shutil.copytree(ROOT / "src" / "ai_wayang_single" / "llm" / "prompts", tmp_path / "prompts")
+    shutil.copytree(ROOT / "data", tmp_path / "data")
+
+    loader = PromptLoader()
+    loader.prompt_folder = tmp_path / "prompts"
+    loader.data_folder = tmp_path / "data"
+
+    return PromptRegistry(loader, reload_interval_seconds=0)
+
+
+def test_schema_changes_reload_only_the_builder_prompt(registry):
+    builder, debugger = registry.get("builder"), registry.get("debugger")
+    changes = []
+    registry.on_reload(changes.append)
+
+    (registry.loader.data_folder / "schemas" / "tables" / "shipments.json").write_text(json.dumps({"shipments": {"columns": {"s_id": "int"}}}))
+
+    assert registry.refresh() == ["data"]
+    assert changes == [["data"]]
+    assert registry.version == 2
+    assert "shipments" in registry.get("builder") and "shipments" not in builder
+    assert registry.get("debugger") is debugger
+
+
+def test_operator_changes_reload_both_prompts(registry):
+    builder, debugger = registry.get("builder"), registry.get("debugger")
+
+    with open(registry.loader.prompt_folder / "operators.txt", "a", encoding="utf-8") as f:
+        f.write("\nNEW OPERATOR\n")
+
+    assert registry.refresh() == ["operators"]
+    assert "NEW OPERATOR" in registry.get("builder") and builder != registry.get("builder")
+    assert "NEW OPERATOR" in registry.get("debugger") and debugger != registry.get("debugger")
+
+
+def test_broken_files_keep_the_current_prompts(registry):
+    builder = registry.get("builder")
+
+    (registry.loader.data_folder / "schemas" / "tables" / "half.json").write_text('{"half": {"col')
+
+    assert registry.refresh() == []
+    assert registry.version == 1
+    assert registry.get("builder") is builder
@@ -0,0 +1,64 @@
+import json
+from ai_wayang_single.bench.replay import (
+    SessionReplay,
+    ReplayExecutor,
+    QUERY_TITLE,
+    ARCHITECTURE_TITLE,
+    BUILDER_PLAN_TITLE,
+    DEBUGGER_PLAN_TITLE,
+    WAYANG_ERROR_TITLE,
+    SUCCESS_TITLE,
+)
+
+
+def _write_log(path, logs):
+    path.write_text(json.dumps(logs), encoding="utf-8")
+    return path
+
+
+def test_load_session_reads_plans_responses_and_outcome(tmp_path):
+    builder_plan = {"operators": [{"id": 1}]}
+    debugger_plan = {"operators": [{"id": 2}]}
+
+    path = _write_log(tmp_path / "session.json", [
+        {"title": QUERY_TITLE, "log": "orders per day"},
+        {"title": ARCHITECTURE_TITLE, "log": {"model": "gpt-5-nano", "reasoning": "medium", "debugger": "False"}},
+        {"title": BUILDER_PLAN_TITLE, "log": builder_plan},
+        # Older logs only record the status of failed executions in the following error log
+        {"title": "Wayang: Wayang plan sent to Wayang", "log": builder_plan},
+        {"title": WAYANG_ERROR_TITLE, "log": {"status_code": 500, "output": "boom"}},
+        {"title": f"{DEBUGGER_PLAN_TITLE} 1", "log": {"plan": debugger_plan}},
+        {"title": "Wayang: Wayang plan sent to Wayang", "log": {"status_code": 200, "output": "1,2"}},
+        {"title": SUCCESS_TITLE, "log": ""},
+    ])
+
+    session = SessionReplay.load_session(path)
+
+    assert session["query"] == "orders per day"
+    assert (session["model"], session["reasoning"], session["use_debugger"]) == ("gpt-5-nano", "medium", "False")
+    assert session["plans"] == [builder_plan, debugger_plan]
+    assert session["wayang_responses"] == [[500, "boom"], [200, "1,2"]]
+    assert session["outcome"] == "success"
+
+
+def test_load_folder_skips_unreplayable_and_broken_logs(tmp_path):
+    _write_log(tmp_path / "a.json", [{"title": QUERY_TITLE, "log": "no plan"}])
+    _write_log(tmp_path / "b.json", [{"title": QUERY_TITLE, "log": "q"}, {"title": BUILDER_PLAN_TITLE, "log": {}}])
+    (tmp_path / "c.json").write_text("{not json", encoding="utf-8")
+
+    sessions = SessionReplay.load_folder(tmp_path)
+
+    assert [session["file"] for session in sessions] == [str(tmp_path / "b.json")]
+
+
+def test_replay_executor_answers_in_order_and_repeats_last():
+    executor = ReplayExecutor([[500, "boom"], [200, {"preview": "1,2"}]])
+
+    assert executor.execute_plan({}) == (500, "boom")
+    assert executor.execute_plan({}) == (200, "1,2")
+    assert executor.execute_plan({}) == (200, "1,2")
+    assert executor.requests == 3
+
+
+def test_replay_executor_without_responses_fails():
+    assert ReplayExecutor([]).execute_plan({}) == (500, "No recorded Wayang response")
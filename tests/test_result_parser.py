@@ -0,0 +1,32 @@
+from ai_wayang_single.wayang.result_parser import ResultParser
+
+
+def test_rows_with_commas_in_text_mark_the_summary_unreliable():
+    parser = ResultParser(top_k=2)
+
+    summary = parser.summarize(parser.parse_text("(1,AIR)\n(2,TRUCK)\n(3,RAIL, FAST)\n"))
+
+    assert summary["rows"] == 3
+    assert summary["reliable"] is False
+    assert summary["irregular_rows"] == 1
+
+
+def test_regular_rows_are_reliable(tmp_path):
+    path = tmp_path / "result.txt"
+    path.write_text("(1,AIR)\n\n(2,TRUCK)\n")
+    parser = ResultParser(top_k=2)
+
+    summary = parser.summarize(parser.parse_file(path))
+
+    assert summary["rows"] == 2
+    assert summary["reliable"] is True
+    assert [column["type"] for column in summary["columns"]] == ["integer", "text"]
+
+
+def test_integers_beyond_int64_stay_text():
+    parser = ResultParser(top_k=2)
+
+    table = parser.parse_text("(1,9223372036854775807)\n(2,99999999999999999999)\n")
+
+    assert table["c0"].tolist() == [1, 2]
+    assert table["c1"].tolist() == ["9223372036854775807", "99999999999999999999"]
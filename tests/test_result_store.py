@@ -0,0 +1,50 @@
+import pytest
+from ai_wayang_single.wayang.result_store import INDEX_EVERY, ResultStore
+
+ROWS = 2 * INDEX_EVERY + 500
+
+
+def chunks(data: bytes, size: int):
+    # Chunks cut through lines, like a streamed response
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+@pytest.fixture
+def data() -> bytes:
+    # Last line without a newline, like some Wayang outputs
+    return "\n".join(f"Record[{i}, row {i}]" for i in range(ROWS)).encode("utf-8")
+
+
+def store(tmp_path) -> ResultStore:
+    return ResultStore(folder=tmp_path, preview_lines=5, preview_chars=1000, max_page_lines=100, max_results=10)
+
+
+@pytest.mark.parametrize("offset,limit", [(0, 10), (INDEX_EVERY - 3, 10), (2 * INDEX_EVERY - 1, 2), (ROWS - 4, 10)])
+def test_pages_across_index_blocks(tmp_path, data, offset, limit):
+    result_store = store(tmp_path)
+    result = result_store.write(chunks(data, 777))
+
+    page = result_store.fetch_page(result["job_id"], offset, limit)
+    expected = [f"Record[{i}, row {i}]" for i in range(offset, min(offset + limit, ROWS))]
+
+    assert result["rows"] == ROWS
+    assert page["rows"] == expected
+    assert page["next_offset"] == (offset + limit if offset + limit < ROWS else None)
+
+
+def test_pages_after_restart_are_reindexed(tmp_path, data):
+    result = store(tmp_path).write(chunks(data, 4096))
+
+    # A new store only has the file on disk
+    page = store(tmp_path).fetch_page(result["job_id"], INDEX_EVERY, 3)
+
+    assert page["total_rows"] == ROWS
+    assert page["rows"] == [f"Record[{i}, row {i}]" for i in range(INDEX_EVERY, INDEX_EVERY + 3)]
+
+
+def test_page_size_is_capped_and_offsets_past_the_end_are_empty(tmp_path, data):
+    result_store = store(tmp_path)
+    job_id = result_store.write(chunks(data, 777))["job_id"]
+
+    assert result_store.fetch_page(job_id, 0, 1000)["returned"] == 100
+    assert result_store.fetch_page(job_id, ROWS + 10, 10)["rows"] == []
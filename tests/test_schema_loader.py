@@ -0,0 +1,48 @@
+import json
+import pandas as pd
+from ai_wayang_single.utils.schema_loader import SchemaLoader
+
+
+def loader(tmp_path, monkeypatch, scanned: list) -> SchemaLoader:
+    (tmp_path / "tables").mkdir()
+    schemas = pd.DataFrame({"table_name": ["orders", "nation"], "column_name": ["o_orderkey", "n_nationkey"], "data_type": ["integer", "integer"]})
+    sizes = {"orders": {"row_count": 15000, "size_bytes": 2367488}, "nation": {"row_count": 25, "size_bytes": 8192}}
+
+    def partition_keys(self, schemas, tables):
+        scanned.extend(tables)
+        return {table: {"column": "o_orderkey", "min": 1, "max": 15000} for table in tables}
+
+    monkeypatch.setattr(SchemaLoader, "_get_schemas", lambda self: schemas)
+    monkeypatch.setattr(SchemaLoader, "_add_record_examples", lambda self, schemas: schemas.assign(example_1="1", example_2="2"))
+    monkeypatch.setattr(SchemaLoader, "_get_table_sizes", lambda self: sizes)
+    monkeypatch.setattr(SchemaLoader, "_get_partition_keys", partition_keys)
+
+    return SchemaLoader({"input_config": {}, "partition_config": {"min_rows": 1000}}, str(tmp_path))
+
+
+def test_statistics_are_merged_into_existing_schema_files(tmp_path, monkeypatch):
+    scanned = []
+    schema_loader = loader(tmp_path, monkeypatch, scanned)
+    path = tmp_path / "tables" / "orders.json"
+    path.write_text(json.dumps({"orders": {"table_description": "Written by hand", "input_type": "jdbc_input", "columns": {}}}))
+
+    schema_loader.get_and_save_table_schemas()
+
+    orders = json.loads(path.read_text())["orders"]
+    assert orders["table_description"] == "Written by hand"
+    assert orders["row_count"] == 15000 and orders["size_bytes"] == 2367488
+    assert orders["partition_key"] == {"column": "o_orderkey", "min": 1, "max": 15000}
+
+    # Tables below the partition threshold aren't scanned for key bounds
+    assert scanned == ["orders"]
+    assert "partition_key" not in json.loads((tmp_path / "tables" / "nation.json").read_text())["nation"]
+
+
+def test_unchanged_statistics_leave_the_file_alone(tmp_path, monkeypatch):
+    schema_loader = loader(tmp_path, monkeypatch, [])
+    schema_loader.get_and_save_table_schemas()
+    path = tmp_path / "tables" / "orders.json"
+    modified = path.stat().st_mtime_ns
+
+    assert "statistics updated in 0 of them" in schema_loader.get_and_save_table_schemas()
+    assert path.stat().st_mtime_ns == modified
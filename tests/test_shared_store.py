@@ -0,0 +1,62 @@
+import json
+import multiprocessing
+from ai_wayang_single.llm.models import WayangPlan
+from ai_wayang_single.utils.shared_store import SharedStore
+from ai_wayang_single.wayang.plan_templates import PlanTemplateLibrary
+from ai_wayang_single.wayang.result_store import ResultStore
+
+WORKERS = 4
+KEYS = 25
+
+
+def write_keys(path: str, worker: int) -> None:
+    # Each process opens its own store on the file, like a server worker
+    store = SharedStore(path)
+    for key in range(KEYS):
+        store.set("jobs", f"{worker}-{key}", {"worker": worker, "key": key})
+
+
+def test_values_written_by_other_processes_are_seen(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = SharedStore(path)
+
+    processes = [multiprocessing.get_context("spawn").Process(target=write_keys, args=(path, worker)) for worker in range(WORKERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+
+    assert [process.exitcode for process in processes] == [0] * WORKERS
+    assert store.count("jobs") == WORKERS * KEYS
+    assert store.get("jobs", "3-24") == {"worker": 3, "key": 24}
+    assert store.version("jobs") == WORKERS * KEYS
+
+
+def test_results_are_paged_by_another_worker(tmp_path):
+    path = str(tmp_path / "store.db")
+    writer = ResultStore(folder=tmp_path / "results", preview_lines=2, preview_chars=100, max_page_lines=10, max_results=10, shared_store=SharedStore(path))
+    reader = ResultStore(folder=tmp_path / "results", preview_lines=2, preview_chars=100, max_page_lines=10, max_results=10, shared_store=SharedStore(path))
+
+    job_id = writer.write([b"a\nb\n", b"c\n"])["job_id"]
+
+    assert reader.fetch_page(job_id, 1, 5)["rows"] == ["b", "c"]
+
+
+def test_templates_learned_by_one_worker_are_used_by_another(tmp_path):
+    tables = tmp_path / "schemas" / "tables"
+    tables.mkdir(parents=True)
+    (tables / "nation.json").write_text(json.dumps({"nation": {"columns": {"n_name": "text", "n_regionkey": "int"}}}))
+    path = str(tmp_path / "store.db")
+
+    learner = PlanTemplateLibrary(max_failures=3, data_folder=tmp_path, shared_store=SharedStore(path))
+    other = PlanTemplateLibrary(max_failures=3, data_folder=tmp_path, shared_store=SharedStore(path))
+
+    learner.add("Nations in region 2", WayangPlan(operations=[
+        {"cat": "input", "id": 1, "input": [], "output": [2], "operatorName": "jdbcRemoteInput", "table": "nation", "columnNames": ["n_name", "n_regionkey"]},
+        {"cat": "unary", "id": 2, "input": [1], "output": [3], "operatorName": "filter", "udf": "(r: org.apache.wayang.basic.data.Record) => r.getInt(1) == 2"},
+        {"cat": "output", "id": 3, "input": [2], "output": [], "operatorName": "textFileOutput"},
+    ], thoughts=""))
+
+    match = other.match("Nations in region 4")
+
+    assert match["wayang_plan"].operations[1].udf.endswith("r.getInt(1) == 4")
@@ -0,0 +1,90 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+import pytest
+from ai_wayang_single.llm.models import WayangPlan
+from ai_wayang_single.wayang.sql_compiler import NotTranslatable, PlanSqlCompiler, format_double, format_scalar
+
+DATA = Path(__file__).resolve().parents[1] / "src" / "ai_wayang_single" / "bench" / "data"
+
+
+def bundled_plans(name: str) -> list:
+    return [(query["query"], query["plans"]) for query in json.loads((DATA / name).read_text())]
+
+
+def operation(id: int, operatorName: str, input: list, output: list, **fields) -> dict:
+    cat = "input" if not input else "output" if not output else "binary" if len(input) == 2 else "unary"
+    return {"cat": cat, "id": id, "input": input, "output": output, "operatorName": operatorName, **fields}
+
+
+def compile_plan(*operations) -> str:
+    return PlanSqlCompiler().compile(WayangPlan(operations=list(operations))).sql
+
+
+@pytest.mark.parametrize("query,plans", bundled_plans("tpch_plans.json") + bundled_plans("recorded_plans.json"))
+def test_final_bundled_plans_compile(query, plans):
+    # The last plan of a query is the one the debugger settled on
+    sql = PlanSqlCompiler().compile(WayangPlan(**plans[-1])).sql
+
+    assert sql.startswith("SELECT ")
+
+
+@pytest.mark.parametrize("query,plans", [(q, p) for q, p in bundled_plans("tpch_plans.json") + bundled_plans("recorded_plans.json") if len(p) > 1])
+def test_rejected_bundled_plans_are_not_translatable(query, plans):
+    for plan in plans[:-1]:
+        with pytest.raises(NotTranslatable):
+            PlanSqlCompiler().compile(WayangPlan(**plan))
+
+
+@pytest.mark.parametrize("value,text", [
+    (1.0, "1.0"),
+    (0.25, "0.25"),
+    (12345678.0, "1.2345678E7"),
+    (0.0001, "1.0E-4"),
+    (-0.0, "-0.0"),
+    (float("nan"), "NaN"),
+    (float("-inf"), "-Infinity"),
+])
+def test_format_double_matches_java(value, text):
+    assert format_double(value) == text
+
+
+@pytest.mark.parametrize("value,type,text", [
+    (None, "any", "null"),
+    (True, "boolean", "true"),
+    (3, "double", "3.0"),
+    (Decimal("3.50"), "long", "3"),
+    (Decimal("3.50"), "any", "3.50"),
+    (date(1994, 1, 1), "any", "1994-01-01"),
+    (datetime(1994, 1, 1, 12, 30), "any", "1994-01-01 12:30:00.0"),
+    ("AIR", "String", "AIR"),
+])
+def test_format_scalar_matches_java(value, type, text):
+    assert format_scalar(value, type) == text
+
+
+def test_file_input_is_not_translatable():
+    with pytest.raises(NotTranslatable, match="no SQL translation"):
+        compile_plan(
+            operation(1, "textFileInput", [], [2], inputFileName="file:///tmp/orders.txt"),
+            operation(2, "textFileOutput", [1], []),
+        )
+
+
+def test_udf_outside_the_supported_subset_is_not_translatable():
+    with pytest.raises(NotTranslatable):
+        compile_plan(
+            operation(1, "jdbcRemoteInput", [], [2], table="orders", columnNames=["o_comment"]),
+            operation(2, "map", [1], [3], udf="(r: org.apache.wayang.basic.data.Record) => r.getField(0).toString.reverse"),
+            operation(3, "textFileOutput", [2], []),
+        )
+
+
+def test_group_by_without_map_is_not_translatable():
+    with pytest.raises(NotTranslatable, match="groupBy must be followed by a map"):
+        compile_plan(
+            operation(1, "jdbcRemoteInput", [], [2], table="orders", columnNames=["o_orderstatus"]),
+            operation(2, "groupBy", [1], [3], keyUdf="(r: org.apache.wayang.basic.data.Record) => r.getField(0).toString"),
+            operation(3, "textFileOutput", [2], []),
+        )
@@ -0,0 +1,8 @@
+from ai_wayang_single.bench.startup import StartupBenchmark
+
+
+def test_server_starts_without_heavy_modules():
+    report = StartupBenchmark(runs=1).run()
+
+    assert report["success_rate"] == 1.0
+    assert report["heavy_modules"] == []